@@ -2,718 +2,386 @@
 Script para ejecutar test cases contra la API FastAPI
 Servidor: http://localhost:8000
 Genera reporte en formato CSV
+
+Los casos se cargan de los CSV en docs/ (columnas ID, Escenario,
+Pre-condiciones, Pasos, Resultado Esperado...). Cada caso independiente se
+ejecuta en paralelo sobre un cliente HTTP con conexiones keep-alive, y se
+repite N iteraciones para reportar percentiles de latencia por caso.
+
+Uso:
+    python api_tests/test_runner.py
+    python api_tests/test_runner.py --iteraciones 20 --preparar-db
 """
 
-import requests
+import argparse
+import asyncio
 import csv
-import json
+import os
+import re
+import statistics
+import sys
+import time
+from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
+
+import httpx
 
 # Configuración
-BASE_URL = "http://localhost:8000"
+BASE_URL = os.getenv("BASE_URL", "http://localhost:8000")
 TIMEOUT = 5
+RAIZ = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+CASOS_DEFAULT = [
+    os.path.join(RAIZ, "docs", "test_cases.csv"),
+    os.path.join(RAIZ, "docs", "test_cases_transfers.csv"),
+    os.path.join(RAIZ, "docs", "test_cases_prestamos.csv"),
+]
+REPORTE_DEFAULT = os.path.join(RAIZ, "report_test_cases.csv")
+
+COLUMNAS_REPORTE = ["ID", "Suite", "Escenario", "Estado", "Esperado", "Obtenido",
+                    "Tiempo (ms)", "p95 (ms)", "p99 (ms)", "Iteraciones", "Notas", "Fecha"]
+
+_RE_PASO = re.compile(r"^(GET|POST|PUT|PATCH|DELETE)\s+(/\S*)\s*(\{.*\})?\s*$", re.IGNORECASE)
+_RE_PAR = re.compile(r"(\w+)\s*:\s*('[^']*'|\"[^\"]*\"|[^,}]+)")
+_RE_STATUS = re.compile(r"\b([1-5]\d\d)\b")
+_RE_CAMPO = re.compile(r"^(\w+)\s*(=|>=|<=|>|<)\s*(.+)$")
+_RE_TEXTO = re.compile(r"(?:detalle|mensaje)\s+'([^']+)'", re.IGNORECASE)
+_RE_LATENCIA = re.compile(r"tiempo de respuesta\s*<\s*(\d+)\s*ms", re.IGNORECASE)
+_RE_CLIENTE_BD = re.compile(r"^Cliente en BD:\s*(.+)$", re.IGNORECASE)
+# Pre-condición sobre datos que crea otro caso (ej. "préstamo 1 creado previamente")
+_RE_PREVIO = re.compile(r"\bprevi(?:o|a|os|as|amente)\b", re.IGNORECASE)
+
+
+@dataclass
+class Caso:
+    id: str
+    suite: str
+    escenario: str
+    esperado: str
+    metodo: Optional[str] = None
+    ruta: Optional[str] = None
+    cuerpo: Optional[dict] = None
+    status_esperados: List[int] = field(default_factory=list)
+    campos: List[Tuple[str, str, str]] = field(default_factory=list)
+    textos: List[str] = field(default_factory=list)
+    latencia_max_ms: Optional[float] = None
+    cliente_bd: Optional[dict] = None
+    depende_de_otros: bool = False
+    motivo_omitido: Optional[str] = None
+
+
+def _valor_literal(texto: str):
+    texto = texto.strip()
+    if texto[:1] in ("'", '"'):
+        return texto[1:-1]
+    minus = texto.lower()
+    if minus in ("true", "false"):
+        return minus == "true"
+    if minus in ("null", "none"):
+        return None
+    try:
+        return int(texto)
+    except ValueError:
+        pass
+    try:
+        return float(texto)
+    except ValueError:
+        return texto
+
+
+def parsear_pasos(pasos: str):
+    """'POST /api/x {cliente_id:1}' -> ('POST', '/api/x', {'cliente_id': 1}); None si no es HTTP"""
+    m = _RE_PASO.match(pasos.strip())
+    if not m:
+        return None
+    cuerpo = None
+    if m.group(3) is not None:
+        cuerpo = {k: _valor_literal(v) for k, v in _RE_PAR.findall(m.group(3))}
+    return m.group(1).upper(), m.group(2), cuerpo
+
+
+def parsear_esperado(caso: Caso, esperado: str):
+    segmentos = [s.strip() for s in esperado.split(";") if s.strip()]
+    if segmentos:
+        caso.status_esperados = [int(s) for s in _RE_STATUS.findall(segmentos[0])]
+    for seg in segmentos:
+        caso.textos.extend(_RE_TEXTO.findall(seg))
+        latencia = _RE_LATENCIA.search(seg)
+        if latencia:
+            caso.latencia_max_ms = float(latencia.group(1))
+    for seg in segmentos[1:]:
+        m = _RE_CAMPO.match(seg)
+        if m and " " not in m.group(3).strip():
+            caso.campos.append((m.group(1), m.group(2), m.group(3).strip()))
+
+
+def parsear_cliente_bd(precondiciones: str) -> Optional[dict]:
+    """'Cliente en BD: id=1001; score_cifin=750; estado=activo' -> dict"""
+    m = _RE_CLIENTE_BD.match(precondiciones.strip())
+    if not m:
+        return None
+    datos = {}
+    for par in m.group(1).split(";"):
+        if "=" in par:
+            clave, valor = par.split("=", 1)
+            datos[clave.strip()] = _valor_literal(valor)
+    return datos if "id" in datos else None
+
+
+def cargar_casos(rutas: List[str]) -> List[Caso]:
+    casos = []
+    for ruta in rutas:
+        if not os.path.exists(ruta):
+            continue
+        suite = os.path.splitext(os.path.basename(ruta))[0]
+        with open(ruta, newline="", encoding="utf-8") as f:
+            for fila in csv.DictReader(f):
+                esperado = fila.get("Resultado Esperado") or fila.get("Validaciones") or ""
+                caso = Caso(id=fila["ID"], suite=suite, escenario=fila["Escenario"], esperado=esperado)
+                precondiciones = fila.get("Pre-condiciones", "")
+                paso = parsear_pasos(fila.get("Pasos", ""))
+                if paso is None:
+                    caso.motivo_omitido = "Pasos no ejecutables como un request HTTP"
+                elif "simular" in precondiciones.lower():
+                    caso.motivo_omitido = "Requiere simular la integración externa"
+                else:
+                    caso.metodo, caso.ruta, caso.cuerpo = paso
+                    parsear_esperado(caso, esperado)
+                    caso.cliente_bd = parsear_cliente_bd(precondiciones)
+                    caso.depende_de_otros = bool(_RE_PREVIO.search(precondiciones))
+                casos.append(caso)
+    return casos
+
 
-class TestCaseRunner:
-    def __init__(self):
+def _comparar(actual, operador: str, esperado: str) -> bool:
+    valor = _valor_literal(esperado)
+    if operador == "=":
+        if isinstance(actual, str) and isinstance(valor, str):
+            return actual.lower() == valor.lower()
+        return actual == valor
+    try:
+        actual, valor = float(actual), float(valor)
+    except (TypeError, ValueError):
+        return False
+    return {">": actual > valor, "<": actual < valor,
+            ">=": actual >= valor, "<=": actual <= valor}[operador]
+
+
+def validar(caso: Caso, status: Optional[int], cuerpo) -> Tuple[bool, str]:
+    if status is None:
+        return False, "Sin respuesta (timeout o error de conexión)"
+    if caso.status_esperados and status not in caso.status_esperados:
+        return False, f"Status {status}"
+    datos = cuerpo if isinstance(cuerpo, dict) else {}
+    for nombre, operador, esperado in caso.campos:
+        if nombre not in datos or not _comparar(datos[nombre], operador, esperado):
+            return False, f"Status {status}, {nombre}={datos.get(nombre)}"
+    texto_respuesta = " ".join(str(v) for v in datos.values() if isinstance(v, str)).lower()
+    for texto in caso.textos:
+        if texto.lower() not in texto_respuesta:
+            return False, f"Status {status}, falta texto '{texto}'"
+    return True, f"Status {status}"
+
+
+def percentil(valores: List[float], p: float) -> float:
+    ordenados = sorted(valores)
+    if len(ordenados) == 1:
+        return ordenados[0]
+    k = (len(ordenados) - 1) * p / 100
+    inferior = int(k)
+    superior = min(inferior + 1, len(ordenados) - 1)
+    return ordenados[inferior] + (ordenados[superior] - ordenados[inferior]) * (k - inferior)
+
+
+def cobertura_por_suite(resultados: List[Dict]) -> Dict[str, Tuple[int, int]]:
+    """Suite -> (casos ejecutados, casos omitidos), en el orden de los resultados"""
+    cobertura = {}
+    for fila in resultados:
+        ejecutados, omitidos = cobertura.get(fila["Suite"], (0, 0))
+        if fila["Estado"] == "SKIP":
+            omitidos += 1
+        else:
+            ejecutados += 1
+        cobertura[fila["Suite"]] = (ejecutados, omitidos)
+    return cobertura
+
+
+class EjecutorCasos:
+    def __init__(self, casos: List[Caso], iteraciones: int = 1, concurrencia: int = 32):
+        self.casos = casos
+        self.iteraciones = iteraciones
+        self.concurrencia = concurrencia
         self.results = []
-        self.test_count = 0
         self.passed = 0
         self.failed = 0
-        
-    def add_result(self, test_id: str, scenario: str, status: str, 
-                   expected: str, actual: str, execution_time: float, notes: str = ""):
-        """Agrega resultado de un test case"""
-        self.test_count += 1
-        if status == "PASS":
-            self.passed += 1
-        else:
-            self.failed += 1
-            
-        self.results.append({
-            "ID": test_id,
-            "Escenario": scenario,
-            "Estado": status,
-            "Esperado": expected,
-            "Obtenido": actual,
-            "Tiempo (ms)": round(execution_time * 1000, 2),
-            "Notas": notes,
-            "Fecha": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        })
-    
-    def make_request(self, method: str, endpoint: str, **kwargs) -> Tuple[requests.Response, float]:
-        """Realiza petición HTTP y mide tiempo"""
-        url = f"{BASE_URL}{endpoint}"
-        start_time = datetime.now()
+        self.skipped = 0
+
+    async def _ejecutar_una(self, cliente: httpx.AsyncClient, limite: asyncio.Semaphore, caso: Caso):
+        async with limite:
+            inicio = time.perf_counter_ns()
+            try:
+                respuesta = await cliente.request(caso.metodo, caso.ruta, json=caso.cuerpo)
+                latencia_ms = (time.perf_counter_ns() - inicio) / 1e6
+            except httpx.HTTPError:
+                return None, None, (time.perf_counter_ns() - inicio) / 1e6
         try:
-            response = requests.request(method, url, timeout=TIMEOUT, **kwargs)
-            execution_time = (datetime.now() - start_time).total_seconds()
-            return response, execution_time
-        except requests.exceptions.Timeout:
-            execution_time = (datetime.now() - start_time).total_seconds()
-            return None, execution_time
-        except Exception as e:
-            execution_time = (datetime.now() - start_time).total_seconds()
-            return None, execution_time
-    
-    # ==================== BUREAU DE CRÉDITO ====================
-    
-    def test_bc_001_path_feliz(self):
-        """TC-BC-001: Path Feliz - Cliente con Buen Historial"""
-        response, exec_time = self.make_request(
-            "POST", 
-            "/api/bureau/consultar",
-            json={"cliente_id": 1}
-        )
-        
-        if response and response.status_code == 200:
-            data = response.json()
-            if data.get("score") == 750 and data.get("tiene_historial") == True:
-                self.add_result(
-                    "TC-BC-001", 
-                    "Cliente con buen historial crediticio",
-                    "PASS",
-                    "Status 200, Score 750, historial=true",
-                    f"Status {response.status_code}, Score {data.get('score')}, historial={data.get('tiene_historial')}",
-                    exec_time
-                )
-            else:
-                self.add_result(
-                    "TC-BC-001", 
-                    "Cliente con buen historial crediticio",
-                    "FAIL",
-                    "Score 750, historial=true",
-                    f"Score {data.get('score')}, historial={data.get('tiene_historial')}",
-                    exec_time,
-                    "Datos incorrectos en la respuesta"
-                )
-        else:
-            status = response.status_code if response else "TIMEOUT"
-            self.add_result(
-                "TC-BC-001", 
-                "Cliente con buen historial crediticio",
-                "FAIL",
-                "Status 200",
-                f"Status {status}",
-                exec_time,
-                "Error en la petición HTTP"
-            )
-    
-    def test_bc_002_sin_historial(self):
-        """TC-BC-002: Cliente sin historial crediticio"""
-        response, exec_time = self.make_request(
-            "POST", 
-            "/api/bureau/consultar",
-            json={"cliente_id": 2}
-        )
-        
-        if response and response.status_code == 200:
-            data = response.json()
-            if data.get("score") == 0 and data.get("tiene_historial") == False:
-                self.add_result(
-                    "TC-BC-002", 
-                    "Cliente sin historial crediticio",
-                    "PASS",
-                    "Status 200, Score 0, historial=false",
-                    f"Status {response.status_code}, Score {data.get('score')}, historial={data.get('tiene_historial')}",
-                    exec_time
-                )
-            else:
-                self.add_result(
-                    "TC-BC-002", 
-                    "Cliente sin historial crediticio",
-                    "FAIL",
-                    "Score 0, historial=false",
-                    f"Score {data.get('score')}, historial={data.get('tiene_historial')}",
-                    exec_time
-                )
-        else:
-            self.add_result(
-                "TC-BC-002", 
-                "Cliente sin historial crediticio",
-                "FAIL",
-                "Status 200",
-                f"Status {response.status_code if response else 'ERROR'}",
-                exec_time
-            )
-    
-    def test_bc_003_cliente_bloqueado(self):
-        """TC-BC-003: Cliente en lista de riesgo (bloqueado)"""
-        response, exec_time = self.make_request(
-            "POST", 
-            "/api/bureau/consultar",
-            json={"cliente_id": 4}
-        )
-        
-        expected_status = 403
-        if response and response.status_code == expected_status:
-            data = response.json()
-            if "bloqueado" in data.get("detail", "").lower():
-                self.add_result(
-                    "TC-BC-003", 
-                    "Cliente bloqueado en lista de riesgo",
-                    "PASS",
-                    f"Status {expected_status}, mensaje de bloqueo",
-                    f"Status {response.status_code}, mensaje: {data.get('detail')}",
-                    exec_time
-                )
-            else:
-                self.add_result(
-                    "TC-BC-003", 
-                    "Cliente bloqueado en lista de riesgo",
-                    "FAIL",
-                    "Mensaje de bloqueo",
-                    f"Mensaje: {data.get('detail')}",
-                    exec_time
-                )
-        else:
-            self.add_result(
-                "TC-BC-003", 
-                "Cliente bloqueado en lista de riesgo",
-                "FAIL",
-                f"Status {expected_status}",
-                f"Status {response.status_code if response else 'ERROR'}",
-                exec_time
-            )
-    
-    def test_bc_004_cliente_no_existe(self):
-        """TC-BC-004: Cliente inexistente"""
-        response, exec_time = self.make_request(
-            "POST", 
-            "/api/bureau/consultar",
-            json={"cliente_id": 999}
-        )
-        
-        if response and response.status_code == 400:
-            data = response.json()
-            if "no encontrado" in data.get("detail", "").lower():
-                self.add_result(
-                    "TC-BC-004", 
-                    "Cliente inexistente",
-                    "PASS",
-                    "Status 400, mensaje de error",
-                    f"Status {response.status_code}, mensaje: {data.get('detail')}",
-                    exec_time
-                )
-            else:
-                self.add_result(
-                    "TC-BC-004", 
-                    "Cliente inexistente",
-                    "FAIL",
-                    "Mensaje 'no encontrado'",
-                    f"Mensaje: {data.get('detail')}",
-                    exec_time
-                )
-        else:
-            self.add_result(
-                "TC-BC-004", 
-                "Cliente inexistente",
-                "FAIL",
-                "Status 400",
-                f"Status {response.status_code if response else 'ERROR'}",
-                exec_time
-            )
-    
-    def test_bc_005_get_ultima_consulta(self):
-        """TC-BC-005: Obtener última consulta"""
-        response, exec_time = self.make_request("GET", "/api/bureau/1")
-        
-        if response and response.status_code == 200:
-            data = response.json()
-            if data.get("cliente_id") == 1:
-                self.add_result(
-                    "TC-BC-005", 
-                    "Obtener última consulta (GET)",
-                    "PASS",
-                    "Status 200, cliente_id=1",
-                    f"Status {response.status_code}, cliente_id={data.get('cliente_id')}",
-                    exec_time
-                )
-            else:
-                self.add_result(
-                    "TC-BC-005", 
-                    "Obtener última consulta (GET)",
-                    "FAIL",
-                    "cliente_id=1",
-                    f"cliente_id={data.get('cliente_id')}",
-                    exec_time
-                )
-        else:
-            self.add_result(
-                "TC-BC-005", 
-                "Obtener última consulta (GET)",
-                "FAIL",
-                "Status 200",
-                f"Status {response.status_code if response else 'ERROR'}",
-                exec_time
-            )
-    
-    # ==================== PRÉSTAMOS ====================
-    
-    def test_pr_001_aprobacion_automatica(self):
-        """TC-PR-001: Aprobación automática (score>700, ingresos 4x)"""
-        response, exec_time = self.make_request(
-            "POST", 
-            "/api/prestamos/solicitar",
-            json={
-                "cliente_id": 1,
-                "monto_solicitado": 10_000_000,
-                "plazo_meses": 24
-            }
-        )
-        
-        if response and response.status_code == 200:
-            data = response.json()
-            if data.get("estado") == "aprobado":
-                self.add_result(
-                    "TC-PR-001", 
-                    "Préstamo aprobado automáticamente",
-                    "PASS",
-                    "Status 200, estado=aprobado",
-                    f"Status {response.status_code}, estado={data.get('estado')}",
-                    exec_time
-                )
-            else:
-                self.add_result(
-                    "TC-PR-001", 
-                    "Préstamo aprobado automáticamente",
-                    "FAIL",
-                    "estado=aprobado",
-                    f"estado={data.get('estado')}",
-                    exec_time,
-                    f"Motivo: {data.get('motivo_rechazo')}"
-                )
-        else:
-            self.add_result(
-                "TC-PR-001", 
-                "Préstamo aprobado automáticamente",
-                "FAIL",
-                "Status 200",
-                f"Status {response.status_code if response else 'ERROR'}",
-                exec_time
-            )
-    
-    def test_pr_002_rechazo_automatico(self):
-        """TC-PR-002: Rechazo automático (score<500)"""
-        response, exec_time = self.make_request(
-            "POST", 
-            "/api/prestamos/solicitar",
-            json={
-                "cliente_id": 3,
-                "monto_solicitado": 5_000_000,
-                "plazo_meses": 12
-            }
-        )
-        
-        if response and response.status_code == 200:
-            data = response.json()
-            if data.get("estado") == "rechazado":
-                self.add_result(
-                    "TC-PR-002", 
-                    "Préstamo rechazado (score bajo)",
-                    "PASS",
-                    "Status 200, estado=rechazado",
-                    f"Status {response.status_code}, estado={data.get('estado')}, motivo={data.get('motivo_rechazo')}",
-                    exec_time
-                )
-            else:
-                self.add_result(
-                    "TC-PR-002", 
-                    "Préstamo rechazado (score bajo)",
-                    "FAIL",
-                    "estado=rechazado",
-                    f"estado={data.get('estado')}",
-                    exec_time
-                )
-        else:
-            self.add_result(
-                "TC-PR-002", 
-                "Préstamo rechazado (score bajo)",
-                "FAIL",
-                "Status 200",
-                f"Status {response.status_code if response else 'ERROR'}",
-                exec_time
-            )
-    
-    def test_pr_003_limite_monto(self):
-        """TC-PR-003: Validación límite de monto (>$50M)"""
-        response, exec_time = self.make_request(
-            "POST", 
-            "/api/prestamos/solicitar",
-            json={
-                "cliente_id": 1,
-                "monto_solicitado": 60_000_000,
-                "plazo_meses": 60
-            }
-        )
-        
-        if response and response.status_code == 400:
-            data = response.json()
-            if "límite" in data.get("detail", "").lower():
-                self.add_result(
-                    "TC-PR-003", 
-                    "Validación límite de monto excedido",
-                    "PASS",
-                    "Status 400, mensaje de límite",
-                    f"Status {response.status_code}, mensaje: {data.get('detail')}",
-                    exec_time
-                )
-            else:
-                self.add_result(
-                    "TC-PR-003", 
-                    "Validación límite de monto excedido",
-                    "FAIL",
-                    "Mensaje de límite",
-                    f"Mensaje: {data.get('detail')}",
-                    exec_time
-                )
-        else:
-            self.add_result(
-                "TC-PR-003", 
-                "Validación límite de monto excedido",
-                "FAIL",
-                "Status 400",
-                f"Status {response.status_code if response else 'ERROR'}",
-                exec_time
-            )
-    
-    def test_pr_004_revision_manual(self):
-        """TC-PR-004: Préstamo en revisión manual (score 600-700)"""
-        response, exec_time = self.make_request(
-            "POST", 
-            "/api/prestamos/solicitar",
-            json={
-                "cliente_id": 4,
-                "monto_solicitado": 10_000_000,
-                "plazo_meses": 36
-            }
-        )
-        
-        if response and response.status_code == 200:
-            data = response.json()
-            expected_estado = "en_revision"
-            if data.get("estado") == expected_estado:
-                self.add_result(
-                    "TC-PR-004", 
-                    "Préstamo requiere revisión manual",
-                    "PASS",
-                    f"Status 200, estado={expected_estado}",
-                    f"Status {response.status_code}, estado={data.get('estado')}",
-                    exec_time
-                )
-            else:
-                self.add_result(
-                    "TC-PR-004", 
-                    "Préstamo requiere revisión manual",
-                    "FAIL",
-                    f"estado={expected_estado}",
-                    f"estado={data.get('estado')}",
-                    exec_time,
-                    f"Motivo: {data.get('motivo_rechazo')}"
-                )
-        else:
-            self.add_result(
-                "TC-PR-004", 
-                "Préstamo requiere revisión manual",
-                "FAIL",
-                "Status 200",
-                f"Status {response.status_code if response else 'ERROR'}",
-                exec_time
-            )
-    
-    def test_pr_005_sin_historial(self):
-        """TC-PR-005: Préstamo rechazado por falta de historial"""
-        response, exec_time = self.make_request(
-            "POST", 
-            "/api/prestamos/solicitar",
-            json={
-                "cliente_id": 2,
-                "monto_solicitado": 5_000_000,
-                "plazo_meses": 12
-            }
-        )
-        
-        if response and response.status_code == 200:
-            data = response.json()
-            if data.get("estado") == "rechazado" and "historial" in data.get("motivo_rechazo", "").lower():
-                self.add_result(
-                    "TC-PR-005", 
-                    "Préstamo rechazado sin historial",
-                    "PASS",
-                    "Status 200, estado=rechazado, motivo=sin historial",
-                    f"Status {response.status_code}, estado={data.get('estado')}, motivo={data.get('motivo_rechazo')}",
-                    exec_time
-                )
-            else:
-                self.add_result(
-                    "TC-PR-005", 
-                    "Préstamo rechazado sin historial",
-                    "FAIL",
-                    "estado=rechazado, motivo incluye 'historial'",
-                    f"estado={data.get('estado')}, motivo={data.get('motivo_rechazo')}",
-                    exec_time
-                )
-        else:
-            self.add_result(
-                "TC-PR-005", 
-                "Préstamo rechazado sin historial",
-                "FAIL",
-                "Status 200",
-                f"Status {response.status_code if response else 'ERROR'}",
-                exec_time
-            )
-    
-    def test_pr_006_consultar_estado(self):
-        """TC-PR-006: Consultar estado de préstamo"""
-        # Primero crear un préstamo
-        create_response, _ = self.make_request(
-            "POST", 
-            "/api/prestamos/solicitar",
-            json={
-                "cliente_id": 1,
-                "monto_solicitado": 10_000_000,
-                "plazo_meses": 24
-            }
-        )
-        
-        if create_response and create_response.status_code == 200:
-            prestamo_id = create_response.json().get("id")
-            
-            # Consultar estado
-            response, exec_time = self.make_request("GET", f"/api/prestamos/{prestamo_id}/estado")
-            
-            if response and response.status_code == 200:
-                data = response.json()
-                if data.get("id") == prestamo_id:
-                    self.add_result(
-                        "TC-PR-006", 
-                        "Consultar estado de préstamo",
-                        "PASS",
-                        f"Status 200, id={prestamo_id}",
-                        f"Status {response.status_code}, id={data.get('id')}, estado={data.get('estado')}",
-                        exec_time
-                    )
-                else:
-                    self.add_result(
-                        "TC-PR-006", 
-                        "Consultar estado de préstamo",
-                        "FAIL",
-                        f"id={prestamo_id}",
-                        f"id={data.get('id')}",
-                        exec_time
-                    )
-            else:
-                self.add_result(
-                    "TC-PR-006", 
-                    "Consultar estado de préstamo",
-                    "FAIL",
-                    "Status 200",
-                    f"Status {response.status_code if response else 'ERROR'}",
-                    exec_time
-                )
-        else:
-            self.add_result(
-                "TC-PR-006", 
-                "Consultar estado de préstamo",
-                "FAIL",
-                "No se pudo crear préstamo previo",
-                f"Status {create_response.status_code if create_response else 'ERROR'}",
-                0
-            )
-    
-    def test_pr_007_prestamo_no_existe(self):
-        """TC-PR-007: Consultar préstamo inexistente"""
-        response, exec_time = self.make_request("GET", "/api/prestamos/999/estado")
-        
-        if response and response.status_code == 404:
-            data = response.json()
-            if "no encontrado" in data.get("detail", "").lower():
-                self.add_result(
-                    "TC-PR-007", 
-                    "Consultar préstamo inexistente",
-                    "PASS",
-                    "Status 404, mensaje de error",
-                    f"Status {response.status_code}, mensaje: {data.get('detail')}",
-                    exec_time
-                )
-            else:
-                self.add_result(
-                    "TC-PR-007", 
-                    "Consultar préstamo inexistente",
-                    "FAIL",
-                    "Mensaje 'no encontrado'",
-                    f"Mensaje: {data.get('detail')}",
-                    exec_time
-                )
-        else:
-            self.add_result(
-                "TC-PR-007", 
-                "Consultar préstamo inexistente",
-                "FAIL",
-                "Status 404",
-                f"Status {response.status_code if response else 'ERROR'}",
-                exec_time
-            )
-    
-    # ==================== HEALTH CHECK ====================
-    
-    def test_health_check(self):
-        """TC-SYS-001: Health check del sistema"""
-        response, exec_time = self.make_request("GET", "/health")
-        
-        if response and response.status_code == 200:
-            data = response.json()
-            if data.get("status") == "OK":
-                self.add_result(
-                    "TC-SYS-001", 
-                    "Health check del sistema",
-                    "PASS",
-                    "Status 200, status=OK",
-                    f"Status {response.status_code}, status={data.get('status')}",
-                    exec_time
-                )
-            else:
-                self.add_result(
-                    "TC-SYS-001", 
-                    "Health check del sistema",
-                    "FAIL",
-                    "status=OK",
-                    f"status={data.get('status')}",
-                    exec_time
-                )
-        else:
-            self.add_result(
-                "TC-SYS-001", 
-                "Health check del sistema",
-                "FAIL",
-                "Status 200",
-                f"Status {response.status_code if response else 'ERROR'}",
-                exec_time
-            )
-    
-    def test_root_endpoint(self):
-        """TC-SYS-002: Endpoint raíz"""
-        response, exec_time = self.make_request("GET", "/")
-        
-        if response and response.status_code == 200:
-            data = response.json()
-            if "message" in data:
-                self.add_result(
-                    "TC-SYS-002", 
-                    "Endpoint raíz",
-                    "PASS",
-                    "Status 200, contiene 'message'",
-                    f"Status {response.status_code}, message={data.get('message')}",
-                    exec_time
-                )
+            cuerpo = respuesta.json()
+        except ValueError:
+            cuerpo = None
+        return respuesta.status_code, cuerpo, latencia_ms
+
+    async def _ejecutar_caso(self, cliente, limite, caso: Caso) -> Dict:
+        if caso.motivo_omitido:
+            return self._resultado(caso, "SKIP", "-", [], caso.motivo_omitido)
+
+        corridas = await asyncio.gather(*[
+            self._ejecutar_una(cliente, limite, caso) for _ in range(self.iteraciones)
+        ])
+        latencias = [latencia for _, _, latencia in corridas]
+        obtenido = ""
+        for status, cuerpo, _ in corridas:
+            ok, obtenido = validar(caso, status, cuerpo)
+            if not ok:
+                return self._resultado(caso, "FAIL", obtenido, latencias)
+
+        if caso.latencia_max_ms is not None and percentil(latencias, 95) >= caso.latencia_max_ms:
+            return self._resultado(caso, "FAIL", obtenido, latencias,
+                                   f"p95 >= {caso.latencia_max_ms:.0f}ms")
+        return self._resultado(caso, "PASS", obtenido, latencias)
+
+    def _resultado(self, caso: Caso, estado: str, obtenido: str, latencias: List[float], notas: str = ""):
+        return {
+            "ID": caso.id,
+            "Suite": caso.suite,
+            "Escenario": caso.escenario,
+            "Estado": estado,
+            "Esperado": caso.esperado,
+            "Obtenido": obtenido,
+            "Tiempo (ms)": round(statistics.median(latencias), 2) if latencias else "",
+            "p95 (ms)": round(percentil(latencias, 95), 2) if latencias else "",
+            "p99 (ms)": round(percentil(latencias, 99), 2) if latencias else "",
+            "Iteraciones": len(latencias),
+            "Notas": notas,
+            "Fecha": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        }
+
+    async def ejecutar(self, base_url: str = BASE_URL) -> float:
+        """Ejecuta los casos independientes en paralelo; retorna la duración total en ms"""
+        limites = httpx.Limits(max_connections=self.concurrencia, max_keepalive_connections=self.concurrencia)
+        limite = asyncio.Semaphore(self.concurrencia)
+        inicio = time.perf_counter_ns()
+        # Los que dependen de datos de otro caso corren después de los
+        # independientes, en orden; los de umbral de latencia al final, sin
+        # competir con el resto
+        de_latencia = [c for c in self.casos if c.latencia_max_ms is not None]
+        dependientes = [c for c in self.casos if c.depende_de_otros and c.latencia_max_ms is None]
+        generales = [c for c in self.casos if not c.depende_de_otros and c.latencia_max_ms is None]
+        async with httpx.AsyncClient(base_url=base_url, timeout=TIMEOUT, limits=limites) as cliente:
+            resultados = await asyncio.gather(*[
+                self._ejecutar_caso(cliente, limite, caso) for caso in generales
+            ])
+            for caso in dependientes:
+                resultados.append(await self._ejecutar_caso(cliente, limite, caso))
+            for caso in de_latencia:
+                resultados.append(await self._ejecutar_caso(cliente, asyncio.Semaphore(1), caso))
+        orden = {id(caso): i for i, caso in enumerate(self.casos)}
+        casos = generales + dependientes + de_latencia
+        self.results = [fila for _, fila in sorted(zip(casos, resultados), key=lambda par: orden[id(par[0])])]
+        for fila in self.results:
+            if fila["Estado"] == "PASS":
+                self.passed += 1
+            elif fila["Estado"] == "FAIL":
+                self.failed += 1
             else:
-                self.add_result(
-                    "TC-SYS-002", 
-                    "Endpoint raíz",
-                    "FAIL",
-                    "Contiene 'message'",
-                    f"Respuesta: {data}",
-                    exec_time
-                )
-        else:
-            self.add_result(
-                "TC-SYS-002", 
-                "Endpoint raíz",
-                "FAIL",
-                "Status 200",
-                f"Status {response.status_code if response else 'ERROR'}",
-                exec_time
-            )
-    
-    def run_all_tests(self):
-        """Ejecuta todos los test cases"""
-        print("🧪 Iniciando ejecución de test cases...")
-        print(f"📡 Servidor: {BASE_URL}")
-        print("-" * 60)
-        
-        # Bureau de Crédito
-        print("\n📋 BUREAU DE CRÉDITO")
-        self.test_bc_001_path_feliz()
-        print("  ✓ TC-BC-001 ejecutado")
-        self.test_bc_002_sin_historial()
-        print("  ✓ TC-BC-002 ejecutado")
-        self.test_bc_003_cliente_bloqueado()
-        print("  ✓ TC-BC-003 ejecutado")
-        self.test_bc_004_cliente_no_existe()
-        print("  ✓ TC-BC-004 ejecutado")
-        self.test_bc_005_get_ultima_consulta()
-        print("  ✓ TC-BC-005 ejecutado")
-        
-        # Préstamos
-        print("\n💰 PRÉSTAMOS")
-        self.test_pr_001_aprobacion_automatica()
-        print("  ✓ TC-PR-001 ejecutado")
-        self.test_pr_002_rechazo_automatico()
-        print("  ✓ TC-PR-002 ejecutado")
-        self.test_pr_003_limite_monto()
-        print("  ✓ TC-PR-003 ejecutado")
-        self.test_pr_004_revision_manual()
-        print("  ✓ TC-PR-004 ejecutado")
-        self.test_pr_005_sin_historial()
-        print("  ✓ TC-PR-005 ejecutado")
-        self.test_pr_006_consultar_estado()
-        print("  ✓ TC-PR-006 ejecutado")
-        self.test_pr_007_prestamo_no_existe()
-        print("  ✓ TC-PR-007 ejecutado")
-        
-        # Sistema
-        print("\n⚙️  SISTEMA")
-        self.test_health_check()
-        print("  ✓ TC-SYS-001 ejecutado")
-        self.test_root_endpoint()
-        print("  ✓ TC-SYS-002 ejecutado")
-        
-        print("\n" + "=" * 60)
-        print(f"✅ Tests ejecutados: {self.test_count}")
-        print(f"✅ Pasados: {self.passed} ({round(self.passed/self.test_count*100, 1)}%)")
-        print(f"❌ Fallidos: {self.failed} ({round(self.failed/self.test_count*100, 1)}%)")
-        print("=" * 60)
-    
-    def export_to_csv(self, filename: str = "report_test_cases.csv"):
+                self.skipped += 1
+        return (time.perf_counter_ns() - inicio) / 1e6
+
+    def export_to_csv(self, filename: str = REPORTE_DEFAULT):
         """Exporta resultados a CSV"""
-        with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
-            fieldnames = ["ID", "Escenario", "Estado", "Esperado", "Obtenido", "Tiempo (ms)", "Notas", "Fecha"]
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-            
+        with open(filename, "w", newline="", encoding="utf-8") as csvfile:
+            writer = csv.DictWriter(csvfile, fieldnames=COLUMNAS_REPORTE)
             writer.writeheader()
             for result in self.results:
                 writer.writerow(result)
-        
         print(f"\n📄 Reporte exportado: {filename}")
 
-def main():
+
+def preparar_db(casos: List[Caso]):
+    """Crea/actualiza los clientes de las pre-condiciones 'Cliente en BD: ...'"""
+    sys.path.insert(0, RAIZ)
+    from app import database
+    from app.models.cliente import Cliente, EstadoCliente
+
+    database.init_db()
+    db = database.SessionLocal()
+    try:
+        for caso in casos:
+            datos = caso.cliente_bd
+            if not datos:
+                continue
+            cliente = db.get(Cliente, datos["id"])
+            if cliente is None:
+                cliente = Cliente(id=datos["id"])
+                db.add(cliente)
+            cliente.nombre = f"Test {datos['id']}"
+            cliente.identificacion = str(datos.get("identificacion", f"{datos['id']}-IDENT"))
+            cliente.email = f"test{datos['id']}@example.com"
+            cliente.score_cifin = datos.get("score_cifin")
+            cliente.ingresos_mensuales = float(datos.get("ingresos_mensuales", 1000.0))
+            cliente.estado = EstadoCliente(str(datos.get("estado", "activo")).lower())
+        db.commit()
+    finally:
+        db.close()
+
+
+def main(argv=None):
     """Función principal"""
+    parser = argparse.ArgumentParser(description="Ejecuta los test cases de docs/*.csv contra la API")
+    parser.add_argument("--base-url", default=BASE_URL)
+    parser.add_argument("--casos", nargs="+", default=CASOS_DEFAULT, help="Archivos CSV de casos")
+    parser.add_argument("--iteraciones", type=int, default=1, help="Repeticiones por caso (percentiles)")
+    parser.add_argument("--concurrencia", type=int, default=32, help="Requests simultáneos máximos")
+    parser.add_argument("--salida", default=REPORTE_DEFAULT)
+    parser.add_argument("--preparar-db", action="store_true",
+                        help="Inserta los clientes de las pre-condiciones en la DB local")
+    args = parser.parse_args(argv)
+
     print("\n" + "=" * 60)
     print("🚀 TEST RUNNER - API FASTAPI CLASE 2")
     print("=" * 60)
-    
-    runner = TestCaseRunner()
-    
+
+    casos = cargar_casos(args.casos)
+    if args.preparar_db:
+        preparar_db(casos)
+
     # Verificar conectividad
     try:
-        response = requests.get(f"{BASE_URL}/health", timeout=2)
-        if response.status_code == 200:
-            print(f"✅ Servidor disponible en {BASE_URL}")
-        else:
-            print(f"⚠️  Servidor responde pero con status {response.status_code}")
-    except:
-        print(f"❌ ERROR: No se puede conectar a {BASE_URL}")
+        httpx.get(f"{args.base_url}/health", timeout=2)
+        print(f"✅ Servidor disponible en {args.base_url}")
+    except httpx.HTTPError:
+        print(f"❌ ERROR: No se puede conectar a {args.base_url}")
         print("   Asegúrate de que el servidor esté ejecutándose:")
         print("   uvicorn app.main:app --reload --port 8000")
-        return
-    
-    # Ejecutar tests
-    runner.run_all_tests()
-    
-    # Exportar resultados
-    runner.export_to_csv()
-    
-    print("\n✅ Ejecución completada exitosamente!")
+        return 1
+
+    runner = EjecutorCasos(casos, iteraciones=args.iteraciones, concurrencia=args.concurrencia)
+    total_ms = asyncio.run(runner.ejecutar(args.base_url))
+
+    for fila in runner.results:
+        detalle = fila["Notas"] if fila["Estado"] == "SKIP" else f"p50={fila['Tiempo (ms)']}ms  {fila['Obtenido']}"
+        print(f"  {fila['Estado']:4s} {fila['Suite']}/{fila['ID']}  {detalle}  {fila['Notas'] if fila['Estado'] == 'FAIL' else ''}")
+    print("\n" + "=" * 60)
+    print(f"✅ Pasados: {runner.passed}  ❌ Fallidos: {runner.failed}  ⏭️  Omitidos: {runner.skipped}")
+    # Una suite sin ningún request ejecutado no es una suite que pasa
+    for suite, (ejecutados, omitidos) in cobertura_por_suite(runner.results).items():
+        aviso = "  ⚠️  sin cobertura HTTP" if ejecutados == 0 else ""
+        print(f"   {suite}: {ejecutados} ejecutados, {omitidos} omitidos{aviso}")
+    print(f"⏱️  Duración total: {total_ms:.1f} ms ({len(casos)} casos x {args.iteraciones} iteraciones)")
+    print("=" * 60)
+
+    runner.export_to_csv(args.salida)
+    return 0 if runner.failed == 0 else 1
+
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,234 @@
+"""
+Control de admisión: límites de concurrencia por clase de ruta y descarte de carga.
+
+Cuando la DB se pone lenta, los requests se acumulan en el threadpool de
+Starlette esperando `get_db` y la latencia sube para todas las rutas. Este
+middleware decide antes de que el request entre a la app:
+
+- Cada clase de ruta tiene un máximo de requests en curso, una cola acotada
+  y un presupuesto de espera en cola. La clase sale de la tabla RUTAS_CLASE
+  (método + plantilla de ruta); las rutas que no figuran se clasifican por
+  método: lecturas o escrituras interactivas.
+- Hay además un máximo global por debajo del threadpool (40 hilos por
+  defecto), así las rutas exentas (`/health`) siempre encuentran un hilo.
+- Al liberarse un lugar se despacha primero la clase de mayor prioridad:
+  las lecturas baratas pasan antes que `POST /api/prestamos/solicitar`, y
+  éste antes que las operaciones masivas (importación, jobs), que tienen sus
+  propios lugares y no le quitan los suyos.
+- Si la cola está llena o se agota el presupuesto de espera, responde 503
+  con `Retry-After` de inmediato en vez de dejar que el cliente espere.
+"""
+import asyncio
+import json
+import re
+import time
+from collections import deque
+
+CLASE_LECTURA = "lectura"
+CLASE_ESCRITURA = "escritura"
+CLASE_MASIVA = "masiva"
+
+# Rutas sin control: deben responder aunque la app esté saturada
+RUTAS_EXENTAS = frozenset({"/", "/health", "/docs", "/redoc", "/openapi.json", "/api/admision/metricas",
+                           "/debug/profile"})
+# Conexiones largas y baratas (SSE): ocuparían un lugar por minutos
+SUFIJOS_EXENTOS = ("/eventos",)
+METODOS_LECTURA = frozenset({"GET", "HEAD", "OPTIONS"})
+
+# Clase por ruta (plantillas como en los routers); el resto va por método
+RUTAS_CLASE = {
+    ("POST", "/api/prestamos/solicitar"): CLASE_ESCRITURA,
+    ("PATCH", "/api/prestamos/{prestamo_id}/estado"): CLASE_ESCRITURA,
+    # POST que solo calcula
+    ("POST", "/api/prestamos/amortizacion/lote"): CLASE_LECTURA,
+    ("POST", "/api/clientes/import"): CLASE_MASIVA,
+    ("POST", "/api/jobs"): CLASE_MASIVA,
+}
+
+
+def _compilar(rutas: dict):
+    """{(método, plantilla): clase} → [(método, regex, clase)]"""
+    return [
+        (metodo, re.compile("^" + re.sub(r"\\{\w+\\}", "[^/]+", re.escape(plantilla)) + "$"), clase)
+        for (metodo, plantilla), clase in rutas.items()
+    ]
+
+
+class Clase:
+    """Límites de una clase de ruta; menor `prioridad` se despacha primero"""
+
+    def __init__(self, nombre: str, prioridad: int, max_concurrencia: int, max_cola: int, espera_maxima: float):
+        self.nombre = nombre
+        self.prioridad = prioridad
+        self.max_concurrencia = max_concurrencia
+        self.max_cola = max_cola
+        self.espera_maxima = espera_maxima
+        self.activos = 0
+        self.cola = deque()
+        self.admitidos = 0
+        self.descartados_cola_llena = 0
+        self.descartados_espera = 0
+        self.espera_total = 0.0
+        self.encolados = 0
+
+
+class ControlAdmision:
+    """
+    Semáforos con prioridad, sin locks: todo corre en el event loop.
+    `adquirir` retorna False si el request debe descartarse.
+    """
+
+    def __init__(self, clases, max_total: int, retry_after: int = 1, reloj=time.monotonic, rutas: dict = None):
+        self.clases = {clase.nombre: clase for clase in clases}
+        self._rutas = _compilar(RUTAS_CLASE if rutas is None else rutas)
+        self._por_prioridad = sorted(clases, key=lambda c: c.prioridad)
+        self.max_total = max_total
+        self.retry_after = retry_after
+        self._reloj = reloj
+        self.activos = 0
+
+    @classmethod
+    def desde_settings(cls, settings):
+        return cls(
+            [
+                Clase(CLASE_LECTURA, 0,
+                      settings.ADMISION_LECTURA_MAX_CONCURRENCIA,
+                      settings.ADMISION_LECTURA_MAX_COLA,
+                      settings.ADMISION_LECTURA_ESPERA_MAXIMA_MS / 1000),
+                Clase(CLASE_ESCRITURA, 1,
+                      settings.ADMISION_ESCRITURA_MAX_CONCURRENCIA,
+                      settings.ADMISION_ESCRITURA_MAX_COLA,
+                      settings.ADMISION_ESCRITURA_ESPERA_MAXIMA_MS / 1000),
+                Clase(CLASE_MASIVA, 2,
+                      settings.ADMISION_MASIVA_MAX_CONCURRENCIA,
+                      settings.ADMISION_MASIVA_MAX_COLA,
+                      settings.ADMISION_MASIVA_ESPERA_MAXIMA_MS / 1000),
+            ],
+            max_total=settings.ADMISION_MAX_TOTAL,
+            retry_after=settings.ADMISION_RETRY_AFTER_SEGUNDOS,
+        )
+
+    def clasificar(self, metodo: str, ruta: str):
+        """Clase de la ruta, o None si no se controla"""
+        if ruta in RUTAS_EXENTAS or ruta.endswith(SUFIJOS_EXENTOS):
+            return None
+        for metodo_ruta, patron, nombre in self._rutas:
+            if metodo == metodo_ruta and patron.match(ruta):
+                return self.clases[nombre]
+        return self.clases[CLASE_LECTURA if metodo in METODOS_LECTURA else CLASE_ESCRITURA]
+
+    def _hay_lugar(self, clase: Clase) -> bool:
+        return self.activos < self.max_total and clase.activos < clase.max_concurrencia
+
+    def _ocupar(self, clase: Clase):
+        self.activos += 1
+        clase.activos += 1
+        clase.admitidos += 1
+
+    async def adquirir(self, clase: Clase) -> bool:
+        # Entra directo solo si nadie de igual o mayor prioridad está esperando
+        esperando = any(c.cola for c in self._por_prioridad if c.prioridad <= clase.prioridad)
+        if not esperando and self._hay_lugar(clase):
+            self._ocupar(clase)
+            return True
+        if len(clase.cola) >= clase.max_cola:
+            clase.descartados_cola_llena += 1
+            return False
+
+        futuro = asyncio.get_running_loop().create_future()
+        clase.cola.append(futuro)
+        inicio = self._reloj()
+        try:
+            await asyncio.wait({futuro}, timeout=clase.espera_maxima)
+        except asyncio.CancelledError:
+            # El cliente se desconectó estando en cola
+            if futuro.done() and not futuro.cancelled():
+                # `_despachar` ya le había ocupado un lugar: devolverlo
+                self.liberar(clase)
+            else:
+                clase.cola.remove(futuro)
+                futuro.cancel()
+            raise
+        clase.espera_total += self._reloj() - inicio
+        clase.encolados += 1
+        if futuro.done():
+            # `_despachar` ya ocupó el lugar a nombre de este request
+            return True
+        clase.cola.remove(futuro)
+        futuro.cancel()
+        clase.descartados_espera += 1
+        return False
+
+    def liberar(self, clase: Clase):
+        self.activos -= 1
+        clase.activos -= 1
+        self._despachar()
+
+    def _despachar(self):
+        for clase in self._por_prioridad:
+            while clase.cola and self._hay_lugar(clase):
+                futuro = clase.cola.popleft()
+                self._ocupar(clase)
+                futuro.set_result(True)
+            if self.activos >= self.max_total:
+                return
+
+    def metricas(self) -> dict:
+        return {
+            "activos": self.activos,
+            "max_total": self.max_total,
+            "clases": {
+                clase.nombre: {
+                    "activos": clase.activos,
+                    "en_cola": len(clase.cola),
+                    "max_concurrencia": clase.max_concurrencia,
+                    "max_cola": clase.max_cola,
+                    "admitidos": clase.admitidos,
+                    "descartados_cola_llena": clase.descartados_cola_llena,
+                    "descartados_espera": clase.descartados_espera,
+                    "espera_promedio_ms": round(clase.espera_total / clase.encolados * 1000, 2)
+                    if clase.encolados else 0.0,
+                }
+                for clase in self._por_prioridad
+            },
+        }
+
+
+class MiddlewareAdmision:
+    """
+    Middleware ASGI puro: el lugar se libera cuando termina de enviarse la
+    respuesta (incluye respuestas en streaming).
+    """
+
+    def __init__(self, app, control: ControlAdmision):
+        self.app = app
+        self.control = control
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        clase = self.control.clasificar(scope["method"], scope["path"])
+        if clase is None:
+            await self.app(scope, receive, send)
+            return
+        if not await self.control.adquirir(clase):
+            await self._responder_503(send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.control.liberar(clase)
+
+    async def _responder_503(self, send):
+        cuerpo = json.dumps({"detail": "Servicio saturado, reintente en unos segundos"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(cuerpo)).encode()),
+                (b"retry-after", str(self.control.retry_after).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": cuerpo})
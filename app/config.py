@@ -1,19 +1,282 @@
+import json
+import logging
 import os
+import signal
+import threading
+from dataclasses import dataclass, fields
 
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
 class Settings:
+    """
+    Snapshot inmutable de la configuración.
+    Cada campo puede sobreescribirse con una variable de entorno del mismo
+    nombre o con un archivo JSON (APP_CONFIG_FILE).
+    """
     # API Settings
-    API_TITLE = "API Test Cases - Clase 2"
-    API_VERSION = "1.0.0"
-    API_DESCRIPTION = "API REST para ejecutar test cases de Bureau, Préstamos y Transferencias"
-    
+    API_TITLE: str = "API Test Cases - Clase 2"
+    API_VERSION: str = "1.0.0"
+    API_DESCRIPTION: str = "API REST para ejecutar test cases de Bureau, Préstamos y Transferencias"
+
     # Database Settings
-    DATABASE_URL = "sqlite:///:memory:"
-    
+    DATABASE_URL: str = "sqlite:///./test.db"
+    # Réplica de lectura; vacío = derivada de DATABASE_URL (ver app/database.py)
+    DATABASE_READ_URL: str = ""
+    # Sharding por cliente (app/shards.py): 0 = una sola base. Se decide al arrancar.
+    # URLs separadas por coma; vacío = derivadas de DATABASE_URL (test.shard0.db, ...)
+    DATABASE_SHARDS: int = 0
+    DATABASE_SHARD_URLS: str = ""
+    # PostgreSQL (driver psycopg 3, ver app/database.py): pool de conexiones y
+    # prepared statements del servidor. Umbral = ejecuciones de una misma sentencia
+    # en una conexión antes de prepararla; <0 = nunca (ej. PgBouncer en modo transacción)
+    DATABASE_POOL_SIZE: int = 10
+    DATABASE_POOL_MAX_OVERFLOW: int = 20
+    DATABASE_PG_PREPARE_THRESHOLD: int = 5
+    DATABASE_PG_PREPARED_MAX: int = 256
+
     # Límites de negocio
-    LIMITE_MONTO_PRESTAMO = 50_000_000
-    PLAZO_MAXIMO_MESES = 60
-    SCORE_APROBACION_AUTOMATICA = 700
-    SCORE_RECHAZO_AUTOMATICO = 500
-    RATIO_INGRESOS_MINIMO = 3
-    
-settings = Settings()
+    LIMITE_MONTO_PRESTAMO: float = 50_000_000
+    PLAZO_MINIMO_MESES: int = 12
+    PLAZO_MAXIMO_MESES: int = 60
+    TASA_INTERES_ANUAL: float = 0.15
+    SCORE_APROBACION_AUTOMATICA: int = 700
+    SCORE_REVISION_MANUAL: int = 600
+    SCORE_RECHAZO_AUTOMATICO: int = 500
+    RATIO_INGRESOS_APROBACION: float = 4
+    RATIO_INGRESOS_MINIMO: float = 3
+
+    # Cache de resultados del bureau (ventana de consulta ~24h)
+    BUREAU_CACHE_HABILITADO: bool = True
+    BUREAU_CACHE_TTL_SEGUNDOS: float = 300
+    BUREAU_CACHE_TTL_MAXIMO_SEGUNDOS: float = 24 * 3600
+    BUREAU_CACHE_TTL_NEGATIVO_SEGUNDOS: float = 60
+    BUREAU_CACHE_MAX_ENTRADAS: int = 10_000
+
+    # Tablas de amortización cacheadas por (monto, plazo, tasa)
+    AMORTIZACION_CACHE_MAX_ENTRADAS: int = 4096
+
+    # ETag de GET /api/prestamos/{id}/estado (mapa de versiones en memoria).
+    # El mapa solo ve las escrituras de este proceso: una entrada no terminal
+    # vive TTL segundos (las de otro worker, script o réplica se ven a lo sumo
+    # con ese atraso); 0 = validar siempre contra la DB
+    PRESTAMO_ETAG_MAX_ENTRADAS: int = 100_000
+    PRESTAMO_ETAG_TTL_SEGUNDOS: float = 2
+    PRESTAMO_ESTADO_MAX_AGE_TERMINAL_SEGUNDOS: int = 3600
+
+    # Cambios de estado (PATCH /api/prestamos/{id}/estado): reintentos ante
+    # un conflicto de versión cuando el llamador no fija la versión leída
+    PRESTAMO_REINTENTOS_CONFLICTO: int = 3
+
+    # Eventos de estado (SSE, GET /api/prestamos/{id}/eventos)
+    SSE_KEEPALIVE_SEGUNDOS: float = 15
+    SSE_DURACION_MAXIMA_SEGUNDOS: float = 300
+    SSE_MAX_CONEXIONES: int = 50_000
+
+    # Exportación NDJSON (GET /api/prestamos/exportar): filas por viaje del cursor
+    EXPORTACION_LOTE_FILAS: int = 2000
+
+    # Importación masiva de clientes (POST /api/clientes/import)
+    IMPORTACION_LOTE_FILAS: int = 5000
+    IMPORTACION_MAX_ERRORES_REPORTADOS: int = 1000
+    IMPORTACION_MAX_BYTES_FILA: int = 1_048_576
+
+    # Snapshot columnar de clientes (score, ingresos, estado) para procesos masivos
+    SNAPSHOT_CLIENTES_LOTE_FILAS: int = 50_000
+    SNAPSHOT_CLIENTES_MARGEN_SEGUNDOS: float = 5
+
+    # Jobs en segundo plano (POST /api/jobs): hilos del pool del proceso.
+    # Cada proceso marca un latido en sus jobs en ejecución; sin latido por
+    # JOBS_LATIDO_VENCIDO_SEGUNDOS, otro proceso los da por interrumpidos
+    JOBS_MAX_WORKERS: int = 2
+    JOBS_LATIDO_SEGUNDOS: float = 10
+    JOBS_LATIDO_VENCIDO_SEGUNDOS: float = 60
+
+    # Re-scoring de préstamos abiertos (job rescoring_cartera)
+    RESCORING_LOTE_FILAS: int = 20000
+    RESCORING_PROCESOS: int = 0  # 0 = os.cpu_count()
+    RESCORING_MAX_DIFERENCIAS_REPORTADAS: int = 1000
+
+    # Control de admisión (app/admision.py): se decide al arrancar.
+    # ADMISION_MAX_TOTAL queda por debajo del threadpool (40) para /health
+    ADMISION_HABILITADA: bool = True
+    ADMISION_MAX_TOTAL: int = 32
+    ADMISION_LECTURA_MAX_CONCURRENCIA: int = 32
+    ADMISION_LECTURA_MAX_COLA: int = 500
+    ADMISION_LECTURA_ESPERA_MAXIMA_MS: float = 500
+    ADMISION_ESCRITURA_MAX_CONCURRENCIA: int = 8
+    ADMISION_ESCRITURA_MAX_COLA: int = 100
+    ADMISION_ESCRITURA_ESPERA_MAXIMA_MS: float = 2000
+    # Importación y jobs (RUTAS_CLASE): lugares propios, despachados al final
+    ADMISION_MASIVA_MAX_CONCURRENCIA: int = 2
+    ADMISION_MASIVA_MAX_COLA: int = 20
+    ADMISION_MASIVA_ESPERA_MAXIMA_MS: float = 5000
+    ADMISION_RETRY_AFTER_SEGUNDOS: int = 1
+
+    # Logging estructurado (app/logs.py)
+    LOG_NIVEL: str = "INFO"
+    LOG_FORMATO_JSON: bool = True
+    LOG_MAX_COLA: int = 10_000
+    # Fracción de eventos de alto volumen que se registra (1 = todos)
+    LOG_MUESTREO_ACCESO: float = 0.1
+    LOG_MUESTREO_DECISIONES: float = 1.0
+
+    # Trazas distribuidas (app/trazas.py)
+    TRAZAS_HABILITADAS: bool = False
+    # Fracción de trazas raíz que se registran (las que llegan con traceparent respetan su decisión)
+    TRAZAS_MUESTREO: float = 0.1
+    TRAZAS_ARCHIVO: str = "./trazas/spans.ndjson"
+    TRAZAS_MAX_COLA: int = 2048
+    TRAZAS_INTERVALO_EXPORTACION_MS: float = 1000
+
+    # Perfilador /debug/profile: vacío = endpoint deshabilitado
+    DEBUG_PROFILE_TOKEN: str = ""
+    DEBUG_PROFILE_MAX_SEGUNDOS: int = 60
+    DEBUG_PROFILE_INTERVALO_MS: float = 10
+
+    # Archivo de préstamos cerrados (job `archivar_prestamos`)
+    ARCHIVO_PRESTAMOS_EDAD_DIAS: float = 180
+    ARCHIVO_PRESTAMOS_LOTE_FILAS: int = 1000
+
+    # Traza de auditoría de decisiones (app/services/auditoria_decisiones.py)
+    AUDITORIA_HABILITADA: bool = True
+    AUDITORIA_DIRECTORIO: str = "./auditoria"
+    AUDITORIA_MAX_PENDIENTES: int = 10_000
+    AUDITORIA_SEGMENTO_MAX_BYTES: int = 64 * 1024 * 1024
+    AUDITORIA_REGISTROS_POR_BLOQUE: int = 256
+    AUDITORIA_INTERVALO_FSYNC_MS: float = 50
+
+    # Group commit de inserts de préstamos (se decide al arrancar)
+    ESCRITURA_POR_LOTES: bool = False
+    ESCRITURA_LOTE_MAX_FILAS: int = 200
+    ESCRITURA_LOTE_ESPERA_MS: float = 5
+
+    # Recarga en caliente: intervalo de revisión de APP_CONFIG_FILE
+    CONFIG_INTERVALO_RECARGA_SEGUNDOS: float = 2.0
+
+
+def _convertir(valor, tipo):
+    if tipo is bool and isinstance(valor, str):
+        return valor.strip().lower() in ("1", "true", "si", "sí", "yes", "on")
+    if tipo is int and isinstance(valor, str):
+        return int(float(valor))
+    return tipo(valor)
+
+
+def cargar_settings(ruta_archivo: str = None, entorno=None) -> Settings:
+    """
+    Construye un snapshot: defaults < archivo JSON < variables de entorno.
+    Lanza ValueError si algún valor no es válido (el snapshot actual no se toca).
+    """
+    entorno = os.environ if entorno is None else entorno
+    valores = {}
+    if ruta_archivo:
+        with open(ruta_archivo, encoding="utf-8") as f:
+            valores.update(json.load(f))
+
+    campos = {f.name: f.type for f in fields(Settings)}
+    desconocidos = set(valores) - set(campos)
+    if desconocidos:
+        raise ValueError(f"Claves de configuración desconocidas: {sorted(desconocidos)}")
+    for nombre in campos:
+        if nombre in entorno:
+            valores[nombre] = entorno[nombre]
+
+    try:
+        convertidos = {k: _convertir(v, campos[k]) for k, v in valores.items()}
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Configuración inválida: {e}") from e
+    return Settings(**convertidos)
+
+
+class ConfigStore:
+    """
+    Fuente única de configuración con recarga en caliente.
+
+    La recarga construye un Settings nuevo y reemplaza la referencia de una
+    sola vez (asignación atómica): los lectores nunca ven un snapshot a medio
+    actualizar y no toman ningún lock. Un request debe leer `actual` una vez
+    y usar ese snapshot hasta terminar.
+    """
+
+    def __init__(self, ruta_archivo: str = None):
+        self.ruta_archivo = ruta_archivo
+        self._actual = cargar_settings(ruta_archivo)
+        self._lock_recarga = threading.Lock()
+        self._mtime = self._leer_mtime()
+        self._detener = threading.Event()
+        self._hilo = None
+
+    @property
+    def actual(self) -> Settings:
+        return self._actual
+
+    def recargar(self) -> Settings:
+        """Relee archivo y entorno; si falla, se conserva el snapshot anterior"""
+        with self._lock_recarga:
+            nuevo = cargar_settings(self.ruta_archivo)
+            self._actual = nuevo
+            return nuevo
+
+    def reemplazar(self, nuevo: Settings):
+        """Publica un snapshot ya construido (ej. tests)"""
+        with self._lock_recarga:
+            self._actual = nuevo
+
+    def instalar_sighup(self):
+        """Recarga al recibir SIGHUP (solo POSIX, desde el hilo principal)"""
+        if not hasattr(signal, "SIGHUP"):
+            return False
+        try:
+            signal.signal(signal.SIGHUP, lambda signum, frame: self._recargar_seguro())
+        except ValueError:
+            # signal.signal solo puede llamarse desde el hilo principal
+            return False
+        return True
+
+    def vigilar_archivo(self, intervalo: float = None):
+        """Arranca un hilo que recarga cuando cambia el mtime del archivo"""
+        if not self.ruta_archivo or self._hilo is not None:
+            return
+        intervalo = intervalo or self._actual.CONFIG_INTERVALO_RECARGA_SEGUNDOS
+        self._detener.clear()
+        self._hilo = threading.Thread(
+            target=self._bucle_vigilancia, args=(intervalo,), name="config-watch", daemon=True
+        )
+        self._hilo.start()
+
+    def detener(self):
+        self._detener.set()
+        if self._hilo is not None:
+            self._hilo.join(timeout=5)
+            self._hilo = None
+
+    def _bucle_vigilancia(self, intervalo: float):
+        while not self._detener.wait(intervalo):
+            mtime = self._leer_mtime()
+            if mtime != self._mtime:
+                self._mtime = mtime
+                self._recargar_seguro()
+
+    def _recargar_seguro(self):
+        try:
+            self.recargar()
+        except (OSError, ValueError) as e:
+            logger.warning("Configuración no recargada, se mantiene la anterior: %s", e)
+
+    def _leer_mtime(self):
+        if not self.ruta_archivo:
+            return None
+        try:
+            return os.stat(self.ruta_archivo).st_mtime_ns
+        except OSError:
+            return None
+
+
+config_store = ConfigStore(os.getenv("APP_CONFIG_FILE"))
+
+
+def get_settings() -> Settings:
+    """Snapshot vigente; leerlo una vez por request"""
+    return config_store.actual
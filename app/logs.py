@@ -0,0 +1,212 @@
+"""
+Logging estructurado (JSON por línea) sin bloquear a quien loguea.
+
+- Los loggers de `app.*` escriben en una cola acotada (`ManejadorCola`); un
+  hilo (`QueueListener`) formatea y escribe a stdout. Un stdout lento no frena
+  al event loop ni al threadpool: si la cola se llena, el registro se descarta
+  y se cuenta.
+- `MiddlewareRequestId` pone el id del request en un contextvar; cada registro
+  lo lleva en `request_id` (el threadpool de Starlette copia el contexto).
+- Los eventos de alto volumen (accesos, decisiones) van por loggers propios y
+  se muestrean antes de encolarse; WARNING o más nunca se muestrea.
+"""
+import json
+import logging
+import queue
+import random
+import sys
+import time
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+# Loggers de eventos de alto volumen (sujetos a muestreo)
+LOGGER_ACCESO = "app.http"
+LOGGER_DECISIONES = "app.decisiones"
+
+request_id_actual: ContextVar = ContextVar("request_id", default=None)
+
+_CABECERA_REQUEST_ID = b"x-request-id"
+_MAX_LARGO_REQUEST_ID = 128
+
+
+def evento(logger: logging.Logger, mensaje: str, nivel: int = logging.INFO, **campos):
+    """Registra `mensaje` con campos estructurados (no arma nada si el nivel está apagado)"""
+    if logger.isEnabledFor(nivel):
+        logger.log(nivel, mensaje, extra={"campos": campos})
+
+
+class FormateadorJSON(logging.Formatter):
+    """Una línea JSON por registro: ts, nivel, logger, mensaje, request_id y los campos del evento"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        salida = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "nivel": record.levelname,
+            "logger": record.name,
+            "mensaje": record.getMessage(),
+        }
+        request_id = getattr(record, "request_id", None)
+        if request_id is not None:
+            salida["request_id"] = request_id
+        muestreo = getattr(record, "muestreo", None)
+        if muestreo is not None:
+            salida["muestreo"] = muestreo
+        salida.update(getattr(record, "campos", None) or {})
+        if record.exc_info:
+            salida["excepcion"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            salida["excepcion"] = record.exc_text
+        return json.dumps(salida, ensure_ascii=False, default=str)
+
+
+class FiltroMuestreo(logging.Filter):
+    """
+    Deja pasar una fracción de los registros INFO/DEBUG de ciertos loggers
+    ({nombre: tasa}, por prefijo). Los que pasan llevan `muestreo` = tasa,
+    así quien agrega puede escalar los conteos.
+    """
+
+    def __init__(self, tasas: dict):
+        super().__init__()
+        self.tasas = dict(tasas)
+
+    def _tasa(self, nombre: str):
+        for prefijo, tasa in self.tasas.items():
+            if nombre == prefijo or nombre.startswith(prefijo + "."):
+                return tasa
+        return None
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        tasa = self._tasa(record.name)
+        if tasa is None or tasa >= 1:
+            return True
+        if random.random() >= tasa:
+            return False
+        record.muestreo = tasa
+        return True
+
+
+class ManejadorCola(QueueHandler):
+    """
+    QueueHandler que no bloquea: estampa el request_id en el hilo que loguea
+    (el contextvar no existe en el hilo escritor), deja el formateo JSON al
+    listener y descarta si la cola está llena.
+    """
+
+    def __init__(self, cola: queue.Queue):
+        super().__init__(cola)
+        self.descartados = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Mensaje y traza se resuelven acá: los args podrían cambiar antes de que el listener los lea
+        record.request_id = request_id_actual.get()
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.descartados += 1
+
+
+_manejador = None
+_listener = None
+
+
+def configurar_logging(nivel: str = "INFO", formato_json: bool = True, max_cola: int = 10_000,
+                       muestreo: dict = None, salida=None) -> ManejadorCola:
+    """Instala la cola en el logger `app` y arranca el hilo escritor (idempotente)"""
+    global _manejador, _listener
+    detener_logging()
+    destino = logging.StreamHandler(salida if salida is not None else sys.stdout)
+    if formato_json:
+        destino.setFormatter(FormateadorJSON())
+    else:
+        destino.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s"))
+
+    _manejador = ManejadorCola(queue.Queue(maxsize=max_cola))
+    _manejador.addFilter(FiltroMuestreo(muestreo or {}))
+    raiz = logging.getLogger("app")
+    raiz.addHandler(_manejador)
+    raiz.setLevel(nivel.upper())
+    # Solo por la cola: sin propagar al root (y a su StreamHandler síncrono)
+    raiz.propagate = False
+    _listener = QueueListener(_manejador.queue, destino)
+    _listener.start()
+    return _manejador
+
+
+def detener_logging():
+    """Escribe lo que quedó en la cola y vuelve al logging por defecto"""
+    global _manejador, _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+    if _manejador is not None:
+        raiz = logging.getLogger("app")
+        raiz.removeHandler(_manejador)
+        raiz.propagate = True
+        raiz.setLevel(logging.NOTSET)
+        _manejador = None
+
+
+def metricas_logging() -> dict:
+    if _manejador is None:
+        return {"activo": False}
+    return {"activo": True, "en_cola": _manejador.queue.qsize(), "descartados": _manejador.descartados}
+
+
+class MiddlewareRequestId:
+    """
+    Middleware ASGI puro: toma `X-Request-ID` del cliente (o genera uno), lo
+    deja en `request_id_actual`, lo devuelve en la respuesta y registra el
+    acceso con su latencia en `app.http`.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.logger = logging.getLogger(LOGGER_ACCESO)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        request_id = self._request_id(scope)
+        token = request_id_actual.set(request_id)
+        inicio = time.perf_counter()
+        estado = {"status": 500}
+
+        async def enviar(mensaje):
+            if mensaje["type"] == "http.response.start":
+                estado["status"] = mensaje["status"]
+                mensaje["headers"] = [*mensaje.get("headers", ()), (_CABECERA_REQUEST_ID, request_id.encode())]
+            await send(mensaje)
+
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            status = estado["status"]
+            # Errores del servidor siempre; 503 es descarte de carga y puede ser masivo
+            nivel = logging.WARNING if status >= 500 and status != 503 else logging.INFO
+            evento(self.logger, "request", nivel, metodo=scope["method"], ruta=scope["path"], status=status,
+                   latencia_ms=round((time.perf_counter() - inicio) * 1000, 2))
+            request_id_actual.reset(token)
+
+    @staticmethod
+    def _request_id(scope) -> str:
+        for nombre, valor in scope.get("headers", ()):
+            if nombre == _CABECERA_REQUEST_ID:
+                valor = valor.decode("latin-1").strip()
+                if valor and len(valor) <= _MAX_LARGO_REQUEST_ID:
+                    return valor
+                break
+        return uuid.uuid4().hex
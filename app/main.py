@@ -1,14 +1,33 @@
+import logging
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.database import init_db, seed_data, SessionLocal
-from app.routers import bureau, prestamos
+from app.admision import ControlAdmision, MiddlewareAdmision
+from app.trazas import ExportadorArchivo, MiddlewareTrazas, detener_trazas, iniciar_trazas
+from app.logs import LOGGER_ACCESO, LOGGER_DECISIONES, MiddlewareRequestId, configurar_logging, detener_logging
+from app.config import config_store, get_settings
+from app.database import init_db, seed_data, nueva_sesion, BatchSessionLocal
+from app.shards import detener_shards, iniciar_shards, urls_shards
+from app.services.escritor_lotes import iniciar_escritor_prestamos, detener_escritor_prestamos
+from app.services.auditoria_decisiones import iniciar_auditoria, detener_auditoria
+from app.services.jobs import gestor_jobs
+from app.services import jobs_cartera  # noqa: F401  (registra los tipos de job)
+from app.routers import bureau, prestamos, clientes, jobs, debug
+
+logger = logging.getLogger(__name__)
 
 app = FastAPI(
-    title="API Test Cases - Clase 2",
-    description="API REST para ejecutar test cases de Bureau, Préstamos y Transferencias",
-    version="1.0.0"
+    title=get_settings().API_TITLE,
+    description=get_settings().API_DESCRIPTION,
+    version=get_settings().API_VERSION
 )
 
+# Control de admisión: límites por clase de ruta y 503 rápido bajo saturación.
+# Se registra antes que CORS para quedar por dentro: los 503 también llevan CORS
+control_admision = ControlAdmision.desde_settings(get_settings())
+if get_settings().ADMISION_HABILITADA:
+    app.add_middleware(MiddlewareAdmision, control=control_admision)
+
 # CORS para permitir llamadas desde Angular (Clase 8)
 app.add_middleware(
     CORSMiddleware,
@@ -16,23 +35,88 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Request-ID"],
 )
 
+# Span raíz por request (no hace nada si TRAZAS_HABILITADAS=false)
+app.add_middleware(MiddlewareTrazas)
+
+# Request id por request (contextvar) y log de acceso; por fuera de todo, así
+# también queda registrado lo que descarta el control de admisión
+app.add_middleware(MiddlewareRequestId)
+
 # Event: Al iniciar API
 @app.on_event("startup")
 def startup_event():
     """Crea tablas e inserta datos demo en memoria"""
-    print("🚀 Inicializando base de datos en memoria...")
+    settings = get_settings()
+    configurar_logging(
+        settings.LOG_NIVEL,
+        formato_json=settings.LOG_FORMATO_JSON,
+        max_cola=settings.LOG_MAX_COLA,
+        muestreo={
+            LOGGER_ACCESO: settings.LOG_MUESTREO_ACCESO,
+            LOGGER_DECISIONES: settings.LOG_MUESTREO_DECISIONES,
+        },
+    )
+    logger.info("Inicializando base de datos")
     init_db()
+    # Con sharding, la base principal solo guarda jobs; clientes y préstamos van a los shards
+    cluster = iniciar_shards(urls_shards(settings)) if settings.DATABASE_SHARDS > 1 else None
     
     # Seed inicial
-    db = SessionLocal()
+    db = nueva_sesion()
     seed_data(db)
     db.close()
+    
+    # Recarga de reglas en caliente: SIGHUP o cambio de APP_CONFIG_FILE
+    config_store.instalar_sighup()
+    config_store.vigilar_archivo()
+    
+    if settings.ESCRITURA_POR_LOTES:
+        iniciar_escritor_prestamos(
+            cluster.BatchSessionLocal if cluster is not None else BatchSessionLocal,
+            max_lote=settings.ESCRITURA_LOTE_MAX_FILAS,
+            espera_ms=settings.ESCRITURA_LOTE_ESPERA_MS,
+        )
+    
+    if settings.AUDITORIA_HABILITADA:
+        iniciar_auditoria(
+            settings.AUDITORIA_DIRECTORIO,
+            max_pendientes=settings.AUDITORIA_MAX_PENDIENTES,
+            segmento_max_bytes=settings.AUDITORIA_SEGMENTO_MAX_BYTES,
+            registros_por_bloque=settings.AUDITORIA_REGISTROS_POR_BLOQUE,
+            intervalo_fsync_ms=settings.AUDITORIA_INTERVALO_FSYNC_MS,
+        )
+    
+    if settings.TRAZAS_HABILITADAS:
+        iniciar_trazas(
+            ExportadorArchivo(settings.TRAZAS_ARCHIVO),
+            muestreo=settings.TRAZAS_MUESTREO,
+            max_cola=settings.TRAZAS_MAX_COLA,
+            intervalo_ms=settings.TRAZAS_INTERVALO_EXPORTACION_MS,
+        )
+    
+    # Jobs en segundo plano: retoma los pendientes de la ejecución anterior
+    gestor_jobs.iniciar()
+
+@app.on_event("shutdown")
+def shutdown_event():
+    config_store.detener()
+    detener_escritor_prestamos()
+    gestor_jobs.detener()
+    detener_auditoria()
+    detener_trazas()
+    detener_shards()
+    # Último: lo que loguearon los anteriores al cerrar todavía se escribe
+    detener_logging()
 
 # Incluir routers
 app.include_router(bureau.router)
 app.include_router(prestamos.router)
+app.include_router(clientes.router)
+app.include_router(jobs.router)
+app.include_router(debug.router)
 
 @app.get("/")
 def root():
@@ -45,6 +129,11 @@ def root():
         }
     }
 
+@app.get("/api/admision/metricas")
+def metricas_admision():
+    """Requests en curso, profundidad de cola y descartes por clase de ruta"""
+    return control_admision.metricas()
+
 @app.get("/health")
 def health_check():
     return {"status": "OK", "database": "SQLite in-memory"}
@@ -0,0 +1,7 @@
+# Importar cualquier modelo registra todos en Base.metadata: las relaciones
+# entre Cliente, Prestamo y ConsultaBureau se resuelven por nombre
+from app.models import cliente, prestamo, consulta_bureau, estadistica, job, archivo, secuencia  # noqa: F401
+
+# Agregados de cartera: el hook de sesión que los mantiene se registra junto
+# con los modelos (cualquier import de un modelo pasa por aquí primero)
+from app.services import estadisticas_service  # noqa: E402,F401
@@ -0,0 +1,17 @@
+from sqlalchemy import Column, Integer, String, DateTime
+from datetime import datetime
+from app.database import Base
+
+class ArchivoPrestamosMes(Base):
+    """
+    Catálogo de las tablas de archivo mensuales (`prestamos_archivo_AAAAMM`).
+    El rango de ids permite buscar un préstamo archivado sin recorrer todos
+    los meses (ver app/services/archivo_prestamos.py).
+    """
+    __tablename__ = "prestamos_archivo_meses"
+    
+    mes = Column(String(6), primary_key=True)  # AAAAMM de fecha_solicitud
+    min_id = Column(Integer, nullable=False)
+    max_id = Column(Integer, nullable=False, index=True)
+    filas = Column(Integer, nullable=False, default=0)
+    fecha_actualizacion = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -1,4 +1,5 @@
 from sqlalchemy import Column, Integer, String, Float, DateTime, Enum
+from sqlalchemy.orm import relationship
 from datetime import datetime
 import enum
 from app.database import Base
@@ -19,3 +20,8 @@ class Cliente(Base):
     ingresos_mensuales = Column(Float)
     estado = Column(Enum(EstadoCliente), default=EstadoCliente.ACTIVO)
     fecha_creacion = Column(DateTime, default=datetime.utcnow)
+    # Refresco incremental del snapshot columnar (app/services/snapshot_clientes.py)
+    fecha_actualizacion = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+    
+    prestamos = relationship("Prestamo", back_populates="cliente", order_by="Prestamo.id")
+    consultas_bureau = relationship("ConsultaBureau", back_populates="cliente")
@@ -0,0 +1,27 @@
+from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, ForeignKey, Index
+from sqlalchemy.orm import relationship
+from datetime import datetime
+from app.database import Base
+
+class ConsultaBureau(Base):
+    """Resultado de cada POST /api/bureau/consultar exitoso"""
+    __tablename__ = "consultas_bureau"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    cliente_id = Column(Integer, ForeignKey("clientes.id"), nullable=False)
+    score = Column(Integer, nullable=False)
+    deudas_activas = Column(Integer)
+    monto_deudas = Column(Float)
+    puntualidad = Column(String)
+    tiene_historial = Column(Boolean, nullable=False)
+    mensaje = Column(String)
+    fecha_consulta = Column(DateTime, default=datetime.utcnow, nullable=False)
+    
+    cliente = relationship("Cliente", back_populates="consultas_bureau")
+    
+    # Última consulta de un cliente: búsqueda por índice, sin ordenar toda la tabla
+    # AUTOINCREMENT: rango de ids propio por shard (app/shards.py)
+    __table_args__ = (
+        Index("ix_consultas_bureau_cliente_fecha", "cliente_id", "fecha_consulta"),
+        {"sqlite_autoincrement": True},
+    )
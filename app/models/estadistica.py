@@ -0,0 +1,18 @@
+from sqlalchemy import Column, Integer, String, Float
+from app.database import Base
+
+class EstadisticaCartera(Base):
+    """
+    Agregados de la cartera de préstamos por (dimension, clave).
+    Se mantienen en la misma transacción que cada insert/cambio de Prestamo
+    (ver app/services/estadisticas_service.py).
+    """
+    __tablename__ = "estadisticas_cartera"
+    
+    dimension = Column(String, primary_key=True)  # estado | banda_score | plazo
+    clave = Column(String, primary_key=True)
+    conteo = Column(Integer, nullable=False, default=0)
+    suma_monto = Column(Float, nullable=False, default=0.0)
+    conteo_cuota = Column(Integer, nullable=False, default=0)  # préstamos con cuota (no rechazados)
+    suma_cuota = Column(Float, nullable=False, default=0.0)
+    aprobados = Column(Integer, nullable=False, default=0)
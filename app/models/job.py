@@ -0,0 +1,34 @@
+from sqlalchemy import Column, String, Float, DateTime, Enum, Text, Boolean
+from datetime import datetime
+import enum
+from app.database import Base
+
+class EstadoJob(str, enum.Enum):
+    PENDIENTE = "pendiente"
+    EJECUTANDO = "ejecutando"
+    COMPLETADO = "completado"
+    FALLIDO = "fallido"
+    CANCELADO = "cancelado"
+
+ESTADOS_TERMINALES = frozenset({EstadoJob.COMPLETADO, EstadoJob.FALLIDO, EstadoJob.CANCELADO})
+
+class Job(Base):
+    """Operación larga ejecutada en segundo plano (ver app/services/jobs.py)"""
+    __tablename__ = "jobs"
+    
+    id = Column(String(32), primary_key=True)  # uuid4 hex
+    tipo = Column(String, nullable=False)
+    estado = Column(Enum(EstadoJob), nullable=False, default=EstadoJob.PENDIENTE, index=True)
+    parametros = Column(Text, nullable=False, default="{}")  # JSON
+    progreso = Column(Float, nullable=False, default=0.0)  # 0..1
+    mensaje = Column(String, nullable=True)
+    resultado = Column(Text, nullable=True)  # JSON
+    error = Column(Text, nullable=True)
+    cancelacion_solicitada = Column(Boolean, nullable=False, default=False)
+    # Proceso que lo ejecuta y su último latido: un job EJECUTANDO cuyo dueño
+    # dejó de latir quedó huérfano (ver GestorJobs._recuperar)
+    worker_id = Column(String, nullable=True)
+    latido = Column(DateTime, nullable=True)
+    fecha_creacion = Column(DateTime, default=datetime.utcnow, nullable=False)
+    fecha_inicio = Column(DateTime, nullable=True)
+    fecha_fin = Column(DateTime, nullable=True)
@@ -1,4 +1,5 @@
 from sqlalchemy import Column, Integer, String, Float, DateTime, Enum, ForeignKey
+from sqlalchemy.orm import column_property, relationship
 from datetime import datetime
 import enum
 from app.database import Base
@@ -10,16 +11,42 @@ class EstadoPrestamo(str, enum.Enum):
     RECHAZADO = "rechazado"
     DESEMBOLSADO = "desembolsado"
 
+# Transiciones manuales admitidas (analistas / desembolso, ver
+# PrestamoService.cambiar_estado)
+TRANSICIONES = {
+    EstadoPrestamo.SOLICITADO: {EstadoPrestamo.EN_REVISION, EstadoPrestamo.APROBADO, EstadoPrestamo.RECHAZADO},
+    EstadoPrestamo.EN_REVISION: {EstadoPrestamo.APROBADO, EstadoPrestamo.RECHAZADO},
+    EstadoPrestamo.APROBADO: {EstadoPrestamo.DESEMBOLSADO},
+    EstadoPrestamo.RECHAZADO: set(),
+    EstadoPrestamo.DESEMBOLSADO: set(),
+}
+# Sin transiciones de salida: el estado ya no cambia
+ESTADOS_TERMINALES = frozenset(estado for estado, destinos in TRANSICIONES.items() if not destinos)
+
 class Prestamo(Base):
     __tablename__ = "prestamos"
     
     id = Column(Integer, primary_key=True, index=True)
-    cliente_id = Column(Integer, ForeignKey("clientes.id"))
-    monto_solicitado = Column(Float, nullable=False)
-    plazo_meses = Column(Integer, nullable=False)  # 12, 24, 36, 48, 60
+    cliente_id = Column(Integer, ForeignKey("clientes.id"), index=True)
+    # active_history: el valor anterior siempre queda en el historial del
+    # atributo, así los agregados de cartera pueden restar lo que cambió
+    monto_solicitado = column_property(Column(Float, nullable=False), active_history=True)
+    plazo_meses = column_property(Column(Integer, nullable=False), active_history=True)  # 12, 24, 36, 48, 60
     tasa_interes = Column(Float)  # %
-    cuota_mensual = Column(Float)
-    estado = Column(Enum(EstadoPrestamo), default=EstadoPrestamo.SOLICITADO)
+    cuota_mensual = column_property(Column(Float), active_history=True)
+    estado = column_property(Column(Enum(EstadoPrestamo), default=EstadoPrestamo.SOLICITADO), active_history=True)
+    score_decision = column_property(Column(Integer, nullable=True), active_history=True)  # score usado al decidir
     motivo_rechazo = Column(String, nullable=True)
     fecha_solicitud = Column(DateTime, default=datetime.utcnow)
     fecha_decision = Column(DateTime, nullable=True)
+    # Control optimista: cada UPDATE del ORM lleva WHERE version = la leída y
+    # la incrementa; si otro commit ganó, el flush lanza StaleDataError
+    # (ver PrestamoService.cambiar_estado). Los UPDATE de Core la suben a mano
+    version = Column(Integer, nullable=False)
+    
+    cliente = relationship("Cliente", back_populates="prestamos")
+    
+    # AUTOINCREMENT: un id no se reutiliza aunque se borre (archivo) y cada
+    # shard puede arrancar su secuencia en su propio rango (app/shards.py)
+    __table_args__ = {"sqlite_autoincrement": True}
+    __mapper_args__ = {"version_id_col": version}
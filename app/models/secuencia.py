@@ -0,0 +1,13 @@
+from sqlalchemy import Column, Integer, String
+from app.database import Base
+
+class Secuencia(Base):
+    """
+    Contador con nombre para reservar rangos de ids.
+    Con sharding, los ids de clientes nuevos salen de aquí (vive en el shard 0,
+    ver app/shards.py): el id decide el shard, así que se asigna antes del insert.
+    """
+    __tablename__ = "secuencias"
+
+    nombre = Column(String, primary_key=True)
+    valor = Column(Integer, nullable=False, default=0)
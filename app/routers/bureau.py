@@ -2,7 +2,8 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from app.schemas.bureau import BureauRequest, BureauResponse
 from app.services.bureau_service import BureauService
-from app.database import get_db
+from app.services.bureau_cache import bureau_cache
+from app.database import get_db, get_read_db
 
 router = APIRouter(prefix="/api/bureau", tags=["Bureau de Crédito"])
 
@@ -19,7 +20,7 @@ def consultar_bureau(request: BureauRequest, db: Session = Depends(get_db)):
     """
     try:
         service = BureauService()
-        resultado = service.consultar_score(db, request.cliente_id)
+        resultado = service.consultar_score(db, request.cliente_id, registrar=True)
         return resultado
     except ValueError as e:
         if "bloqueado" in str(e).lower():
@@ -28,8 +29,13 @@ def consultar_bureau(request: BureauRequest, db: Session = Depends(get_db)):
             raise HTTPException(status_code=429, detail=str(e))
         raise HTTPException(status_code=400, detail=str(e))
 
+@router.get("/cache/metricas")
+def metricas_cache():
+    """Métricas del cache de resultados del bureau (hits, misses, desalojos...)"""
+    return bureau_cache.metricas()
+
 @router.get("/{cliente_id}", response_model=BureauResponse)
-def obtener_ultima_consulta(cliente_id: int, db: Session = Depends(get_db)):
+def obtener_ultima_consulta(cliente_id: int, db: Session = Depends(get_read_db)):
     """Obtiene la última consulta guardada (mock para demo)"""
     service = BureauService()
     try:
@@ -0,0 +1,55 @@
+from fastapi import APIRouter, Depends, HTTPException, Request
+from sqlalchemy.orm import Session
+from app.config import get_settings
+from app.schemas.cliente import ClienteResumenResponse, ImportacionResponse
+from app.services.cliente_service import ClienteService
+from app.services.importacion_service import ImportadorClientes, FORMATO_CSV, FORMATO_NDJSON
+from app.services.bureau_cache import bureau_cache
+from app.database import get_db, get_read_db
+
+router = APIRouter(prefix="/api/clientes", tags=["Clientes"])
+
+@router.get("/{cliente_id}/resumen", response_model=ClienteResumenResponse)
+def obtener_resumen_cliente(cliente_id: int, db: Session = Depends(get_read_db)):
+    """
+    Cliente, todos sus préstamos y su última consulta de bureau en una sola llamada.
+    Número de consultas a la DB constante (no crece con la cantidad de préstamos).
+    """
+    try:
+        return ClienteService().obtener_resumen(db, cliente_id)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@router.post("/import", response_model=ImportacionResponse)
+async def importar_clientes(request: Request, db: Session = Depends(get_db)):
+    """
+    Importación masiva de clientes desde el body (streaming, sin multipart).
+
+    - `Content-Type: text/csv`: primera línea = encabezado con los nombres de columna
+    - `Content-Type: application/x-ndjson`: un objeto JSON por línea
+    - Sin Content-Type reconocible se detecta por la primera línea
+
+    Columnas: nombre, identificacion, email, score_cifin, ingresos_mensuales, estado.
+    Si la identificación ya existe, el cliente se actualiza (upsert).
+    Responde un reporte con el error de cada fila rechazada.
+    """
+    tipo = request.headers.get("content-type", "").lower()
+    formato = FORMATO_CSV if "csv" in tipo else FORMATO_NDJSON if "json" in tipo else None
+    reglas = get_settings()
+    importador = ImportadorClientes(
+        db,
+        tamano_lote=reglas.IMPORTACION_LOTE_FILAS,
+        max_errores=reglas.IMPORTACION_MAX_ERRORES_REPORTADOS,
+        max_bytes_fila=reglas.IMPORTACION_MAX_BYTES_FILA,
+    )
+    try:
+        reporte = await importador.importar(request.stream(), formato)
+    except (RuntimeError, ValueError) as e:
+        # ValueError: fila más larga que IMPORTACION_MAX_BYTES_FILA (los lotes
+        # anteriores ya quedaron confirmados)
+        raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        # Scores y estados pudieron cambiar: los resultados cacheados ya no valen
+        if importador.importados:
+            bureau_cache.limpiar()
+    return reporte
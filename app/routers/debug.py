@@ -0,0 +1,50 @@
+import asyncio
+import hmac
+from datetime import datetime
+from typing import Optional
+from fastapi import APIRouter, Header, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+from app.config import get_settings
+from app.services.perfilador import a_colapsado, perfilador
+
+router = APIRouter(prefix="/debug", tags=["Debug"])
+
+@router.get("/profile", response_class=PlainTextResponse)
+async def perfilar_worker(
+    seconds: float = Query(10, gt=0),
+    x_debug_token: Optional[str] = Header(None),
+):
+    """
+    Muestrea las pilas de todos los hilos de este worker durante `seconds` y
+    retorna "collapsed stacks" (flamegraph.pl, speedscope, inferno).
+
+    Opt-in: responde 404 si no hay DEBUG_PROFILE_TOKEN configurado, y exige el
+    mismo valor en `X-Debug-Token`. La espera es async: no ocupa un hilo del
+    threadpool mientras muestrea.
+    """
+    settings = get_settings()
+    if not settings.DEBUG_PROFILE_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not x_debug_token or not hmac.compare_digest(x_debug_token, settings.DEBUG_PROFILE_TOKEN):
+        raise HTTPException(status_code=401, detail="Token de debug inválido")
+    if seconds > settings.DEBUG_PROFILE_MAX_SEGUNDOS:
+        raise HTTPException(status_code=400,
+                            detail=f"Máximo {settings.DEBUG_PROFILE_MAX_SEGUNDOS} segundos por perfilado")
+
+    try:
+        perfilador.iniciar()
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        conteos = perfilador.detener()
+
+    nombre = f"profile-{datetime.utcnow():%Y%m%dT%H%M%S}.collapsed"
+    return PlainTextResponse(
+        a_colapsado(conteos),
+        headers={
+            "Content-Disposition": f'attachment; filename="{nombre}"',
+            "X-Profile-Muestras": str(perfilador.muestras),
+        },
+    )
@@ -0,0 +1,47 @@
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from app.models.job import EstadoJob
+from app.schemas.job import JobRequest, JobResponse
+from app.services.jobs import GestorJobs, get_gestor_jobs
+
+router = APIRouter(prefix="/api/jobs", tags=["Jobs"])
+
+@router.post("", response_model=JobResponse, status_code=202)
+def enviar_job(request: JobRequest, gestor: GestorJobs = Depends(get_gestor_jobs)):
+    """
+    Encola una operación larga y retorna de inmediato con el id del job.
+    El avance se consulta con GET /api/jobs/{id}.
+    """
+    try:
+        return gestor.enviar(request.tipo, request.parametros)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+@router.get("", response_model=List[JobResponse])
+def listar_jobs(
+    estado: Optional[EstadoJob] = None,
+    limite: int = Query(50, ge=1, le=500),
+    gestor: GestorJobs = Depends(get_gestor_jobs),
+):
+    """Jobs más recientes primero, opcionalmente filtrados por estado"""
+    return gestor.listar(estado=estado, limite=limite)
+
+@router.get("/{job_id}", response_model=JobResponse)
+def obtener_job(job_id: str, gestor: GestorJobs = Depends(get_gestor_jobs)):
+    try:
+        return gestor.obtener(job_id)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@router.post("/{job_id}/cancelar", response_model=JobResponse)
+def cancelar_job(job_id: str, gestor: GestorJobs = Depends(get_gestor_jobs)):
+    """
+    Un job pendiente se cancela de inmediato; uno en ejecución se detiene en
+    su próximo punto de control. Cancelar un job terminado no tiene efecto.
+    """
+    try:
+        return gestor.cancelar(job_id)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
@@ -1,11 +1,31 @@
-from fastapi import APIRouter, Depends, HTTPException
+import asyncio
+import json
+from fastapi import APIRouter, Depends, Header, HTTPException, Response
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from typing import Optional
 from sqlalchemy.orm import Session
-from app.schemas.prestamo import PrestamoRequest, PrestamoResponse
-from app.services.prestamo_service import PrestamoService
-from app.database import get_db
+from app.schemas.prestamo import (
+    PrestamoRequest, PrestamoResponse, CambioEstadoRequest, TablaAmortizacionResponse,
+    AmortizacionLoteRequest, AmortizacionLoteResponse, EstadisticasCarteraResponse,
+)
+from app.models.prestamo import EstadoPrestamo
+from app.services.prestamo_service import PrestamoService, ConflictoConcurrencia
+from app.services.amortizacion_service import AmortizacionService, filas_tabla, resumen_tabla
+from app.services.estadisticas_service import EstadisticasService
+from app.services.versiones_prestamo import (
+    versiones_prestamo, etag_prestamo, cache_control, coincide, ESTADOS_TERMINALES,
+)
+from app.services.eventos_prestamo import pubsub_prestamos
+from app.services import auditoria_decisiones
+from app.config import get_settings
+from app.database import get_db, get_read_db
 
 router = APIRouter(prefix="/api/prestamos", tags=["Préstamos"])
 
+# Espera sugerida a EventSource antes de reconectar
+_SSE_RETRY_MS = 3000
+
 @router.post("/solicitar", response_model=PrestamoResponse)
 def solicitar_prestamo(request: PrestamoRequest, db: Session = Depends(get_db)):
     """
@@ -29,12 +49,217 @@ def solicitar_prestamo(request: PrestamoRequest, db: Session = Depends(get_db)):
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+@router.get("/estadisticas", response_model=EstadisticasCarteraResponse)
+def obtener_estadisticas(db: Session = Depends(get_read_db)):
+    """
+    Totales de cartera: conteo y monto por estado, tasa de aprobación por
+    banda de score y cuota promedio por plazo.
+    Lee la tabla de agregados mantenida en cada insert/cambio de estado.
+    """
+    return EstadisticasService().resumen(db)
+
 @router.get("/{prestamo_id}/estado", response_model=PrestamoResponse)
-def obtener_estado_prestamo(prestamo_id: int, db: Session = Depends(get_db)):
-    """Consulta estado actual de un préstamo"""
+def obtener_estado_prestamo(
+    prestamo_id: int,
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_read_db),
+):
+    """
+    Consulta estado actual de un préstamo.
+
+    Responde con `ETag`; con `If-None-Match` igual a la versión vigente
+    responde 304 sin consultar la DB (mapa de versiones en memoria, con
+    `PRESTAMO_ETAG_TTL_SEGUNDOS` para escrituras de otros procesos).
+    Los estados terminales (rechazado, desembolsado) se pueden cachear
+    (`max-age`); el resto `no-cache`, incluido aprobado, que todavía se desembolsa.
+    """
+    vigente = versiones_prestamo.obtener(prestamo_id)
+    if vigente is not None and coincide(if_none_match, vigente[0]):
+        return Response(status_code=304, headers={"ETag": vigente[0], "Cache-Control": vigente[1]})
+
+    epoca = versiones_prestamo.epoca()
     try:
         service = PrestamoService()
         prestamo = service.obtener_estado_prestamo(db, prestamo_id)
-        return prestamo
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
+
+    etag = etag_prestamo(prestamo)
+    control = cache_control(prestamo.estado, get_settings().PRESTAMO_ESTADO_MAX_AGE_TERMINAL_SEGUNDOS)
+    versiones_prestamo.registrar(prestamo_id, etag, control, epoca, terminal=prestamo.estado in ESTADOS_TERMINALES)
+    encabezados = {"ETag": etag, "Cache-Control": control}
+    if coincide(if_none_match, etag):
+        return Response(status_code=304, headers=encabezados)
+    return Response(
+        content=PrestamoResponse.model_validate(prestamo).model_dump_json(),
+        media_type="application/json",
+        headers=encabezados,
+    )
+
+@router.patch("/{prestamo_id}/estado", response_model=PrestamoResponse)
+def cambiar_estado_prestamo(prestamo_id: int, request: CambioEstadoRequest, db: Session = Depends(get_db)):
+    """
+    Transición de estado (revisión manual, desembolso) con control optimista.
+
+    Enviar la `version` leída en `GET /{id}/estado`: si otro cambio ganó
+    responde 409 y hay que releer. Sin locks: nunca espera a otra escritura.
+    """
+    try:
+        return PrestamoService().cambiar_estado(
+            db, prestamo_id, request.estado, version=request.version, motivo_rechazo=request.motivo_rechazo
+        )
+    except ConflictoConcurrencia as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        if "no encontrado" in str(e).lower():
+            raise HTTPException(status_code=404, detail=str(e))
+        raise HTTPException(status_code=400, detail=str(e))
+
+def _leer_estado(db: Session, prestamo_id: int):
+    """(etag, estado, json) actuales; libera la conexión enseguida"""
+    try:
+        prestamo = PrestamoService().obtener_estado_prestamo(db, prestamo_id)
+        return etag_prestamo(prestamo), prestamo.estado, PrestamoResponse.model_validate(prestamo).model_dump_json()
+    finally:
+        db.close()
+
+@router.get("/{prestamo_id}/eventos")
+async def eventos_estado_prestamo(
+    prestamo_id: int,
+    last_event_id: Optional[str] = Header(None),
+    db: Session = Depends(get_read_db),
+):
+    """
+    Server-Sent Events con el estado del préstamo, en vez de hacer polling.
+
+    Envía el estado actual y luego un evento `estado` cada vez que cambia;
+    cierra al llegar a un estado terminal (rechazado/desembolsado) o tras
+    `SSE_DURACION_MAXIMA_SEGUNDOS` (EventSource reconecta solo, con
+    `Last-Event-ID` para no repetir el último estado).
+    Mientras espera no ocupa hilos ni conexiones a la DB.
+    """
+    reglas = get_settings()
+    if pubsub_prestamos.conexiones() >= reglas.SSE_MAX_CONEXIONES:
+        raise HTTPException(status_code=503, detail="Demasiadas conexiones de eventos abiertas",
+                            headers={"Retry-After": "5"})
+    # Suscribir antes de leer: un cambio entre la lectura y la espera no se pierde
+    suscripcion = pubsub_prestamos.suscribir(prestamo_id)
+    try:
+        actual = await run_in_threadpool(_leer_estado, db, prestamo_id)
+    except ValueError as e:
+        pubsub_prestamos.desuscribir(suscripcion)
+        raise HTTPException(status_code=404, detail=str(e))
+
+    async def generar(actual):
+        loop = asyncio.get_running_loop()
+        limite = loop.time() + reglas.SSE_DURACION_MAXIMA_SEGUNDOS
+        enviado = last_event_id
+        try:
+            yield f"retry: {_SSE_RETRY_MS}\n\n"
+            while True:
+                etag, estado, cuerpo = actual
+                if etag != enviado:
+                    yield f"event: estado\nid: {etag}\ndata: {cuerpo}\n\n"
+                    enviado = etag
+                if estado in ESTADOS_TERMINALES:
+                    return
+                restante = limite - loop.time()
+                if restante <= 0:
+                    return
+                if await suscripcion.esperar(min(reglas.SSE_KEEPALIVE_SEGUNDOS, restante)):
+                    try:
+                        actual = await run_in_threadpool(_leer_estado, db, prestamo_id)
+                    except ValueError:
+                        return
+                else:
+                    # Comentario SSE: mantiene viva la conexión en proxies
+                    yield ": keepalive\n\n"
+        finally:
+            pubsub_prestamos.desuscribir(suscripcion)
+
+    return StreamingResponse(
+        generar(actual),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.get("/{prestamo_id}/auditoria")
+def obtener_auditoria_prestamo(prestamo_id: int):
+    """
+    Traza de la decisión: entradas (score, ingresos, monto, plazo), umbrales
+    vigentes, cuota, ratio y regla aplicada. Se lee de los segmentos de
+    auditoría, no de la tabla de préstamos.
+    """
+    auditor = auditoria_decisiones.auditoria_decisiones
+    if auditor is None:
+        raise HTTPException(status_code=503, detail="Auditoría de decisiones deshabilitada")
+    registros = auditor.buscar(prestamo_id)
+    if not registros:
+        raise HTTPException(status_code=404, detail="Sin registros de auditoría para el préstamo")
+    return {"prestamo_id": prestamo_id, "registros": registros}
+
+@router.post("/amortizacion/lote", response_model=AmortizacionLoteResponse)
+def obtener_amortizacion_lote(request: AmortizacionLoteRequest, db: Session = Depends(get_read_db)):
+    """
+    Tablas de amortización de varios préstamos.
+    Una sola consulta y un solo cálculo vectorizado para todo el lote.
+    """
+    resultados, no_disponibles = AmortizacionService().obtener_tablas(db, request.prestamo_ids)
+    return {
+        "tablas": [resumen_tabla(prestamo, tasa, tabla) for prestamo, tasa, tabla in resultados],
+        "no_disponibles": no_disponibles,
+    }
+
+# Líneas NDJSON por chunk al hacer streaming de tablas largas
+_LINEAS_POR_CHUNK = 256
+
+@router.get("/{prestamo_id}/amortizacion", response_model=TablaAmortizacionResponse)
+def obtener_amortizacion(prestamo_id: int, stream: bool = False, db: Session = Depends(get_read_db)):
+    """
+    Tabla de amortización (cuota, interés, capital y saldo por mes).
+
+    Con `?stream=true` responde NDJSON (una cuota por línea) en chunks,
+    sin armar la respuesta completa en memoria.
+    """
+    try:
+        prestamo, tasa, tabla = AmortizacionService().obtener_tabla(db, prestamo_id)
+    except ValueError as e:
+        if "no encontrado" in str(e).lower():
+            raise HTTPException(status_code=404, detail=str(e))
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if not stream:
+        return resumen_tabla(prestamo, tasa, tabla)
+
+    def generar():
+        lineas = []
+        for fila in filas_tabla(tabla, prestamo.plazo_meses):
+            lineas.append(json.dumps(fila))
+            if len(lineas) == _LINEAS_POR_CHUNK:
+                yield "\n".join(lineas) + "\n"
+                lineas = []
+        if lineas:
+            yield "\n".join(lineas) + "\n"
+
+    return StreamingResponse(generar(), media_type="application/x-ndjson")
+
+@router.get("/exportar")
+def exportar_prestamos(estado: Optional[EstadoPrestamo] = None, db: Session = Depends(get_read_db)):
+    """
+    Cartera activa en NDJSON (un préstamo por línea, mismo formato que
+    `/{id}/estado`), opcionalmente filtrada por estado. Se lee y se envía en
+    streaming: en PostgreSQL con un cursor del lado del servidor.
+    """
+    tamano_lote = get_settings().EXPORTACION_LOTE_FILAS
+
+    def generar():
+        lineas = []
+        for fila in PrestamoService().exportar(db, estado, tamano_lote=tamano_lote):
+            lineas.append(PrestamoResponse.model_validate(dict(fila)).model_dump_json())
+            if len(lineas) == _LINEAS_POR_CHUNK:
+                yield "\n".join(lineas) + "\n"
+                lineas = []
+        if lineas:
+            yield "\n".join(lineas) + "\n"
+
+    return StreamingResponse(generar(), media_type="application/x-ndjson")
@@ -0,0 +1,46 @@
+from pydantic import BaseModel
+from typing import List, Optional
+from datetime import datetime
+from app.schemas.prestamo import PrestamoResponse
+
+class ClienteResponse(BaseModel):
+    id: int
+    nombre: str
+    identificacion: str
+    email: str
+    score_cifin: Optional[int] = None
+    ingresos_mensuales: Optional[float] = None
+    estado: str
+    fecha_creacion: Optional[datetime] = None
+    
+    class Config:
+        from_attributes = True
+
+class ConsultaBureauResponse(BaseModel):
+    score: int
+    deudas_activas: Optional[int] = None
+    monto_deudas: Optional[float] = None
+    puntualidad: Optional[str] = None
+    tiene_historial: bool
+    mensaje: Optional[str] = None
+    fecha_consulta: datetime
+    
+    class Config:
+        from_attributes = True
+
+class ClienteResumenResponse(BaseModel):
+    cliente: ClienteResponse
+    prestamos: List[PrestamoResponse]
+    ultima_consulta_bureau: Optional[ConsultaBureauResponse] = None
+
+class ErrorImportacion(BaseModel):
+    fila: int  # número de fila de datos (sin contar el encabezado CSV)
+    error: str
+
+class ImportacionResponse(BaseModel):
+    filas: int
+    importados: int  # insertados o actualizados (upsert por identificación)
+    errores: int
+    lotes: int
+    detalle_errores: List[ErrorImportacion]
+    errores_truncados: bool  # True si hubo más errores que los reportados
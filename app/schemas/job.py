@@ -0,0 +1,31 @@
+import json
+from pydantic import BaseModel, Field, field_validator
+from typing import Any, Dict, Optional
+from datetime import datetime
+
+class JobRequest(BaseModel):
+    tipo: str = Field(..., min_length=1, description="Tipo registrado, ej. reconstruir_estadisticas")
+    parametros: Dict[str, Any] = Field(default_factory=dict)
+
+class JobResponse(BaseModel):
+    id: str
+    tipo: str
+    estado: str
+    parametros: Dict[str, Any] = Field(default_factory=dict)
+    progreso: float
+    mensaje: Optional[str] = None
+    resultado: Optional[Any] = None
+    error: Optional[str] = None
+    cancelacion_solicitada: bool = False
+    fecha_creacion: datetime
+    fecha_inicio: Optional[datetime] = None
+    fecha_fin: Optional[datetime] = None
+
+    @field_validator("parametros", "resultado", mode="before")
+    @classmethod
+    def _desde_json(cls, valor):
+        # La tabla guarda parámetros y resultado como texto JSON
+        return json.loads(valor) if isinstance(valor, str) else valor
+
+    class Config:
+        from_attributes = True
@@ -1,11 +1,13 @@
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
+from app.models.prestamo import EstadoPrestamo
 
 class PrestamoRequest(BaseModel):
     cliente_id: int = Field(..., description="ID del cliente")
-    monto_solicitado: float = Field(..., gt=0, le=50_000_000)
-    plazo_meses: int = Field(..., ge=12, le=60)
+    # Límites de monto y plazo: los valida PrestamoService contra Settings
+    monto_solicitado: float = Field(..., gt=0)
+    plazo_meses: int = Field(..., gt=0)
 
 class PrestamoResponse(BaseModel):
     id: int
@@ -16,6 +18,8 @@ class PrestamoResponse(BaseModel):
     estado: str
     motivo_rechazo: Optional[str] = None
     fecha_solicitud: datetime
+    # Para PATCH /{id}/estado: la versión leída (control optimista)
+    version: int
     
     class Config:
         from_attributes = True
@@ -28,6 +32,59 @@ class PrestamoResponse(BaseModel):
                 "cuota_mensual": 483871.0,
                 "estado": "aprobado",
                 "motivo_rechazo": None,
-                "fecha_solicitud": "2025-11-26T10:30:00"
+                "fecha_solicitud": "2025-11-26T10:30:00",
+                "version": 1
             }
         }
+
+class CambioEstadoRequest(BaseModel):
+    estado: EstadoPrestamo
+    # Versión leída por el llamador: si ya no es la vigente → 409.
+    # Sin versión, el servicio relee y reintenta ante un conflicto
+    version: Optional[int] = None
+    motivo_rechazo: Optional[str] = None
+
+class CuotaAmortizacion(BaseModel):
+    numero: int
+    cuota: float
+    interes: float
+    capital: float
+    saldo: float
+
+class TablaAmortizacionResponse(BaseModel):
+    prestamo_id: int
+    monto_solicitado: float
+    plazo_meses: int
+    tasa_interes: float  # % anual
+    cuota_mensual: float
+    total_intereses: float
+    cuotas: List[CuotaAmortizacion]
+
+class AmortizacionLoteRequest(BaseModel):
+    prestamo_ids: List[int] = Field(..., min_length=1, max_length=1000)
+
+class AmortizacionLoteResponse(BaseModel):
+    tablas: List[TablaAmortizacionResponse]
+    no_disponibles: List[int] = Field(default_factory=list, description="Inexistentes o rechazados")
+
+class EstadisticaEstado(BaseModel):
+    estado: str
+    conteo: int
+    suma_monto: float
+
+class EstadisticaBandaScore(BaseModel):
+    banda: str  # "700-749" o "sin_historial"
+    conteo: int
+    aprobados: int
+    tasa_aprobacion: float
+
+class EstadisticaPlazo(BaseModel):
+    plazo_meses: int
+    conteo: int
+    cuota_promedio: Optional[float] = None  # solo préstamos con cuota (no rechazados)
+
+class EstadisticasCarteraResponse(BaseModel):
+    total_prestamos: int
+    por_estado: List[EstadisticaEstado]
+    por_banda_score: List[EstadisticaBandaScore]
+    por_plazo: List[EstadisticaPlazo]
@@ -0,0 +1,123 @@
+from functools import lru_cache
+
+import numpy as np
+from sqlalchemy.orm import Session
+from app.config import get_settings
+from app.models.prestamo import Prestamo, EstadoPrestamo
+
+
+def _calcular_tablas(montos: np.ndarray, plazos: np.ndarray, tasas_anuales: np.ndarray) -> np.ndarray:
+    """
+    Sistema francés (cuota fija) para m préstamos a la vez, forma (m, max_plazo, 4);
+    columnas: cuota, interés, capital, saldo.
+
+    Saldo después de la cuota k en forma cerrada:
+        saldo_k = P·(1+r)^k - cuota·((1+r)^k - 1)/r
+    así no hay bucle mes a mes: todo es una operación sobre la matriz de
+    potencias (1+r)^k. Los meses posteriores al plazo de cada préstamo quedan en 0.
+    """
+    montos = montos.astype(np.float64)[:, None]
+    plazos = plazos.astype(np.int64)[:, None]
+    r = (tasas_anuales.astype(np.float64) / 12)[:, None]
+    max_plazo = int(plazos.max())
+    k = np.arange(1, max_plazo + 1)[None, :]
+
+    sin_interes = r == 0
+    r_segura = np.where(sin_interes, 1.0, r)
+    potencia_n = (1 + r) ** plazos
+    cuota = np.where(sin_interes, montos / plazos,
+                     montos * r_segura * potencia_n / np.where(sin_interes, 1.0, potencia_n - 1))
+
+    potencia_k = (1 + r) ** k
+    saldo = np.where(sin_interes, montos - cuota * k,
+                     montos * potencia_k - cuota * (potencia_k - 1) / r_segura)
+    saldo_anterior = np.concatenate([np.broadcast_to(montos, (len(montos), 1)), saldo[:, :-1]], axis=1)
+    interes = saldo_anterior * r
+    capital = cuota - interes
+
+    tablas = np.stack(np.broadcast_arrays(cuota, interes, capital, saldo), axis=-1)
+    # Última cuota: saldo exactamente 0 (sin residuo de punto flotante)
+    tablas[..., 3] = np.where(k == plazos, 0.0, tablas[..., 3])
+    tablas[k > plazos] = 0.0
+    return tablas
+
+
+@lru_cache(maxsize=get_settings().AMORTIZACION_CACHE_MAX_ENTRADAS)
+def tabla_amortizacion(monto: float, plazo_meses: int, tasa_anual: float) -> np.ndarray:
+    """
+    Tabla de un préstamo, forma (plazo, 4); cacheada por (monto, plazo, tasa) con LRU.
+    El arreglo es de solo lectura porque se comparte entre requests.
+    """
+    tabla = _calcular_tablas(np.array([monto]), np.array([plazo_meses]), np.array([tasa_anual]))[0]
+    tabla.setflags(write=False)
+    return tabla
+
+
+def tablas_amortizacion(montos, plazos, tasas_anuales) -> np.ndarray:
+    """Tablas de muchos préstamos en una sola operación 2-D, forma (m, max_plazo, 4)"""
+    return _calcular_tablas(np.asarray(montos), np.asarray(plazos), np.asarray(tasas_anuales))
+
+
+def filas_tabla(tabla: np.ndarray, plazo_meses: int):
+    """Itera las cuotas como dicts redondeados (para JSON o streaming)"""
+    for numero, (cuota, interes, capital, saldo) in enumerate(np.round(tabla[:plazo_meses], 2).tolist(), start=1):
+        yield {"numero": numero, "cuota": cuota, "interes": interes, "capital": capital, "saldo": saldo}
+
+
+def resumen_tabla(prestamo: Prestamo, tasa_anual: float, tabla: np.ndarray) -> dict:
+    """Respuesta completa (TablaAmortizacionResponse) de un préstamo"""
+    plazo = prestamo.plazo_meses
+    return {
+        "prestamo_id": prestamo.id,
+        "monto_solicitado": prestamo.monto_solicitado,
+        "plazo_meses": plazo,
+        "tasa_interes": round(tasa_anual * 100, 6),
+        "cuota_mensual": round(float(tabla[0, 0]), 2),
+        "total_intereses": round(float(tabla[:plazo, 1].sum()), 2),
+        "cuotas": list(filas_tabla(tabla, plazo)),
+    }
+
+
+class AmortizacionService:
+
+    def obtener_prestamo(self, db: Session, prestamo_id: int) -> Prestamo:
+        prestamo = db.query(Prestamo).filter(Prestamo.id == prestamo_id).first()
+        if not prestamo:
+            raise ValueError("Préstamo no encontrado")
+        if prestamo.estado == EstadoPrestamo.RECHAZADO:
+            raise ValueError("Préstamo rechazado: no tiene tabla de amortización")
+        return prestamo
+
+    def tasa_anual(self, prestamo: Prestamo) -> float:
+        # tasa_interes se guarda en %; préstamos anteriores a la columna usan la tasa vigente
+        if prestamo.tasa_interes is None:
+            return get_settings().TASA_INTERES_ANUAL
+        return prestamo.tasa_interes / 100
+
+    def obtener_tabla(self, db: Session, prestamo_id: int):
+        """Retorna (prestamo, tasa_anual, tabla)"""
+        prestamo = self.obtener_prestamo(db, prestamo_id)
+        tasa = self.tasa_anual(prestamo)
+        return prestamo, tasa, tabla_amortizacion(prestamo.monto_solicitado, prestamo.plazo_meses, tasa)
+
+    def obtener_tablas(self, db: Session, prestamo_ids):
+        """
+        Tablas de varios préstamos con una sola consulta y un solo cálculo 2-D.
+        Retorna (lista de (prestamo, tasa_anual, tabla), ids no disponibles).
+        """
+        prestamos = (
+            db.query(Prestamo)
+            .filter(Prestamo.id.in_(set(prestamo_ids)), Prestamo.estado != EstadoPrestamo.RECHAZADO)
+            .all()
+        )
+        por_id = {p.id: p for p in prestamos}
+        encontrados = [por_id[i] for i in dict.fromkeys(prestamo_ids) if i in por_id]
+        no_disponibles = [i for i in dict.fromkeys(prestamo_ids) if i not in por_id]
+        if not encontrados:
+            return [], no_disponibles
+
+        tasas = [self.tasa_anual(p) for p in encontrados]
+        tablas = tablas_amortizacion(
+            [p.monto_solicitado for p in encontrados], [p.plazo_meses for p in encontrados], tasas
+        )
+        return list(zip(encontrados, tasas, tablas)), no_disponibles
@@ -0,0 +1,147 @@
+import threading
+from datetime import datetime, timedelta
+from sqlalchemy import Column, MetaData, Table, delete, func, insert, select
+from sqlalchemy.orm import Session
+from app.models.archivo import ArchivoPrestamosMes
+from app.models.prestamo import Prestamo, EstadoPrestamo
+from app.shards import argumentos_shard
+
+# Préstamos cerrados: ya no cambian y solo se consultan por id
+ESTADOS_ARCHIVABLES = (EstadoPrestamo.RECHAZADO, EstadoPrestamo.DESEMBOLSADO)
+
+_PREFIJO_TABLA = "prestamos_archivo_"
+# Metadata propia: create_all del esquema no crea las tablas mensuales
+_metadata_archivo = MetaData()
+_lock_tablas = threading.Lock()
+
+_prestamos = Prestamo.__table__
+
+
+def tabla_archivo(mes: str) -> Table:
+    """Tabla `prestamos_archivo_AAAAMM`: mismas columnas que prestamos, sin FKs ni índices secundarios"""
+    nombre = _PREFIJO_TABLA + mes
+    with _lock_tablas:
+        tabla = _metadata_archivo.tables.get(nombre)
+        if tabla is None:
+            tabla = Table(nombre, _metadata_archivo, *(
+                Column(columna.name, columna.type, primary_key=columna.primary_key)
+                for columna in _prestamos.columns
+            ))
+        return tabla
+
+
+def mes_de(fecha: datetime) -> str:
+    return f"{fecha:%Y%m}"
+
+
+def meses_archivados(db: Session):
+    return list(db.scalars(select(ArchivoPrestamosMes.mes).order_by(ArchivoPrestamosMes.mes)))
+
+
+def buscar_archivado(db: Session, prestamo_id: int):
+    """
+    Préstamo archivado como objeto Prestamo (transitorio, fuera de la sesión),
+    o None. Solo consulta los meses cuyo rango de ids contiene al préstamo.
+    Con sharding, solo el archivo del shard dueño del id.
+    """
+    shard = argumentos_shard(db, prestamo_id)
+    meses = db.scalars(
+        select(ArchivoPrestamosMes.mes)
+        .where(ArchivoPrestamosMes.min_id <= prestamo_id, ArchivoPrestamosMes.max_id >= prestamo_id)
+        .order_by(ArchivoPrestamosMes.mes.desc()),
+        bind_arguments=shard,
+    ).all()
+    for mes in meses:
+        tabla = tabla_archivo(mes)
+        fila = db.execute(select(tabla).where(tabla.c.id == prestamo_id), bind_arguments=shard).mappings().first()
+        if fila is not None:
+            return Prestamo(**fila)
+    return None
+
+
+class ArchivadorPrestamos:
+    """
+    Mueve los préstamos cerrados (RECHAZADO / DESEMBOLSADO) con más de
+    `edad_dias` desde la decisión a tablas de archivo por mes de solicitud.
+
+    - Lotes de `tamano_lote` por id, cada uno en su propia transacción:
+      INSERT ... SELECT a la tabla del mes + DELETE de prestamos, con el mismo
+      filtro en ambas sentencias. Un corte a mitad no pierde ni duplica filas.
+    - La tabla de agregados de cartera no cambia: un préstamo archivado sigue
+      siendo parte de la cartera (ver EstadisticasService.reconstruir).
+    - Las tablas mensuales se crean al primer uso y se registran en el
+      catálogo `prestamos_archivo_meses` con su rango de ids.
+    """
+
+    def __init__(self, db: Session, edad_dias: float, tamano_lote: int = 1000, ahora: datetime = None):
+        self.db = db
+        self.tamano_lote = tamano_lote
+        self.corte = (ahora or datetime.utcnow()) - timedelta(days=edad_dias)
+
+    def _filtro(self):
+        return (
+            _prestamos.c.estado.in_(ESTADOS_ARCHIVABLES),
+            func.coalesce(_prestamos.c.fecha_decision, _prestamos.c.fecha_solicitud) < self.corte,
+        )
+
+    def pendientes(self) -> int:
+        return self.db.scalar(select(func.count()).select_from(_prestamos).where(*self._filtro()))
+
+    def ejecutar(self, progreso=None) -> dict:
+        """`progreso(archivados, total)` tras cada lote; si lanza, el lote en curso ya quedó confirmado"""
+        total = self.pendientes()
+        archivados, lotes, meses, ultimo_id = 0, 0, set(), 0
+        while True:
+            filas = self.db.execute(
+                select(_prestamos.c.id, _prestamos.c.fecha_solicitud)
+                .where(_prestamos.c.id > ultimo_id, *self._filtro())
+                .order_by(_prestamos.c.id)
+                .limit(self.tamano_lote)
+            ).all()
+            if not filas:
+                break
+            ultimo_id = filas[-1][0]
+            por_mes = {}
+            for prestamo_id, fecha in filas:
+                por_mes.setdefault(mes_de(fecha or self.corte), []).append(prestamo_id)
+            archivados += self._mover(por_mes)
+            self.db.commit()
+            meses.update(por_mes)
+            lotes += 1
+            if progreso:
+                progreso(archivados, total)
+        return {"archivados": archivados, "lotes": lotes, "meses": sorted(meses), "corte": self.corte.isoformat()}
+
+    def _mover(self, por_mes: dict) -> int:
+        conexion = self.db.connection()
+        movidos = 0
+        for mes, ids in por_mes.items():
+            tabla = tabla_archivo(mes)
+            tabla.create(conexion, checkfirst=True)
+            columnas = [columna.name for columna in _prestamos.columns]
+            copiados = conexion.execute(
+                insert(tabla).from_select(
+                    columnas,
+                    select(*(_prestamos.c[nombre] for nombre in columnas)).where(
+                        _prestamos.c.id.in_(ids), *self._filtro()
+                    ),
+                )
+            ).rowcount
+            borrados = conexion.execute(
+                delete(_prestamos).where(_prestamos.c.id.in_(ids), *self._filtro())
+            ).rowcount
+            if copiados != borrados:
+                raise RuntimeError(f"Archivo {mes}: {copiados} copiados pero {borrados} borrados")
+            self._catalogar(mes, min(ids), max(ids), borrados)
+            movidos += borrados
+        return movidos
+
+    def _catalogar(self, mes: str, min_id: int, max_id: int, filas: int):
+        entrada = self.db.get(ArchivoPrestamosMes, mes)
+        if entrada is None:
+            self.db.add(ArchivoPrestamosMes(mes=mes, min_id=min_id, max_id=max_id, filas=filas))
+        else:
+            entrada.min_id = min(entrada.min_id, min_id)
+            entrada.max_id = max(entrada.max_id, max_id)
+            entrada.filas += filas
+        self.db.flush()
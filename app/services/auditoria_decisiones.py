@@ -0,0 +1,367 @@
+import gzip
+import hashlib
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+
+ARCHIVO_ACTIVO = "activo.ndjson"
+_SUFIJO_SEGMENTO = ".ndjson.gz"
+_SUFIJO_INDICE = ".idx.json"
+# Índices de segmentos sellados que se mantienen cargados
+_MAX_INDICES_EN_MEMORIA = 16
+
+logger = logging.getLogger(__name__)
+
+
+class AuditoriaDecisiones:
+    """
+    Traza completa de cada decisión de préstamo (entradas, umbrales, ratio,
+    regla aplicada), fuera de la tabla `prestamos`.
+
+    - `registrar` solo encola el dict (cola acotada): el request no espera
+      disco ni cola. Si la cola está llena descarta y lo cuenta en las métricas.
+    - Un hilo escritor agrega líneas NDJSON a `activo.ndjson` y hace un solo
+      fsync por tanda (las que llegan en `intervalo_fsync_ms`).
+    - Al superar `segmento_max_bytes`, el archivo activo se sella en un
+      segmento gzip numerado, comprimido en bloques de `registros_por_bloque`
+      (miembros gzip independientes), con un índice prestamo_id -> bloque al
+      lado: buscar un préstamo descomprime un solo bloque.
+    - Los segmentos no se modifican nunca (append-only).
+    """
+
+    def __init__(self, directorio: str, max_pendientes: int = 10_000, segmento_max_bytes: int = 64 * 1024 * 1024,
+                 registros_por_bloque: int = 256, intervalo_fsync_ms: float = 50):
+        self.directorio = directorio
+        self.segmento_max_bytes = segmento_max_bytes
+        self.registros_por_bloque = registros_por_bloque
+        self.intervalo_fsync = intervalo_fsync_ms / 1000
+        self._cola = queue.Queue(maxsize=max_pendientes)
+        self._detener = threading.Event()
+        self._hilo = None
+        self._lock = threading.Lock()
+        self._archivo = None
+        self._offsets_activo = {}  # prestamo_id -> [offset de la línea en activo.ndjson]
+        self._segmentos = []  # (numero, min_id, max_id)
+        self._indices = OrderedDict()
+        self._metricas = {"registrados": 0, "descartados": 0, "fsyncs": 0, "segmentos_sellados": 0,
+                          "errores_escritura": 0}
+
+    @property
+    def activo(self) -> bool:
+        return self._hilo is not None and self._hilo.is_alive()
+
+    def iniciar(self):
+        if self.activo:
+            return
+        os.makedirs(self.directorio, exist_ok=True)
+        self._cargar_segmentos()
+        self._recuperar_activo()
+        self._archivo = open(self._ruta(ARCHIVO_ACTIVO), "ab")
+        # Un activo que quedó sin sellar (el sellado falló antes de detener)
+        self._sellar_si_corresponde()
+        self._detener.clear()
+        self._hilo = threading.Thread(target=self._bucle, name="auditoria-decisiones", daemon=True)
+        self._hilo.start()
+
+    def detener(self):
+        """Escribe lo pendiente, hace fsync y cierra (un activo sin sellar se sella al próximo `iniciar`)"""
+        self._detener.set()
+        if self._hilo is not None:
+            self._hilo.join()
+            self._hilo = None
+        if self._archivo is not None:
+            self._archivo.close()
+            self._archivo = None
+
+    def registrar(self, registro: dict) -> bool:
+        """Encola un registro (debe traer `prestamo_id`); False si se descartó"""
+        if not self.activo:
+            return False
+        try:
+            self._cola.put_nowait(registro)
+        except queue.Full:
+            with self._lock:
+                self._metricas["descartados"] += 1
+            return False
+        return True
+
+    def vaciar(self):
+        """Bloquea hasta que todo lo encolado quedó escrito y con fsync"""
+        self._cola.join()
+
+    def buscar(self, prestamo_id: int):
+        """Registros de un préstamo, del más antiguo al más reciente"""
+        registros = []
+        for numero, minimo, maximo in list(self._segmentos):
+            if minimo <= prestamo_id <= maximo:
+                registros.extend(self._buscar_en_segmento(numero, prestamo_id))
+        # Con el lock: el sellado no puede vaciar el activo a mitad de la lectura
+        with self._lock:
+            offsets = self._offsets_activo.get(prestamo_id)
+            if offsets:
+                with open(self._ruta(ARCHIVO_ACTIVO), "rb") as archivo:
+                    for offset in offsets:
+                        archivo.seek(offset)
+                        registros.append(json.loads(archivo.readline()))
+        return registros
+
+    def metricas(self) -> dict:
+        with self._lock:
+            return {**self._metricas, "en_cola": self._cola.qsize(), "segmentos": len(self._segmentos)}
+
+    # --- hilo escritor ---
+
+    def _bucle(self):
+        while not (self._detener.is_set() and self._cola.empty()):
+            try:
+                tanda = [self._cola.get(timeout=0.05)]
+            except queue.Empty:
+                continue
+            limite = time.monotonic() + self.intervalo_fsync
+            while True:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    break
+                try:
+                    tanda.append(self._cola.get(timeout=restante))
+                except queue.Empty:
+                    break
+            try:
+                self._escribir(tanda)
+            except Exception as e:
+                # Disco lleno / permisos / registro sin prestamo_id: la tanda
+                # se pierde, se cuenta y el hilo sigue vivo
+                logger.error("No se pudo escribir una tanda de %d registros de auditoría: %s", len(tanda), e)
+                with self._lock:
+                    self._metricas["errores_escritura"] += 1
+                    self._metricas["descartados"] += len(tanda)
+            else:
+                self._sellar_si_corresponde()
+            finally:
+                for _ in tanda:
+                    self._cola.task_done()
+
+    def _escribir(self, tanda):
+        if self._archivo.closed:
+            # Un error anterior no pudo reabrirlo
+            self._archivo = open(self._ruta(ARCHIVO_ACTIVO), "ab")
+        inicio_tanda = offset = self._archivo.tell()
+        nuevos = []
+        lineas = []
+        for registro in tanda:
+            linea = (json.dumps(registro, ensure_ascii=False, default=str) + "\n").encode()
+            nuevos.append((registro["prestamo_id"], offset))
+            lineas.append(linea)
+            offset += len(linea)
+        try:
+            self._archivo.write(b"".join(lineas))
+            self._archivo.flush()
+            os.fsync(self._archivo.fileno())
+        except OSError:
+            self._descartar_tanda(inicio_tanda)
+            raise
+        # Visibles para `buscar` solo cuando ya son durables
+        with self._lock:
+            for prestamo_id, inicio in nuevos:
+                self._offsets_activo.setdefault(prestamo_id, []).append(inicio)
+            self._metricas["registrados"] += len(tanda)
+            self._metricas["fsyncs"] += 1
+
+    def _descartar_tanda(self, largo: int):
+        """
+        Tras un error de escritura: cierra el activo (lo que quedó en el buffer
+        se pierde), lo trunca a la última tanda completa y lo reabre, así no
+        queda una línea a medias en el medio del archivo.
+        """
+        try:
+            self._archivo.close()
+        except OSError:
+            pass
+        ruta = self._ruta(ARCHIVO_ACTIVO)
+        try:
+            os.truncate(ruta, largo)
+            self._archivo = open(ruta, "ab")
+        except OSError:
+            # Queda cerrado: la próxima tanda lo reabre
+            pass
+
+    def _sellar_si_corresponde(self):
+        if self._archivo.tell() < self.segmento_max_bytes:
+            return
+        try:
+            self._sellar()
+        except Exception as e:
+            # El activo sigue abierto y completo: se reintenta tras la próxima tanda
+            logger.error("No se pudo sellar el segmento de auditoría: %s", e)
+            with self._lock:
+                self._metricas["errores_escritura"] += 1
+
+    def _sellar(self):
+        """
+        Comprime el archivo activo en el siguiente segmento y lo vacía. El
+        activo se cierra recién cuando el segmento y su índice están
+        publicados: si algo falla antes, sigue abierto y nada se pierde. El
+        índice guarda largo y hash del contenido sellado: si el proceso cae
+        antes de vaciar el activo, el arranque reconoce esas líneas y no las
+        vuelve a indexar (ver _recuperar_activo).
+        """
+        with open(self._ruta(ARCHIVO_ACTIVO), "rb") as archivo:
+            contenido = archivo.read()
+        lineas = contenido.splitlines(keepends=True)
+        origen = {"bytes": len(contenido), "sha256": hashlib.sha256(contenido).hexdigest()}
+        numero = self._segmentos[-1][0] + 1 if self._segmentos else 1
+        nombre = f"{numero:06d}"
+        ruta_segmento = self._ruta(nombre + _SUFIJO_SEGMENTO)
+        ruta_indice = self._ruta(nombre + _SUFIJO_INDICE)
+        try:
+            indice = self._escribir_segmento(lineas, origen, ruta_segmento, ruta_indice)
+        except Exception:
+            for temporal in (ruta_segmento + ".tmp", ruta_indice + ".tmp"):
+                try:
+                    os.remove(temporal)
+                except OSError:
+                    pass
+            raise
+
+        # Si el truncado falla, el próximo intento vuelve a sellar con el mismo número
+        nuevo = open(self._ruta(ARCHIVO_ACTIVO), "wb")
+        with self._lock:
+            self._segmentos.append((numero, indice["min"], indice["max"]))
+            self._offsets_activo = {}
+            anterior, self._archivo = self._archivo, nuevo
+            self._metricas["segmentos_sellados"] += 1
+        anterior.close()
+
+    def _escribir_segmento(self, lineas, origen: dict, ruta_segmento: str, ruta_indice: str) -> dict:
+        bloques, ids = [], {}
+        with open(ruta_segmento + ".tmp", "wb") as salida:
+            for inicio in range(0, len(lineas), self.registros_por_bloque):
+                bloque = lineas[inicio:inicio + self.registros_por_bloque]
+                comprimido = gzip.compress(b"".join(bloque))
+                for linea in bloque:
+                    ids.setdefault(json.loads(linea)["prestamo_id"], set()).add(len(bloques))
+                bloques.append((salida.tell(), len(comprimido)))
+                salida.write(comprimido)
+            salida.flush()
+            os.fsync(salida.fileno())
+        indice = {
+            "min": min(ids), "max": max(ids), "bloques": bloques, "origen": origen,
+            "prestamos": {str(prestamo_id): sorted(b) for prestamo_id, b in ids.items()},
+        }
+        with open(ruta_indice + ".tmp", "w", encoding="utf-8") as salida:
+            json.dump(indice, salida)
+            salida.flush()
+            os.fsync(salida.fileno())
+        # El índice se publica último: un segmento sin índice se ignora al arrancar
+        os.replace(ruta_segmento + ".tmp", ruta_segmento)
+        os.replace(ruta_indice + ".tmp", ruta_indice)
+        return indice
+
+    # --- lectura / arranque ---
+
+    def _ruta(self, nombre: str) -> str:
+        return os.path.join(self.directorio, nombre)
+
+    def _cargar_segmentos(self):
+        segmentos = []
+        for nombre in os.listdir(self.directorio):
+            if nombre.endswith(_SUFIJO_INDICE):
+                numero = int(nombre[:-len(_SUFIJO_INDICE)])
+                indice = self._indice(numero)
+                segmentos.append((numero, indice["min"], indice["max"]))
+        self._segmentos = sorted(segmentos)
+
+    def _recuperar_activo(self):
+        """Rearma los offsets del archivo activo; descarta una última línea a medio escribir"""
+        ruta = self._ruta(ARCHIVO_ACTIVO)
+        offsets, valido = {}, 0
+        if os.path.exists(ruta):
+            self._descartar_ya_sellado(ruta)
+            with open(ruta, "rb") as archivo:
+                for linea in archivo:
+                    if not linea.endswith(b"\n"):
+                        break
+                    try:
+                        prestamo_id = json.loads(linea)["prestamo_id"]
+                    except (ValueError, KeyError):
+                        break
+                    offsets.setdefault(prestamo_id, []).append(valido)
+                    valido += len(linea)
+            if valido != os.path.getsize(ruta):
+                with open(ruta, "r+b") as archivo:
+                    archivo.truncate(valido)
+        self._offsets_activo = offsets
+
+    def _descartar_ya_sellado(self, ruta: str):
+        """
+        Caída entre publicar el último segmento y vaciar el activo: el activo
+        empieza con exactamente lo sellado. Se quita ese prefijo para que
+        `buscar` no devuelva duplicados ni el próximo sellado los repita.
+        """
+        if not self._segmentos:
+            return
+        origen = self._indice(self._segmentos[-1][0]).get("origen")
+        if not origen or os.path.getsize(ruta) < origen["bytes"]:
+            return
+        with open(ruta, "rb") as archivo:
+            prefijo = archivo.read(origen["bytes"])
+            if hashlib.sha256(prefijo).hexdigest() != origen["sha256"]:
+                return
+            resto = archivo.read()
+        with open(ruta + ".tmp", "wb") as salida:
+            salida.write(resto)
+            salida.flush()
+            os.fsync(salida.fileno())
+        os.replace(ruta + ".tmp", ruta)
+        logger.warning("El archivo activo de auditoría ya estaba sellado en el segmento %06d; se vació",
+                       self._segmentos[-1][0])
+
+    def _indice(self, numero: int) -> dict:
+        with self._lock:
+            indice = self._indices.get(numero)
+            if indice is not None:
+                self._indices.move_to_end(numero)
+                return indice
+        with open(self._ruta(f"{numero:06d}{_SUFIJO_INDICE}"), encoding="utf-8") as archivo:
+            indice = json.load(archivo)
+        with self._lock:
+            self._indices[numero] = indice
+            while len(self._indices) > _MAX_INDICES_EN_MEMORIA:
+                self._indices.popitem(last=False)
+        return indice
+
+    def _buscar_en_segmento(self, numero: int, prestamo_id: int):
+        indice = self._indice(numero)
+        registros = []
+        with open(self._ruta(f"{numero:06d}{_SUFIJO_SEGMENTO}"), "rb") as archivo:
+            for bloque in indice["prestamos"].get(str(prestamo_id), ()):
+                offset, largo = indice["bloques"][bloque]
+                archivo.seek(offset)
+                for linea in gzip.decompress(archivo.read(largo)).splitlines():
+                    registro = json.loads(linea)
+                    if registro["prestamo_id"] == prestamo_id:
+                        registros.append(registro)
+        return registros
+
+
+# Auditoría del proceso; se crea en el startup si AUDITORIA_HABILITADA (ver app/main.py)
+auditoria_decisiones = None
+
+
+def iniciar_auditoria(directorio: str, **opciones) -> AuditoriaDecisiones:
+    global auditoria_decisiones
+    if auditoria_decisiones is None:
+        auditoria_decisiones = AuditoriaDecisiones(directorio, **opciones)
+    auditoria_decisiones.iniciar()
+    return auditoria_decisiones
+
+
+def detener_auditoria():
+    global auditoria_decisiones
+    if auditoria_decisiones is not None:
+        auditoria_decisiones.detener()
+        auditoria_decisiones = None
@@ -0,0 +1,146 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from app.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+
+class _Entrada:
+    __slots__ = ("valor", "error", "guardado_en")
+
+    def __init__(self, valor, error, guardado_en):
+        self.valor = valor
+        self.error = error
+        self.guardado_en = guardado_en
+
+
+class BureauCache:
+    """
+    Cache de resultados del bureau por cliente_id.
+
+    - Entrada fresca (edad < ttl_fresco): se sirve directo.
+    - Entrada vieja (edad < ttl_maximo): se sirve y se refresca en segundo plano
+      (stale-while-revalidate).
+    - "Cliente no encontrado" se guarda como entrada negativa con ttl_negativo.
+    - Tamaño acotado con desalojo LRU.
+    """
+
+    def __init__(self, session_factory=None, ttl_fresco: float = 300, ttl_maximo: float = 86_400,
+                 ttl_negativo: float = 60, max_entradas: int = 10_000, reloj=time.monotonic):
+        self.session_factory = session_factory
+        self.ttl_fresco = ttl_fresco
+        self.ttl_maximo = ttl_maximo
+        self.ttl_negativo = ttl_negativo
+        self.max_entradas = max_entradas
+        self._reloj = reloj
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+        self._refrescando = set()
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="bureau-cache")
+        self._metricas = dict.fromkeys(
+            ("hits", "hits_viejos", "hits_negativos", "misses", "refrescos",
+             "refrescos_fallidos", "desalojos"), 0
+        )
+
+    def obtener(self, db, cliente_id: int, cargar):
+        """
+        Retorna el resultado de `cargar(db, cliente_id)` usando el cache.
+        `cargar` debe retornar un dict o lanzar ValueError.
+        """
+        ahora = self._reloj()
+        with self._lock:
+            entrada = self._entradas.get(cliente_id)
+            if entrada is not None:
+                edad = ahora - entrada.guardado_en
+                if entrada.error is not None:
+                    if edad < self.ttl_negativo:
+                        self._entradas.move_to_end(cliente_id)
+                        self._metricas["hits_negativos"] += 1
+                        raise ValueError(entrada.error)
+                elif edad < self.ttl_fresco:
+                    self._entradas.move_to_end(cliente_id)
+                    self._metricas["hits"] += 1
+                    return entrada.valor
+                elif edad < self.ttl_maximo:
+                    self._entradas.move_to_end(cliente_id)
+                    self._metricas["hits_viejos"] += 1
+                    self._programar_refresco(cliente_id, cargar)
+                    return entrada.valor
+            self._metricas["misses"] += 1
+
+        return self._cargar_y_guardar(db, cliente_id, cargar)
+
+    def invalidar(self, cliente_id: int):
+        with self._lock:
+            self._entradas.pop(cliente_id, None)
+
+    def limpiar(self):
+        with self._lock:
+            self._entradas.clear()
+
+    def metricas(self) -> dict:
+        with self._lock:
+            return {**self._metricas, "entradas": len(self._entradas), "max_entradas": self.max_entradas}
+
+    def _cargar_y_guardar(self, db, cliente_id: int, cargar):
+        try:
+            valor = cargar(db, cliente_id)
+        except ValueError as e:
+            # Solo se cachea el caso negativo "no encontrado"; otros errores
+            # (ej. cliente bloqueado) dependen del estado actual del cliente
+            if "no encontrado" in str(e).lower():
+                self._guardar(cliente_id, _Entrada(None, str(e), self._reloj()))
+            else:
+                self.invalidar(cliente_id)
+            raise
+        self._guardar(cliente_id, _Entrada(valor, None, self._reloj()))
+        return valor
+
+    def _guardar(self, cliente_id: int, entrada: _Entrada):
+        with self._lock:
+            self._entradas[cliente_id] = entrada
+            self._entradas.move_to_end(cliente_id)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+                self._metricas["desalojos"] += 1
+
+    def _programar_refresco(self, cliente_id: int, cargar):
+        # Llamado con self._lock tomado: un solo refresco en vuelo por cliente
+        if self.session_factory is None or cliente_id in self._refrescando:
+            return
+        self._refrescando.add(cliente_id)
+        self._metricas["refrescos"] += 1
+        self._executor.submit(self._refrescar, cliente_id, cargar)
+
+    def _refrescar(self, cliente_id: int, cargar):
+        db = self.session_factory()
+        try:
+            self._cargar_y_guardar(db, cliente_id, cargar)
+        except Exception:
+            logger.warning("Refresco en segundo plano del cliente %s fallido", cliente_id, exc_info=True)
+            with self._lock:
+                self._metricas["refrescos_fallidos"] += 1
+        finally:
+            db.close()
+            with self._lock:
+                self._refrescando.discard(cliente_id)
+
+
+def _crear_cache_default():
+    # El refresco en segundo plano solo lee: usa el engine de lectura (o los shards)
+    from app.database import nueva_sesion
+    settings = get_settings()
+    return BureauCache(
+        session_factory=lambda: nueva_sesion(lectura=True),
+        ttl_fresco=settings.BUREAU_CACHE_TTL_SEGUNDOS,
+        ttl_maximo=settings.BUREAU_CACHE_TTL_MAXIMO_SEGUNDOS,
+        ttl_negativo=settings.BUREAU_CACHE_TTL_NEGATIVO_SEGUNDOS,
+        max_entradas=settings.BUREAU_CACHE_MAX_ENTRADAS,
+    )
+
+
+# Cache compartido por todos los requests del proceso
+bureau_cache = _crear_cache_default()
@@ -1,12 +1,31 @@
+import logging
+import time
 from datetime import datetime, timedelta
+from sqlalchemy import event, inspect as sa_inspect, select
 from sqlalchemy.orm import Session
-from app.models.cliente import Cliente
+from app.config import get_settings
+from app.logs import LOGGER_DECISIONES, evento
+from app.models.cliente import Cliente, EstadoCliente
+from app.models.consulta_bureau import ConsultaBureau
+from app.services.bureau_cache import bureau_cache
+from app.trazas import trazado
+
+logger_decisiones = logging.getLogger(LOGGER_DECISIONES)
+
+_CLAVE_SESION = "bureau_clientes_modificados"
 
 class BureauService:
     # Límite: 1 consulta por cliente cada 24h
     LIMITE_CONSULTAS_24H = 1
     
-    def consultar_score(self, db: Session, cliente_id: int):
+    def __init__(self, cache=None):
+        # cache=None usa el cache compartido del proceso (si está habilitado)
+        if cache is None and get_settings().BUREAU_CACHE_HABILITADO:
+            cache = bureau_cache
+        self.cache = cache
+    
+    @trazado("BureauService.consultar_score")
+    def consultar_score(self, db: Session, cliente_id: int, registrar: bool = False):
         """
         Test Cases implementados:
         1. Path feliz: Cliente con score 750 → OK
@@ -14,21 +33,55 @@ class BureauService:
         3. Límite consultas: >1 en 24h → Error
         4. Cliente bloqueado: estado=BLOQUEADO → Error
         """
-        
-        # Validar cliente existe
-        cliente = db.query(Cliente).filter(Cliente.id == cliente_id).first()
-        if not cliente:
-            raise ValueError("Cliente no encontrado")
-        
-        # Test Case: Cliente bloqueado
-        if cliente.estado.value == "bloqueado":
-            raise ValueError("Cliente en lista de riesgo. Consulta bloqueada.")
+        inicio = time.perf_counter()
+        if self.cache is not None:
+            resultado = self.cache.obtener(db, cliente_id, self._consultar_proveedor)
+        else:
+            resultado = self._consultar_proveedor(db, cliente_id)
+        # El estado se verifica en cada llamada, fuera del cache: un bloqueo
+        # rige enseguida aunque el resultado siga cacheado
+        self._verificar_estado(db, cliente_id)
+        resultado = {**resultado, "fecha_consulta": datetime.utcnow().isoformat()}
         
         # Test Case: Límite de consultas (simular con cache/DB)
         ultima_consulta = self._obtener_ultima_consulta(db, cliente_id)
         if ultima_consulta and (datetime.utcnow() - ultima_consulta) < timedelta(hours=24):
             raise ValueError("Límite de consultas: solo 1 permitida cada 24 horas")
         
+        if registrar:
+            self._registrar_consulta(db, resultado)
+        evento(logger_decisiones, "consulta_bureau", cliente_id=cliente_id, score=resultado["score"],
+               tiene_historial=resultado["tiene_historial"],
+               latencia_ms=round((time.perf_counter() - inicio) * 1000, 2))
+        return resultado
+    
+    @trazado("bureau.registrar_consulta")
+    def _registrar_consulta(self, db: Session, resultado: dict):
+        """Guarda el resultado entregado (historial del cliente, ver /api/clientes/{id}/resumen)"""
+        campos = ("cliente_id", "score", "deudas_activas", "monto_deudas", "puntualidad",
+                  "tiene_historial", "mensaje")
+        db.add(ConsultaBureau(**{campo: resultado[campo] for campo in campos}))
+        db.commit()
+    
+    def _verificar_estado(self, db: Session, cliente_id: int):
+        estado = db.scalar(select(Cliente.estado).where(Cliente.id == cliente_id))
+        if estado is None:
+            raise ValueError("Cliente no encontrado")
+        # Test Case: Cliente bloqueado
+        if estado == EstadoCliente.BLOQUEADO:
+            raise ValueError("Cliente en lista de riesgo. Consulta bloqueada.")
+    
+    @trazado("bureau.proveedor")
+    def _consultar_proveedor(self, db: Session, cliente_id: int):
+        """
+        Consulta al proveedor (hoy la tabla clientes); es la parte cacheable.
+        No depende del estado del cliente: eso lo verifica consultar_score.
+        """
+        # Validar cliente existe
+        cliente = db.query(Cliente).filter(Cliente.id == cliente_id).first()
+        if not cliente:
+            raise ValueError("Cliente no encontrado")
+        
         # Test Case: Sin historial crediticio
         if cliente.score_cifin is None:
             return {
@@ -68,3 +121,25 @@ class BureauService:
         """
         # Para demo: siempre retorna None (primera consulta)
         return None
+
+
+@event.listens_for(Session, "after_flush")
+def _registrar_cambios_estado(session, flush_context):
+    ids = {
+        objeto.id for objeto in session.dirty
+        if isinstance(objeto, Cliente) and sa_inspect(objeto).attrs.estado.history.has_changes()
+    }
+    if ids:
+        session.info.setdefault(_CLAVE_SESION, set()).update(ids)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidar_cambios_estado(session):
+    # Cliente bloqueado/desbloqueado: su resultado cacheado se descarta
+    for cliente_id in session.info.pop(_CLAVE_SESION, ()):
+        bureau_cache.invalidar(cliente_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _descartar_cambios_estado(session):
+    session.info.pop(_CLAVE_SESION, None)
@@ -0,0 +1,33 @@
+from sqlalchemy.orm import Session, raiseload, selectinload
+from app.models.cliente import Cliente
+from app.models.consulta_bureau import ConsultaBureau
+
+class ClienteService:
+    
+    def obtener_resumen(self, db: Session, cliente_id: int) -> dict:
+        """
+        Cliente + sus préstamos + su última consulta de bureau.
+        Siempre 3 consultas sin importar cuántos préstamos tenga:
+        cliente, préstamos (selectinload) y última consulta (índice cliente_id, fecha).
+        raiseload evita que una relación no prevista dispare lazy loads (N+1).
+        """
+        cliente = (
+            db.query(Cliente)
+            .options(selectinload(Cliente.prestamos).raiseload("*"), raiseload("*"))
+            .filter(Cliente.id == cliente_id)
+            .first()
+        )
+        if not cliente:
+            raise ValueError("Cliente no encontrado")
+        
+        ultima_consulta = (
+            db.query(ConsultaBureau)
+            .filter(ConsultaBureau.cliente_id == cliente_id)
+            .order_by(ConsultaBureau.fecha_consulta.desc(), ConsultaBureau.id.desc())
+            .first()
+        )
+        return {
+            "cliente": cliente,
+            "prestamos": cliente.prestamos,
+            "ultima_consulta_bureau": ultima_consulta,
+        }
@@ -0,0 +1,174 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from sqlalchemy import inspect
+from sqlalchemy.orm import make_transient
+
+logger = logging.getLogger(__name__)
+
+
+class EscritorPorLotes:
+    """
+    Group commit de inserts: los requests encolan su objeto ORM y esperan el
+    acuse; un único hilo escritor junta hasta `max_lote` filas o `espera_ms`
+    milisegundos y las confirma en una sola transacción (un solo fsync).
+
+    La durabilidad no cambia: `guardar` retorna solo después del commit del
+    lote que contiene al objeto. Si el lote falla, cada fila se reintenta en
+    su propia transacción para que un registro inválido no arrastre al resto.
+    """
+
+    def __init__(self, session_factory, max_lote: int = 200, espera_ms: float = 5):
+        # session_factory debe crear sesiones con expire_on_commit=False
+        self.session_factory = session_factory
+        self.max_lote = max_lote
+        self.espera = espera_ms / 1000
+        self._cola = queue.Queue()
+        self._detener = threading.Event()
+        self._hilo = None
+        # Protege las métricas y `_aceptando` junto con el put: detener no
+        # puede colarse entre la verificación y el encolado de guardar
+        self._lock = threading.Lock()
+        self._aceptando = False
+        self._metricas = {"lotes": 0, "filas": 0, "lotes_fallidos": 0}
+
+    @property
+    def activo(self) -> bool:
+        return self._hilo is not None and self._hilo.is_alive()
+
+    def iniciar(self):
+        if self.activo:
+            return
+        self._detener.clear()
+        self._hilo = threading.Thread(target=self._bucle, name="escritor-lotes", daemon=True)
+        self._hilo.start()
+        with self._lock:
+            self._aceptando = True
+
+    def detener(self):
+        """Deja de aceptar objetos, drena la cola pendiente y termina el hilo escritor"""
+        with self._lock:
+            self._aceptando = False
+        self._detener.set()
+        if self._hilo is not None:
+            self._hilo.join()
+            self._hilo = None
+        # Si el hilo murió antes de drenar, lo pendiente se rechaza en vez de colgar al llamador
+        while True:
+            try:
+                _, futuro = self._cola.get_nowait()
+            except queue.Empty:
+                break
+            futuro.set_exception(RuntimeError("Escritor por lotes detenido"))
+
+    def guardar(self, objeto, timeout: float = 30):
+        """
+        Encola el objeto y bloquea hasta que su lote esté confirmado. Si el
+        acuse no llega en `timeout` segundos lanza TimeoutError (el objeto
+        puede confirmarse igual más tarde)
+        """
+        futuro = Future()
+        with self._lock:
+            if not (self._aceptando and self.activo):
+                raise RuntimeError("Escritor por lotes detenido")
+            self._cola.put((objeto, futuro))
+        return futuro.result(timeout)
+
+    def metricas(self) -> dict:
+        with self._lock:
+            return {**self._metricas, "en_cola": self._cola.qsize()}
+
+    def _bucle(self):
+        while not (self._detener.is_set() and self._cola.empty()):
+            try:
+                primero = self._cola.get(timeout=0.05)
+            except queue.Empty:
+                continue
+            lote = [primero]
+            limite = time.monotonic() + self.espera
+            while len(lote) < self.max_lote:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    break
+                try:
+                    lote.append(self._cola.get(timeout=restante))
+                except queue.Empty:
+                    break
+            self._escribir(lote)
+
+    def _escribir(self, lote):
+        db = self.session_factory()
+        claves = [_clave_primaria(objeto) for objeto, _ in lote]
+        try:
+            db.add_all([objeto for objeto, _ in lote])
+            db.commit()
+        except Exception:
+            logger.warning("Lote de %d filas fallido, se reintenta fila por fila", len(lote), exc_info=True)
+            db.rollback()
+            db.close()
+            with self._lock:
+                self._metricas["lotes_fallidos"] += 1
+            for (objeto, futuro), clave in zip(lote, claves):
+                _reiniciar(objeto, clave)
+                self._escribir_individual(objeto, futuro)
+            return
+        db.close()
+        with self._lock:
+            self._metricas["lotes"] += 1
+            self._metricas["filas"] += len(lote)
+        for objeto, futuro in lote:
+            futuro.set_result(objeto)
+
+    def _escribir_individual(self, objeto, futuro):
+        db = self.session_factory()
+        try:
+            db.add(objeto)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            futuro.set_exception(e)
+        else:
+            with self._lock:
+                self._metricas["filas"] += 1
+            futuro.set_result(objeto)
+        finally:
+            db.close()
+
+
+def _clave_primaria(objeto) -> dict:
+    mapper = inspect(objeto).mapper
+    return {mapper.get_property_by_column(c).key: getattr(objeto, mapper.get_property_by_column(c).key)
+            for c in mapper.primary_key}
+
+
+def _reiniciar(objeto, clave: dict):
+    """
+    Devuelve al estado transitorio un objeto del lote fallido: el flush
+    revertido le dejó la PK generada y su identidad, y reintentarlo así choca
+    con la fila que ocupe ese id. Se restaura la PK que traía al encolarse
+    """
+    make_transient(objeto)
+    for atributo, valor in clave.items():
+        setattr(objeto, atributo, valor)
+
+
+# Escritor del proceso para préstamos; se crea en el startup si
+# ESCRITURA_POR_LOTES está habilitado (ver app/main.py)
+escritor_prestamos = None
+
+
+def iniciar_escritor_prestamos(session_factory, max_lote: int, espera_ms: float) -> EscritorPorLotes:
+    global escritor_prestamos
+    if escritor_prestamos is None:
+        escritor_prestamos = EscritorPorLotes(session_factory, max_lote=max_lote, espera_ms=espera_ms)
+    escritor_prestamos.iniciar()
+    return escritor_prestamos
+
+
+def detener_escritor_prestamos():
+    global escritor_prestamos
+    if escritor_prestamos is not None:
+        escritor_prestamos.detener()
+        escritor_prestamos = None
@@ -0,0 +1,219 @@
+from types import SimpleNamespace
+
+from sqlalchemy import delete, event, func, select, update
+from sqlalchemy import inspect as sa_inspect
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from app.models.estadistica import EstadisticaCartera
+from app.models.prestamo import Prestamo, EstadoPrestamo
+from app.services.archivo_prestamos import meses_archivados, tabla_archivo
+from app.shards import es_sesion_shards, leer_todos, shard_de
+
+DIMENSION_ESTADO = "estado"
+DIMENSION_BANDA_SCORE = "banda_score"
+DIMENSION_PLAZO = "plazo"
+
+ANCHO_BANDA_SCORE = 50
+BANDA_SIN_HISTORIAL = "sin_historial"
+ESTADOS_APROBADOS = frozenset({EstadoPrestamo.APROBADO, EstadoPrestamo.DESEMBOLSADO})
+
+# Métricas acumulables, en el orden de los vectores delta
+_METRICAS = ("conteo", "suma_monto", "conteo_cuota", "suma_cuota", "aprobados")
+# Atributos de Prestamo que afectan los agregados, en el orden de `valores_prestamo`
+_ATRIBUTOS = ("estado", "score_decision", "plazo_meses", "monto_solicitado", "cuota_mensual")
+
+
+def banda_score(score) -> str:
+    """Bandas fijas de 50 puntos ("700-749"); no dependen de umbrales recargables"""
+    if score is None:
+        return BANDA_SIN_HISTORIAL
+    inicio = (int(score) // ANCHO_BANDA_SCORE) * ANCHO_BANDA_SCORE
+    return f"{inicio}-{inicio + ANCHO_BANDA_SCORE - 1}"
+
+
+def valores_prestamo(prestamo: Prestamo):
+    """(estado, score, plazo, monto, cuota) actuales de un préstamo"""
+    return tuple(getattr(prestamo, nombre) for nombre in _ATRIBUTOS)
+
+
+def _valores_anteriores(prestamo: Prestamo):
+    """Valores confirmados en la DB antes de los cambios pendientes del objeto"""
+    estado = sa_inspect(prestamo)
+    valores = []
+    for nombre in _ATRIBUTOS:
+        historial = estado.attrs[nombre].history
+        if historial.deleted:
+            valores.append(historial.deleted[0])
+        elif historial.unchanged:
+            valores.append(historial.unchanged[0])
+        else:
+            valores.append(getattr(prestamo, nombre))
+    return tuple(valores)
+
+
+def _acumular(deltas: dict, valores, signo: int):
+    estado, score, plazo, monto, cuota = valores
+    estado = EstadoPrestamo(estado) if estado is not None else EstadoPrestamo.SOLICITADO
+    vector = (
+        signo,
+        signo * (monto or 0.0),
+        signo * (cuota is not None),
+        signo * (cuota or 0.0),
+        signo * (estado in ESTADOS_APROBADOS),
+    )
+    for clave in ((DIMENSION_ESTADO, estado.value),
+                  (DIMENSION_BANDA_SCORE, banda_score(score)),
+                  (DIMENSION_PLAZO, str(plazo))):
+        actual = deltas.get(clave)
+        deltas[clave] = vector if actual is None else tuple(a + b for a, b in zip(actual, vector))
+
+
+def _filas(deltas: dict):
+    return [
+        {"dimension": dimension, "clave": clave, **dict(zip(_METRICAS, vector))}
+        for (dimension, clave), vector in deltas.items()
+        if any(vector)
+    ]
+
+
+def _upsert(conexion, filas):
+    """Suma los deltas a las filas existentes (o las crea) en una sola sentencia"""
+    if not filas:
+        return
+    tabla = EstadisticaCartera.__table__
+    dialectos = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+    insertar = dialectos.get(conexion.dialect.name)
+    if insertar is not None:
+        sentencia = insertar(tabla)
+        sentencia = sentencia.on_conflict_do_update(
+            index_elements=[tabla.c.dimension, tabla.c.clave],
+            set_={m: tabla.c[m] + sentencia.excluded[m] for m in _METRICAS},
+        )
+        conexion.execute(sentencia, filas)
+        return
+    # Otros motores: UPDATE y, si no existía la fila, INSERT
+    for fila in filas:
+        resultado = conexion.execute(
+            update(tabla)
+            .where(tabla.c.dimension == fila["dimension"], tabla.c.clave == fila["clave"])
+            .values({m: tabla.c[m] + fila[m] for m in _METRICAS})
+        )
+        if resultado.rowcount == 0:
+            conexion.execute(tabla.insert().values(**fila))
+
+
+def aplicar_transiciones(conexion, transiciones):
+    """
+    Aplica cambios de préstamos a los agregados.
+    `transiciones`: pares (antes, despues) de tuplas de `valores_prestamo`;
+    None en `antes` es un insert y None en `despues` un borrado.
+    Para escrituras masivas que no pasan por el ORM (se llama en su transacción).
+    """
+    deltas = {}
+    for antes, despues in transiciones:
+        if antes is not None:
+            _acumular(deltas, antes, -1)
+        if despues is not None:
+            _acumular(deltas, despues, 1)
+    _upsert(conexion, _filas(deltas))
+
+
+@event.listens_for(Session, "before_flush")
+def _mantener_agregados(session, flush_context, instances):
+    # before_flush: el historial de atributos todavía tiene los valores
+    # anteriores y los objetos borrados aún pueden leerse
+    transiciones = []
+    for objeto in session.new:
+        if isinstance(objeto, Prestamo):
+            transiciones.append((objeto, (None, valores_prestamo(objeto))))
+    for objeto in session.dirty:
+        if isinstance(objeto, Prestamo) and session.is_modified(objeto):
+            antes, despues = _valores_anteriores(objeto), valores_prestamo(objeto)
+            if antes != despues:
+                transiciones.append((objeto, (antes, despues)))
+    for objeto in session.deleted:
+        if isinstance(objeto, Prestamo):
+            transiciones.append((objeto, (_valores_anteriores(objeto), None)))
+    if not transiciones:
+        return
+    if not es_sesion_shards(session):
+        aplicar_transiciones(session.connection(), [transicion for _, transicion in transiciones])
+        return
+    # Con sharding cada shard tiene sus propios agregados, en la transacción de sus préstamos
+    por_shard = {}
+    for objeto, transicion in transiciones:
+        por_shard.setdefault(shard_de(session, objeto), []).append(transicion)
+    for shard, grupo in por_shard.items():
+        aplicar_transiciones(session.connection(bind_arguments={"shard_id": shard}), grupo)
+
+
+class EstadisticasService:
+
+    def resumen(self, db: Session) -> dict:
+        """
+        Totales de cartera leídos de la tabla de agregados (sin GROUP BY sobre
+        prestamos). Con sharding se leen todos los shards en paralelo y se suman.
+        """
+        filas = leer_todos(db, select(EstadisticaCartera).where(EstadisticaCartera.conteo > 0))
+        totales = {}
+        for fila in filas:
+            vector = tuple(getattr(fila, metrica) for metrica in _METRICAS)
+            actual = totales.get((fila.dimension, fila.clave))
+            totales[(fila.dimension, fila.clave)] = (
+                vector if actual is None else tuple(a + b for a, b in zip(actual, vector))
+            )
+        por_dimension = {DIMENSION_ESTADO: [], DIMENSION_BANDA_SCORE: [], DIMENSION_PLAZO: []}
+        for (dimension, clave), vector in totales.items():
+            por_dimension.setdefault(dimension, []).append(
+                SimpleNamespace(clave=clave, **dict(zip(_METRICAS, vector)))
+            )
+
+        orden_estados = {e.value: i for i, e in enumerate(EstadoPrestamo)}
+        por_estado = sorted(por_dimension[DIMENSION_ESTADO], key=lambda f: orden_estados.get(f.clave, len(orden_estados)))
+        por_banda = sorted(
+            por_dimension[DIMENSION_BANDA_SCORE],
+            key=lambda f: -1 if f.clave == BANDA_SIN_HISTORIAL else int(f.clave.split("-")[0]),
+        )
+        por_plazo = sorted(por_dimension[DIMENSION_PLAZO], key=lambda f: int(f.clave))
+
+        return {
+            "total_prestamos": sum(f.conteo for f in por_estado),
+            "por_estado": [
+                {"estado": f.clave, "conteo": f.conteo, "suma_monto": round(f.suma_monto, 2)}
+                for f in por_estado
+            ],
+            "por_banda_score": [
+                {"banda": f.clave, "conteo": f.conteo, "aprobados": f.aprobados,
+                 "tasa_aprobacion": round(f.aprobados / f.conteo, 4)}
+                for f in por_banda
+            ],
+            "por_plazo": [
+                {"plazo_meses": int(f.clave), "conteo": f.conteo,
+                 "cuota_promedio": round(f.suma_cuota / f.conteo_cuota, 2) if f.conteo_cuota else None}
+                for f in por_plazo
+            ],
+        }
+
+    def reconstruir(self, db: Session, tamano_lote: int = 5000, progreso=None) -> int:
+        """
+        Recalcula todos los agregados en una sola pasada en streaming sobre
+        prestamos y sus tablas de archivo (yield_per: memoria acotada) y los
+        reemplaza en una transacción.
+        `progreso(procesados, total)` se llama después de cada lote; si lanza,
+        no se escribe nada. Retorna la cantidad de préstamos procesados.
+        """
+        # Los préstamos archivados siguen siendo parte de la cartera
+        tablas = [Prestamo.__table__, *(tabla_archivo(mes) for mes in meses_archivados(db))]
+        total = sum(db.scalar(select(func.count()).select_from(t)) for t in tablas) if progreso else None
+        deltas, procesados = {}, 0
+        for tabla in tablas:
+            consulta = select(*(tabla.c[nombre] for nombre in _ATRIBUTOS)).execution_options(yield_per=tamano_lote)
+            for fila in db.execute(consulta):
+                _acumular(deltas, tuple(fila), 1)
+                procesados += 1
+                if progreso and procesados % tamano_lote == 0:
+                    progreso(procesados, total)
+        db.execute(delete(EstadisticaCartera))
+        _upsert(db.connection(), _filas(deltas))
+        db.commit()
+        return procesados
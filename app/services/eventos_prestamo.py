@@ -0,0 +1,72 @@
+import asyncio
+import threading
+
+
+class Suscripcion:
+    """
+    Espera de un cliente por cambios de un préstamo.
+    Es un asyncio.Event: varias notificaciones seguidas se juntan en una sola,
+    el suscriptor relee el estado actual al despertar.
+    """
+
+    __slots__ = ("prestamo_id", "loop", "evento")
+
+    def __init__(self, prestamo_id: int, loop):
+        self.prestamo_id = prestamo_id
+        self.loop = loop
+        self.evento = asyncio.Event()
+
+    async def esperar(self, timeout: float) -> bool:
+        """True si hubo un cambio, False si pasó `timeout` sin cambios"""
+        try:
+            await asyncio.wait_for(self.evento.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        self.evento.clear()
+        return True
+
+
+class PubSubPrestamos:
+    """
+    Pub/sub en memoria de cambios de préstamos, por prestamo_id.
+
+    Se publica desde los hilos que escriben (commit del ORM, UPDATE de core);
+    los suscriptores viven en el event loop y se despiertan con
+    `call_soon_threadsafe`. Cada conexión esperando cuesta un Event y una
+    entrada en un set: no ocupa hilos ni conexiones a la DB.
+    """
+
+    def __init__(self):
+        self._suscripciones = {}
+        self._lock = threading.Lock()
+
+    def suscribir(self, prestamo_id: int) -> Suscripcion:
+        suscripcion = Suscripcion(prestamo_id, asyncio.get_running_loop())
+        with self._lock:
+            self._suscripciones.setdefault(prestamo_id, set()).add(suscripcion)
+        return suscripcion
+
+    def desuscribir(self, suscripcion: Suscripcion):
+        with self._lock:
+            suscritos = self._suscripciones.get(suscripcion.prestamo_id)
+            if suscritos is not None:
+                suscritos.discard(suscripcion)
+                if not suscritos:
+                    del self._suscripciones[suscripcion.prestamo_id]
+
+    def publicar(self, prestamo_ids):
+        with self._lock:
+            despertar = [s for i in prestamo_ids for s in self._suscripciones.get(i, ())]
+        for suscripcion in despertar:
+            try:
+                suscripcion.loop.call_soon_threadsafe(suscripcion.evento.set)
+            except RuntimeError:
+                # Loop cerrado: la conexión ya terminó
+                pass
+
+    def conexiones(self) -> int:
+        with self._lock:
+            return sum(len(suscritos) for suscritos in self._suscripciones.values())
+
+
+pubsub_prestamos = PubSubPrestamos()
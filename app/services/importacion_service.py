@@ -0,0 +1,249 @@
+import csv
+import json
+from datetime import datetime
+from typing import Optional
+
+from pydantic import BaseModel, Field, ValidationError, field_validator
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from app.models.cliente import Cliente, EstadoCliente
+from app.shards import es_sesion_shards
+
+FORMATO_CSV = "csv"
+FORMATO_NDJSON = "ndjson"
+
+# Columnas que se actualizan cuando la identificación ya existe
+_COLUMNAS_UPSERT = ("nombre", "email", "score_cifin", "ingresos_mensuales", "estado")
+
+
+class ClienteImportacion(BaseModel):
+    """Fila de un archivo de onboarding (columnas extra se ignoran)"""
+    nombre: str = Field(..., min_length=1)
+    identificacion: str = Field(..., min_length=1)
+    email: str = Field(..., pattern=r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+    score_cifin: Optional[int] = Field(None, ge=0, le=900)
+    ingresos_mensuales: Optional[float] = Field(None, ge=0)
+    estado: EstadoCliente = EstadoCliente.ACTIVO
+
+    @field_validator("nombre", "identificacion", "email")
+    @classmethod
+    def _sin_espacios(cls, valor: str) -> str:
+        return valor.strip()
+
+
+def _primer_error(error: ValidationError) -> str:
+    detalle = error.errors()[0]
+    campo = ".".join(str(parte) for parte in detalle["loc"]) or "fila"
+    return f"{campo}: {detalle['msg']}"
+
+
+async def lineas(flujo, max_bytes: int):
+    """
+    Parte un flujo de bytes en líneas (bytes, sin el fin de línea) sin
+    bufferizar el cuerpo completo. Una línea de más de `max_bytes` lanza
+    ValueError: un body sin saltos de línea no crece sin límite en memoria.
+    """
+    resto = b""
+    async for chunk in flujo:
+        resto += chunk
+        *completas, resto = resto.split(b"\n")
+        for linea in completas:
+            if len(linea) > max_bytes:
+                raise ValueError(f"Línea de más de {max_bytes} bytes")
+            yield linea.rstrip(b"\r")
+        if len(resto) > max_bytes:
+            raise ValueError(f"Línea de más de {max_bytes} bytes")
+    if resto.strip():
+        yield resto.rstrip(b"\r")
+
+
+class ImportadorClientes:
+    """
+    Importación masiva de clientes en streaming.
+
+    Las líneas se leen del body a medida que llegan; cada `tamano_lote` filas
+    se validan con Pydantic y se escriben con un `insert()` de core
+    (executemany) con upsert sobre `identificacion`, en un hilo del
+    threadpool para no bloquear el event loop. Un lote se confirma en su
+    propia transacción; si el lote falla (ej. email de otro cliente), sus filas
+    se reintentan una por una con SAVEPOINT para reportar el error por fila.
+
+    Con sharding el id decide el shard: los clientes existentes conservan el
+    suyo, los nuevos reciben ids reservados antes del insert y cada lote se
+    escribe como un sub-lote por shard. La unicidad de identificación y email
+    solo la garantiza cada shard.
+    """
+
+    def __init__(self, db: Session, tamano_lote: int = 5000, max_errores: int = 1000,
+                 max_bytes_fila: int = 1_048_576):
+        self.db = db
+        self.tamano_lote = tamano_lote
+        self.max_errores = max_errores
+        self.max_bytes_fila = max_bytes_fila
+        self.filas = 0
+        self.importados = 0
+        self.lotes = 0
+        self.total_errores = 0
+        self.errores = []
+
+    async def importar(self, flujo, formato: str = None) -> dict:
+        pendientes = []
+        encabezado = None
+        # CSV: registro con un campo entre comillas todavía abierto (saltos de
+        # línea dentro del campo); se completa con las líneas siguientes
+        abierto = None
+        async for crudo in lineas(flujo, self.max_bytes_fila):
+            try:
+                linea = crudo.decode("utf-8-sig")
+            except UnicodeDecodeError:
+                self.filas += 1
+                self._registrar_error(self.filas, "fila inválida: no está codificada en UTF-8")
+                abierto = None
+                continue
+            if abierto is not None:
+                linea, abierto = f"{abierto}\n{linea}", None
+            elif not linea.strip():
+                continue
+            if formato is None:
+                formato = FORMATO_NDJSON if linea.lstrip().startswith("{") else FORMATO_CSV
+            if formato == FORMATO_CSV:
+                # Comillas impares: el registro sigue en la línea siguiente
+                if linea.count('"') % 2:
+                    if len(linea) > self.max_bytes_fila:
+                        raise ValueError(f"Fila de más de {self.max_bytes_fila} bytes")
+                    abierto = linea
+                    continue
+                if encabezado is None:
+                    encabezado = [columna.strip() for columna in next(csv.reader([linea]))]
+                    continue
+            self.filas += 1
+            pendientes.append((self.filas, linea))
+            if len(pendientes) >= self.tamano_lote:
+                await run_in_threadpool(self._procesar_lote, pendientes, formato, encabezado)
+                pendientes = []
+        if abierto is not None:
+            # Comillas sin cerrar al final del archivo: el parser decide
+            self.filas += 1
+            pendientes.append((self.filas, abierto))
+        if pendientes:
+            await run_in_threadpool(self._procesar_lote, pendientes, formato, encabezado)
+        return self.reporte()
+
+    def reporte(self) -> dict:
+        return {
+            "filas": self.filas,
+            "importados": self.importados,
+            "errores": self.total_errores,
+            "lotes": self.lotes,
+            "detalle_errores": self.errores,
+            "errores_truncados": self.total_errores > len(self.errores),
+        }
+
+    def _registrar_error(self, fila: int, mensaje: str):
+        self.total_errores += 1
+        if len(self.errores) < self.max_errores:
+            self.errores.append({"fila": fila, "error": mensaje})
+
+    def _parsear(self, linea: str, formato: str, encabezado, lector_csv):
+        if formato == FORMATO_NDJSON:
+            datos = json.loads(linea)
+            if not isinstance(datos, dict):
+                raise ValueError("se esperaba un objeto JSON")
+            return datos
+        # Cada registro del lote está completo: el lector da una fila por registro
+        valores = next(lector_csv)
+        if len(valores) != len(encabezado):
+            raise ValueError(f"se esperaban {len(encabezado)} columnas y llegaron {len(valores)}")
+        # Celda vacía = sin dato (ej. score_cifin sin historial)
+        return {columna: (valor if valor.strip() else None) for columna, valor in zip(encabezado, valores)}
+
+    def _procesar_lote(self, pendientes, formato: str, encabezado):
+        # Última ocurrencia de cada identificación dentro del lote (un upsert
+        # multi-fila no puede tocar la misma fila dos veces en PostgreSQL); las
+        # anteriores se reportan como error para que filas = importados + errores
+        validas = {}
+        lector_csv = csv.reader(linea for _, linea in pendientes) if formato == FORMATO_CSV else None
+        for fila, linea in pendientes:
+            try:
+                cliente = ClienteImportacion.model_validate(self._parsear(linea, formato, encabezado, lector_csv))
+            except ValidationError as e:
+                self._registrar_error(fila, _primer_error(e))
+                continue
+            except (ValueError, csv.Error) as e:
+                self._registrar_error(fila, f"fila inválida: {e}")
+                continue
+            anterior = validas.pop(cliente.identificacion, None)
+            if anterior is not None:
+                self._registrar_error(anterior[0], f"identificación duplicada en el archivo (la reemplaza la fila {fila})")
+            validas[cliente.identificacion] = (fila, cliente.model_dump())
+        if validas:
+            self._escribir(list(validas.values()))
+        self.lotes += 1
+
+    def _sentencia_upsert(self):
+        tabla = Cliente.__table__
+        dialectos = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+        bind = self.db.get_bind(shard_id=0) if es_sesion_shards(self.db) else self.db.get_bind()
+        insertar = dialectos.get(bind.dialect.name)
+        if insertar is None:
+            raise RuntimeError("Importación masiva soportada solo en SQLite y PostgreSQL")
+        sentencia = insertar(tabla)
+        set_ = {columna: sentencia.excluded[columna] for columna in _COLUMNAS_UPSERT}
+        # onupdate no aplica a ON CONFLICT: el snapshot de clientes necesita la marca
+        set_["fecha_actualizacion"] = datetime.utcnow()
+        return sentencia.on_conflict_do_update(index_elements=[tabla.c.identificacion], set_=set_)
+
+    def _por_shard(self, filas):
+        """Pares (bind_arguments, filas); sin sharding, un único grupo"""
+        if not es_sesion_shards(self.db):
+            return [({}, filas)]
+        cluster = self.db.cluster
+        identificaciones = [datos["identificacion"] for _, datos in filas]
+        existentes = dict(
+            par
+            for parte in cluster.en_paralelo(lambda db: db.execute(
+                select(Cliente.identificacion, Cliente.id).where(Cliente.identificacion.in_(identificaciones))
+            ).all())
+            for par in parte
+        )
+        # Un id por identificación nueva: sus filas repetidas van al mismo
+        # shard y el upsert las une, como sin sharding
+        nuevas = list(dict.fromkeys(i for i in identificaciones if i not in existentes))
+        if nuevas:
+            existentes.update(zip(nuevas, cluster.reservar_ids_clientes(len(nuevas))))
+        grupos = {}
+        for fila, datos in filas:
+            cliente_id = existentes[datos["identificacion"]]
+            grupos.setdefault(cluster.shard_de_cliente(cliente_id), []).append((fila, {**datos, "id": cliente_id}))
+        return [({"shard_id": shard}, grupo) for shard, grupo in sorted(grupos.items())]
+
+    def _escribir(self, filas):
+        sentencia = self._sentencia_upsert()
+        for bind_arguments, grupo in self._por_shard(filas):
+            self._escribir_grupo(sentencia, grupo, bind_arguments)
+
+    def _escribir_grupo(self, sentencia, filas, bind_arguments: dict):
+        try:
+            self.db.execute(sentencia, [datos for _, datos in filas], bind_arguments=bind_arguments)
+            self.db.commit()
+            self.importados += len(filas)
+            return
+        except IntegrityError:
+            self.db.rollback()
+
+        for fila, datos in filas:
+            try:
+                with self.db.begin_nested():
+                    self.db.execute(sentencia, [datos], bind_arguments=bind_arguments)
+            except IntegrityError as e:
+                mensaje = str(e.orig).lower()
+                if "email" in mensaje:
+                    self._registrar_error(fila, "email ya registrado para otro cliente")
+                else:
+                    self._registrar_error(fila, f"conflicto de integridad: {e.orig}")
+            else:
+                self.importados += 1
+        self.db.commit()
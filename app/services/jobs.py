@@ -0,0 +1,351 @@
+import inspect
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from sqlalchemy import or_, select, update
+from app.config import get_settings
+from app.models.job import Job, EstadoJob
+
+logger = logging.getLogger(__name__)
+
+# Tipos de job registrados en el proceso: nombre -> función(contexto, **parametros)
+TIPOS_JOB = {}
+
+
+def tipo_job(nombre: str):
+    """
+    Registra una función como tipo de job.
+    La función recibe un ContextoJob y los parámetros del job como kwargs,
+    y retorna un dict JSON-serializable con el resultado.
+    """
+    def registrar(funcion):
+        TIPOS_JOB[nombre] = funcion
+        return funcion
+    return registrar
+
+
+class JobCancelado(Exception):
+    """Lanzada por ContextoJob.verificar_cancelacion cuando se pidió cancelar"""
+
+
+class ContextoJob:
+    """Lo que ve una función de job: sesiones, progreso y cancelación cooperativa"""
+
+    # Escrituras de progreso a la DB como máximo cada este intervalo
+    INTERVALO_PROGRESO_SEGUNDOS = 0.5
+    # Lecturas de la marca de cancelación en la DB como máximo cada este
+    # intervalo (la pudo escribir otro proceso)
+    INTERVALO_CANCELACION_SEGUNDOS = 1.0
+
+    def __init__(self, gestor, job_id: str):
+        self.gestor = gestor
+        self.job_id = job_id
+        self.session_factory = gestor.session_factory
+        self._ultimo_reporte = 0.0
+        self._ultima_lectura = time.monotonic()
+
+    def reportar(self, progreso: float, mensaje: str = None):
+        ahora = time.monotonic()
+        if progreso < 1 and ahora - self._ultimo_reporte < self.INTERVALO_PROGRESO_SEGUNDOS:
+            return
+        self._ultimo_reporte = ahora
+        self.gestor._actualizar(self.job_id, progreso=min(max(progreso, 0.0), 1.0), mensaje=mensaje)
+
+    def cancelado(self) -> bool:
+        # Camino rápido: cancelado en este proceso o apagado en curso
+        if self.gestor._cancelacion_pedida(self.job_id):
+            return True
+        ahora = time.monotonic()
+        if ahora - self._ultima_lectura < self.INTERVALO_CANCELACION_SEGUNDOS:
+            return False
+        self._ultima_lectura = ahora
+        return self.gestor._cancelacion_en_db(self.job_id)
+
+    def verificar_cancelacion(self):
+        """Llamar entre unidades de trabajo: corta el job si se pidió cancelarlo"""
+        if self.cancelado():
+            raise JobCancelado()
+
+
+class GestorJobs:
+    """
+    Jobs en segundo plano dentro del proceso, persistidos en la tabla `jobs`.
+
+    - `enviar` guarda el job como PENDIENTE y lo encola: el request retorna
+      el id de inmediato.
+    - Un pool de hilos ejecuta los jobs; las funciones reportan progreso y
+      revisan la cancelación entre unidades de trabajo (cancelación cooperativa).
+    - Cada job EJECUTANDO guarda el `worker_id` del proceso que lo corre y un
+      `latido` que un hilo del gestor renueva. Una cancelación pedida en otro
+      proceso llega por la columna `cancelacion_solicitada`.
+    - Al arrancar, los PENDIENTES de una ejecución anterior se vuelven a encolar
+      y los EJECUTANDO de este worker o sin latido reciente se marcan FALLIDO
+      (no se reintentan: el trabajo pudo quedar a medias y no todo job es
+      idempotente). Los de otro proceso vivo no se tocan.
+    """
+
+    def __init__(self, session_factory, max_workers: int = 2, tipos: dict = None, worker_id: str = None,
+                 latido_segundos: float = 10, latido_vencido_segundos: float = 60):
+        self.session_factory = session_factory
+        self.max_workers = max_workers
+        self.tipos = TIPOS_JOB if tipos is None else tipos
+        # Estable entre reinicios del mismo proceso en el mismo host (ej. pid 1
+        # de un contenedor): sus jobs interrumpidos se recuperan sin esperar
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.latido_segundos = latido_segundos
+        self.latido_vencido = timedelta(seconds=latido_vencido_segundos)
+        self._executor = None
+        self._hilo_latido = None
+        self._lock = threading.Lock()
+        # Ids tomados por un hilo del pool; solo ellos pueden tener una
+        # cancelación pendiente en memoria (ambos conjuntos bajo self._lock)
+        self._en_ejecucion = set()
+        self._cancelaciones = set()
+        self._detenido = threading.Event()
+
+    @property
+    def activo(self) -> bool:
+        return self._executor is not None
+
+    def iniciar(self):
+        with self._lock:
+            if self._executor is not None:
+                return
+            self._detenido.clear()
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="jobs")
+            self._hilo_latido = threading.Thread(target=self._latir, name="jobs-latido", daemon=True)
+            self._hilo_latido.start()
+        self._recuperar()
+
+    def detener(self):
+        """
+        Los jobs en ejecución se cortan en su próximo punto de cancelación
+        (quedan FALLIDO); los pendientes siguen PENDIENTE en la tabla y se
+        retoman en el próximo arranque.
+        """
+        with self._lock:
+            executor, self._executor = self._executor, None
+            hilo, self._hilo_latido = self._hilo_latido, None
+        if executor is None:
+            return
+        self._detenido.set()
+        executor.shutdown(wait=True, cancel_futures=True)
+        hilo.join()
+
+    def enviar(self, tipo: str, parametros: dict = None) -> Job:
+        parametros = parametros or {}
+        funcion = self.tipos.get(tipo)
+        if funcion is None:
+            raise ValueError(f"Tipo de job desconocido: {tipo}")
+        try:
+            inspect.signature(funcion).bind(None, **parametros)
+            parametros_json = json.dumps(parametros)
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"Parámetros inválidos para {tipo}: {e}") from e
+        if not self.activo:
+            raise RuntimeError("Gestor de jobs detenido")
+
+        job = Job(id=uuid.uuid4().hex, tipo=tipo, estado=EstadoJob.PENDIENTE, parametros=parametros_json)
+        with self.session_factory() as db:
+            db.add(job)
+            db.commit()
+            db.refresh(job)
+            db.expunge(job)
+        self._encolar(job.id)
+        return job
+
+    def obtener(self, job_id: str) -> Job:
+        with self.session_factory() as db:
+            job = db.get(Job, job_id)
+            if job is None:
+                raise ValueError("Job no encontrado")
+            db.expunge(job)
+            return job
+
+    def listar(self, estado: EstadoJob = None, limite: int = 50):
+        with self.session_factory() as db:
+            consulta = db.query(Job)
+            if estado is not None:
+                consulta = consulta.filter(Job.estado == estado)
+            jobs = consulta.order_by(Job.fecha_creacion.desc()).limit(limite).all()
+            db.expunge_all()
+            return jobs
+
+    def cancelar(self, job_id: str) -> Job:
+        """PENDIENTE pasa directo a CANCELADO; EJECUTANDO se corta en su próximo punto de control"""
+        with self.session_factory() as db:
+            resultado = db.execute(
+                update(Job)
+                .where(Job.id == job_id, Job.estado == EstadoJob.PENDIENTE)
+                .values(estado=EstadoJob.CANCELADO, cancelacion_solicitada=True, fecha_fin=datetime.utcnow())
+            )
+            ejecutando = False
+            if resultado.rowcount == 0:
+                ejecutando = db.execute(
+                    update(Job)
+                    .where(Job.id == job_id, Job.estado == EstadoJob.EJECUTANDO)
+                    .values(cancelacion_solicitada=True)
+                ).rowcount > 0
+            db.commit()
+        if ejecutando:
+            with self._lock:
+                # Si el hilo ya terminó, no queda nadie que la descarte
+                if job_id in self._en_ejecucion:
+                    self._cancelaciones.add(job_id)
+        return self.obtener(job_id)
+
+    def _encolar(self, job_id: str):
+        with self._lock:
+            if self._executor is None:
+                return
+            self._executor.submit(self._ejecutar, job_id)
+
+    def _recuperar(self):
+        self._fallar_huerfanos(incluir_propios=True)
+        with self.session_factory() as db:
+            pendientes = [
+                job_id for (job_id,) in
+                db.query(Job.id).filter(Job.estado == EstadoJob.PENDIENTE).order_by(Job.fecha_creacion)
+            ]
+        for job_id in pendientes:
+            self._encolar(job_id)
+
+    def _fallar_huerfanos(self, incluir_propios: bool = False):
+        """
+        EJECUTANDO sin latido reciente (su proceso murió) pasan a FALLIDO; con
+        `incluir_propios`, también los de este worker_id (al arrancar, ningún
+        hilo de este proceso los está corriendo)
+        """
+        huerfano = or_(Job.worker_id.is_(None), Job.latido.is_(None),
+                       Job.latido < datetime.utcnow() - self.latido_vencido)
+        if incluir_propios:
+            huerfano = or_(huerfano, Job.worker_id == self.worker_id)
+        with self.session_factory() as db:
+            fallidos = db.execute(
+                update(Job)
+                .where(Job.estado == EstadoJob.EJECUTANDO, huerfano)
+                .values(estado=EstadoJob.FALLIDO, error="Interrumpido: el proceso se reinició",
+                        fecha_fin=datetime.utcnow())
+            ).rowcount
+            db.commit()
+        if fallidos:
+            logger.warning("%d jobs interrumpidos marcados como fallidos", fallidos)
+
+    def _latir(self):
+        """Renueva el latido de los jobs de este proceso y falla los huérfanos de otros"""
+        while not self._detenido.wait(self.latido_segundos):
+            with self._lock:
+                ids = list(self._en_ejecucion)
+            try:
+                if ids:
+                    with self.session_factory() as db:
+                        db.execute(
+                            update(Job)
+                            .where(Job.id.in_(ids), Job.worker_id == self.worker_id,
+                                   Job.estado == EstadoJob.EJECUTANDO)
+                            .values(latido=datetime.utcnow())
+                        )
+                        db.commit()
+                self._fallar_huerfanos()
+            except Exception:
+                logger.exception("Error al renovar el latido de los jobs")
+
+    def _cancelacion_en_db(self, job_id: str) -> bool:
+        """Cancelación pedida (desde cualquier proceso) o el job ya no es de este worker"""
+        with self.session_factory() as db:
+            fila = db.execute(
+                select(Job.estado, Job.worker_id, Job.cancelacion_solicitada).where(Job.id == job_id)
+            ).one_or_none()
+        if fila is None:
+            return True
+        estado, worker_id, cancelacion = fila
+        return cancelacion or estado != EstadoJob.EJECUTANDO or worker_id != self.worker_id
+
+    def _cancelacion_pedida(self, job_id: str) -> bool:
+        if self._detenido.is_set():
+            return True
+        with self._lock:
+            return job_id in self._cancelaciones
+
+    def _actualizar(self, job_id: str, **valores) -> bool:
+        """Solo mientras el job siga EJECUTANDO en este worker; False si ya no"""
+        with self.session_factory() as db:
+            actualizado = db.execute(
+                update(Job)
+                .where(Job.id == job_id, Job.estado == EstadoJob.EJECUTANDO, Job.worker_id == self.worker_id)
+                .values(**valores)
+            ).rowcount
+            db.commit()
+        return actualizado > 0
+
+    def _ejecutar(self, job_id: str):
+        # Registrado antes de pasar a EJECUTANDO: un cancelar que vea ese
+        # estado siempre encuentra el id aquí
+        with self._lock:
+            self._en_ejecucion.add(job_id)
+        try:
+            self._correr(job_id)
+        finally:
+            with self._lock:
+                self._en_ejecucion.discard(job_id)
+                self._cancelaciones.discard(job_id)
+
+    def _correr(self, job_id: str):
+        with self.session_factory() as db:
+            # Solo un PENDIENTE arranca (pudo cancelarse mientras esperaba)
+            arrancado = db.execute(
+                update(Job)
+                .where(Job.id == job_id, Job.estado == EstadoJob.PENDIENTE)
+                .values(estado=EstadoJob.EJECUTANDO, fecha_inicio=datetime.utcnow(),
+                        worker_id=self.worker_id, latido=datetime.utcnow())
+            ).rowcount
+            db.commit()
+            if not arrancado:
+                return
+            job = db.get(Job, job_id)
+            tipo, parametros = job.tipo, json.loads(job.parametros)
+
+        funcion = self.tipos.get(tipo)
+        try:
+            if funcion is None:
+                raise ValueError(f"Tipo de job desconocido: {tipo}")
+            resultado = funcion(ContextoJob(self, job_id), **parametros)
+        except JobCancelado:
+            if self._detenido.is_set():
+                self._finalizar(job_id, EstadoJob.FALLIDO, error="Interrumpido por apagado del proceso")
+            else:
+                self._finalizar(job_id, EstadoJob.CANCELADO)
+        except Exception as e:
+            logger.exception("Job %s (%s) fallido", job_id, tipo)
+            self._finalizar(job_id, EstadoJob.FALLIDO, error=f"{type(e).__name__}: {e}")
+        else:
+            self._finalizar(job_id, EstadoJob.COMPLETADO, progreso=1.0,
+                            resultado=json.dumps(resultado, default=str))
+
+    def _finalizar(self, job_id: str, estado: EstadoJob, **valores):
+        if not self._actualizar(job_id, estado=estado, fecha_fin=datetime.utcnow(), **valores):
+            # Otro proceso lo dio por interrumpido: su estado no se pisa
+            logger.warning("Job %s ya no pertenece a este worker; se descarta el estado %s", job_id, estado.value)
+
+
+def _crear_gestor_default():
+    from app.database import SessionLocal
+    settings = get_settings()
+    return GestorJobs(SessionLocal, max_workers=settings.JOBS_MAX_WORKERS,
+                      latido_segundos=settings.JOBS_LATIDO_SEGUNDOS,
+                      latido_vencido_segundos=settings.JOBS_LATIDO_VENCIDO_SEGUNDOS)
+
+
+# Gestor del proceso; se inicia en el startup (ver app/main.py)
+gestor_jobs = _crear_gestor_default()
+
+
+def get_gestor_jobs() -> GestorJobs:
+    """Dependency de FastAPI (los tests la reemplazan con un gestor sobre su DB)"""
+    return gestor_jobs
@@ -0,0 +1,119 @@
+"""
+Tipos de job de la cartera (ver app/services/jobs.py).
+Se registran al importar este módulo; app/main.py lo importa al arrancar.
+Con sharding, cada job recorre los shards uno por uno y combina los reportes.
+"""
+from app.config import get_settings
+from app.services.archivo_prestamos import ArchivadorPrestamos
+from app.services.estadisticas_service import EstadisticasService
+from app.services.jobs import tipo_job
+from app.services.motor_reglas import motor_para
+from app.services.rescoring_service import RescoringCartera
+from app.services.snapshot_clientes import snapshot_clientes
+from app.shards import fabricas_de_sesion
+
+
+def _combinar(reportes: list) -> dict:
+    """Suma contadores (y dicts de contadores), concatena listas y hace OR de banderas"""
+    combinado = dict(reportes[0])
+    for reporte in reportes[1:]:
+        for clave, valor in reporte.items():
+            actual = combinado.get(clave)
+            if isinstance(valor, bool):
+                combinado[clave] = bool(actual) or valor
+            elif isinstance(valor, (int, float)):
+                combinado[clave] = (actual or 0) + valor
+            elif isinstance(valor, list):
+                combinado[clave] = (actual or []) + valor
+            elif isinstance(valor, dict):
+                combinado[clave] = _combinar([actual or {}, valor])
+    return combinado
+
+
+def _por_shard(contexto, ejecutar) -> list:
+    """`ejecutar(db, reportar)` en cada shard (uno solo sin sharding); progreso repartido entre shards"""
+    fabricas = fabricas_de_sesion(contexto.session_factory)
+    reportes = []
+    for indice, fabrica in enumerate(fabricas):
+        def reportar(fraccion, mensaje, indice=indice):
+            if len(fabricas) > 1:
+                mensaje = f"shard {indice + 1}/{len(fabricas)}: {mensaje}"
+            contexto.reportar((indice + fraccion) / len(fabricas), mensaje)
+
+        with fabrica() as db:
+            reportes.append(ejecutar(db, reportar))
+    return reportes
+
+
+@tipo_job("reconstruir_estadisticas")
+def reconstruir_estadisticas(contexto, tamano_lote: int = 5000) -> dict:
+    """Versión en segundo plano de scripts/reconstruir_estadisticas.py"""
+    def ejecutar(db, reportar):
+        def progreso(procesados, total):
+            contexto.verificar_cancelacion()
+            reportar(procesados / total if total else 0.0, f"{procesados}/{total} préstamos")
+
+        return EstadisticasService().reconstruir(db, tamano_lote=int(tamano_lote), progreso=progreso)
+
+    return {"prestamos_procesados": sum(_por_shard(contexto, ejecutar))}
+
+
+@tipo_job("rescoring_cartera")
+def rescoring_cartera(contexto, dry_run: bool = False, tamano_lote: int = None, procesos: int = None,
+                      usar_snapshot: bool = True) -> dict:
+    """
+    Re-evalúa los préstamos abiertos con las reglas y scores vigentes.
+    Con `usar_snapshot` los datos del cliente salen del snapshot columnar
+    (refrescado antes de empezar) en vez de un JOIN por lote. Con sharding
+    siempre es JOIN: el snapshot es uno solo por proceso.
+    """
+    reglas = get_settings()
+    fabricas = fabricas_de_sesion(contexto.session_factory)
+    usar_snapshot = usar_snapshot and len(fabricas) == 1
+
+    def ejecutar(db, reportar):
+        def progreso(evaluados, total):
+            contexto.verificar_cancelacion()
+            reportar(evaluados / total if total else 0.0, f"{evaluados}/{total} préstamos")
+
+        snapshot = None
+        if usar_snapshot:
+            snapshot_clientes.refrescar(db)
+            db.commit()
+            snapshot = snapshot_clientes.actual
+        rescoring = RescoringCartera(
+            db,
+            motor_para(reglas),
+            tamano_lote=int(tamano_lote or reglas.RESCORING_LOTE_FILAS),
+            procesos=int(procesos if procesos is not None else reglas.RESCORING_PROCESOS),
+            max_diferencias=reglas.RESCORING_MAX_DIFERENCIAS_REPORTADAS,
+            snapshot=snapshot,
+        )
+        return rescoring.ejecutar(dry_run=bool(dry_run), progreso=progreso)
+
+    reporte = _combinar(_por_shard(contexto, ejecutar))
+    reporte["diferencias"] = reporte["diferencias"][:reglas.RESCORING_MAX_DIFERENCIAS_REPORTADAS]
+    reporte["diferencias_truncadas"] = reporte["cambios"] > len(reporte["diferencias"])
+    return reporte
+
+
+@tipo_job("archivar_prestamos")
+def archivar_prestamos(contexto, edad_dias: float = None, tamano_lote: int = None) -> dict:
+    """Mueve préstamos cerrados y antiguos a las tablas de archivo mensuales"""
+    reglas = get_settings()
+
+    def ejecutar(db, reportar):
+        def progreso(archivados, total):
+            contexto.verificar_cancelacion()
+            reportar(archivados / total if total else 0.0, f"{archivados}/{total} préstamos")
+
+        archivador = ArchivadorPrestamos(
+            db,
+            edad_dias=float(edad_dias if edad_dias is not None else reglas.ARCHIVO_PRESTAMOS_EDAD_DIAS),
+            tamano_lote=int(tamano_lote or reglas.ARCHIVO_PRESTAMOS_LOTE_FILAS),
+        )
+        return archivador.ejecutar(progreso=progreso)
+
+    reporte = _combinar(_por_shard(contexto, ejecutar))
+    reporte["meses"] = sorted(set(reporte["meses"]))
+    return reporte
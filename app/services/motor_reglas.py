@@ -0,0 +1,146 @@
+from collections import namedtuple
+from app.models.prestamo import EstadoPrestamo
+
+# Regla de la tabla de decisión: se aplica si score >= score_minimo y ratio >= ratio_minimo.
+# `motivo` es la plantilla del motivo de rechazo (None si no rechaza).
+Regla = namedtuple("Regla", ["nombre", "score_minimo", "ratio_minimo", "estado", "motivo"])
+
+SCORE_MAXIMO = 900
+
+
+def factor_amortizacion(plazo_meses: int, tasa_anual: float) -> float:
+    """Factor de cuota fija: cuota = monto * factor"""
+    tasa_mensual = tasa_anual / 12
+    potencia = (1 + tasa_mensual) ** plazo_meses
+    return tasa_mensual * potencia / (potencia - 1)
+
+
+class MotorReglas:
+    """
+    Reglas de aprobación compiladas a tablas de búsqueda.
+
+    - Factores de amortización precalculados por plazo (la tasa es fija).
+    - Tabla indexada por score con las reglas candidatas ya filtradas,
+      así evaluar una solicitud es un lookup + comparaciones de ratio.
+    Se construye desde los límites de `Settings` (sin umbrales en código).
+
+    `evaluar` retorna (regla, cuota, ratio); las reglas son objetos
+    precalculados, así el camino caliente no crea objetos por llamada.
+    """
+
+    def __init__(self, reglas, score_rechazo: int, ratio_minimo: float, tasa_anual: float,
+                 plazo_minimo: int, plazo_maximo: int):
+        if score_rechazo < 0:
+            raise ValueError("score_rechazo no puede ser negativo")
+        self.reglas = tuple(reglas)
+        self.score_rechazo = score_rechazo
+        self.ratio_minimo = ratio_minimo
+        self.tasa_anual = tasa_anual
+        self.plazo_minimo = plazo_minimo
+        self.plazo_maximo = plazo_maximo
+        self.origen = None
+
+        self.regla_sin_historial = Regla(
+            "sin_historial", None, None, EstadoPrestamo.RECHAZADO,
+            "Cliente sin historial crediticio")
+        self.regla_score_insuficiente = Regla(
+            "score_insuficiente", None, None, EstadoPrestamo.RECHAZADO,
+            f"Score crediticio insuficiente (< {score_rechazo})")
+        self.regla_ingresos_insuficientes = Regla(
+            "ingresos_insuficientes", score_rechazo, None, EstadoPrestamo.RECHAZADO,
+            "Ingresos insuficientes. Ratio: {ratio:.1f}x (mínimo " + f"{ratio_minimo:g}x)")
+
+        # Umbrales vigentes, tal como quedan en la traza de auditoría
+        self.umbrales = {
+            "score_rechazo": score_rechazo,
+            "ratio_minimo": ratio_minimo,
+            "tasa_anual": tasa_anual,
+            "reglas": [
+                {"nombre": r.nombre, "score_minimo": r.score_minimo, "ratio_minimo": r.ratio_minimo,
+                 "estado": r.estado.value}
+                for r in self.reglas
+            ],
+        }
+
+        self._factores = {
+            plazo: factor_amortizacion(plazo, tasa_anual)
+            for plazo in range(plazo_minimo, plazo_maximo + 1)
+        }
+        # _tabla_score[score] -> reglas cuyo score_minimo se cumple (en orden de prioridad).
+        # Solo se indexa con score >= score_rechazo, que no es negativo.
+        self._tabla_score = tuple(
+            tuple(r for r in self.reglas if score >= r.score_minimo)
+            for score in range(SCORE_MAXIMO + 1)
+        )
+
+    @classmethod
+    def desde_settings(cls, settings):
+        reglas = [
+            Regla("aprobacion_automatica", settings.SCORE_APROBACION_AUTOMATICA,
+                  settings.RATIO_INGRESOS_APROBACION, EstadoPrestamo.APROBADO, None),
+            Regla("revision_manual", settings.SCORE_REVISION_MANUAL,
+                  settings.RATIO_INGRESOS_MINIMO, EstadoPrestamo.EN_REVISION, None),
+        ]
+        motor = cls(
+            reglas,
+            score_rechazo=settings.SCORE_RECHAZO_AUTOMATICO,
+            ratio_minimo=settings.RATIO_INGRESOS_MINIMO,
+            tasa_anual=settings.TASA_INTERES_ANUAL,
+            plazo_minimo=settings.PLAZO_MINIMO_MESES,
+            plazo_maximo=settings.PLAZO_MAXIMO_MESES,
+        )
+        motor.origen = settings
+        return motor
+
+    def factor(self, plazo_meses: int) -> float:
+        factor = self._factores.get(plazo_meses)
+        if factor is None:
+            # Plazo fuera de la tabla precalculada: cálculo directo
+            factor = factor_amortizacion(plazo_meses, self.tasa_anual)
+        return factor
+
+    def calcular_cuota(self, monto: float, plazo_meses: int) -> float:
+        return monto * self.factor(plazo_meses)
+
+    def evaluar(self, score, ingresos_mensuales, monto: float, plazo_meses: int):
+        """Retorna (regla, cuota, ratio); ratio es None si no llegó a calcularse"""
+        factor = self._factores.get(plazo_meses)
+        if factor is None:
+            factor = factor_amortizacion(plazo_meses, self.tasa_anual)
+        cuota = monto * factor
+
+        if score is None:
+            return self.regla_sin_historial, cuota, None
+        if score < self.score_rechazo:
+            return self.regla_score_insuficiente, cuota, None
+
+        if score > SCORE_MAXIMO:
+            score = SCORE_MAXIMO
+        ratio = (ingresos_mensuales or 0.0) / cuota
+        for regla in self._tabla_score[score]:
+            if ratio >= regla.ratio_minimo:
+                return regla, cuota, ratio
+        return self.regla_ingresos_insuficientes, cuota, ratio
+
+    @staticmethod
+    def motivo(regla: Regla, ratio) -> str:
+        if regla.motivo is None:
+            return None
+        return regla.motivo.format(ratio=ratio) if ratio is not None else regla.motivo
+
+
+_motor_vigente = None
+
+
+def motor_para(settings) -> MotorReglas:
+    """
+    Motor compilado para un snapshot de Settings.
+    Se recompila solo cuando el snapshot cambia (recarga de configuración);
+    si dos hilos recompilan a la vez, ambos resultados son equivalentes.
+    """
+    global _motor_vigente
+    motor = _motor_vigente
+    if motor is None or motor.origen is not settings:
+        motor = MotorReglas.desde_settings(settings)
+        _motor_vigente = motor
+    return motor
@@ -0,0 +1,48 @@
+"""
+Evaluación de la tabla de decisión sobre arreglos (un lote de préstamos por llamada).
+
+Módulo liviano a propósito (solo NumPy): corre en los procesos del pool de
+re-scoring, que lo importan al arrancar sin cargar modelos ni la DB.
+Debe decidir exactamente lo mismo que `MotorReglas.evaluar`.
+"""
+import numpy as np
+
+# Códigos de regla negativos: reglas de rechazo fijas del motor.
+# Los códigos >= 0 son el índice de la regla en `MotorReglas.reglas`.
+CODIGO_SIN_HISTORIAL = -1
+CODIGO_SCORE_INSUFICIENTE = -2
+CODIGO_INGRESOS_INSUFICIENTES = -3
+
+SCORE_MAXIMO = 900
+
+
+def evaluar_decisiones(scores, ingresos, montos, plazos, plazos_tabla, factores_tabla,
+                       score_rechazo: int, reglas):
+    """
+    - `scores`: float64 con NaN para clientes sin historial
+    - `plazos_tabla`/`factores_tabla`: factor de amortización por plazo (ordenado
+      por plazo y con todos los plazos del lote), calculado por el motor
+    - `reglas`: pares (score_minimo, ratio_minimo) en orden de prioridad
+
+    Retorna (codigos, cuotas, ratios); ratio es NaN donde no llegó a calcularse.
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    plazos = np.asarray(plazos, dtype=np.int64)
+    factores = np.asarray(factores_tabla, dtype=np.float64)[np.searchsorted(plazos_tabla, plazos)]
+    cuotas = np.asarray(montos, dtype=np.float64) * factores
+    ratios = np.nan_to_num(np.asarray(ingresos, dtype=np.float64), nan=0.0) / cuotas
+
+    sin_historial = np.isnan(scores)
+    score_insuficiente = ~sin_historial & (scores < score_rechazo)
+    acotados = np.minimum(np.where(sin_historial, 0.0, scores), SCORE_MAXIMO)
+
+    codigos = np.full(len(scores), CODIGO_INGRESOS_INSUFICIENTES, dtype=np.int8)
+    pendiente = ~(sin_historial | score_insuficiente)
+    for indice, (score_minimo, ratio_minimo) in enumerate(reglas):
+        aplica = pendiente & (acotados >= score_minimo) & (ratios >= ratio_minimo)
+        codigos[aplica] = indice
+        pendiente &= ~aplica
+    codigos[sin_historial] = CODIGO_SIN_HISTORIAL
+    codigos[score_insuficiente] = CODIGO_SCORE_INSUFICIENTE
+    ratios[sin_historial | score_insuficiente] = np.nan
+    return codigos, cuotas, ratios
@@ -0,0 +1,91 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from app.config import get_settings
+
+
+def _marco(frame) -> str:
+    codigo = frame.f_code
+    # co_qualname (Clase.metodo) existe desde Python 3.11; en 3.10, solo el nombre
+    nombre = getattr(codigo, "co_qualname", codigo.co_name)
+    return f"{os.path.basename(codigo.co_filename)}:{nombre}"
+
+
+def a_colapsado(conteos: Counter) -> str:
+    """Formato "collapsed stacks" (una pila por línea + muestras): entrada de flamegraph.pl / speedscope"""
+    return "".join(f"{pila} {n}\n" for pila, n in conteos.most_common())
+
+
+class PerfiladorMuestreo:
+    """
+    Perfilador estadístico de todos los hilos del proceso.
+
+    Un hilo propio toma `sys._current_frames()` cada `intervalo_ms` y cuenta
+    las pilas (raíz = nombre del hilo). No instrumenta nada: el costo es solo
+    el de recorrer las pilas en cada muestra, y solo mientras está activo.
+    Un solo perfilado a la vez por proceso.
+    """
+
+    def __init__(self, intervalo_ms: float = 10):
+        self.intervalo = intervalo_ms / 1000
+        self._lock = threading.Lock()
+        self._hilo = None
+        self._detener = threading.Event()
+        self._conteos = Counter()
+        self.muestras = 0
+
+    @property
+    def activo(self) -> bool:
+        return self._hilo is not None
+
+    def iniciar(self):
+        with self._lock:
+            if self._hilo is not None:
+                raise RuntimeError("Ya hay un perfilado en curso")
+            self._conteos = Counter()
+            self.muestras = 0
+            self._detener.clear()
+            self._hilo = threading.Thread(target=self._bucle, name="perfilador", daemon=True)
+            self._hilo.start()
+
+    def detener(self) -> Counter:
+        with self._lock:
+            hilo, self._hilo = self._hilo, None
+        if hilo is None:
+            return Counter()
+        self._detener.set()
+        hilo.join()
+        return self._conteos
+
+    def perfilar(self, segundos: float) -> Counter:
+        """Bloquea `segundos` muestreando y retorna las pilas contadas"""
+        self.iniciar()
+        try:
+            time.sleep(segundos)
+        finally:
+            conteos = self.detener()
+        return conteos
+
+    def _bucle(self):
+        propio = threading.get_ident()
+        siguiente = time.perf_counter()
+        while not self._detener.is_set():
+            nombres = {hilo.ident: hilo.name for hilo in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == propio:
+                    continue
+                marcos = []
+                while frame is not None:
+                    marcos.append(_marco(frame))
+                    frame = frame.f_back
+                marcos.append(nombres.get(ident, f"hilo-{ident}"))
+                self._conteos[";".join(reversed(marcos))] += 1
+            self.muestras += 1
+            # Intervalo fijo (no acumula el costo de cada muestra)
+            siguiente += self.intervalo
+            self._detener.wait(max(0.0, siguiente - time.perf_counter()))
+
+
+perfilador = PerfiladorMuestreo(get_settings().DEBUG_PROFILE_INTERVALO_MS)
@@ -1,16 +1,36 @@
+import logging
+import time
 from datetime import datetime
+from sqlalchemy import select
 from sqlalchemy.orm import Session
+from sqlalchemy.orm.exc import StaleDataError
+from app.config import get_settings
+from app.logs import LOGGER_DECISIONES, evento
 from app.models.cliente import Cliente
-from app.models.prestamo import Prestamo, EstadoPrestamo
+from app.models.prestamo import Prestamo, EstadoPrestamo, TRANSICIONES
+from app.services import auditoria_decisiones, escritor_lotes
+from app.services.archivo_prestamos import buscar_archivado
+from app.services.motor_reglas import motor_para
+from app.trazas import span, trazado
+
+logger_decisiones = logging.getLogger(LOGGER_DECISIONES)
+
+# Columnas de la exportación (las de PrestamoResponse)
+_COLUMNAS_EXPORTACION = (
+    Prestamo.id, Prestamo.cliente_id, Prestamo.monto_solicitado, Prestamo.plazo_meses,
+    Prestamo.cuota_mensual, Prestamo.estado, Prestamo.motivo_rechazo, Prestamo.fecha_solicitud,
+    Prestamo.version,
+)
+
+
+class ConflictoConcurrencia(ValueError):
+    """El préstamo cambió desde que el llamador lo leyó: debe releer (409)"""
+
 
 class PrestamoService:
-    # Constantes de negocio (de test cases Clase 2)
-    LIMITE_MONTO = 50_000_000
-    PLAZO_MAXIMO_MESES = 60
-    SCORE_APROBACION_AUTOMATICA = 700
-    SCORE_RECHAZO_AUTOMATICO = 500
-    RATIO_INGRESOS_MINIMO = 3  # Ingresos deben ser 3x cuota
+    # Límites y umbrales de negocio: vienen de Settings (app/config.py)
     
+    @trazado("PrestamoService.solicitar_prestamo")
     def solicitar_prestamo(self, db: Session, cliente_id: int, monto: float, plazo_meses: int):
         """
         Test Cases implementados:
@@ -19,93 +39,190 @@ class PrestamoService:
         3. Rechazo automático: score<500 → RECHAZADO
         4. Límite monto: monto>50M → Error validación
         """
+        inicio = time.perf_counter()
+        # Un solo snapshot de reglas para todo el request (recarga en caliente)
+        reglas = get_settings()
         
         # Test Case: Validar límite de monto
-        if monto > self.LIMITE_MONTO:
-            raise ValueError(f"Monto solicitado excede límite de ${self.LIMITE_MONTO:,.0f}")
+        if monto > reglas.LIMITE_MONTO_PRESTAMO:
+            raise ValueError(f"Monto solicitado excede límite de ${reglas.LIMITE_MONTO_PRESTAMO:,.0f}")
+        
+        if plazo_meses > reglas.PLAZO_MAXIMO_MESES:
+            raise ValueError(f"Plazo máximo permitido: {reglas.PLAZO_MAXIMO_MESES} meses")
         
-        if plazo_meses > self.PLAZO_MAXIMO_MESES:
-            raise ValueError(f"Plazo máximo permitido: {self.PLAZO_MAXIMO_MESES} meses")
+        if plazo_meses < reglas.PLAZO_MINIMO_MESES:
+            raise ValueError(f"Plazo mínimo permitido: {reglas.PLAZO_MINIMO_MESES} meses")
         
         # Obtener cliente
-        cliente = db.query(Cliente).filter(Cliente.id == cliente_id).first()
+        with span("prestamo.buscar_cliente"):
+            cliente = db.query(Cliente).filter(Cliente.id == cliente_id).first()
         if not cliente:
             raise ValueError("Cliente no encontrado")
         
-        # Calcular cuota mensual (simplificado: monto/plazo, sin interés)
-        tasa_anual = 0.15  # 15% anual
-        cuota_mensual = self._calcular_cuota(monto, plazo_meses, tasa_anual)
-        
-        # Validar que el cliente tenga score
-        if cliente.score_cifin is None:
-            return self._crear_prestamo_rechazado(
-                db, cliente_id, monto, plazo_meses,
-                motivo="Cliente sin historial crediticio"
+        # Evaluar reglas con el motor compilado (factores y tabla precalculados)
+        with span("prestamo.evaluar_reglas") as actual:
+            motor = motor_para(reglas)
+            regla, cuota_mensual, ratio = motor.evaluar(
+                cliente.score_cifin, cliente.ingresos_mensuales, monto, plazo_meses
             )
+            actual.atributo("regla", regla.nombre)
         
-        # Test Case: Rechazo automático (score < 500)
-        if cliente.score_cifin < self.SCORE_RECHAZO_AUTOMATICO:
-            return self._crear_prestamo_rechazado(
+        # La tasa queda registrada en el préstamo (en %) para su tabla de amortización
+        # El score usado queda en el préstamo (agregados por banda de score)
+        tasa = round(motor.tasa_anual * 100, 6)
+        score = cliente.score_cifin
+        if regla.estado == EstadoPrestamo.APROBADO:
+            prestamo = self._crear_prestamo_aprobado(db, cliente_id, monto, plazo_meses, cuota_mensual, tasa, score)
+        elif regla.estado == EstadoPrestamo.EN_REVISION:
+            prestamo = self._crear_prestamo_revision(db, cliente_id, monto, plazo_meses, cuota_mensual, tasa, score)
+        else:
+            prestamo = self._crear_prestamo_rechazado(
                 db, cliente_id, monto, plazo_meses,
-                motivo="Score crediticio insuficiente (< 500)"
+                motivo=motor.motivo(regla, ratio), tasa=tasa, score=score
             )
-        
-        # Validar capacidad de pago
-        ratio_ingresos = cliente.ingresos_mensuales / cuota_mensual
-        
-        # Test Case: Aprobación automática (score > 700 y ratio >= 4x)
-        if cliente.score_cifin >= self.SCORE_APROBACION_AUTOMATICA and ratio_ingresos >= 4:
-            return self._crear_prestamo_aprobado(db, cliente_id, monto, plazo_meses, cuota_mensual)
-        
-        # Test Case: Análisis manual (score 600-700 y ratio >= 3x)
-        if cliente.score_cifin >= 600 and ratio_ingresos >= self.RATIO_INGRESOS_MINIMO:
-            return self._crear_prestamo_revision(db, cliente_id, monto, plazo_meses, cuota_mensual)
-        
-        # Cualquier otro caso: rechazado
-        return self._crear_prestamo_rechazado(
-            db, cliente_id, monto, plazo_meses,
-            motivo=f"Ingresos insuficientes. Ratio: {ratio_ingresos:.1f}x (mínimo 3x)"
-        )
+        self._auditar(prestamo, cliente, motor, regla, cuota_mensual, ratio)
+        evento(logger_decisiones, "decision_prestamo", prestamo_id=prestamo.id, cliente_id=cliente_id,
+               estado=regla.estado.value, regla=regla.nombre, score=score, monto=monto,
+               latencia_ms=round((time.perf_counter() - inicio) * 1000, 2))
+        return prestamo
     
-    def _calcular_cuota(self, monto: float, plazo_meses: int, tasa_anual: float) -> float:
-        tasa_mensual = tasa_anual / 12
-        return monto * (tasa_mensual * (1 + tasa_mensual)**plazo_meses) / ((1 + tasa_mensual)**plazo_meses - 1)
+    def _auditar(self, prestamo: Prestamo, cliente: Cliente, motor, regla, cuota: float, ratio):
+        # Solo arma el dict: serializar y escribir a disco lo hace el hilo de auditoría
+        auditor = auditoria_decisiones.auditoria_decisiones
+        if auditor is None:
+            return
+        auditor.registrar({
+            "prestamo_id": prestamo.id,
+            "cliente_id": cliente.id,
+            "fecha": datetime.utcnow().isoformat(),
+            "entradas": {
+                "score_cifin": cliente.score_cifin,
+                "ingresos_mensuales": cliente.ingresos_mensuales,
+                "monto_solicitado": prestamo.monto_solicitado,
+                "plazo_meses": prestamo.plazo_meses,
+            },
+            "umbrales": motor.umbrales,
+            "resultado": {
+                "regla": regla.nombre,
+                "estado": regla.estado.value,
+                "cuota_mensual": cuota,
+                "ratio_ingresos": ratio,
+                "motivo_rechazo": motor.motivo(regla, ratio),
+            },
+        })
     
-    def _crear_prestamo_aprobado(self, db: Session, cliente_id: int, monto: float, plazo_meses: int, cuota: float):
+    def _crear_prestamo_aprobado(self, db: Session, cliente_id: int, monto: float, plazo_meses: int, cuota: float,
+                                 tasa: float = None, score: int = None):
         prestamo = Prestamo(
             cliente_id=cliente_id, monto_solicitado=monto, plazo_meses=plazo_meses,
-            cuota_mensual=cuota, estado=EstadoPrestamo.APROBADO,
-            fecha_decision=datetime.utcnow()
+            tasa_interes=tasa, cuota_mensual=cuota, estado=EstadoPrestamo.APROBADO,
+            score_decision=score, fecha_decision=datetime.utcnow()
         )
-        db.add(prestamo)
-        db.commit()
-        db.refresh(prestamo)
-        return prestamo
+        return self._persistir(db, prestamo)
     
-    def _crear_prestamo_revision(self, db: Session, cliente_id: int, monto: float, plazo_meses: int, cuota: float):
+    def _crear_prestamo_revision(self, db: Session, cliente_id: int, monto: float, plazo_meses: int, cuota: float,
+                                 tasa: float = None, score: int = None):
         prestamo = Prestamo(
             cliente_id=cliente_id, monto_solicitado=monto, plazo_meses=plazo_meses,
-            cuota_mensual=cuota, estado=EstadoPrestamo.EN_REVISION
+            tasa_interes=tasa, cuota_mensual=cuota, estado=EstadoPrestamo.EN_REVISION,
+            score_decision=score
         )
-        db.add(prestamo)
-        db.commit()
-        db.refresh(prestamo)
-        return prestamo
+        return self._persistir(db, prestamo)
     
-    def _crear_prestamo_rechazado(self, db: Session, cliente_id: int, monto: float, plazo_meses: int, motivo: str):
+    def _crear_prestamo_rechazado(self, db: Session, cliente_id: int, monto: float, plazo_meses: int, motivo: str,
+                                  tasa: float = None, score: int = None):
         prestamo = Prestamo(
             cliente_id=cliente_id, monto_solicitado=monto, plazo_meses=plazo_meses,
-            estado=EstadoPrestamo.RECHAZADO, motivo_rechazo=motivo,
+            tasa_interes=tasa, estado=EstadoPrestamo.RECHAZADO, motivo_rechazo=motivo,
+            score_decision=score,
             fecha_decision=datetime.utcnow()
         )
+        return self._persistir(db, prestamo)
+    
+    @trazado("prestamo.persistir")
+    def _persistir(self, db: Session, prestamo: Prestamo):
+        # Con escritura por lotes activa, el insert viaja en el group commit
+        # y esta llamada retorna cuando su lote ya está confirmado
+        escritor = escritor_lotes.escritor_prestamos
+        if escritor is not None and escritor.activo:
+            return escritor.guardar(prestamo)
         db.add(prestamo)
+        if db.get_bind(Prestamo.__mapper__, instance=prestamo).dialect.name == "postgresql":
+            # INSERT ... RETURNING: el flush trae el id en el mismo viaje y el
+            # resto de los valores ya está en el objeto. Fuera de la sesión,
+            # el commit no lo expira y no hace falta el SELECT del refresh
+            db.flush()
+            db.expunge(prestamo)
+            db.commit()
+            return prestamo
         db.commit()
         db.refresh(prestamo)
         return prestamo
     
+    @trazado("PrestamoService.obtener_estado_prestamo")
     def obtener_estado_prestamo(self, db: Session, prestamo_id: int):
-        """Obtiene el estado actual de un préstamo"""
+        """Obtiene el estado actual de un préstamo (si no está en la tabla activa, lo busca en el archivo)"""
         prestamo = db.query(Prestamo).filter(Prestamo.id == prestamo_id).first()
+        if not prestamo:
+            prestamo = buscar_archivado(db, prestamo_id)
         if not prestamo:
             raise ValueError("Préstamo no encontrado")
         return prestamo
+    
+    @trazado("PrestamoService.cambiar_estado")
+    def cambiar_estado(self, db: Session, prestamo_id: int, estado: EstadoPrestamo, version: int = None,
+                       motivo_rechazo: str = None, reintentos: int = None):
+        """
+        Transición de estado con control optimista, sin locks: el UPDATE lleva
+        WHERE version = la leída y falla (StaleDataError) si otro commit ganó.
+        - Con `version` (la que vio el llamador): si no es la vigente, o cambia
+          antes del commit → ConflictoConcurrencia; el llamador decide con el
+          estado nuevo.
+        - Sin `version`: relee y reintenta hasta `reintentos` veces mientras la
+          transición siga siendo válida sobre el estado releído.
+        """
+        if reintentos is None:
+            reintentos = get_settings().PRESTAMO_REINTENTOS_CONFLICTO
+        estado = EstadoPrestamo(estado)
+        for intento in range(reintentos + 1):
+            prestamo = db.get(Prestamo, prestamo_id, populate_existing=True)
+            if prestamo is None:
+                if buscar_archivado(db, prestamo_id) is not None:
+                    raise ValueError("Préstamo archivado: no admite cambios de estado")
+                raise ValueError("Préstamo no encontrado")
+            if version is not None and prestamo.version != version:
+                raise ConflictoConcurrencia(
+                    f"Versión {version} desactualizada: la vigente es {prestamo.version}"
+                )
+            if estado not in TRANSICIONES[prestamo.estado]:
+                mensaje = f"Transición inválida: {prestamo.estado.value} → {estado.value}"
+                # Tras un conflicto, el estado que la impide lo escribió otro
+                raise ConflictoConcurrencia(mensaje) if intento else ValueError(mensaje)
+
+            prestamo.estado = estado
+            if estado in (EstadoPrestamo.APROBADO, EstadoPrestamo.RECHAZADO):
+                prestamo.fecha_decision = datetime.utcnow()
+            if estado == EstadoPrestamo.RECHAZADO:
+                prestamo.motivo_rechazo = motivo_rechazo or "Rechazado en revisión"
+            try:
+                db.commit()
+            except StaleDataError:
+                db.rollback()
+                if version is not None:
+                    raise ConflictoConcurrencia("El préstamo cambió durante la actualización")
+                continue
+            db.refresh(prestamo)
+            return prestamo
+        raise ConflictoConcurrencia(f"Conflicto de versión persistente tras {reintentos} reintentos")
+    
+    def exportar(self, db: Session, estado: EstadoPrestamo = None, tamano_lote: int = 2000):
+        """
+        Préstamos de la tabla activa por id, como mappings, en streaming:
+        yield_per abre un cursor del lado del servidor en PostgreSQL (fetchmany
+        en SQLite), así la memoria no crece con la cartera. Sin archivados.
+        """
+        consulta = select(*_COLUMNAS_EXPORTACION).order_by(Prestamo.id)
+        if estado is not None:
+            consulta = consulta.where(Prestamo.estado == estado)
+        for fila in db.execute(consulta.execution_options(yield_per=tamano_lote)):
+            yield fila._mapping
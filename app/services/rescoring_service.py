@@ -0,0 +1,248 @@
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy import and_, bindparam, func, select, update
+from sqlalchemy.orm import Session
+from app.models.cliente import Cliente
+from app.models.prestamo import Prestamo, EstadoPrestamo
+from app.services.estadisticas_service import aplicar_transiciones
+from app.services.motor_reglas import MotorReglas
+from app.services.versiones_prestamo import notificar_cambios
+from app.services.motor_vectorizado import (
+    evaluar_decisiones,
+    CODIGO_SIN_HISTORIAL,
+    CODIGO_SCORE_INSUFICIENTE,
+    CODIGO_INGRESOS_INSUFICIENTES,
+)
+
+# Préstamos sin decisión final: los únicos que el re-scoring puede mover
+ESTADOS_ABIERTOS = (EstadoPrestamo.SOLICITADO, EstadoPrestamo.EN_REVISION)
+
+_COLUMNAS = (
+    Prestamo.id, Prestamo.cliente_id, Prestamo.estado, Prestamo.score_decision,
+    Prestamo.plazo_meses, Prestamo.monto_solicitado, Prestamo.cuota_mensual,
+)
+_COLUMNAS_CLIENTE = (Cliente.score_cifin, Cliente.ingresos_mensuales)
+
+
+class RescoringCartera:
+    """
+    Re-evalúa con las reglas vigentes todos los préstamos abiertos
+    (SOLICITADO / EN_REVISION) contra el score e ingresos actuales del cliente.
+
+    - Lee la cartera por lotes de `tamano_lote` (paginación por id, sin ORM).
+    - Cada lote se evalúa vectorizado (`motor_vectorizado`) en un pool de
+      `procesos` procesos; mientras el pool calcula, se lee el lote siguiente.
+    - Solo se escriben los préstamos cuyo estado cambia, con un UPDATE de core
+      (executemany) por lote, en su propia transacción junto con los agregados
+      de cartera. El UPDATE exige el estado leído: si otro request cambió el
+      préstamo en el medio, ese préstamo no se toca.
+    - `dry_run`: no escribe nada y reporta el diff.
+    - Con `snapshot` (`ColumnasClientes`) el score y los ingresos salen de
+      sus arreglos en vez de un JOIN con clientes.
+    """
+
+    def __init__(self, db: Session, motor: MotorReglas, tamano_lote: int = 20000, procesos: int = 1,
+                 max_diferencias: int = 1000, snapshot=None):
+        self.db = db
+        self.motor = motor
+        self.snapshot = snapshot
+        self.tamano_lote = tamano_lote
+        self.procesos = procesos or os.cpu_count() or 1
+        self.max_diferencias = max_diferencias
+        self._reglas = {indice: regla for indice, regla in enumerate(motor.reglas)}
+        self._reglas[CODIGO_SIN_HISTORIAL] = motor.regla_sin_historial
+        self._reglas[CODIGO_SCORE_INSUFICIENTE] = motor.regla_score_insuficiente
+        self._reglas[CODIGO_INGRESOS_INSUFICIENTES] = motor.regla_ingresos_insuficientes
+        self._reiniciar()
+
+    def _reiniciar(self):
+        self.evaluados = 0
+        self.cambios = 0
+        self.actualizados = 0
+        self.transiciones = {}
+        self.diferencias = []
+
+    def ejecutar(self, dry_run: bool = False, progreso=None) -> dict:
+        """
+        `progreso(evaluados, total)` se llama después de cada lote aplicado; si
+        lanza, los lotes ya escritos quedan confirmados (volver a correr es seguro).
+        """
+        self._reiniciar()
+        total = self.db.scalar(
+            select(func.count(Prestamo.id)).where(Prestamo.estado.in_(ESTADOS_ABIERTOS))
+        )
+        pool = self._crear_pool()
+        try:
+            en_curso = deque()
+            for lote in self._lotes():
+                en_curso.append((lote, *self._evaluar(pool, lote)))
+                # Ventana acotada: a lo sumo un lote en espera por proceso
+                if len(en_curso) > self.procesos:
+                    self._aplicar(*en_curso.popleft(), dry_run=dry_run)
+                    if progreso:
+                        progreso(self.evaluados, total)
+            while en_curso:
+                self._aplicar(*en_curso.popleft(), dry_run=dry_run)
+                if progreso:
+                    progreso(self.evaluados, total)
+        finally:
+            if pool is not None:
+                pool.shutdown(wait=True, cancel_futures=True)
+        return self.reporte(dry_run)
+
+    def reporte(self, dry_run: bool) -> dict:
+        return {
+            "dry_run": dry_run,
+            "evaluados": self.evaluados,
+            "cambios": self.cambios,
+            "actualizados": self.actualizados,
+            "transiciones": dict(sorted(self.transiciones.items())),
+            "diferencias": self.diferencias,
+            "diferencias_truncadas": self.cambios > len(self.diferencias),
+        }
+
+    def _crear_pool(self):
+        if self.procesos <= 1:
+            return None
+        # spawn: el proceso padre tiene hilos (uvicorn, jobs); fork no es seguro
+        return ProcessPoolExecutor(max_workers=self.procesos, mp_context=multiprocessing.get_context("spawn"))
+
+    def _lotes(self):
+        ultimo_id = 0
+        consulta = select(*_COLUMNAS)
+        if self.snapshot is None:
+            consulta = select(*_COLUMNAS, *_COLUMNAS_CLIENTE).join(Cliente, Prestamo.cliente_id == Cliente.id)
+        while True:
+            filas = self.db.execute(
+                consulta
+                .where(Prestamo.estado.in_(ESTADOS_ABIERTOS), Prestamo.id > ultimo_id)
+                .order_by(Prestamo.id)
+                .limit(self.tamano_lote)
+            ).all()
+            # Cierra la transacción de lectura: no retener el snapshot entre lotes
+            self.db.commit()
+            if not filas:
+                return
+            ultimo_id = filas[-1][0]
+            yield filas
+
+    def _evaluar(self, pool, lote):
+        """(scores, futuro con el resultado del kernel) de un lote"""
+        columnas = list(zip(*lote))
+        cliente_ids, plazos, montos = columnas[1], columnas[4], columnas[5]
+        if self.snapshot is not None:
+            scores = self.snapshot.scores(cliente_ids)
+            ingresos = self.snapshot.ingresos_de(cliente_ids)
+        else:
+            scores = np.array([np.nan if s is None else s for s in columnas[7]], dtype=np.float64)
+            ingresos = np.array([np.nan if i is None else i for i in columnas[8]], dtype=np.float64)
+        plazos = np.array(plazos, dtype=np.int64)
+        plazos_tabla = np.unique(plazos)
+        argumentos = (
+            scores,
+            ingresos,
+            np.array(montos, dtype=np.float64),
+            plazos,
+            plazos_tabla,
+            np.array([self.motor.factor(int(p)) for p in plazos_tabla], dtype=np.float64),
+            self.motor.score_rechazo,
+            tuple((r.score_minimo, r.ratio_minimo) for r in self.motor.reglas),
+        )
+        if pool is not None:
+            return scores, pool.submit(evaluar_decisiones, *argumentos)
+        futuro = Future()
+        futuro.set_result(evaluar_decisiones(*argumentos))
+        return scores, futuro
+
+    def _aplicar(self, lote, scores, futuro: Future, dry_run: bool):
+        codigos, cuotas, ratios = futuro.result()
+        self.evaluados += len(lote)
+        cambios = []
+        for fila, score, codigo, cuota, ratio in zip(lote, scores.tolist(), codigos.tolist(), cuotas.tolist(),
+                                                     ratios.tolist()):
+            prestamo_id, cliente_id, estado, score_anterior, plazo, monto, cuota_anterior = fila[:7]
+            regla = self._reglas[codigo]
+            if regla.estado == estado:
+                continue
+            # NaN: sin dato / no se calculó
+            score = None if score != score else int(score)
+            ratio = None if ratio != ratio else ratio
+            rechazado = regla.estado == EstadoPrestamo.RECHAZADO
+            cambio = {
+                "prestamo_id": prestamo_id,
+                "cliente_id": cliente_id,
+                "estado_anterior": estado,
+                "estado_nuevo": regla.estado,
+                "score_anterior": score_anterior,
+                "score_nuevo": score,
+                "regla": regla.nombre,
+                "cuota_mensual": None if rechazado else cuota,
+                "motivo_rechazo": self.motor.motivo(regla, ratio),
+                "_antes": (estado, score_anterior, plazo, monto, cuota_anterior),
+            }
+            cambios.append(cambio)
+            self.cambios += 1
+            clave = f"{estado.value}->{regla.estado.value}"
+            self.transiciones[clave] = self.transiciones.get(clave, 0) + 1
+            if len(self.diferencias) < self.max_diferencias:
+                self.diferencias.append({
+                    k: (v.value if isinstance(v, EstadoPrestamo) else v)
+                    for k, v in cambio.items() if not k.startswith("_")
+                })
+        if cambios and not dry_run:
+            self._escribir(cambios)
+
+    def _escribir(self, cambios):
+        tabla = Prestamo.__table__
+        sentencia = (
+            update(tabla)
+            .where(and_(tabla.c.id == bindparam("b_id"), tabla.c.estado == bindparam("b_estado_anterior")))
+            .values(
+                estado=bindparam("b_estado"),
+                score_decision=bindparam("b_score"),
+                cuota_mensual=bindparam("b_cuota"),
+                motivo_rechazo=bindparam("b_motivo"),
+                fecha_decision=bindparam("b_fecha"),
+                # UPDATE de Core: el ORM no sube la versión (control optimista)
+                version=tabla.c.version + 1,
+            )
+        )
+        ahora = datetime.utcnow()
+        parametros = [
+            {
+                "b_id": c["prestamo_id"],
+                "b_estado_anterior": c["estado_anterior"],
+                "b_estado": c["estado_nuevo"],
+                "b_score": c["score_nuevo"],
+                "b_cuota": c["cuota_mensual"],
+                "b_motivo": c["motivo_rechazo"],
+                # Igual que PrestamoService: EN_REVISION todavía no tiene decisión
+                "b_fecha": None if c["estado_nuevo"] == EstadoPrestamo.EN_REVISION else ahora,
+            }
+            for c in cambios
+        ]
+        conexion = self.db.connection()
+        if conexion.execute(sentencia, parametros).rowcount == len(cambios):
+            aplicados = cambios
+        else:
+            # Algún préstamo cambió desde la lectura: rehacer fila por fila
+            # para saber cuáles se escribieron (los agregados deben cuadrar)
+            self.db.rollback()
+            conexion = self.db.connection()
+            aplicados = [
+                c for c, p in zip(cambios, parametros)
+                if conexion.execute(sentencia, [p]).rowcount == 1
+            ]
+        aplicar_transiciones(conexion, [
+            (c["_antes"], (c["estado_nuevo"], c["score_nuevo"], c["_antes"][2], c["_antes"][3], c["cuota_mensual"]))
+            for c in aplicados
+        ])
+        self.db.commit()
+        # UPDATE de core: el hook del ORM no se entera, se avisa a mano
+        notificar_cambios(c["prestamo_id"] for c in aplicados)
+        self.actualizados += len(aplicados)
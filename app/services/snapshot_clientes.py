@@ -0,0 +1,189 @@
+import threading
+from datetime import timedelta
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from app.config import get_settings
+from app.models.cliente import Cliente, EstadoCliente
+
+# estado como uint8: índice en este orden
+ESTADOS = tuple(EstadoCliente)
+CODIGO_ESTADO = {estado: codigo for codigo, estado in enumerate(ESTADOS)}
+
+_COLUMNAS = (Cliente.id, Cliente.score_cifin, Cliente.ingresos_mensuales, Cliente.estado,
+             Cliente.fecha_actualizacion)
+
+
+def _solo_lectura(*arreglos):
+    for arreglo in arreglos:
+        arreglo.flags.writeable = False
+
+
+class ColumnasClientes:
+    """
+    Una versión inmutable del snapshot: arreglos paralelos ordenados por id.
+
+    ~20 bytes por cliente (id int64, score int16 + máscara, ingresos float64
+    con NaN si falta, estado uint8) en vez de un objeto del ORM por fila.
+    """
+
+    __slots__ = ("ids", "score", "score_nulo", "ingresos", "estado", "marca")
+
+    def __init__(self, ids, score, score_nulo, ingresos, estado, marca):
+        self.ids = ids
+        self.score = score
+        self.score_nulo = score_nulo
+        self.ingresos = ingresos
+        self.estado = estado
+        self.marca = marca  # mayor fecha_actualizacion leída
+        _solo_lectura(ids, score, score_nulo, ingresos, estado)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def posiciones(self, cliente_ids):
+        """(posiciones, encontrados) de cada id pedido en los arreglos"""
+        cliente_ids = np.asarray(cliente_ids, dtype=np.int64)
+        if not len(self.ids):
+            return np.zeros(len(cliente_ids), dtype=np.int64), np.zeros(len(cliente_ids), dtype=bool)
+        posiciones = np.minimum(np.searchsorted(self.ids, cliente_ids), len(self.ids) - 1)
+        return posiciones, self.ids[posiciones] == cliente_ids
+
+    def scores(self, cliente_ids):
+        """score float64 con NaN para sin historial o cliente desconocido"""
+        posiciones, encontrados = self.posiciones(cliente_ids)
+        if not len(self.ids):
+            return np.full(len(posiciones), np.nan)
+        return np.where(encontrados & ~self.score_nulo[posiciones], self.score[posiciones], np.nan)
+
+    def ingresos_de(self, cliente_ids):
+        """ingresos float64 con NaN si faltan o el cliente es desconocido"""
+        posiciones, encontrados = self.posiciones(cliente_ids)
+        if not len(self.ids):
+            return np.full(len(posiciones), np.nan)
+        return np.where(encontrados, self.ingresos[posiciones], np.nan)
+
+    def memoria_bytes(self) -> int:
+        return sum(a.nbytes for a in (self.ids, self.score, self.score_nulo, self.ingresos, self.estado))
+
+
+def _vacias():
+    return ColumnasClientes(
+        np.empty(0, np.int64), np.empty(0, np.int16), np.empty(0, bool),
+        np.empty(0, np.float64), np.empty(0, np.uint8), None,
+    )
+
+
+def _a_arreglos(filas):
+    ids = np.fromiter((f[0] for f in filas), dtype=np.int64, count=len(filas))
+    score_nulo = np.fromiter((f[1] is None for f in filas), dtype=bool, count=len(filas))
+    score = np.fromiter((f[1] or 0 for f in filas), dtype=np.int16, count=len(filas))
+    ingresos = np.fromiter((np.nan if f[2] is None else f[2] for f in filas), dtype=np.float64, count=len(filas))
+    estado = np.fromiter((CODIGO_ESTADO[f[3] or EstadoCliente.ACTIVO] for f in filas),
+                         dtype=np.uint8, count=len(filas))
+    marcas = [f[4] for f in filas if f[4] is not None]
+    return ids, score, score_nulo, ingresos, estado, max(marcas) if marcas else None
+
+
+class SnapshotClientes:
+    """
+    Snapshot columnar de solo lectura de score, ingresos y estado de todos los
+    clientes, para lógica masiva sobre arreglos (re-scoring, analítica).
+
+    - La primera lectura carga todo por lotes; después `refrescar` trae solo
+      las filas con `fecha_actualizacion` posterior a la última vista (menos un
+      margen, por commits que terminan fuera de orden) y las mezcla.
+    - Cada refresco publica una versión nueva de una sola vez (como
+      `config_store`): los lectores toman `actual` y trabajan sin locks sobre
+      arreglos que no cambian.
+    - Los clientes no se borran en esta app; un borrado no se reflejaría
+      hasta `cargar`.
+    """
+
+    def __init__(self, tamano_lote: int = 50_000, margen_segundos: float = 5):
+        self.tamano_lote = tamano_lote
+        self.margen = timedelta(seconds=margen_segundos)
+        self._actual = None
+        self._lock = threading.Lock()
+
+    @property
+    def actual(self) -> ColumnasClientes:
+        return self._actual if self._actual is not None else _vacias()
+
+    def cargar(self, db: Session) -> ColumnasClientes:
+        """Carga completa (paginada por id, sin objetos del ORM)"""
+        with self._lock:
+            partes, ultimo_id = [], 0
+            while True:
+                filas = db.execute(
+                    select(*_COLUMNAS).where(Cliente.id > ultimo_id).order_by(Cliente.id).limit(self.tamano_lote)
+                ).all()
+                if not filas:
+                    break
+                partes.append(_a_arreglos(filas))
+                ultimo_id = filas[-1][0]
+            if not partes:
+                self._actual = _vacias()
+                return self._actual
+            marcas = [p[5] for p in partes if p[5] is not None]
+            self._actual = ColumnasClientes(
+                *(np.concatenate([p[i] for p in partes]) for i in range(5)),
+                max(marcas) if marcas else None,
+            )
+            return self._actual
+
+    def refrescar(self, db: Session) -> int:
+        """Mezcla las filas cambiadas desde el último refresco; retorna cuántas leyó"""
+        if self._actual is None:
+            return len(self.cargar(db))
+        with self._lock:
+            base = self._actual
+            consulta = select(*_COLUMNAS).order_by(Cliente.id)
+            if base.marca is not None:
+                consulta = consulta.where(Cliente.fecha_actualizacion >= base.marca - self.margen)
+            filas = db.execute(consulta).all()
+            if not filas:
+                return 0
+            self._actual = self._mezclar(base, _a_arreglos(filas))
+            return len(filas)
+
+    @staticmethod
+    def _mezclar(base: ColumnasClientes, cambios) -> ColumnasClientes:
+        ids, score, score_nulo, ingresos, estado, marca = cambios
+        posiciones, existentes = base.posiciones(ids)
+        columnas = [c.copy() for c in (base.score, base.score_nulo, base.ingresos, base.estado)]
+        for columna, valores in zip(columnas, (score, score_nulo, ingresos, estado)):
+            columna[posiciones[existentes]] = valores[existentes]
+        nuevos = ~existentes
+        todos_ids = np.concatenate([base.ids, ids[nuevos]])
+        columnas = [np.concatenate([c, v[nuevos]]) for c, v in zip(columnas, (score, score_nulo, ingresos, estado))]
+        if nuevos.any():
+            orden = np.argsort(todos_ids, kind="stable")
+            todos_ids = todos_ids[orden]
+            columnas = [c[orden] for c in columnas]
+        marcas = [m for m in (base.marca, marca) if m is not None]
+        return ColumnasClientes(todos_ids, *columnas, max(marcas) if marcas else None)
+
+    def metricas(self) -> dict:
+        actual = self.actual
+        return {
+            "clientes": len(actual),
+            "memoria_bytes": actual.memoria_bytes(),
+            "marca": actual.marca.isoformat() if actual.marca else None,
+        }
+
+    def limpiar(self):
+        with self._lock:
+            self._actual = None
+
+
+def _crear_snapshot_default():
+    settings = get_settings()
+    return SnapshotClientes(
+        tamano_lote=settings.SNAPSHOT_CLIENTES_LOTE_FILAS,
+        margen_segundos=settings.SNAPSHOT_CLIENTES_MARGEN_SEGUNDOS,
+    )
+
+
+snapshot_clientes = _crear_snapshot_default()
@@ -0,0 +1,137 @@
+import threading
+import time
+from collections import OrderedDict
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from app.config import get_settings
+from app.models.prestamo import Prestamo, EstadoPrestamo, ESTADOS_TERMINALES
+from app.services.eventos_prestamo import pubsub_prestamos
+
+_CLAVE_SESION = "prestamos_modificados"
+
+
+def etag_prestamo(prestamo: Prestamo) -> str:
+    """
+    La columna `version` del control optimista: sube con todo UPDATE del
+    préstamo (ORM o core), cambie o no el estado, y es la que pide el PATCH
+    """
+    return f'"{prestamo.version}"'
+
+
+def cache_control(estado: EstadoPrestamo, max_age_terminal: int) -> str:
+    # Terminal (rechazado, desembolsado): sin cambios posteriores, el cliente
+    # puede reusar la respuesta. Aprobado todavía pasa a desembolsado
+    if estado in ESTADOS_TERMINALES:
+        return f"private, max-age={max_age_terminal}"
+    # Puede cambiar en cualquier momento: revalidar siempre (el 304 es barato)
+    return "private, no-cache"
+
+
+def coincide(if_none_match: str, etag: str) -> bool:
+    """Comparación débil de If-None-Match (RFC 9110): ignora el prefijo W/"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(candidato.strip().removeprefix("W/") == etag for candidato in if_none_match.split(","))
+
+
+class VersionesPrestamo:
+    """
+    Mapa en memoria prestamo_id -> (etag, cache-control), acotado con LRU.
+
+    Permite responder 304 a los polls de estado sin tocar la DB ni serializar.
+    Toda escritura de este proceso que cambie un préstamo invalida su entrada:
+    el ORM lo hace solo (hook after_commit de abajo); las escrituras de core
+    llaman a `notificar_cambios`. La época evita registrar una versión leída
+    antes de una invalidación concurrente.
+
+    Las escrituras de otros procesos (workers, scripts, jobs) y el atraso de
+    una réplica de lectura no llegan aquí: por eso una entrada no terminal
+    vence a los `ttl` segundos y el siguiente poll revalida la versión contra
+    la DB. Las terminales no cambian más y no vencen.
+    """
+
+    def __init__(self, max_entradas: int = 100_000, ttl: float = 2, reloj=time.monotonic):
+        self.max_entradas = max_entradas
+        self.ttl = ttl
+        self._reloj = reloj
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+        self._epoca = 0
+
+    def epoca(self) -> int:
+        return self._epoca
+
+    def obtener(self, prestamo_id: int):
+        """(etag, cache-control) vigente, o None si no hay o ya venció"""
+        with self._lock:
+            entrada = self._entradas.get(prestamo_id)
+            if entrada is None:
+                return None
+            etag, control, vence = entrada
+            if vence is not None and self._reloj() >= vence:
+                del self._entradas[prestamo_id]
+                return None
+            self._entradas.move_to_end(prestamo_id)
+            return etag, control
+
+    def registrar(self, prestamo_id: int, etag: str, control: str, epoca: int, terminal: bool = False):
+        if not terminal and self.ttl <= 0:
+            return
+        with self._lock:
+            if epoca != self._epoca:
+                return
+            vence = None if terminal else self._reloj() + self.ttl
+            self._entradas[prestamo_id] = (etag, control, vence)
+            self._entradas.move_to_end(prestamo_id)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+
+    def invalidar(self, prestamo_ids):
+        with self._lock:
+            self._epoca += 1
+            for prestamo_id in prestamo_ids:
+                self._entradas.pop(prestamo_id, None)
+
+    def limpiar(self):
+        with self._lock:
+            self._epoca += 1
+            self._entradas.clear()
+
+
+versiones_prestamo = VersionesPrestamo(get_settings().PRESTAMO_ETAG_MAX_ENTRADAS,
+                                       ttl=get_settings().PRESTAMO_ETAG_TTL_SEGUNDOS)
+
+
+def notificar_cambios(prestamo_ids):
+    """
+    Punto único de aviso de préstamos modificados (ya confirmados): invalida
+    sus versiones y despierta a los clientes suscritos a sus eventos.
+    """
+    prestamo_ids = list(prestamo_ids)
+    if prestamo_ids:
+        versiones_prestamo.invalidar(prestamo_ids)
+        pubsub_prestamos.publicar(prestamo_ids)
+
+
+@event.listens_for(Session, "after_flush")
+def _registrar_modificados(session, flush_context):
+    ids = {
+        objeto.id for objeto in (*session.dirty, *session.deleted)
+        if isinstance(objeto, Prestamo) and objeto.id is not None
+    }
+    if ids:
+        session.info.setdefault(_CLAVE_SESION, set()).update(ids)
+
+
+@event.listens_for(Session, "after_commit")
+def _notificar_modificados(session):
+    ids = session.info.pop(_CLAVE_SESION, None)
+    if ids:
+        notificar_cambios(ids)
+
+
+@event.listens_for(Session, "after_rollback")
+def _descartar_modificados(session):
+    session.info.pop(_CLAVE_SESION, None)
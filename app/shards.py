@@ -0,0 +1,309 @@
+"""
+Sharding horizontal por cliente (DATABASE_SHARDS > 1).
+
+Cada cliente vive, junto con sus préstamos y consultas de bureau, en una de N
+bases elegida por hash de su id: las escrituras de clientes distintos no
+compiten por el único lock de escritura de un archivo SQLite.
+
+- Cada shard tiene su propio engine (y pool). `get_db` entrega una
+  `SesionShards` que resuelve el shard por objeto, por id y por los criterios
+  de la consulta (`cliente_id == x`, `id IN (...)`); sin criterio, consulta
+  todos los shards.
+- Los ids de préstamos y consultas de bureau son globales: cada shard los
+  genera en su propio rango (RANGO_IDS_POR_SHARD), así el id alcanza para
+  saber en qué shard buscar. Los ids de clientes nuevos se reservan en el
+  contador `secuencias` del shard 0.
+- Las lecturas que cruzan shards (estadísticas de cartera) se hacen en
+  paralelo, una sesión por shard, y se combinan en Python.
+- Jobs y su tabla quedan en la base principal (DATABASE_URL).
+"""
+import logging
+import os
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import Column, case, func, select, text, update
+from sqlalchemy import inspect as sa_inspect
+from sqlalchemy.ext.horizontal_shard import ShardedSession
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.sql import operators, visitors
+from sqlalchemy.sql.elements import BindParameter
+from app.database import Base, _es_sqlite_archivo, actualizar_esquema, crear_engine_escritura, crear_engine_lectura
+
+logger = logging.getLogger(__name__)
+
+# Ids por shard para tablas con id generado: el shard s usa (s * RANGO, (s + 1) * RANGO].
+# Entra en un INTEGER de 32 bits hasta 21 shards
+RANGO_IDS_POR_SHARD = 100_000_000
+
+# Tablas repartidas por cliente: columna con el id del cliente
+_COLUMNA_CLIENTE = {"clientes": "id", "prestamos": "cliente_id", "consultas_bureau": "cliente_id"}
+# Tablas cuyo id se genera en el rango del shard
+_TABLAS_RANGO_IDS = ("prestamos", "consultas_bureau")
+
+SECUENCIA_CLIENTES = "clientes"
+
+
+def urls_shards(settings) -> list:
+    """URLs de los shards: DATABASE_SHARD_URLS o derivadas de DATABASE_URL (`test.db` → `test.shard0.db`, ...)"""
+    if settings.DATABASE_SHARD_URLS:
+        urls = [url.strip() for url in settings.DATABASE_SHARD_URLS.split(",") if url.strip()]
+        if len(urls) != settings.DATABASE_SHARDS:
+            raise ValueError(
+                f"DATABASE_SHARD_URLS tiene {len(urls)} URLs y DATABASE_SHARDS={settings.DATABASE_SHARDS}"
+            )
+        return urls
+    if not _es_sqlite_archivo(settings.DATABASE_URL):
+        raise ValueError("DATABASE_SHARD_URLS es obligatorio si DATABASE_URL no es un archivo SQLite")
+    raiz, extension = os.path.splitext(settings.DATABASE_URL)
+    return [f"{raiz}.shard{indice}{extension or '.db'}" for indice in range(settings.DATABASE_SHARDS)]
+
+
+class SesionShards(ShardedSession):
+    """ShardedSession que conoce su cluster (ids por shard, lecturas en paralelo)"""
+
+    def __init__(self, cluster=None, **kwargs):
+        super().__init__(**kwargs)
+        self.cluster = cluster
+
+
+class ClusterShards:
+    """Engines, fábricas de sesión y reglas de ruteo de N shards"""
+
+    def __init__(self, urls):
+        if len(urls) < 2:
+            raise ValueError("El sharding necesita al menos 2 shards")
+        self.urls = list(urls)
+        self.cantidad = len(self.urls)
+        self.engines = {indice: crear_engine_escritura(url) for indice, url in enumerate(self.urls)}
+        self.engines_lectura = {
+            indice: crear_engine_lectura(url, engine_escritura=self.engines[indice])
+            for indice, url in enumerate(self.urls)
+        }
+        opciones = dict(
+            class_=SesionShards, cluster=self, autocommit=False, autoflush=False,
+            shard_chooser=self._shard_de_objeto,
+            identity_chooser=self._shards_de_identidad,
+            execute_chooser=self._shards_de_consulta,
+        )
+        self.SessionLocal = sessionmaker(shards=self.engines, **opciones)
+        self.ReadSessionLocal = sessionmaker(shards=self.engines_lectura, **opciones)
+        self.BatchSessionLocal = sessionmaker(shards=self.engines, expire_on_commit=False, **opciones)
+        # Sesión simple sobre un shard: jobs de cartera y lecturas en paralelo
+        self.sesiones_shard = {
+            indice: sessionmaker(autocommit=False, autoflush=False, bind=engine)
+            for indice, engine in self.engines.items()
+        }
+        self.sesiones_lectura_shard = {
+            indice: sessionmaker(autocommit=False, autoflush=False, bind=engine)
+            for indice, engine in self.engines_lectura.items()
+        }
+        self._pool = ThreadPoolExecutor(max_workers=self.cantidad, thread_name_prefix="shards")
+
+    # --- Ruteo ---
+
+    def shard_de_cliente(self, cliente_id) -> int:
+        # crc32: estable entre procesos y reinicios (hash() de str no lo es)
+        return zlib.crc32(str(int(cliente_id)).encode()) % self.cantidad
+
+    def shard_de_id(self, id_generado):
+        """Shard dueño de un id de préstamo / consulta de bureau; None si cae fuera de todo rango"""
+        shard = (int(id_generado) - 1) // RANGO_IDS_POR_SHARD
+        return shard if 0 <= shard < self.cantidad else None
+
+    def _shard_de_columna(self, columna, valor):
+        tabla = getattr(columna, "table", None)
+        nombre_tabla = getattr(tabla, "name", None)
+        if valor is None or nombre_tabla is None:
+            return None
+        if _COLUMNA_CLIENTE.get(nombre_tabla) == columna.name:
+            return self.shard_de_cliente(valor)
+        if nombre_tabla in _TABLAS_RANGO_IDS and columna.name == "id":
+            return self.shard_de_id(valor)
+        return None
+
+    def shards_de_criterio(self, sentencia) -> set:
+        """
+        Shards que alcanzan a los `columna == valor` / `columna IN (...)` sobre
+        el id del cliente o un id generado. Vacío = no se puede acotar.
+        """
+        encontrados = set()
+
+        def visitar(binario):
+            columna, parametro = binario.left, binario.right
+            if isinstance(columna, BindParameter):
+                columna, parametro = parametro, columna
+            if not isinstance(columna, Column) or not isinstance(parametro, BindParameter):
+                return
+            if binario.operator == operators.eq:
+                valores = [parametro.effective_value]
+            elif binario.operator == operators.in_op:
+                valores = parametro.effective_value or []
+            else:
+                return
+            for valor in valores:
+                shard = self._shard_de_columna(columna, valor)
+                if shard is not None:
+                    encontrados.add(shard)
+
+        visitors.traverse(sentencia, {}, {"binary": visitar})
+        return encontrados
+
+    def _shard_de_objeto(self, mapper, instancia, clause=None):
+        if instancia is not None and mapper is not None:
+            columna = _COLUMNA_CLIENTE.get(mapper.local_table.name)
+            if columna is not None and getattr(instancia, columna) is not None:
+                return self.shard_de_cliente(getattr(instancia, columna))
+        if clause is not None:
+            shards = self.shards_de_criterio(clause)
+            if len(shards) == 1:
+                return shards.pop()
+        # Una operación sin shard (ej. session.connection()) debe elegirlo explícitamente
+        raise RuntimeError("Operación sin shard: usar bind_arguments={'shard_id': ...}")
+
+    def _shards_de_identidad(self, mapper, primary_key, *, lazy_loaded_from=None, **kwargs):
+        if lazy_loaded_from is not None:
+            return [lazy_loaded_from.identity_token]
+        tabla = mapper.local_table.name
+        if tabla == "clientes":
+            return [self.shard_de_cliente(primary_key[0])]
+        if tabla in _TABLAS_RANGO_IDS:
+            shard = self.shard_de_id(primary_key[0])
+            return [] if shard is None else [shard]
+        return list(self.engines)
+
+    def _shards_de_consulta(self, contexto):
+        if contexto.lazy_loaded_from is not None:
+            return [contexto.lazy_loaded_from.identity_token]
+        shards = self.shards_de_criterio(contexto.statement)
+        return sorted(shards) if shards else list(self.engines)
+
+    # --- Esquema y ids ---
+
+    def crear_esquema(self):
+        """Tablas en cada shard y rango de ids generados de cada uno"""
+        # Registra todos los modelos en Base.metadata
+        import app.models  # noqa: F401
+        for indice, engine in self.engines.items():
+            Base.metadata.create_all(bind=engine)
+            actualizar_esquema(engine)
+            if indice:
+                self._reservar_rango(engine, indice * RANGO_IDS_POR_SHARD)
+
+    @staticmethod
+    def _reservar_rango(engine, base: int):
+        with engine.begin() as conexion:
+            for tabla in _TABLAS_RANGO_IDS:
+                if conexion.dialect.name == "sqlite":
+                    # Las tablas usan AUTOINCREMENT: el próximo id es seq + 1
+                    actual = conexion.execute(
+                        text("SELECT seq FROM sqlite_sequence WHERE name = :tabla"), {"tabla": tabla}
+                    ).scalar()
+                    if actual is None:
+                        conexion.execute(
+                            text("INSERT INTO sqlite_sequence (name, seq) VALUES (:tabla, :base)"),
+                            {"tabla": tabla, "base": base},
+                        )
+                    elif actual < base:
+                        conexion.execute(
+                            text("UPDATE sqlite_sequence SET seq = :base WHERE name = :tabla"),
+                            {"tabla": tabla, "base": base},
+                        )
+                elif conexion.dialect.name == "postgresql":
+                    conexion.execute(
+                        text(f"SELECT setval(pg_get_serial_sequence('{tabla}', 'id'), "
+                             f"GREATEST(:base, (SELECT COALESCE(MAX(id), 0) FROM {tabla})))"),
+                        {"base": base},
+                    )
+                else:
+                    raise ValueError(f"Sharding no soportado para {conexion.dialect.name}")
+
+    def reservar_ids_clientes(self, cantidad: int) -> range:
+        """
+        `cantidad` ids nuevos de cliente, únicos entre procesos: el contador
+        vive en el shard 0 y nunca queda por debajo del mayor id existente.
+        """
+        from app.models.cliente import Cliente
+        from app.models.secuencia import Secuencia
+        maximo = max(self.en_paralelo(lambda db: db.scalar(select(func.max(Cliente.id))) or 0))
+        tabla = Secuencia.__table__
+        with self.engines[0].begin() as conexion:
+            actualizadas = conexion.execute(
+                update(tabla)
+                .where(tabla.c.nombre == SECUENCIA_CLIENTES)
+                .values(valor=case((tabla.c.valor > maximo, tabla.c.valor), else_=maximo) + cantidad)
+            ).rowcount
+            if not actualizadas:
+                conexion.execute(tabla.insert().values(nombre=SECUENCIA_CLIENTES, valor=maximo + cantidad))
+            fin = conexion.scalar(select(tabla.c.valor).where(tabla.c.nombre == SECUENCIA_CLIENTES))
+        return range(fin - cantidad + 1, fin + 1)
+
+    # --- Lecturas cruzadas ---
+
+    def en_paralelo(self, funcion, lectura: bool = True) -> list:
+        """`funcion(db)` en todos los shards a la vez, cada uno con su sesión; resultados en orden de shard"""
+        fabricas = self.sesiones_lectura_shard if lectura else self.sesiones_shard
+
+        def ejecutar(indice):
+            with fabricas[indice]() as db:
+                return funcion(db)
+
+        return list(self._pool.map(ejecutar, sorted(fabricas)))
+
+    def cerrar(self):
+        self._pool.shutdown(wait=True)
+        for engine in {*self.engines.values(), *self.engines_lectura.values()}:
+            engine.dispose()
+
+
+def es_sesion_shards(db) -> bool:
+    return isinstance(db, SesionShards)
+
+
+def shard_de(db: SesionShards, objeto):
+    """Shard de un objeto de la sesión (ya persistido o pendiente de insert)"""
+    estado = sa_inspect(objeto)
+    if estado.identity_token is not None:
+        return estado.identity_token
+    return db.shard_chooser(estado.mapper, objeto)
+
+
+def argumentos_shard(db, id_generado) -> dict:
+    """bind_arguments para consultas Core por id de préstamo; {} sin sharding"""
+    if not es_sesion_shards(db):
+        return {}
+    shard = db.cluster.shard_de_id(id_generado)
+    return {} if shard is None else {"shard_id": shard}
+
+
+def leer_todos(db, consulta) -> list:
+    """Objetos de `consulta`: en paralelo en todos los shards, o en la sesión si no hay sharding"""
+    if es_sesion_shards(db):
+        return [fila for parte in db.cluster.en_paralelo(lambda s: s.scalars(consulta).all()) for fila in parte]
+    return db.scalars(consulta).all()
+
+
+def fabricas_de_sesion(session_factory) -> list:
+    """Una fábrica de sesión simple por shard; sin sharding, la que se recibió"""
+    if cluster is None:
+        return [session_factory]
+    return [cluster.sesiones_shard[indice] for indice in sorted(cluster.sesiones_shard)]
+
+
+cluster = None
+
+
+def iniciar_shards(urls) -> ClusterShards:
+    global cluster
+    if cluster is None:
+        cluster = ClusterShards(urls)
+        cluster.crear_esquema()
+        logger.info("Sharding activo: %d shards", cluster.cantidad)
+    return cluster
+
+
+def detener_shards():
+    global cluster
+    if cluster is not None:
+        cluster.cerrar()
+        cluster = None
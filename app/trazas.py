@@ -0,0 +1,393 @@
+"""
+Trazas distribuidas compatibles con OpenTelemetry, sin dependencias.
+
+- Ids y propagación W3C (`traceparent`): un gateway o cliente instrumentado
+  con OTel continúa su traza acá, y la respuesta devuelve la nuestra.
+- Spans con el formato de OTLP/JSON (`traceId`, `spanId`, `parentSpanId`,
+  `kind`, `startTimeUnixNano`, ...), una línea por span.
+- Muestreo de cabecera: la traza raíz se decide con el trace id
+  (TraceIdRatioBased) y los hijos heredan la decisión (ParentBased).
+- Con las trazas apagadas o una traza no muestreada, `span` retorna un span
+  nulo compartido: ni ids, ni reloj, ni objetos por llamada. Los listeners de
+  SQLAlchemy solo se instalan mientras las trazas están activas.
+"""
+import functools
+import json
+import os
+import queue
+import threading
+import time
+from contextvars import ContextVar
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+SPAN_SERVER = "SPAN_KIND_SERVER"
+SPAN_INTERNAL = "SPAN_KIND_INTERNAL"
+SPAN_CLIENT = "SPAN_KIND_CLIENT"
+
+_MAX_SQL = 500
+
+# Span vigente del contexto; `_NO_MUESTREADO` marca una traza descartada
+_span_actual: ContextVar = ContextVar("span_actual", default=None)
+_NO_MUESTREADO = object()
+
+
+class Span:
+    __slots__ = ("trace_id", "span_id", "padre_id", "nombre", "tipo", "inicio", "fin", "atributos", "error")
+
+    def __init__(self, trace_id: str, padre_id: str, nombre: str, tipo: str, atributos: dict):
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.padre_id = padre_id
+        self.nombre = nombre
+        self.tipo = tipo
+        self.atributos = atributos
+        self.error = None
+        self.inicio = time.time_ns()
+        self.fin = None
+
+    def atributo(self, clave: str, valor):
+        self.atributos[clave] = valor
+
+    def registrar_error(self, error: BaseException):
+        self.error = f"{type(error).__name__}: {error}"
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def a_dict(self) -> dict:
+        salida = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.nombre,
+            "kind": self.tipo,
+            "startTimeUnixNano": self.inicio,
+            "endTimeUnixNano": self.fin,
+            "attributes": self.atributos,
+            "status": {"code": "STATUS_CODE_ERROR", "message": self.error} if self.error
+            else {"code": "STATUS_CODE_UNSET"},
+        }
+        if self.padre_id:
+            salida["parentSpanId"] = self.padre_id
+        return salida
+
+
+class _SpanNulo:
+    """Mismo API que Span, sin efecto"""
+    __slots__ = ()
+    traceparent = None
+
+    def atributo(self, clave, valor):
+        pass
+
+    def registrar_error(self, error):
+        pass
+
+
+SPAN_NULO = _SpanNulo()
+
+
+class _AmbitoNulo:
+    __slots__ = ()
+
+    def __enter__(self):
+        return SPAN_NULO
+
+    def __exit__(self, *exc):
+        return False
+
+
+_AMBITO_NULO = _AmbitoNulo()
+
+
+class _Ambito:
+    """Activa el span en el contexto mientras dura el bloque y lo entrega al terminar"""
+    __slots__ = ("trazador", "span", "token")
+
+    def __init__(self, trazador, span):
+        self.trazador = trazador
+        self.span = span
+
+    def __enter__(self):
+        self.token = _span_actual.set(self.span)
+        return self.span
+
+    def __exit__(self, tipo, error, traza):
+        if error is not None:
+            self.span.registrar_error(error)
+        self.span.fin = time.time_ns()
+        _span_actual.reset(self.token)
+        self.trazador.terminar(self.span)
+        return False
+
+
+class _AmbitoDescartado:
+    """Traza raíz no muestreada: solo marca el contexto para que los hijos no hagan nada"""
+    __slots__ = ("token",)
+
+    def __enter__(self):
+        self.token = _span_actual.set(_NO_MUESTREADO)
+        return SPAN_NULO
+
+    def __exit__(self, *exc):
+        _span_actual.reset(self.token)
+        return False
+
+
+def parsear_traceparent(valor: str):
+    """(trace_id, span_id padre, muestreado) o None si el header no es válido"""
+    partes = valor.strip().split("-") if valor else ()
+    if len(partes) != 4 or len(partes[1]) != 32 or len(partes[2]) != 16 or len(partes[3]) != 2:
+        return None
+    try:
+        int(partes[1], 16), int(partes[2], 16)
+        banderas = int(partes[3], 16)
+    except ValueError:
+        return None
+    if partes[1] == "0" * 32 or partes[2] == "0" * 16:
+        return None
+    return partes[1], partes[2], bool(banderas & 1)
+
+
+class ExportadorMemoria:
+    """Colector en memoria (tests)"""
+
+    def __init__(self):
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def exportar(self, spans):
+        with self._lock:
+            self.spans.extend(span.a_dict() for span in spans)
+
+    def cerrar(self):
+        pass
+
+
+class ExportadorArchivo:
+    """Una línea OTLP/JSON por span, agregada a `ruta`"""
+
+    def __init__(self, ruta: str):
+        directorio = os.path.dirname(ruta)
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+        self._archivo = open(ruta, "a", encoding="utf-8")
+
+    def exportar(self, spans):
+        self._archivo.write("".join(json.dumps(span.a_dict(), default=str) + "\n" for span in spans))
+        self._archivo.flush()
+
+    def cerrar(self):
+        self._archivo.close()
+
+
+class Trazador:
+    """
+    Crea spans y los entrega al exportador. Con `sincrono=False` los spans
+    terminados van a una cola acotada y un hilo exporta en lotes (el request
+    no espera al disco); si la cola se llena se descartan y se cuentan.
+    """
+
+    def __init__(self, exportador, muestreo: float = 1.0, max_cola: int = 2048, tamano_lote: int = 256,
+                 intervalo_ms: float = 1000, sincrono: bool = False):
+        self.exportador = exportador
+        self.muestreo = muestreo
+        self._umbral = int(max(0.0, min(1.0, muestreo)) * (1 << 64))
+        self.tamano_lote = tamano_lote
+        self.intervalo = intervalo_ms / 1000
+        self.sincrono = sincrono
+        self._cola = queue.Queue(maxsize=max_cola)
+        self._detener = threading.Event()
+        self._hilo = None
+        self.descartados = 0
+        self.exportados = 0
+
+    def iniciar(self):
+        if self.sincrono or self._hilo is not None:
+            return
+        self._detener.clear()
+        self._hilo = threading.Thread(target=self._bucle, name="trazas-exportador", daemon=True)
+        self._hilo.start()
+
+    def detener(self):
+        self._detener.set()
+        if self._hilo is not None:
+            self._hilo.join()
+            self._hilo = None
+        self._exportar_pendientes()
+        self.exportador.cerrar()
+
+    def muestrear(self, trace_id: str) -> bool:
+        # Los últimos 64 bits del trace id son aleatorios (W3C): la decisión es
+        # la misma en cualquier proceso que use el mismo criterio
+        return int(trace_id[16:], 16) < self._umbral
+
+    def span(self, nombre: str, tipo: str = SPAN_INTERNAL, atributos: dict = None, traceparent: str = None):
+        actual = _span_actual.get()
+        if actual is _NO_MUESTREADO:
+            return _AMBITO_NULO
+        if actual is not None:
+            return _Ambito(self, Span(actual.trace_id, actual.span_id, nombre, tipo, atributos or {}))
+
+        remoto = parsear_traceparent(traceparent) if traceparent else None
+        if remoto is not None:
+            trace_id, padre_id, muestreado = remoto
+        else:
+            trace_id, padre_id = os.urandom(16).hex(), None
+            muestreado = self.muestrear(trace_id)
+        if not muestreado:
+            return _AmbitoDescartado()
+        return _Ambito(self, Span(trace_id, padre_id, nombre, tipo, atributos or {}))
+
+    def terminar(self, span: Span):
+        if self.sincrono:
+            self.exportador.exportar([span])
+            self.exportados += 1
+            return
+        try:
+            self._cola.put_nowait(span)
+        except queue.Full:
+            self.descartados += 1
+
+    def metricas(self) -> dict:
+        return {"muestreo": self.muestreo, "en_cola": self._cola.qsize(), "exportados": self.exportados,
+                "descartados": self.descartados}
+
+    def _bucle(self):
+        while not self._detener.wait(self.intervalo):
+            self._exportar_pendientes()
+
+    def _exportar_pendientes(self):
+        while True:
+            lote = []
+            while len(lote) < self.tamano_lote:
+                try:
+                    lote.append(self._cola.get_nowait())
+                except queue.Empty:
+                    break
+            if not lote:
+                return
+            try:
+                self.exportador.exportar(lote)
+                self.exportados += len(lote)
+            except OSError:
+                self.descartados += len(lote)
+
+
+# Trazador del proceso; None = trazas apagadas (ver iniciar_trazas)
+trazador = None
+
+
+def span(nombre: str, **atributos):
+    """Context manager de un span hijo del actual (no hace nada sin trazador o sin traza muestreada)"""
+    if trazador is None:
+        return _AMBITO_NULO
+    return trazador.span(nombre, atributos=atributos)
+
+
+def trazado(nombre: str):
+    """Decorador: la llamada completa queda en un span `nombre`"""
+    def decorador(funcion):
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            if trazador is None:
+                return funcion(*args, **kwargs)
+            with trazador.span(nombre):
+                return funcion(*args, **kwargs)
+        return envoltura
+    return decorador
+
+
+# --- SQLAlchemy: un span por sentencia ---
+
+def _antes_de_ejecutar(conn, cursor, sentencia, parametros, contexto, executemany):
+    if trazador is None or _span_actual.get() in (None, _NO_MUESTREADO):
+        return
+    atributos = {"db.system": conn.dialect.name, "db.statement": sentencia[:_MAX_SQL]}
+    if executemany:
+        atributos["db.executemany"] = True
+    ambito = trazador.span(sentencia.split(None, 1)[0].upper() if sentencia else "SQL", SPAN_CLIENT, atributos)
+    ambito.__enter__()
+    contexto._ambito_traza = ambito
+
+
+def _despues_de_ejecutar(conn, cursor, sentencia, parametros, contexto, executemany):
+    ambito = getattr(contexto, "_ambito_traza", None)
+    if ambito is not None:
+        contexto._ambito_traza = None
+        ambito.__exit__(None, None, None)
+
+
+def _error_de_ejecucion(contexto_excepcion):
+    contexto = contexto_excepcion.execution_context
+    ambito = getattr(contexto, "_ambito_traza", None) if contexto is not None else None
+    if ambito is not None:
+        contexto._ambito_traza = None
+        error = contexto_excepcion.original_exception
+        ambito.__exit__(type(error), error, None)
+
+
+_LISTENERS = (
+    ("before_cursor_execute", _antes_de_ejecutar),
+    ("after_cursor_execute", _despues_de_ejecutar),
+    ("handle_error", _error_de_ejecucion),
+)
+
+
+def iniciar_trazas(exportador, **opciones) -> Trazador:
+    global trazador
+    if trazador is None:
+        trazador = Trazador(exportador, **opciones)
+        trazador.iniciar()
+        for nombre, funcion in _LISTENERS:
+            event.listen(Engine, nombre, funcion)
+    return trazador
+
+
+def detener_trazas():
+    global trazador
+    if trazador is not None:
+        for nombre, funcion in _LISTENERS:
+            event.remove(Engine, nombre, funcion)
+        actual, trazador = trazador, None
+        actual.detener()
+
+
+class MiddlewareTrazas:
+    """
+    Span SERVER por request (nombre = método + plantilla de la ruta). Continúa
+    el `traceparent` entrante y devuelve el propio en la respuesta.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or trazador is None:
+            await self.app(scope, receive, send)
+            return
+        traceparent = None
+        for nombre, valor in scope.get("headers", ()):
+            if nombre == b"traceparent":
+                traceparent = valor.decode("latin-1")
+                break
+        ambito = trazador.span(f"{scope['method']} {scope['path']}", SPAN_SERVER,
+                               {"http.method": scope["method"], "http.target": scope["path"]}, traceparent)
+        with ambito as actual:
+            async def enviar(mensaje):
+                if mensaje["type"] == "http.response.start":
+                    actual.atributo("http.status_code", mensaje["status"])
+                    if actual.traceparent is not None:
+                        mensaje["headers"] = [*mensaje.get("headers", ()),
+                                              (b"traceparent", actual.traceparent.encode())]
+                await send(mensaje)
+
+            try:
+                await self.app(scope, receive, enviar)
+            finally:
+                # La plantilla (`/api/prestamos/{prestamo_id}`) recién se conoce tras el ruteo
+                ruta = scope.get("route")
+                if isinstance(actual, Span) and ruta is not None and hasattr(ruta, "path"):
+                    actual.nombre = f"{scope['method']} {ruta.path}"
+                    actual.atributo("http.route", ruta.path)
@@ -0,0 +1,83 @@
+"""
+Benchmark: inserts de préstamos con commit por request vs group commit.
+
+Cada "request" es un hilo que inserta un Prestamo y espera su commit.
+Se usa un archivo SQLite temporal para que cada commit pague su fsync.
+
+Uso:
+    python scripts/bench_group_commit.py
+"""
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from sqlalchemy import create_engine, func
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.models.cliente import Cliente
+from app.models.prestamo import Prestamo, EstadoPrestamo
+from app.services.escritor_lotes import EscritorPorLotes
+
+CONCURRENCIA = int(os.getenv("BENCH_CONCURRENCIA", "100"))
+INSERTS = int(os.getenv("BENCH_INSERTS", "2000"))
+
+
+def nuevo_prestamo():
+    return Prestamo(cliente_id=1, monto_solicitado=10_000_000, plazo_meses=24,
+                    cuota_mensual=484_870.0, estado=EstadoPrestamo.APROBADO)
+
+
+def preparar(ruta):
+    engine = create_engine(f"sqlite:///{ruta}", connect_args={"check_same_thread": False, "timeout": 30})
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    with Session() as db:
+        db.add(Cliente(id=1, nombre="Bench", identificacion="1", email="b@test.com",
+                       score_cifin=750, ingresos_mensuales=5_000_000))
+        db.commit()
+    return engine
+
+
+def medir(nombre, engine, insertar):
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=CONCURRENCIA) as ex:
+        list(ex.map(lambda _: insertar(), range(INSERTS)))
+    segundos = time.perf_counter() - inicio
+    with sessionmaker(bind=engine)() as db:
+        filas = db.query(func.count(Prestamo.id)).scalar()
+    print(f"{nombre:22s}: {INSERTS / segundos:9.1f} inserts/s ({segundos:.2f}s, filas={filas})")
+    return INSERTS / segundos
+
+
+def run():
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = preparar(os.path.join(tmp, "por_request.db"))
+        Session = sessionmaker(bind=engine)
+
+        def por_request():
+            with Session() as db:
+                p = nuevo_prestamo()
+                db.add(p)
+                db.commit()
+                db.refresh(p)
+
+        base = medir("Commit por request", engine, por_request)
+        engine.dispose()
+
+        engine = preparar(os.path.join(tmp, "group_commit.db"))
+        escritor = EscritorPorLotes(sessionmaker(bind=engine, expire_on_commit=False))
+        escritor.iniciar()
+        lotes = medir("Group commit", engine, lambda: escritor.guardar(nuevo_prestamo()))
+        escritor.detener()
+        print(f"Lotes confirmados     : {escritor.metricas()['lotes']}")
+        print(f"Speedup               : {lotes / base:.2f}x")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,72 @@
+"""
+Benchmark: evaluación de reglas de préstamo.
+
+Compara el camino anterior de PrestamoService (potencia float por llamada +
+cadena de if) contra MotorReglas (factores precalculados + tabla por score).
+
+Uso:
+    python scripts/bench_motor_reglas.py
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.config import get_settings
+from app.services.motor_reglas import MotorReglas
+
+ITERACIONES = int(os.getenv("BENCH_ITERACIONES", "200000"))
+
+
+def decision_actual(score, ingresos, monto, plazo_meses):
+    """Camino original: cuota recalculada en cada llamada"""
+    tasa_mensual = 0.15 / 12
+    cuota = monto * (tasa_mensual * (1 + tasa_mensual)**plazo_meses) / ((1 + tasa_mensual)**plazo_meses - 1)
+    if score is None:
+        return "rechazado"
+    if score < 500:
+        return "rechazado"
+    ratio = ingresos / cuota
+    if score >= 700 and ratio >= 4:
+        return "aprobado"
+    if score >= 600 and ratio >= 3:
+        return "en_revision"
+    return "rechazado"
+
+
+def generar_casos(n, semilla=42):
+    rnd = random.Random(semilla)
+    return [
+        (rnd.choice([None, rnd.randint(300, 900)]), rnd.uniform(1e6, 1e7),
+         rnd.uniform(1e6, 5e7), rnd.randint(12, 60))
+        for _ in range(n)
+    ]
+
+
+def medir(fn, casos):
+    inicio = time.perf_counter_ns()
+    for caso in casos:
+        fn(*caso)
+    return (time.perf_counter_ns() - inicio) / len(casos)
+
+
+def run():
+    casos = generar_casos(ITERACIONES)
+    motor = MotorReglas.desde_settings(get_settings())
+
+    # Verificación: ambos caminos deciden lo mismo
+    for caso in casos[:10_000]:
+        assert decision_actual(*caso) == motor.evaluar(*caso)[0].estado.value, caso
+
+    ns_actual = medir(decision_actual, casos)
+    ns_motor = medir(motor.evaluar, casos)
+    print(f"Casos evaluados: {ITERACIONES}")
+    print(f"Camino actual : {ns_actual:8.1f} ns/decisión")
+    print(f"MotorReglas   : {ns_motor:8.1f} ns/decisión")
+    print(f"Speedup       : {ns_actual / ns_motor:8.2f}x")
+
+
+if __name__ == "__main__":
+    run()
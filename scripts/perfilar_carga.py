@@ -0,0 +1,86 @@
+"""
+Perfila la app bajo una carga fija, en el mismo proceso (sin servidor).
+
+Levanta la app con TestClient sobre una DB temporal, lanza solicitudes de
+préstamo y consultas de estado desde varios hilos mientras el perfilador de
+muestreo (el mismo de /debug/profile) cuenta pilas de todos los hilos.
+Escribe las pilas en formato "collapsed" junto a docs/test_results.csv e
+imprime las funciones con más muestras propias.
+
+Uso:
+    python scripts/perfilar_carga.py
+    flamegraph.pl docs/profile_<fecha>.collapsed > perfil.svg   (o speedscope)
+"""
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+CONCURRENCIA = int(os.getenv("PERFIL_CONCURRENCIA", "8"))
+REQUESTS = int(os.getenv("PERFIL_REQUESTS", "2000"))
+INTERVALO_MS = float(os.getenv("PERFIL_INTERVALO_MS", "5"))
+DOCS = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "docs"))
+
+
+def _request(client, i):
+    # Mezcla fija: aprobado (cliente 1), rechazado (cliente 3) y poll de estado
+    cliente_id = 1 if i % 2 == 0 else 3
+    r = client.post("/api/prestamos/solicitar", json={
+        "cliente_id": cliente_id, "monto_solicitado": 5_000_000, "plazo_meses": 12,
+    })
+    if r.status_code == 200:
+        client.get(f"/api/prestamos/{r.json()['id']}/estado")
+    return r.status_code
+
+
+def _propias(conteos: Counter, top: int = 15):
+    """Muestras por función hoja (tiempo propio)"""
+    hojas = Counter()
+    for pila, n in conteos.items():
+        hojas[pila.rsplit(";", 1)[-1]] += n
+    return hojas.most_common(top)
+
+
+def run():
+    with tempfile.TemporaryDirectory() as tmp:
+        # Antes de importar la app: la configuración se lee al importar
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'perfil.db')}"
+        os.environ["AUDITORIA_DIRECTORIO"] = os.path.join(tmp, "auditoria")
+        os.environ.setdefault("ADMISION_HABILITADA", "false")
+        os.environ.setdefault("LOG_NIVEL", "WARNING")
+
+        from fastapi.testclient import TestClient
+        from app.main import app
+        from app.services.perfilador import PerfiladorMuestreo, a_colapsado
+
+        perfilador = PerfiladorMuestreo(INTERVALO_MS)
+        with TestClient(app) as client:
+            _request(client, 0)  # calentamiento (motor de reglas, conexiones)
+            inicio = time.perf_counter()
+            perfilador.iniciar()
+            try:
+                with ThreadPoolExecutor(max_workers=CONCURRENCIA) as ex:
+                    estados = Counter(ex.map(lambda i: _request(client, i), range(REQUESTS)))
+            finally:
+                conteos = perfilador.detener()
+            segundos = time.perf_counter() - inicio
+
+    ruta = os.path.join(DOCS, f"profile_{time.strftime('%Y%m%d_%H%M%S', time.gmtime())}.collapsed")
+    os.makedirs(DOCS, exist_ok=True)
+    with open(ruta, "w", encoding="utf-8") as f:
+        f.write(a_colapsado(conteos))
+
+    print(f"{REQUESTS} solicitudes en {segundos:.2f}s ({REQUESTS / segundos:.1f} req/s), estados={dict(estados)}")
+    print(f"{perfilador.muestras} muestras cada {INTERVALO_MS} ms -> {ruta}")
+    total = sum(conteos.values()) or 1
+    print("Funciones con más muestras propias (todos los hilos, incluye esperas):")
+    for funcion, n in _propias(conteos):
+        print(f"  {n / total:6.1%}  {funcion}")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,42 @@
+"""
+Recalcula la tabla estadisticas_cartera desde prestamos en una sola pasada.
+
+Usar después de cargas masivas que no pasaron por el ORM o si se sospecha
+que los agregados se desincronizaron. Lee prestamos en streaming (yield_per),
+así la memoria no crece con el tamaño de la cartera.
+
+Uso:
+    python scripts/reconstruir_estadisticas.py
+    DATABASE_URL=sqlite:///./otra.db python scripts/reconstruir_estadisticas.py
+
+Con DATABASE_SHARDS > 1 reconstruye los agregados de cada shard.
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.config import get_settings
+from app.database import SessionLocal, init_db
+from app.services.estadisticas_service import EstadisticasService
+from app.shards import fabricas_de_sesion, iniciar_shards, urls_shards
+
+TAMANO_LOTE = int(os.getenv("ESTADISTICAS_TAMANO_LOTE", "5000"))
+
+
+def run():
+    init_db()
+    settings = get_settings()
+    if settings.DATABASE_SHARDS > 1:
+        iniciar_shards(urls_shards(settings))
+    inicio = time.perf_counter()
+    procesados = 0
+    for fabrica in fabricas_de_sesion(SessionLocal):
+        with fabrica() as db:
+            procesados += EstadisticasService().reconstruir(db, tamano_lote=TAMANO_LOTE)
+    print(f"✅ Agregados reconstruidos: {procesados} préstamos en {time.perf_counter() - inicio:.2f}s")
+
+
+if __name__ == "__main__":
+    run()
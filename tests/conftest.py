@@ -1,31 +1,20 @@
+import sqlite3
+
 import pytest
+from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
-from app.database import Base
+from sqlalchemy.pool import StaticPool
+from app.config import config_store
+from app.database import Base, get_db, get_read_db
 from app.models.cliente import Cliente, EstadoCliente
 
-@pytest.fixture
-def setup_db():
-    """
-    Crea DB en memoria para cada test.
-    IMPORTANTE: Cada test tiene su propia instancia aislada.
-    """
-    # Crear engine temporal para tests
-    SQLALCHEMY_TEST_DATABASE_URL = "sqlite:///:memory:"
-    engine = create_engine(
-        SQLALCHEMY_TEST_DATABASE_URL,
-        connect_args={"check_same_thread": False}
-    )
-    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-    
-    # Crear tablas
-    Base.metadata.create_all(bind=engine)
-    db = TestingSessionLocal()
-    
+
+def _clientes_seed():
     # Datos demo (mismo seed que startup)
-    clientes = [
+    return [
         Cliente(id=1, nombre="Juan Pérez", identificacion="1234567890",
-                email="juan@test.com", score_cifin=750, 
+                email="juan@test.com", score_cifin=750,
                 ingresos_mensuales=5_000_000, estado=EstadoCliente.ACTIVO),
         Cliente(id=2, nombre="María López", identificacion="0987654321",
                 email="maria@test.com", score_cifin=None,
@@ -37,11 +26,99 @@ def setup_db():
                 email="ana@test.com", score_cifin=650,
                 ingresos_mensuales=4_000_000, estado=EstadoCliente.BLOQUEADO),
     ]
-    
-    db.add_all(clientes)
+
+
+def _engine_memoria(creator):
+    # StaticPool: una sola conexión, así el threadpool de TestClient ve la misma DB en memoria
+    return create_engine("sqlite://", creator=creator, poolclass=StaticPool)
+
+
+def _conexion_memoria():
+    return sqlite3.connect(":memory:", check_same_thread=False)
+
+
+@pytest.fixture(scope="session")
+def db_plantilla():
+    """
+    DB en memoria con el esquema y el seed, construida una sola vez por sesión.
+    Los tests nunca la usan directo: reciben una copia (ver setup_db).
+    """
+    conexion = _conexion_memoria()
+    engine = _engine_memoria(lambda: conexion)
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    db.add_all(_clientes_seed())
     db.commit()
-    
+    db.close()
+    yield conexion
+    engine.dispose()
+    conexion.close()
+
+
+@pytest.fixture
+def setup_db(db_plantilla):
+    """
+    Crea DB en memoria para cada test.
+    IMPORTANTE: Cada test tiene su propia instancia aislada.
+
+    La copia se hace con la API de backup de SQLite desde la plantilla de la
+    sesión: copiar páginas es mucho más barato que create_all + seed, y el
+    costo no crece con la cantidad de tests.
+    """
+    conexion = _conexion_memoria()
+    db_plantilla.backup(conexion)
+    engine = _engine_memoria(lambda: conexion)
+    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    db = TestingSessionLocal()
+
     yield db
-    
+
     db.close()
-    Base.metadata.drop_all(bind=engine)
+    engine.dispose()
+    conexion.close()
+
+
+@pytest.fixture
+def client(setup_db):
+    """TestClient con get_db/get_read_db apuntando a la DB aislada del test"""
+    from app.main import app
+    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=setup_db.get_bind())
+
+    def override_get_db():
+        db = TestingSessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_read_db] = override_get_db
+    yield TestClient(app)
+    app.dependency_overrides.pop(get_db, None)
+    app.dependency_overrides.pop(get_read_db, None)
+
+
+@pytest.fixture(autouse=True)
+def limpiar_bureau_cache():
+    """El cache de bureau es del proceso: no debe filtrar resultados entre tests"""
+    from app.services.bureau_cache import bureau_cache
+    bureau_cache.limpiar()
+    yield
+    bureau_cache.limpiar()
+
+
+@pytest.fixture(autouse=True)
+def limpiar_versiones_prestamo():
+    """Las versiones (ETag) son del proceso y los ids se repiten entre DBs de test"""
+    from app.services.versiones_prestamo import versiones_prestamo
+    versiones_prestamo.limpiar()
+    yield
+    versiones_prestamo.limpiar()
+
+
+@pytest.fixture
+def restaurar_config():
+    """Permite publicar otro snapshot de Settings en el test; al final vuelve el original"""
+    original = config_store.actual
+    yield original
+    config_store.reemplazar(original)
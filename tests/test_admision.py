@@ -0,0 +1,141 @@
+import asyncio
+
+import httpx
+from fastapi import FastAPI
+from app.admision import (
+    Clase, ControlAdmision, MiddlewareAdmision, CLASE_LECTURA, CLASE_ESCRITURA, CLASE_MASIVA,
+)
+
+
+def _control(max_total=1, max_cola=10, espera=1.0):
+    return ControlAdmision(
+        [Clase(CLASE_LECTURA, 0, 10, max_cola, espera), Clase(CLASE_ESCRITURA, 1, 10, max_cola, espera),
+         Clase(CLASE_MASIVA, 2, 10, max_cola, espera)],
+        max_total=max_total,
+        retry_after=3,
+    )
+
+
+def test_clasifica_rutas():
+    control = _control()
+    assert control.clasificar("GET", "/health") is None
+    assert control.clasificar("GET", "/api/prestamos/1/eventos") is None
+    assert control.clasificar("GET", "/api/prestamos/1/estado").nombre == CLASE_LECTURA
+    assert control.clasificar("POST", "/api/prestamos/solicitar").nombre == CLASE_ESCRITURA
+    assert control.clasificar("PATCH", "/api/prestamos/7/estado").nombre == CLASE_ESCRITURA
+    assert control.clasificar("POST", "/api/prestamos/amortizacion/lote").nombre == CLASE_LECTURA
+    assert control.clasificar("POST", "/api/clientes/import").nombre == CLASE_MASIVA
+    assert control.clasificar("POST", "/api/jobs").nombre == CLASE_MASIVA
+    # Sin entrada en la tabla: por método
+    assert control.clasificar("POST", "/api/jobs/abc/cancelar").nombre == CLASE_ESCRITURA
+
+
+def test_cancelar_en_cola_no_pierde_el_lugar():
+    async def escenario():
+        control = _control(max_total=1)
+        escritura = control.clases[CLASE_ESCRITURA]
+        assert await control.adquirir(escritura)
+        # Cancelado mientras espera en cola
+        cancelado = asyncio.ensure_future(control.adquirir(escritura))
+        await asyncio.sleep(0)
+        cancelado.cancel()
+        # Cancelado justo después de que `_despachar` le ocupó el lugar
+        despachado = asyncio.ensure_future(control.adquirir(escritura))
+        await asyncio.sleep(0)
+        control.liberar(escritura)
+        despachado.cancel()
+        for tarea in (cancelado, despachado):
+            try:
+                await tarea
+            except asyncio.CancelledError:
+                pass
+        return control.activos, len(escritura.cola), await control.adquirir(escritura)
+
+    activos, en_cola, admitido = asyncio.run(escenario())
+    assert (activos, en_cola, admitido) == (0, 0, True)
+
+
+def test_cola_llena_y_presupuesto_de_espera_descartan():
+    async def escenario():
+        control = _control(max_cola=1, espera=0.05)
+        escritura = control.clases[CLASE_ESCRITURA]
+        assert await control.adquirir(escritura)
+        en_cola = asyncio.ensure_future(control.adquirir(escritura))
+        await asyncio.sleep(0)
+        # Cola llena: descarte inmediato
+        assert not await control.adquirir(escritura)
+        # El encolado agota su presupuesto de espera
+        assert not await en_cola
+        return control.metricas()["clases"][CLASE_ESCRITURA]
+
+    metricas = asyncio.run(escenario())
+    assert metricas["descartados_cola_llena"] == 1
+    assert metricas["descartados_espera"] == 1
+    assert metricas["en_cola"] == 0
+    assert metricas["activos"] == 1
+
+
+def test_lecturas_se_despachan_antes_que_escrituras():
+    async def escenario():
+        control = _control(max_total=1)
+        lectura, escritura = control.clases[CLASE_LECTURA], control.clases[CLASE_ESCRITURA]
+        assert await control.adquirir(escritura)
+        orden = []
+
+        async def esperar(clase):
+            assert await control.adquirir(clase)
+            orden.append(clase.nombre)
+            await asyncio.sleep(0)
+            control.liberar(clase)
+
+        tareas = [asyncio.ensure_future(esperar(escritura)), asyncio.ensure_future(esperar(lectura))]
+        await asyncio.sleep(0)
+        control.liberar(escritura)
+        await asyncio.gather(*tareas)
+        return orden, control.activos
+
+    orden, activos = asyncio.run(escenario())
+    assert orden == [CLASE_LECTURA, CLASE_ESCRITURA]
+    assert activos == 0
+
+
+def test_middleware_responde_503_con_retry_after_y_health_sigue_libre():
+    control = _control(max_total=1, max_cola=0)
+    app = FastAPI()
+    liberar = asyncio.Event()
+
+    @app.post("/lento")
+    async def lento():
+        await liberar.wait()
+        return {"ok": True}
+
+    @app.get("/health")
+    async def health():
+        return {"status": "OK"}
+
+    app.add_middleware(MiddlewareAdmision, control=control)
+
+    async def escenario():
+        transporte = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transporte, base_url="http://test") as cliente:
+            ocupado = asyncio.ensure_future(cliente.post("/lento"))
+            while control.activos == 0:
+                await asyncio.sleep(0.001)
+            descartado = await cliente.post("/lento")
+            health = await cliente.get("/health")
+            liberar.set()
+            return (await ocupado), descartado, health
+
+    ocupado, descartado, health = asyncio.run(escenario())
+    assert ocupado.status_code == 200
+    assert descartado.status_code == 503
+    assert descartado.headers["retry-after"] == "3"
+    assert health.status_code == 200
+    assert control.activos == 0
+    assert control.metricas()["clases"][CLASE_ESCRITURA]["descartados_cola_llena"] == 1
+
+
+def test_endpoint_de_metricas(client):
+    data = client.get("/api/admision/metricas").json()
+    assert set(data["clases"]) == {CLASE_LECTURA, CLASE_ESCRITURA, CLASE_MASIVA}
+    assert data["clases"][CLASE_LECTURA]["en_cola"] == 0
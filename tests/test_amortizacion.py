@@ -0,0 +1,90 @@
+import json
+
+import numpy as np
+import pytest
+from app.services.amortizacion_service import tabla_amortizacion, tablas_amortizacion
+from app.services.motor_reglas import factor_amortizacion
+
+
+def _tabla_iterativa(monto, plazo, tasa_anual):
+    """Cálculo mes a mes de referencia"""
+    r = tasa_anual / 12
+    cuota = monto * factor_amortizacion(plazo, tasa_anual)
+    saldo, filas = monto, []
+    for _ in range(plazo):
+        interes = saldo * r
+        saldo -= cuota - interes
+        filas.append((cuota, interes, cuota - interes, saldo))
+    return np.array(filas)
+
+
+@pytest.mark.parametrize("monto,plazo", [(10_000_000, 24), (1_500_000, 12), (49_000_000, 60)])
+def test_tabla_vectorizada_equivale_a_iterativa(monto, plazo):
+    tabla = tabla_amortizacion(monto, plazo, 0.15)
+    esperado = _tabla_iterativa(monto, plazo, 0.15)
+    assert np.allclose(tabla[:, :3], esperado[:, :3])
+    assert np.allclose(tabla[:, 3], esperado[:, 3], atol=1e-4)
+    assert tabla[-1, 3] == 0.0
+    assert tabla[:, 2].sum() == pytest.approx(monto)
+
+
+def test_tabla_cacheada_y_solo_lectura():
+    tabla = tabla_amortizacion(7_000_000, 36, 0.15)
+    assert tabla_amortizacion(7_000_000, 36, 0.15) is tabla
+    with pytest.raises(ValueError):
+        tabla[0, 0] = 1
+
+
+def test_tablas_lote_equivalen_a_individuales():
+    montos, plazos = [10_000_000, 2_000_000, 5_000_000], [24, 12, 60]
+    tablas = tablas_amortizacion(montos, plazos, [0.15, 0.15, 0.0])
+    assert tablas.shape == (3, 60, 4)
+    for i, (monto, plazo) in enumerate(zip(montos[:2], plazos[:2])):
+        assert np.allclose(tablas[i, :plazo], tabla_amortizacion(monto, plazo, 0.15))
+        assert not tablas[i, plazo:].any()
+    # Tasa 0: cuota = monto / plazo
+    assert np.allclose(tablas[2, :, 0], 5_000_000 / 60)
+
+
+def test_endpoint_amortizacion(client):
+    prestamo = client.post("/api/prestamos/solicitar", json={
+        "cliente_id": 1, "monto_solicitado": 10_000_000, "plazo_meses": 24
+    }).json()
+
+    response = client.get(f"/api/prestamos/{prestamo['id']}/amortizacion")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["tasa_interes"] == 15
+    assert len(data["cuotas"]) == 24
+    assert data["cuota_mensual"] == pytest.approx(prestamo["cuota_mensual"], abs=0.01)
+    assert data["cuotas"][-1]["saldo"] == 0
+
+    response = client.get(f"/api/prestamos/{prestamo['id']}/amortizacion?stream=true")
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lineas = [json.loads(linea) for linea in response.text.splitlines()]
+    assert lineas == data["cuotas"]
+
+
+def test_endpoint_amortizacion_errores(client):
+    rechazado = client.post("/api/prestamos/solicitar", json={
+        "cliente_id": 3, "monto_solicitado": 5_000_000, "plazo_meses": 12
+    }).json()
+    assert client.get(f"/api/prestamos/{rechazado['id']}/amortizacion").status_code == 400
+    assert client.get("/api/prestamos/999/amortizacion").status_code == 404
+
+
+def test_endpoint_amortizacion_lote(client):
+    ids = [
+        client.post("/api/prestamos/solicitar", json={
+            "cliente_id": 1, "monto_solicitado": monto, "plazo_meses": plazo
+        }).json()["id"]
+        for monto, plazo in [(10_000_000, 24), (3_000_000, 12)]
+    ]
+    response = client.post("/api/prestamos/amortizacion/lote", json={"prestamo_ids": ids + [999]})
+    assert response.status_code == 200
+    data = response.json()
+    assert [t["prestamo_id"] for t in data["tablas"]] == ids
+    assert [len(t["cuotas"]) for t in data["tablas"]] == [24, 12]
+    assert data["no_disponibles"] == [999]
+    individual = client.get(f"/api/prestamos/{ids[1]}/amortizacion").json()
+    assert data["tablas"][1] == individual
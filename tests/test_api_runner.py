@@ -0,0 +1,76 @@
+import pytest
+from sqlalchemy.orm import sessionmaker
+from api_tests import test_runner as runner
+from app import database
+from app.models.cliente import Cliente, EstadoCliente
+
+
+CSV_CASOS = """ID,Escenario,Pre-condiciones,Pasos,Resultado Esperado
+C-1,Consulta,"Cliente en BD: id=1001; score_cifin=720; estado=activo","POST /api/bureau/consultar {cliente_id:1001, forzar:true}",200 OK; score=720; tiene_historial=true
+C-2,Bloqueado,"Cliente en BD: id=1002; estado=bloqueado","POST /api/bureau/consultar {cliente_id:1002}",403 Forbidden; detalle 'lista de riesgo'
+C-3,Estado,"Seed: préstamo 1 creado previamente","GET /api/prestamos/1/estado",200 OK; id=1; tiempo de respuesta < 300ms
+C-4,Falla externa,"Simular caída del bureau","POST /api/bureau/consultar {cliente_id:1}",502/503
+C-5,Manual,"","1) Iniciar sesión; 2) Confirmar",200 OK
+"""
+
+
+@pytest.fixture
+def casos(tmp_path):
+    ruta = tmp_path / "suite_demo.csv"
+    ruta.write_text(CSV_CASOS, encoding="utf-8")
+    return runner.cargar_casos([str(ruta), str(tmp_path / "no_existe.csv")])
+
+
+def test_carga_casos_desde_csv(casos):
+    assert [c.id for c in casos] == ["C-1", "C-2", "C-3", "C-4", "C-5"]
+    consulta, bloqueado, estado, externa, manual = casos
+
+    assert (consulta.suite, consulta.metodo, consulta.ruta) == ("suite_demo", "POST", "/api/bureau/consultar")
+    assert consulta.cuerpo == {"cliente_id": 1001, "forzar": True}
+    assert consulta.status_esperados == [200]
+    assert consulta.campos == [("score", "=", "720"), ("tiene_historial", "=", "true")]
+    assert consulta.cliente_bd == {"id": 1001, "score_cifin": 720, "estado": "activo"}
+    assert bloqueado.textos == ["lista de riesgo"]
+
+    assert estado.depende_de_otros and not consulta.depende_de_otros
+    assert estado.latencia_max_ms == 300
+    assert externa.status_esperados == [] and "simular" in externa.motivo_omitido
+    assert manual.metodo is None and manual.motivo_omitido
+
+
+def test_validar(casos):
+    consulta = casos[0]
+    assert runner.validar(consulta, 200, {"score": 720, "tiene_historial": True})[0]
+    assert runner.validar(consulta, 200, {"score": 700, "tiene_historial": True}) == (False, "Status 200, score=700")
+    assert runner.validar(consulta, 503, {}) == (False, "Status 503")
+    assert not runner.validar(consulta, None, None)[0]
+    assert runner.validar(casos[1], 403, {"detail": "Cliente en Lista de Riesgo"})[0]
+
+
+def test_percentil_interpola():
+    valores = [float(v) for v in range(1, 101)]
+    assert runner.percentil([7.0], 99) == 7.0
+    assert runner.percentil(valores, 50) == pytest.approx(50.5)
+    assert runner.percentil(valores, 95) == pytest.approx(95.05)
+    assert runner.percentil(list(reversed(valores)), 100) == 100.0
+
+
+def test_cobertura_cuenta_las_suites_sin_requests():
+    filas = [{"Suite": "bureau", "Estado": "PASS"}, {"Suite": "bureau", "Estado": "SKIP"},
+             {"Suite": "transfers", "Estado": "SKIP"}, {"Suite": "transfers", "Estado": "SKIP"}]
+    assert runner.cobertura_por_suite(filas) == {"bureau": (1, 1), "transfers": (0, 2)}
+
+
+def test_preparar_db_crea_y_actualiza_clientes(casos, setup_db, monkeypatch):
+    monkeypatch.setattr(database, "init_db", lambda: None)
+    monkeypatch.setattr(database, "SessionLocal", sessionmaker(bind=setup_db.get_bind()))
+    setup_db.add(Cliente(id=1002, nombre="Viejo", identificacion="X-1002", email="x@test.com",
+                         ingresos_mensuales=1.0, estado=EstadoCliente.ACTIVO))
+    setup_db.commit()
+
+    runner.preparar_db(casos)
+
+    setup_db.expire_all()
+    nuevo, existente = setup_db.get(Cliente, 1001), setup_db.get(Cliente, 1002)
+    assert (nuevo.score_cifin, nuevo.estado, nuevo.identificacion) == (720, EstadoCliente.ACTIVO, "1001-IDENT")
+    assert (existente.nombre, existente.estado) == ("Test 1002", EstadoCliente.BLOQUEADO)
@@ -0,0 +1,88 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import inspect, select
+from app.models.archivo import ArchivoPrestamosMes
+from app.models.prestamo import Prestamo, EstadoPrestamo
+from app.services.archivo_prestamos import ArchivadorPrestamos, buscar_archivado, tabla_archivo
+from app.services.estadisticas_service import EstadisticasService
+from app.services.prestamo_service import PrestamoService
+
+AHORA = datetime(2026, 6, 15)
+
+
+def _prestamo(estado, dias, **extra):
+    fecha = AHORA - timedelta(days=dias)
+    return Prestamo(cliente_id=1, monto_solicitado=1_000_000, plazo_meses=12, cuota_mensual=90_000.0,
+                    estado=estado, fecha_solicitud=fecha, fecha_decision=fecha, **extra)
+
+
+def _cartera(db):
+    prestamos = {
+        "rechazado_viejo": _prestamo(EstadoPrestamo.RECHAZADO, 400, motivo_rechazo="Score insuficiente"),
+        "desembolsado_viejo": _prestamo(EstadoPrestamo.DESEMBOLSADO, 300),
+        "desembolsado_otro_mes": _prestamo(EstadoPrestamo.DESEMBOLSADO, 250),
+        "aprobado_viejo": _prestamo(EstadoPrestamo.APROBADO, 400),
+        "rechazado_reciente": _prestamo(EstadoPrestamo.RECHAZADO, 10),
+    }
+    db.add_all(prestamos.values())
+    db.commit()
+    return {nombre: p.id for nombre, p in prestamos.items()}
+
+
+def test_archiva_cerrados_antiguos_por_mes(setup_db):
+    ids = _cartera(setup_db)
+    resultado = ArchivadorPrestamos(setup_db, edad_dias=180, tamano_lote=1, ahora=AHORA).ejecutar()
+
+    assert resultado["archivados"] == 3
+    assert resultado["lotes"] == 3
+    activos = set(setup_db.scalars(select(Prestamo.id)))
+    assert activos == {ids["aprobado_viejo"], ids["rechazado_reciente"]}
+
+    catalogo = {m.mes: m for m in setup_db.query(ArchivoPrestamosMes)}
+    assert sorted(catalogo) == resultado["meses"]
+    assert sum(m.filas for m in catalogo.values()) == 3
+    tablas = set(inspect(setup_db.get_bind()).get_table_names())
+    assert {f"prestamos_archivo_{mes}" for mes in catalogo} <= tablas
+
+    # Sin pendientes: una segunda pasada no mueve nada
+    assert ArchivadorPrestamos(setup_db, edad_dias=180, ahora=AHORA).ejecutar()["archivados"] == 0
+
+
+def test_consulta_por_id_cae_al_archivo(setup_db):
+    ids = _cartera(setup_db)
+    ArchivadorPrestamos(setup_db, edad_dias=180, ahora=AHORA).ejecutar()
+
+    archivado = buscar_archivado(setup_db, ids["rechazado_viejo"])
+    assert archivado.estado == EstadoPrestamo.RECHAZADO
+    assert archivado.motivo_rechazo == "Score insuficiente"
+    assert buscar_archivado(setup_db, ids["aprobado_viejo"]) is None
+
+    prestamo = PrestamoService().obtener_estado_prestamo(setup_db, ids["desembolsado_viejo"])
+    assert prestamo.id == ids["desembolsado_viejo"]
+    assert prestamo.estado == EstadoPrestamo.DESEMBOLSADO
+
+
+def test_endpoint_estado_de_prestamo_archivado(client, setup_db):
+    ids = _cartera(setup_db)
+    ArchivadorPrestamos(setup_db, edad_dias=180, ahora=AHORA).ejecutar()
+
+    response = client.get(f"/api/prestamos/{ids['desembolsado_otro_mes']}/estado")
+    assert response.status_code == 200
+    assert response.json()["estado"] == "desembolsado"
+    assert response.headers["etag"]
+    assert client.get("/api/prestamos/99999/estado").status_code == 404
+
+
+def test_agregados_incluyen_archivados(setup_db):
+    _cartera(setup_db)
+    antes = EstadisticasService().resumen(setup_db)
+    ArchivadorPrestamos(setup_db, edad_dias=180, ahora=AHORA).ejecutar()
+    assert EstadisticasService().resumen(setup_db) == antes
+
+    assert EstadisticasService().reconstruir(setup_db) == 5
+    assert EstadisticasService().resumen(setup_db) == antes
+
+
+def test_tabla_archivo_se_reutiliza():
+    assert tabla_archivo("202401") is tabla_archivo("202401")
+    assert [c.name for c in tabla_archivo("202401").columns] == [c.name for c in Prestamo.__table__.columns]
@@ -0,0 +1,225 @@
+import os
+
+import pytest
+from app.services import auditoria_decisiones
+from app.services.auditoria_decisiones import (
+    ARCHIVO_ACTIVO, AuditoriaDecisiones, detener_auditoria, iniciar_auditoria,
+)
+
+
+def _registro(prestamo_id, **extra):
+    return {"prestamo_id": prestamo_id, "resultado": {"estado": "aprobado"}, **extra}
+
+
+@pytest.fixture
+def auditor(tmp_path):
+    auditor = AuditoriaDecisiones(str(tmp_path), intervalo_fsync_ms=1)
+    auditor.iniciar()
+    yield auditor
+    auditor.detener()
+
+
+def test_registros_se_encuentran_y_sobreviven_reinicio(tmp_path, auditor):
+    """Lo escrito en el archivo activo se busca por préstamo y se recupera al rearrancar"""
+    for prestamo_id in (1, 2, 1):
+        assert auditor.registrar(_registro(prestamo_id, orden=prestamo_id))
+    auditor.vaciar()
+    assert len(auditor.buscar(1)) == 2
+    assert auditor.buscar(3) == []
+    auditor.detener()
+
+    nuevo = AuditoriaDecisiones(str(tmp_path))
+    nuevo.iniciar()
+    try:
+        assert [r["orden"] for r in nuevo.buscar(1)] == [1, 1]
+        assert len(nuevo.buscar(2)) == 1
+    finally:
+        nuevo.detener()
+
+
+def test_rotacion_sella_segmentos_comprimidos(tmp_path):
+    """Con segmentos chicos, los registros quedan repartidos en .gz y se siguen encontrando en orden"""
+    auditor = AuditoriaDecisiones(str(tmp_path), segmento_max_bytes=2_000, registros_por_bloque=4,
+                                  intervalo_fsync_ms=1)
+    auditor.iniciar()
+    try:
+        for i in range(200):
+            auditor.registrar(_registro(i % 20, secuencia=i))
+        auditor.vaciar()
+        assert auditor.metricas()["segmentos_sellados"] > 0
+        assert any(nombre.endswith(".ndjson.gz") for nombre in os.listdir(tmp_path))
+        assert [r["secuencia"] for r in auditor.buscar(7)] == list(range(7, 200, 20))
+    finally:
+        auditor.detener()
+
+    # Tras reiniciar se leen los índices del disco
+    nuevo = AuditoriaDecisiones(str(tmp_path), segmento_max_bytes=2_000)
+    nuevo.iniciar()
+    try:
+        assert [r["secuencia"] for r in nuevo.buscar(7)] == list(range(7, 200, 20))
+    finally:
+        nuevo.detener()
+
+
+def test_falla_al_sellar_no_pierde_el_activo(tmp_path, monkeypatch):
+    """Sin espacio al comprimir: el activo sigue abierto y el sellado se reintenta"""
+    auditor = AuditoriaDecisiones(str(tmp_path), segmento_max_bytes=200, intervalo_fsync_ms=1)
+    auditor.iniciar()
+
+    def sin_espacio(datos):
+        raise OSError(28, "No space left on device")
+
+    try:
+        with monkeypatch.context() as m:
+            m.setattr(auditoria_decisiones.gzip, "compress", sin_espacio)
+            for i in range(10):
+                auditor.registrar(_registro(1, secuencia=i))
+            auditor.vaciar()
+            assert auditor.metricas()["errores_escritura"] > 0
+            assert auditor.metricas()["segmentos_sellados"] == 0
+            assert not any(nombre.endswith(".tmp") for nombre in os.listdir(tmp_path))
+        assert auditor.registrar(_registro(1, secuencia=10))
+        auditor.vaciar()
+        assert auditor.activo
+        assert auditor.metricas()["segmentos_sellados"] == 1
+        assert [r["secuencia"] for r in auditor.buscar(1)] == list(range(11))
+    finally:
+        auditor.detener()
+
+
+def test_falla_de_escritura_descarta_la_tanda_y_sigue(tmp_path, monkeypatch):
+    auditor = AuditoriaDecisiones(str(tmp_path), intervalo_fsync_ms=1)
+    auditor.iniciar()
+    fsync = os.fsync
+
+    def falla_una_vez(fd):
+        monkeypatch.setattr(auditoria_decisiones.os, "fsync", fsync)
+        raise OSError(28, "No space left on device")
+
+    try:
+        auditor.registrar(_registro(1, secuencia=0))
+        auditor.vaciar()
+        monkeypatch.setattr(auditoria_decisiones.os, "fsync", falla_una_vez)
+        auditor.registrar(_registro(1, secuencia=1))
+        auditor.vaciar()
+        auditor.registrar({"sin_prestamo_id": True})
+        auditor.vaciar()
+        auditor.registrar(_registro(1, secuencia=2))
+        auditor.vaciar()
+        assert auditor.activo
+        assert auditor.metricas()["descartados"] == 2
+        assert [r["secuencia"] for r in auditor.buscar(1)] == [0, 2]
+    finally:
+        auditor.detener()
+    assert (tmp_path / ARCHIVO_ACTIVO).read_bytes().count(b"\n") == 2
+
+
+def test_caida_tras_publicar_el_segmento_no_duplica(tmp_path, monkeypatch):
+    """Caída entre publicar el segmento y vaciar el activo: al arrancar no se reindexa lo sellado"""
+    auditor = AuditoriaDecisiones(str(tmp_path), intervalo_fsync_ms=1)
+    auditor.iniciar()
+    for i in range(5):
+        auditor.registrar(_registro(1, secuencia=i))
+    auditor.vaciar()
+    abrir = open
+
+    def cae_al_vaciar(ruta, modo="r", *args, **kwargs):
+        if modo == "wb" and ruta.endswith(ARCHIVO_ACTIVO):
+            raise OSError("caída simulada")
+        return abrir(ruta, modo, *args, **kwargs)
+
+    with monkeypatch.context() as m:
+        m.setattr(auditoria_decisiones, "open", cae_al_vaciar, raising=False)
+        with pytest.raises(OSError):
+            auditor._sellar()
+    auditor.detener()
+    assert (tmp_path / "000001.idx.json").exists()
+    assert (tmp_path / ARCHIVO_ACTIVO).stat().st_size > 0
+
+    nuevo = AuditoriaDecisiones(str(tmp_path), segmento_max_bytes=200, intervalo_fsync_ms=1)
+    nuevo.iniciar()
+    try:
+        assert (tmp_path / ARCHIVO_ACTIVO).stat().st_size == 0
+        assert [r["secuencia"] for r in nuevo.buscar(1)] == list(range(5))
+        # El próximo segmento solo lleva lo nuevo
+        for i in range(5, 10):
+            nuevo.registrar(_registro(1, secuencia=i))
+        nuevo.vaciar()
+        assert nuevo.metricas()["segmentos"] == 2
+        assert [r["secuencia"] for r in nuevo.buscar(1)] == list(range(10))
+    finally:
+        nuevo.detener()
+
+
+def test_arranque_sella_el_activo_que_quedo_grande(tmp_path):
+    auditor = AuditoriaDecisiones(str(tmp_path), intervalo_fsync_ms=1)
+    auditor.iniciar()
+    for i in range(10):
+        auditor.registrar(_registro(2, secuencia=i))
+    auditor.vaciar()
+    auditor.detener()
+
+    nuevo = AuditoriaDecisiones(str(tmp_path), segmento_max_bytes=200)
+    nuevo.iniciar()
+    try:
+        assert nuevo.metricas()["segmentos_sellados"] == 1
+        assert (tmp_path / ARCHIVO_ACTIVO).stat().st_size == 0
+        assert [r["secuencia"] for r in nuevo.buscar(2)] == list(range(10))
+    finally:
+        nuevo.detener()
+
+
+def test_linea_incompleta_se_descarta_al_arrancar(tmp_path):
+    """Una caída a mitad de escritura deja una línea cortada: se trunca y se sigue escribiendo"""
+    ruta = tmp_path / ARCHIVO_ACTIVO
+    ruta.write_bytes(b'{"prestamo_id": 5, "n": 1}\n{"prestamo_id": 5, "n"')
+    auditor = AuditoriaDecisiones(str(tmp_path), intervalo_fsync_ms=1)
+    auditor.iniciar()
+    try:
+        auditor.registrar({"prestamo_id": 5, "n": 2})
+        auditor.vaciar()
+        assert [r["n"] for r in auditor.buscar(5)] == [1, 2]
+    finally:
+        auditor.detener()
+
+
+def test_cola_llena_descarta_sin_bloquear(tmp_path):
+    """Sin hilo que consuma, la cola acotada descarta y lo cuenta"""
+    auditor = AuditoriaDecisiones(str(tmp_path), max_pendientes=1)
+    auditor._hilo = _HiloSinConsumir()
+    assert auditor.registrar(_registro(1))
+    assert not auditor.registrar(_registro(2))
+    assert auditor.metricas()["descartados"] == 1
+
+
+class _HiloSinConsumir:
+    def is_alive(self):
+        return True
+
+
+def test_solicitud_queda_auditada(client, tmp_path):
+    """Cada decisión deja entradas, umbrales y regla; el endpoint la devuelve"""
+    iniciar_auditoria(str(tmp_path), intervalo_fsync_ms=1)
+    try:
+        response = client.post("/api/prestamos/solicitar", json={
+            "cliente_id": 1, "monto_solicitado": 5_000_000, "plazo_meses": 12,
+        })
+        assert response.status_code == 200
+        prestamo_id = response.json()["id"]
+        auditoria_decisiones.auditoria_decisiones.vaciar()
+
+        response = client.get(f"/api/prestamos/{prestamo_id}/auditoria")
+        assert response.status_code == 200
+        registro, = response.json()["registros"]
+        assert registro["entradas"]["score_cifin"] == 750
+        assert registro["entradas"]["monto_solicitado"] == 5_000_000
+        assert registro["umbrales"]["score_rechazo"] is not None
+        assert registro["resultado"]["estado"] == "aprobado"
+
+        assert client.get("/api/prestamos/9999/auditoria").status_code == 404
+    finally:
+        detener_auditoria()
+
+
+def test_auditoria_deshabilitada(client):
+    assert client.get("/api/prestamos/1/auditoria").status_code == 503
@@ -0,0 +1,112 @@
+import pytest
+from sqlalchemy.orm import sessionmaker
+from app.models.cliente import Cliente, EstadoCliente
+from app.services.bureau_cache import BureauCache
+from app.services.bureau_service import BureauService
+
+
+class RelojFalso:
+    def __init__(self):
+        self.ahora = 0.0
+
+    def __call__(self):
+        return self.ahora
+
+
+@pytest.fixture
+def reloj():
+    return RelojFalso()
+
+
+@pytest.fixture
+def cache(setup_db, reloj):
+    factory = sessionmaker(bind=setup_db.get_bind())
+    c = BureauCache(session_factory=factory, ttl_fresco=10, ttl_maximo=100,
+                    ttl_negativo=5, max_entradas=2, reloj=reloj)
+    yield c
+    c._executor.shutdown(wait=True)
+
+
+def test_cache_hit_no_consulta_proveedor(setup_db, cache):
+    llamadas = []
+    def cargar(db, cliente_id):
+        llamadas.append(cliente_id)
+        return {"cliente_id": cliente_id}
+
+    assert cache.obtener(setup_db, 1, cargar) == {"cliente_id": 1}
+    assert cache.obtener(setup_db, 1, cargar) == {"cliente_id": 1}
+    assert llamadas == [1]
+    assert cache.metricas()["hits"] == 1
+    assert cache.metricas()["misses"] == 1
+
+
+def test_cache_stale_while_revalidate(setup_db, cache, reloj):
+    service = BureauService(cache=cache)
+    assert service.consultar_score(setup_db, 1)["score"] == 750
+
+    # Cambia el score en la DB; la entrada vieja se sirve y se refresca en background
+    cliente = setup_db.get(Cliente, 1)
+    cliente.score_cifin = 800
+    setup_db.commit()
+    reloj.ahora = 50
+
+    assert service.consultar_score(setup_db, 1)["score"] == 750
+    cache._executor.shutdown(wait=True)
+    assert service.consultar_score(setup_db, 1)["score"] == 800
+    assert cache.metricas()["hits_viejos"] == 1
+    assert cache.metricas()["refrescos"] == 1
+
+
+def test_cache_negativo_cliente_no_encontrado(setup_db, cache, reloj):
+    service = BureauService(cache=cache)
+    with pytest.raises(ValueError, match="no encontrado"):
+        service.consultar_score(setup_db, 999)
+    with pytest.raises(ValueError, match="no encontrado"):
+        service.consultar_score(setup_db, 999)
+    assert cache.metricas()["hits_negativos"] == 1
+
+    reloj.ahora = 6
+    with pytest.raises(ValueError):
+        service.consultar_score(setup_db, 999)
+    assert cache.metricas()["misses"] == 2
+
+
+def test_bloqueo_se_verifica_fuera_del_cache(setup_db, cache, reloj):
+    service = BureauService(cache=cache)
+    with pytest.raises(ValueError, match="bloqueada"):
+        service.consultar_score(setup_db, 4)
+
+    primera = service.consultar_score(setup_db, 1)
+    reloj.ahora = 1
+    assert service.consultar_score(setup_db, 1)["fecha_consulta"] >= primera["fecha_consulta"]
+    # Bloqueado con el resultado todavía fresco en el cache
+    setup_db.get(Cliente, 1).estado = EstadoCliente.BLOQUEADO
+    setup_db.commit()
+    with pytest.raises(ValueError, match="bloqueada"):
+        service.consultar_score(setup_db, 1)
+    assert cache.metricas()["hits"] == 2
+
+
+def test_cambio_de_estado_invalida_cache_compartido(setup_db, monkeypatch):
+    from app.services import bureau_service
+    invalidados = []
+    monkeypatch.setattr(bureau_service.bureau_cache, "invalidar", invalidados.append)
+
+    cliente = setup_db.get(Cliente, 1)
+    cliente.score_cifin = 760
+    setup_db.commit()
+    assert invalidados == []
+    cliente.estado = EstadoCliente.BLOQUEADO
+    setup_db.commit()
+    assert invalidados == [1]
+
+
+def test_cache_desalojo_lru(setup_db, cache):
+    service = BureauService(cache=cache)
+    service.consultar_score(setup_db, 1)
+    service.consultar_score(setup_db, 2)
+    service.consultar_score(setup_db, 1)  # 1 pasa a ser el más reciente
+    service.consultar_score(setup_db, 3)  # desaloja al 2
+
+    assert cache.metricas()["desalojos"] == 1
+    assert set(cache._entradas) == {1, 3}
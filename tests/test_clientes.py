@@ -0,0 +1,73 @@
+from sqlalchemy import event
+from app.models.prestamo import Prestamo, EstadoPrestamo
+from app.services.cliente_service import ClienteService
+
+
+class ContadorSentencias:
+    def __init__(self, engine):
+        self.engine = engine
+        self.total = 0
+
+    def _contar(self, *args):
+        self.total += 1
+
+    def __enter__(self):
+        event.listen(self.engine, "before_cursor_execute", self._contar)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, "before_cursor_execute", self._contar)
+
+
+def _agregar_prestamos(db, cliente_id, cantidad):
+    db.add_all([
+        Prestamo(cliente_id=cliente_id, monto_solicitado=1_000_000 * (i + 1), plazo_meses=12,
+                 cuota_mensual=90_000.0, estado=EstadoPrestamo.APROBADO)
+        for i in range(cantidad)
+    ])
+    db.commit()
+
+
+def _sentencias_resumen(db, cliente_id):
+    db.expire_all()
+    with ContadorSentencias(db.get_bind()) as contador:
+        resumen = ClienteService().obtener_resumen(db, cliente_id)
+        # Acceder a todo lo que serializa la respuesta no debe disparar más consultas
+        [(p.id, p.estado, p.cuota_mensual) for p in resumen["prestamos"]]
+    return contador.total, resumen
+
+
+def test_resumen_cantidad_de_consultas_constante(setup_db):
+    _agregar_prestamos(setup_db, 1, 1)
+    _agregar_prestamos(setup_db, 3, 25)
+
+    consultas_uno, resumen_uno = _sentencias_resumen(setup_db, 1)
+    consultas_muchos, resumen_muchos = _sentencias_resumen(setup_db, 3)
+
+    assert len(resumen_uno["prestamos"]) == 1
+    assert len(resumen_muchos["prestamos"]) == 25
+    assert consultas_uno == consultas_muchos == 3
+
+
+def test_endpoint_resumen_cliente(client):
+    client.post("/api/bureau/consultar", json={"cliente_id": 1})
+    ids = [
+        client.post("/api/prestamos/solicitar", json={
+            "cliente_id": 1, "monto_solicitado": monto, "plazo_meses": 24
+        }).json()["id"]
+        for monto in (10_000_000, 2_000_000)
+    ]
+
+    response = client.get("/api/clientes/1/resumen")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["cliente"]["nombre"] == "Juan Pérez"
+    assert [p["id"] for p in data["prestamos"]] == ids
+    assert data["ultima_consulta_bureau"]["score"] == 750
+
+
+def test_endpoint_resumen_sin_consultas_ni_prestamos(client):
+    data = client.get("/api/clientes/2/resumen").json()
+    assert data["prestamos"] == []
+    assert data["ultima_consulta_bureau"] is None
+    assert client.get("/api/clientes/999/resumen").status_code == 404
@@ -0,0 +1,100 @@
+import pytest
+from sqlalchemy import event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm.exc import StaleDataError
+from app.models.prestamo import Prestamo, EstadoPrestamo
+from app.services.prestamo_service import PrestamoService, ConflictoConcurrencia
+
+
+def _en_revision(db):
+    prestamo = Prestamo(cliente_id=1, monto_solicitado=5_000_000, plazo_meses=24,
+                        cuota_mensual=250_000, estado=EstadoPrestamo.EN_REVISION)
+    db.add(prestamo)
+    db.commit()
+    return prestamo.id
+
+
+def _otra_sesion(db):
+    return sessionmaker(autocommit=False, autoflush=False, bind=db.get_bind())()
+
+
+def _escritura_concurrente(db, prestamo_id, **cambios):
+    """Otro proceso escribe justo después de que `db` lee el préstamo (una vez)"""
+    def escribir(session, instancia):
+        with _otra_sesion(db) as otra:
+            prestamo = otra.get(Prestamo, prestamo_id)
+            for campo, valor in cambios.items():
+                setattr(prestamo, campo, valor)
+            otra.commit()
+    event.listen(db, "loaded_as_persistent", escribir, once=True)
+
+
+def test_version_sube_con_cada_update(setup_db):
+    prestamo_id = _en_revision(setup_db)
+    assert setup_db.get(Prestamo, prestamo_id).version == 1
+
+    prestamo = PrestamoService().cambiar_estado(setup_db, prestamo_id, EstadoPrestamo.APROBADO, version=1)
+    assert (prestamo.estado, prestamo.version) == (EstadoPrestamo.APROBADO, 2)
+    assert prestamo.fecha_decision is not None
+
+
+def test_update_con_version_vieja_falla_sin_pisar(setup_db):
+    prestamo_id = _en_revision(setup_db)
+    with _otra_sesion(setup_db) as a, _otra_sesion(setup_db) as b:
+        en_a, en_b = a.get(Prestamo, prestamo_id), b.get(Prestamo, prestamo_id)
+        en_a.estado = EstadoPrestamo.APROBADO
+        a.commit()
+        en_b.estado = EstadoPrestamo.RECHAZADO
+        with pytest.raises(StaleDataError):
+            b.commit()
+        b.rollback()
+    setup_db.expire_all()
+    assert setup_db.get(Prestamo, prestamo_id).estado == EstadoPrestamo.APROBADO
+
+
+def test_sin_version_reintenta_sobre_el_estado_releido(setup_db):
+    prestamo_id = _en_revision(setup_db)
+    # El cambio concurrente no invalida la transición: se relee y se aplica
+    _escritura_concurrente(setup_db, prestamo_id, score_decision=680)
+
+    prestamo = PrestamoService().cambiar_estado(setup_db, prestamo_id, EstadoPrestamo.APROBADO)
+    assert (prestamo.estado, prestamo.score_decision, prestamo.version) == (EstadoPrestamo.APROBADO, 680, 3)
+
+
+def test_conflicto_que_invalida_la_transicion(setup_db):
+    prestamo_id = _en_revision(setup_db)
+    _escritura_concurrente(setup_db, prestamo_id, estado=EstadoPrestamo.RECHAZADO)
+
+    with pytest.raises(ConflictoConcurrencia):
+        PrestamoService().cambiar_estado(setup_db, prestamo_id, EstadoPrestamo.APROBADO)
+    setup_db.expire_all()
+    assert setup_db.get(Prestamo, prestamo_id).estado == EstadoPrestamo.RECHAZADO
+
+
+def test_con_version_el_conflicto_no_se_reintenta(setup_db):
+    prestamo_id = _en_revision(setup_db)
+    _escritura_concurrente(setup_db, prestamo_id, score_decision=680)
+
+    with pytest.raises(ConflictoConcurrencia):
+        PrestamoService().cambiar_estado(setup_db, prestamo_id, EstadoPrestamo.APROBADO, version=1)
+    setup_db.expire_all()
+    assert setup_db.get(Prestamo, prestamo_id).estado == EstadoPrestamo.EN_REVISION
+
+
+def test_patch_estado(client, setup_db):
+    prestamo_id = _en_revision(setup_db)
+    url = f"/api/prestamos/{prestamo_id}/estado"
+    version = client.get(url).json()["version"]
+
+    response = client.patch(url, json={"estado": "aprobado", "version": version})
+    assert response.status_code == 200
+    assert (response.json()["estado"], response.json()["version"]) == ("aprobado", version + 1)
+
+    # Estado viejo: otro ya decidió
+    response = client.patch(url, json={"estado": "rechazado", "version": version})
+    assert response.status_code == 409
+    assert client.get(url).json()["estado"] == "aprobado"
+
+    assert client.patch(url, json={"estado": "rechazado", "version": version + 1}).status_code == 400
+    assert client.patch(url, json={"estado": "desembolsado", "version": version + 1}).json()["version"] == version + 2
+    assert client.patch("/api/prestamos/999/estado", json={"estado": "aprobado"}).status_code == 404
@@ -0,0 +1,82 @@
+import dataclasses
+import json
+import os
+import signal
+import pytest
+from app.config import ConfigStore, Settings, cargar_settings, config_store, get_settings
+from app.services.prestamo_service import PrestamoService
+
+
+
+def test_cargar_settings_archivo_y_entorno(tmp_path):
+    ruta = tmp_path / "config.json"
+    ruta.write_text(json.dumps({"LIMITE_MONTO_PRESTAMO": 20_000_000, "PLAZO_MAXIMO_MESES": 48}))
+
+    s = cargar_settings(str(ruta), entorno={"PLAZO_MAXIMO_MESES": "36", "BUREAU_CACHE_HABILITADO": "false"})
+
+    assert s.LIMITE_MONTO_PRESTAMO == 20_000_000
+    assert s.PLAZO_MAXIMO_MESES == 36  # el entorno gana sobre el archivo
+    assert s.BUREAU_CACHE_HABILITADO is False
+
+
+def test_cargar_settings_rechaza_claves_desconocidas(tmp_path):
+    ruta = tmp_path / "config.json"
+    ruta.write_text(json.dumps({"NO_EXISTE": 1}))
+    with pytest.raises(ValueError):
+        cargar_settings(str(ruta), entorno={})
+
+
+def test_snapshot_inmutable():
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        get_settings().LIMITE_MONTO_PRESTAMO = 1
+
+
+def test_recarga_reemplaza_snapshot_completo(tmp_path):
+    ruta = tmp_path / "config.json"
+    ruta.write_text(json.dumps({"SCORE_APROBACION_AUTOMATICA": 720}))
+    store = ConfigStore(str(ruta))
+    anterior = store.actual
+
+    ruta.write_text(json.dumps({"SCORE_APROBACION_AUTOMATICA": 650, "SCORE_REVISION_MANUAL": 550}))
+    nuevo = store.recargar()
+
+    assert store.actual is nuevo
+    assert (anterior.SCORE_APROBACION_AUTOMATICA, anterior.SCORE_REVISION_MANUAL) == (720, 600)
+    assert (nuevo.SCORE_APROBACION_AUTOMATICA, nuevo.SCORE_REVISION_MANUAL) == (650, 550)
+
+
+def test_recarga_invalida_conserva_snapshot(tmp_path):
+    ruta = tmp_path / "config.json"
+    ruta.write_text(json.dumps({"PLAZO_MAXIMO_MESES": 48}))
+    store = ConfigStore(str(ruta))
+    ruta.write_text("{no es json")
+
+    store._recargar_seguro()
+
+    assert store.actual.PLAZO_MAXIMO_MESES == 48
+
+
+@pytest.mark.skipif(not hasattr(signal, "SIGHUP"), reason="SIGHUP solo existe en POSIX")
+def test_recarga_por_sighup(tmp_path):
+    ruta = tmp_path / "config.json"
+    ruta.write_text(json.dumps({"PLAZO_MAXIMO_MESES": 48}))
+    store = ConfigStore(str(ruta))
+    anterior = signal.getsignal(signal.SIGHUP)
+    try:
+        assert store.instalar_sighup()
+        ruta.write_text(json.dumps({"PLAZO_MAXIMO_MESES": 24}))
+        os.kill(os.getpid(), signal.SIGHUP)
+        assert store.actual.PLAZO_MAXIMO_MESES == 24
+    finally:
+        signal.signal(signal.SIGHUP, anterior)
+
+
+def test_servicio_usa_reglas_recargadas(setup_db, restaurar_config):
+    original = restaurar_config
+    config_store.reemplazar(dataclasses.replace(original, LIMITE_MONTO_PRESTAMO=1_000_000))
+    with pytest.raises(ValueError, match="límite"):
+        PrestamoService().solicitar_prestamo(setup_db, 1, 2_000_000, 24)
+
+    config_store.reemplazar(dataclasses.replace(original, SCORE_APROBACION_AUTOMATICA=800))
+    prestamo = PrestamoService().solicitar_prestamo(setup_db, 1, 2_000_000, 24)
+    assert prestamo.estado.value == "en_revision"
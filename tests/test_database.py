@@ -0,0 +1,81 @@
+import pytest
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+from app.database import Base, actualizar_esquema, crear_engine_escritura, crear_engine_lectura
+from app.models.cliente import Cliente
+from app.models.prestamo import Prestamo, EstadoPrestamo
+
+
+def test_engine_lectura_sqlite_archivo_es_read_only(tmp_path):
+    url = f"sqlite:///{tmp_path / 'app.db'}"
+    escritura = crear_engine_escritura(url)
+    lectura = crear_engine_lectura(url, engine_escritura=escritura)
+    assert lectura is not escritura
+
+    Base.metadata.create_all(bind=escritura)
+    with sessionmaker(bind=escritura)() as db:
+        db.add(Cliente(id=1, nombre="Juan", identificacion="1", email="j@test.com"))
+        db.commit()
+
+    with sessionmaker(bind=lectura)() as db:
+        assert db.get(Cliente, 1).nombre == "Juan"
+        with pytest.raises(OperationalError, match="readonly"):
+            db.execute(text("DELETE FROM clientes"))
+
+    with escritura.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+    escritura.dispose()
+    lectura.dispose()
+
+
+def test_engine_lectura_memoria_comparte_writer():
+    escritura = crear_engine_escritura("sqlite:///:memory:")
+    assert crear_engine_lectura("sqlite:///:memory:", engine_escritura=escritura) is escritura
+
+
+def test_engine_lectura_usa_replica_configurada(tmp_path):
+    replica = f"sqlite:///{tmp_path / 'replica.db'}"
+    lectura = crear_engine_lectura("sqlite:///./test.db", replica)
+    assert str(lectura.url) == replica
+
+
+def test_setup_db_es_copia_aislada_de_la_plantilla(setup_db, db_plantilla):
+    cliente = setup_db.get(Cliente, 1)
+    cliente.score_cifin = 100
+    setup_db.commit()
+
+    score = db_plantilla.execute("SELECT score_cifin FROM clientes WHERE id = 1").fetchone()[0]
+    assert score == 750
+
+
+def test_actualizar_esquema_agrega_columnas_nuevas(tmp_path):
+    # Base creada con el esquema original: create_all no agrega columnas
+    motor = crear_engine_escritura(f"sqlite:///{tmp_path / 'vieja.db'}")
+    with motor.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE clientes (id INTEGER PRIMARY KEY, nombre VARCHAR, identificacion VARCHAR UNIQUE, "
+            "email VARCHAR, score_cifin INTEGER, ingresos_mensuales FLOAT, estado VARCHAR(9), fecha_creacion DATETIME)"))
+        conn.execute(text(
+            "CREATE TABLE prestamos (id INTEGER PRIMARY KEY, cliente_id INTEGER, monto_solicitado FLOAT NOT NULL, "
+            "plazo_meses INTEGER NOT NULL, tasa_interes FLOAT, cuota_mensual FLOAT, estado VARCHAR(12), "
+            "motivo_rechazo VARCHAR, fecha_solicitud DATETIME, fecha_decision DATETIME)"))
+        conn.execute(text("INSERT INTO clientes (id, nombre, identificacion, estado) VALUES (1, 'Juan', '1', 'ACTIVO')"))
+        conn.execute(text("INSERT INTO prestamos (id, cliente_id, monto_solicitado, plazo_meses, estado) "
+                          "VALUES (7, 1, 1000, 12, 'APROBADO')"))
+    Base.metadata.create_all(bind=motor)
+
+    actualizar_esquema(motor)
+    actualizar_esquema(motor)  # idempotente
+
+    columnas = {c["name"] for c in inspect(motor).get_columns("prestamos")}
+    assert {"score_decision", "version"} <= columnas
+    assert "ix_prestamos_cliente_id" in {i["name"] for i in inspect(motor).get_indexes("prestamos")}
+    with sessionmaker(bind=motor)() as db:
+        prestamo = db.get(Prestamo, 7)
+        assert (prestamo.version, prestamo.score_decision) == (1, None)
+        assert db.get(Cliente, 1).fecha_actualizacion is None
+        prestamo.estado = EstadoPrestamo.DESEMBOLSADO
+        db.commit()
+        assert prestamo.version == 2
+    motor.dispose()
@@ -0,0 +1,90 @@
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import Future
+import pytest
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import sessionmaker
+from app.models.prestamo import Prestamo, EstadoPrestamo
+from app.services import escritor_lotes
+from app.services.escritor_lotes import EscritorPorLotes
+from app.services.prestamo_service import PrestamoService
+
+
+@pytest.fixture
+def escritor(setup_db):
+    e = EscritorPorLotes(sessionmaker(bind=setup_db.get_bind(), expire_on_commit=False),
+                         max_lote=50, espera_ms=20)
+    e.iniciar()
+    yield e
+    e.detener()
+
+
+def _prestamo(monto=1_000_000):
+    return Prestamo(cliente_id=1, monto_solicitado=monto, plazo_meses=12,
+                    estado=EstadoPrestamo.EN_REVISION)
+
+
+def test_escritor_agrupa_inserts_concurrentes(setup_db, escritor):
+    with ThreadPoolExecutor(max_workers=20) as ex:
+        guardados = list(ex.map(lambda _: escritor.guardar(_prestamo()), range(100)))
+
+    assert len({p.id for p in guardados}) == 100
+    assert setup_db.query(func.count(Prestamo.id)).scalar() == 100
+    assert escritor.metricas()["lotes"] < 100
+
+
+def test_escritor_aisla_fila_invalida(setup_db, escritor):
+    with ThreadPoolExecutor(max_workers=3) as ex:
+        buenos = [ex.submit(escritor.guardar, _prestamo()) for _ in range(2)]
+        malo = ex.submit(escritor.guardar, _prestamo(monto=None))  # NOT NULL
+
+    assert all(f.result().id is not None for f in buenos)
+    with pytest.raises(IntegrityError):
+        malo.result()
+    assert setup_db.query(func.count(Prestamo.id)).scalar() == 2
+
+
+def test_servicio_usa_escritor_activo(setup_db, escritor, monkeypatch):
+    monkeypatch.setattr(escritor_lotes, "escritor_prestamos", escritor)
+
+    prestamo = PrestamoService().solicitar_prestamo(setup_db, 1, 10_000_000, 24)
+
+    assert prestamo.id is not None
+    assert prestamo.estado == EstadoPrestamo.APROBADO
+    assert escritor.metricas()["filas"] == 1
+
+
+def test_escritor_detenido_rechaza(escritor):
+    escritor.detener()
+    with pytest.raises(RuntimeError):
+        escritor.guardar(_prestamo())
+
+
+def test_reintento_fila_por_fila_tras_violar_constraint(setup_db):
+    # Lote armado a mano: una fila reusa un id existente (PK duplicada). El
+    # flush fallido ya le asignó id a la primera; antes del reintento otro
+    # writer ocupa ese id, así que reintentarla con la PK vieja chocaría
+    existente = _prestamo()
+    setup_db.add(existente)
+    setup_db.commit()
+    escritor = EscritorPorLotes(sessionmaker(bind=setup_db.get_bind(), expire_on_commit=False))
+    duplicado = _prestamo()
+    duplicado.id = existente.id
+    lote = [(p, Future()) for p in (_prestamo(), duplicado, _prestamo())]
+
+    individual = escritor._escribir_individual
+    def otro_writer_primero(objeto, futuro):
+        if setup_db.query(func.count(Prestamo.id)).scalar() == 1:
+            setup_db.add(_prestamo())
+            setup_db.commit()
+        individual(objeto, futuro)
+    escritor._escribir_individual = otro_writer_primero
+
+    escritor._escribir(lote)
+
+    with pytest.raises(IntegrityError):
+        lote[1][1].result(0)
+    guardados = [lote[0][1].result(0), lote[2][1].result(0)]
+    assert all(p.id not in (None, existente.id) for p in guardados)
+    assert escritor.metricas()["lotes_fallidos"] == 1
+    assert setup_db.query(func.count(Prestamo.id)).scalar() == 4
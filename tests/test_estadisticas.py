@@ -0,0 +1,84 @@
+import pytest
+from sqlalchemy import func
+from app.models.estadistica import EstadisticaCartera
+from app.models.prestamo import Prestamo, EstadoPrestamo
+from app.services.estadisticas_service import EstadisticasService, banda_score
+from app.services.prestamo_service import PrestamoService
+
+
+def _agregados(db):
+    return {
+        (f.dimension, f.clave): (f.conteo, round(f.suma_monto, 2), f.conteo_cuota, round(f.suma_cuota, 2), f.aprobados)
+        for f in db.query(EstadisticaCartera).filter(EstadisticaCartera.conteo > 0)
+    }
+
+
+def _solicitar_varios(db):
+    service = PrestamoService()
+    service.solicitar_prestamo(db, 1, 10_000_000, 24)   # aprobado, score 750
+    service.solicitar_prestamo(db, 1, 2_000_000, 12)    # aprobado
+    service.solicitar_prestamo(db, 3, 5_000_000, 12)    # rechazado, score 450
+    service.solicitar_prestamo(db, 2, 3_000_000, 24)    # rechazado, sin historial
+
+
+def test_banda_score():
+    assert banda_score(None) == "sin_historial"
+    assert banda_score(750) == "750-799"
+    assert banda_score(699) == "650-699"
+
+
+def test_agregados_se_mantienen_en_cada_insert(setup_db):
+    _solicitar_varios(setup_db)
+    resumen = EstadisticasService().resumen(setup_db)
+
+    assert resumen["total_prestamos"] == 4
+    assert {e["estado"]: e["conteo"] for e in resumen["por_estado"]} == {"aprobado": 2, "rechazado": 2}
+    bandas = {b["banda"]: b for b in resumen["por_banda_score"]}
+    assert bandas["750-799"]["tasa_aprobacion"] == 1.0
+    assert bandas["450-499"]["tasa_aprobacion"] == 0.0
+    assert bandas["sin_historial"]["conteo"] == 1
+    # Los rechazados no tienen cuota: no entran al promedio
+    plazo_24 = next(p for p in resumen["por_plazo"] if p["plazo_meses"] == 24)
+    cuota = setup_db.query(Prestamo.cuota_mensual).filter(Prestamo.monto_solicitado == 10_000_000).scalar()
+    assert plazo_24["conteo"] == 2
+    assert plazo_24["cuota_promedio"] == pytest.approx(cuota, abs=0.01)
+
+
+def test_cambio_de_estado_mueve_agregados(setup_db):
+    prestamo = PrestamoService().solicitar_prestamo(setup_db, 1, 10_000_000, 24)
+    prestamo.estado = EstadoPrestamo.DESEMBOLSADO
+    setup_db.commit()
+
+    agregados = _agregados(setup_db)
+    assert ("estado", "aprobado") not in agregados
+    assert agregados[("estado", "desembolsado")][0] == 1
+    # Desembolsado sigue contando como aprobado en la banda de score
+    assert agregados[("banda_score", "750-799")][4] == 1
+
+
+def test_rollback_descarta_agregados(setup_db):
+    setup_db.add(Prestamo(cliente_id=1, monto_solicitado=1_000_000, plazo_meses=12,
+                          estado=EstadoPrestamo.EN_REVISION))
+    setup_db.flush()
+    setup_db.rollback()
+    assert _agregados(setup_db) == {}
+
+
+def test_reconstruir_equivale_a_incremental(setup_db):
+    _solicitar_varios(setup_db)
+    setup_db.delete(setup_db.query(Prestamo).first())
+    setup_db.commit()
+    incremental = _agregados(setup_db)
+
+    procesados = EstadisticasService().reconstruir(setup_db, tamano_lote=2)
+    assert procesados == setup_db.query(func.count(Prestamo.id)).scalar() == 3
+    assert _agregados(setup_db) == incremental
+
+
+def test_endpoint_estadisticas(client):
+    client.post("/api/prestamos/solicitar", json={"cliente_id": 1, "monto_solicitado": 10_000_000, "plazo_meses": 24})
+    response = client.get("/api/prestamos/estadisticas")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["total_prestamos"] == 1
+    assert data["por_estado"] == [{"estado": "aprobado", "conteo": 1, "suma_monto": 10_000_000}]
@@ -0,0 +1,120 @@
+import dataclasses
+import json
+
+from app.config import config_store
+from app.models.cliente import Cliente, EstadoCliente
+from app.services.bureau_cache import bureau_cache
+
+
+def _importar(client, cuerpo, tipo):
+    return client.post("/api/clientes/import", content=cuerpo, headers={"Content-Type": tipo})
+
+
+def test_importar_csv_con_upsert_y_errores_por_fila(client, setup_db):
+    cuerpo = "\n".join([
+        "nombre,identificacion,email,score_cifin,ingresos_mensuales,estado",
+        "Nuevo Uno,900001,uno@test.com,720,3000000,activo",
+        "Juan Pérez Actualizado,1234567890,juan@test.com,810,6000000,activo",  # upsert sobre seed
+        "Sin Email,900002,,700,1000,activo",                                     # error de validación
+        "Score Malo,900003,malo@test.com,1200,1000,activo",                      # error de validación
+        "Email Ajeno,900004,maria@test.com,,1000,activo",                        # email de otro cliente
+        "Nuevo Dos,900005,dos@test.com,,2000000,bloqueado",
+    ])
+    response = _importar(client, cuerpo.encode(), "text/csv")
+    assert response.status_code == 200
+    reporte = response.json()
+
+    assert reporte["filas"] == 6
+    assert reporte["importados"] == 3
+    assert reporte["errores"] == 3
+    assert [e["fila"] for e in reporte["detalle_errores"]] == [3, 4, 5]
+    assert "email" in reporte["detalle_errores"][2]["error"]
+
+    setup_db.expire_all()
+    juan = setup_db.query(Cliente).filter(Cliente.identificacion == "1234567890").one()
+    assert (juan.id, juan.score_cifin, juan.nombre) == (1, 810, "Juan Pérez Actualizado")
+    nuevo = setup_db.query(Cliente).filter(Cliente.identificacion == "900005").one()
+    assert nuevo.score_cifin is None
+    assert nuevo.estado == EstadoCliente.BLOQUEADO
+
+
+def test_importar_ndjson_en_varios_lotes(client, setup_db, restaurar_config):
+    config_store.reemplazar(dataclasses.replace(
+        restaurar_config, IMPORTACION_LOTE_FILAS=10, IMPORTACION_MAX_ERRORES_REPORTADOS=2
+    ))
+    filas = [
+        {"nombre": f"Cliente {i}", "identificacion": f"ID-{i}", "email": f"c{i}@test.com", "score_cifin": 650}
+        for i in range(35)
+    ] + [{"nombre": "", "identificacion": "X", "email": "x@test.com"}] * 3
+    cuerpo = "\n".join(json.dumps(f) for f in filas).encode()
+
+    def en_pedazos():
+        # Cortes arbitrarios: las líneas llegan partidas entre chunks
+        for i in range(0, len(cuerpo), 37):
+            yield cuerpo[i:i + 37]
+
+    reporte = client.post("/api/clientes/import", content=en_pedazos(),
+                          headers={"Content-Type": "application/x-ndjson"}).json()
+    assert reporte["importados"] == 35
+    assert reporte["lotes"] == 4
+    assert reporte["errores"] == 3
+    assert len(reporte["detalle_errores"]) == 2
+    assert reporte["errores_truncados"] is True
+    assert setup_db.query(Cliente).filter(Cliente.identificacion.like("ID-%")).count() == 35
+
+
+def test_importar_limpia_cache_bureau(client):
+    client.post("/api/bureau/consultar", json={"cliente_id": 1})
+    assert bureau_cache.metricas()["entradas"] == 1
+    _importar(client, b'{"nombre": "Juan", "identificacion": "1234567890", "email": "juan@test.com", '
+                      b'"score_cifin": 500}', "application/x-ndjson")
+    assert bureau_cache.metricas()["entradas"] == 0
+    assert client.post("/api/bureau/consultar", json={"cliente_id": 1}).json()["score"] == 500
+
+
+def test_importar_csv_con_saltos_de_linea_y_bytes_invalidos(client, setup_db):
+    cuerpo = b"\n".join([
+        b"nombre,identificacion,email,score_cifin,ingresos_mensuales,estado",
+        b'"Ana\nde la Cruz",900010,ana10@test.com,700,3000000,activo',  # campo entre comillas con salto
+        "Latin1 Núñez,900011,n11@test.com,700,1000,activo".encode("latin-1"),
+        b"Nuevo Tres,900012,tres@test.com,700,1000,activo",
+    ])
+    reporte = _importar(client, cuerpo, "text/csv").json()
+
+    assert (reporte["filas"], reporte["importados"]) == (3, 2)
+    assert reporte["detalle_errores"] == [{"fila": 2, "error": "fila inválida: no está codificada en UTF-8"}]
+    setup_db.expire_all()
+    assert setup_db.query(Cliente).filter(Cliente.identificacion == "900010").one().nombre == "Ana\nde la Cruz"
+
+
+def test_importar_rechaza_linea_sin_fin(client, restaurar_config):
+    config_store.reemplazar(dataclasses.replace(restaurar_config, IMPORTACION_MAX_BYTES_FILA=100))
+
+    def sin_saltos():
+        for _ in range(10):
+            yield b"x" * 50
+
+    response = client.post("/api/clientes/import", content=sin_saltos(), headers={"Content-Type": "text/csv"})
+    assert response.status_code == 400
+    assert "100 bytes" in response.json()["detail"]
+
+
+def test_importar_reporta_identificacion_duplicada_en_el_lote(client, setup_db):
+    cuerpo = "\n".join([
+        "nombre,identificacion,email,score_cifin,ingresos_mensuales,estado",
+        "Primera,900020,d1@test.com,600,1000,activo",
+        "Otra,900021,d2@test.com,600,1000,activo",
+        "Segunda,900020,d1@test.com,650,1000,activo",
+        "Tercera,900020,d1@test.com,700,1000,activo",
+    ])
+    reporte = _importar(client, cuerpo.encode(), "text/csv").json()
+
+    assert (reporte["filas"], reporte["importados"], reporte["errores"]) == (4, 2, 2)
+    assert reporte["filas"] == reporte["importados"] + reporte["errores"]
+    assert reporte["detalle_errores"] == [
+        {"fila": 1, "error": "identificación duplicada en el archivo (la reemplaza la fila 3)"},
+        {"fila": 3, "error": "identificación duplicada en el archivo (la reemplaza la fila 4)"},
+    ]
+    setup_db.expire_all()
+    cliente = setup_db.query(Cliente).filter(Cliente.identificacion == "900020").one()
+    assert (cliente.nombre, cliente.score_cifin) == ("Tercera", 700)
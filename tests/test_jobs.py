@@ -0,0 +1,268 @@
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.database import Base
+from app.main import app
+from app.models.job import Job, EstadoJob, ESTADOS_TERMINALES
+from app.services.jobs import ContextoJob, GestorJobs, TIPOS_JOB, get_gestor_jobs
+from app.services.prestamo_service import PrestamoService
+from app.services import jobs_cartera  # noqa: F401
+
+
+def _esperar(gestor, job_id, timeout=5.0):
+    limite = time.monotonic() + timeout
+    while time.monotonic() < limite:
+        job = gestor.obtener(job_id)
+        if job.estado in ESTADOS_TERMINALES:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"El job {job_id} no terminó: {job.estado}")
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    # DB en archivo: los hilos del pool usan sus propias conexiones, como en producción
+    engine = create_engine(f"sqlite:///{tmp_path / 'jobs.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    yield sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    engine.dispose()
+
+
+@pytest.fixture
+def liberar():
+    evento = threading.Event()
+    yield evento
+    evento.set()
+
+
+@pytest.fixture
+def tipos(liberar):
+    def esperar_cancelacion(contexto):
+        while not liberar.wait(0.01):
+            contexto.verificar_cancelacion()
+        return {"ok": True}
+
+    def sumar(contexto, a: int, b: int = 0):
+        contexto.reportar(0.5, "sumando")
+        return {"suma": a + b}
+
+    def fallar(contexto):
+        raise RuntimeError("explotó")
+
+    return {"esperar_cancelacion": esperar_cancelacion, "sumar": sumar, "fallar": fallar}
+
+
+@pytest.fixture
+def gestor(session_factory, tipos):
+    gestor = GestorJobs(session_factory, max_workers=2, tipos=tipos)
+    gestor.iniciar()
+    yield gestor
+    gestor.detener()
+
+
+def test_job_completa_con_resultado(gestor):
+    job = gestor.enviar("sumar", {"a": 2, "b": 3})
+    assert job.estado == EstadoJob.PENDIENTE
+
+    job = _esperar(gestor, job.id)
+    assert job.estado == EstadoJob.COMPLETADO
+    assert job.progreso == 1.0
+    assert job.resultado == '{"suma": 5}'
+    assert job.fecha_inicio is not None and job.fecha_fin is not None
+
+
+def test_enviar_valida_tipo_y_parametros(gestor):
+    with pytest.raises(ValueError, match="desconocido"):
+        gestor.enviar("no_existe")
+    with pytest.raises(ValueError, match="Parámetros inválidos"):
+        gestor.enviar("sumar", {"c": 1})
+    assert gestor.listar() == []
+
+
+def test_error_del_job_queda_como_fallido(gestor):
+    job = _esperar(gestor, gestor.enviar("fallar").id)
+    assert job.estado == EstadoJob.FALLIDO
+    assert "explotó" in job.error
+
+
+def test_cancelar_job_en_ejecucion(gestor):
+    job = gestor.enviar("esperar_cancelacion")
+    limite = time.monotonic() + 5
+    while gestor.obtener(job.id).estado != EstadoJob.EJECUTANDO and time.monotonic() < limite:
+        time.sleep(0.01)
+
+    assert gestor.cancelar(job.id).cancelacion_solicitada
+    assert _esperar(gestor, job.id).estado == EstadoJob.CANCELADO
+
+
+def test_cancelar_job_pendiente_no_lo_ejecuta(session_factory, tipos):
+    # Un solo hilo ocupado: el segundo job espera en la cola
+    gestor = GestorJobs(session_factory, max_workers=1, tipos=tipos)
+    gestor.iniciar()
+    try:
+        ocupado = gestor.enviar("esperar_cancelacion")
+        en_cola = gestor.enviar("sumar", {"a": 1})
+        assert gestor.cancelar(en_cola.id).estado == EstadoJob.CANCELADO
+        gestor.cancelar(ocupado.id)
+        _esperar(gestor, ocupado.id)
+        assert gestor.obtener(en_cola.id).fecha_inicio is None
+    finally:
+        gestor.detener()
+
+
+def test_cancelaciones_no_quedan_en_memoria(session_factory, tipos):
+    gestor = GestorJobs(session_factory, max_workers=1, tipos=tipos)
+    gestor.iniciar()
+    try:
+        ocupado = gestor.enviar("esperar_cancelacion")
+        while gestor.obtener(ocupado.id).estado != EstadoJob.EJECUTANDO:
+            time.sleep(0.01)
+        en_cola = gestor.enviar("sumar", {"a": 1})
+        gestor.cancelar(en_cola.id)
+        terminado = gestor.enviar("sumar", {"a": 2})
+        gestor.cancelar(ocupado.id)
+        _esperar(gestor, ocupado.id)
+        _esperar(gestor, terminado.id)
+        # Terminados o desconocidos: nada que cancelar
+        gestor.cancelar(terminado.id)
+        with pytest.raises(ValueError):
+            gestor.cancelar("x" * 32)
+        assert gestor._cancelaciones == set()
+        assert gestor._en_ejecucion == set()
+    finally:
+        gestor.detener()
+
+
+def test_arranque_retoma_pendientes_y_marca_interrumpidos(session_factory, tipos):
+    with session_factory() as db:
+        db.add_all([
+            Job(id="a" * 32, tipo="sumar", estado=EstadoJob.PENDIENTE, parametros='{"a": 4}'),
+            Job(id="b" * 32, tipo="sumar", estado=EstadoJob.EJECUTANDO, parametros='{"a": 1}'),
+        ])
+        db.commit()
+
+    gestor = GestorJobs(session_factory, tipos=tipos)
+    gestor.iniciar()
+    try:
+        assert _esperar(gestor, "a" * 32).resultado == '{"suma": 4}'
+        interrumpido = gestor.obtener("b" * 32)
+        assert interrumpido.estado == EstadoJob.FALLIDO
+        assert "reinició" in interrumpido.error
+    finally:
+        gestor.detener()
+
+
+def _esperar_ejecutando(gestor, job_id):
+    limite = time.monotonic() + 5
+    while gestor.obtener(job_id).estado != EstadoJob.EJECUTANDO and time.monotonic() < limite:
+        time.sleep(0.01)
+
+
+def test_cancelar_desde_otro_proceso(session_factory, tipos, monkeypatch):
+    monkeypatch.setattr(ContextoJob, "INTERVALO_CANCELACION_SEGUNDOS", 0.05)
+    ejecutor = GestorJobs(session_factory, max_workers=1, tipos=tipos, worker_id="worker-a")
+    otro = GestorJobs(session_factory, tipos=tipos, worker_id="worker-b")
+    ejecutor.iniciar()
+    try:
+        job = ejecutor.enviar("esperar_cancelacion")
+        _esperar_ejecutando(ejecutor, job.id)
+        assert ejecutor.obtener(job.id).worker_id == "worker-a"
+
+        # El request de cancelación llega al otro worker: solo queda la marca en la DB
+        otro.cancelar(job.id)
+        assert _esperar(ejecutor, job.id).estado == EstadoJob.CANCELADO
+    finally:
+        ejecutor.detener()
+
+
+def test_arranque_no_falla_jobs_de_otro_worker_vivo(session_factory, tipos):
+    ahora = datetime.utcnow()
+    with session_factory() as db:
+        db.add_all([
+            Job(id="v" * 32, tipo="sumar", estado=EstadoJob.EJECUTANDO, worker_id="otro", latido=ahora),
+            Job(id="m" * 32, tipo="sumar", estado=EstadoJob.EJECUTANDO, worker_id="otro",
+                latido=ahora - timedelta(minutes=5)),
+            Job(id="p" * 32, tipo="sumar", estado=EstadoJob.EJECUTANDO, worker_id="propio", latido=ahora),
+        ])
+        db.commit()
+
+    gestor = GestorJobs(session_factory, tipos=tipos, worker_id="propio", latido_vencido_segundos=60)
+    gestor.iniciar()
+    try:
+        assert gestor.obtener("v" * 32).estado == EstadoJob.EJECUTANDO
+        assert gestor.obtener("m" * 32).estado == EstadoJob.FALLIDO
+        assert gestor.obtener("p" * 32).estado == EstadoJob.FALLIDO
+    finally:
+        gestor.detener()
+
+
+def test_latido_y_job_tomado_por_otro_no_se_pisa(session_factory, tipos, monkeypatch):
+    monkeypatch.setattr(ContextoJob, "INTERVALO_CANCELACION_SEGUNDOS", 0.05)
+    gestor = GestorJobs(session_factory, max_workers=1, tipos=tipos, worker_id="lento",
+                        latido_segundos=0.02, latido_vencido_segundos=60)
+    gestor.iniciar()
+    try:
+        job = gestor.enviar("esperar_cancelacion")
+        _esperar_ejecutando(gestor, job.id)
+        inicial = gestor.obtener(job.id).latido
+        limite = time.monotonic() + 5
+        while gestor.obtener(job.id).latido == inicial and time.monotonic() < limite:
+            time.sleep(0.01)
+        assert gestor.obtener(job.id).latido > inicial
+
+        # Otro proceso lo dio por interrumpido: el job se corta y no lo pisa
+        with session_factory() as db:
+            db.get(Job, job.id).estado = EstadoJob.FALLIDO
+            db.commit()
+        limite = time.monotonic() + 5
+        while job.id in gestor._en_ejecucion and time.monotonic() < limite:
+            time.sleep(0.01)
+        assert job.id not in gestor._en_ejecucion
+        assert gestor.obtener(job.id).estado == EstadoJob.FALLIDO
+        assert gestor.obtener(job.id).fecha_fin is None
+    finally:
+        gestor.detener()
+
+
+def test_apagado_corta_el_job_y_conserva_pendientes(session_factory, tipos):
+    gestor = GestorJobs(session_factory, max_workers=1, tipos=tipos)
+    gestor.iniciar()
+    corriendo = gestor.enviar("esperar_cancelacion")
+    en_cola = gestor.enviar("sumar", {"a": 1})
+    while gestor.obtener(corriendo.id).estado != EstadoJob.EJECUTANDO:
+        time.sleep(0.01)
+    gestor.detener()
+
+    assert gestor.obtener(corriendo.id).estado == EstadoJob.FALLIDO
+    assert gestor.obtener(en_cola.id).estado == EstadoJob.PENDIENTE
+
+
+def test_endpoints_reconstruir_estadisticas(client, setup_db):
+    # El job trabaja sobre la DB del test a través del gestor inyectado
+    factory = sessionmaker(autocommit=False, autoflush=False, bind=setup_db.get_bind())
+    PrestamoService().solicitar_prestamo(setup_db, 1, 10_000_000, 24)
+    gestor = GestorJobs(factory, max_workers=1, tipos=TIPOS_JOB)
+    gestor.iniciar()
+    app.dependency_overrides[get_gestor_jobs] = lambda: gestor
+    try:
+        response = client.post("/api/jobs", json={"tipo": "reconstruir_estadisticas", "parametros": {"tamano_lote": 10}})
+        assert response.status_code == 202
+        job_id = response.json()["id"]
+        _esperar(gestor, job_id)
+
+        data = client.get(f"/api/jobs/{job_id}").json()
+        assert data["estado"] == "completado"
+        assert data["resultado"] == {"prestamos_procesados": 1}
+        assert data["parametros"] == {"tamano_lote": 10}
+        assert [j["id"] for j in client.get("/api/jobs", params={"estado": "completado"}).json()] == [job_id]
+
+        assert client.post("/api/jobs", json={"tipo": "no_existe"}).status_code == 400
+        assert client.get("/api/jobs/" + "0" * 32).status_code == 404
+        assert client.post("/api/jobs/" + "0" * 32 + "/cancelar").status_code == 404
+    finally:
+        app.dependency_overrides.pop(get_gestor_jobs, None)
+        gestor.detener()
@@ -0,0 +1,90 @@
+import io
+import json
+import logging
+import queue
+import sys
+
+import pytest
+from app.logs import (
+    LOGGER_ACCESO, LOGGER_DECISIONES, FiltroMuestreo, FormateadorJSON, ManejadorCola,
+    configurar_logging, detener_logging, evento, metricas_logging,
+)
+
+
+@pytest.fixture
+def salida():
+    """Logging configurado como en startup, escribiendo a un buffer"""
+    buffer = io.StringIO()
+    configurar_logging("INFO", muestreo={LOGGER_ACCESO: 1.0, LOGGER_DECISIONES: 1.0}, salida=buffer)
+    yield buffer
+    detener_logging()
+
+
+def _lineas(buffer):
+    detener_logging()  # vacía la cola del listener
+    return [json.loads(linea) for linea in buffer.getvalue().splitlines()]
+
+
+def _registro(nombre="app.x", nivel=logging.INFO, mensaje="hola"):
+    return logging.LogRecord(nombre, nivel, __file__, 1, mensaje, None, None)
+
+
+def test_decision_queda_logueada_con_request_id_y_latencia(client, salida):
+    """El id que manda el cliente llega al log de la decisión, emitido en el threadpool"""
+    response = client.post("/api/prestamos/solicitar", headers={"X-Request-ID": "req-123"}, json={
+        "cliente_id": 1, "monto_solicitado": 5_000_000, "plazo_meses": 12,
+    })
+    assert response.status_code == 200
+    assert response.headers["x-request-id"] == "req-123"
+
+    lineas = _lineas(salida)
+    decision, = [l for l in lineas if l["mensaje"] == "decision_prestamo"]
+    assert decision["request_id"] == "req-123"
+    assert decision["logger"] == LOGGER_DECISIONES
+    assert decision["estado"] == "aprobado"
+    assert decision["latencia_ms"] >= 0
+    acceso, = [l for l in lineas if l["logger"] == LOGGER_ACCESO]
+    assert acceso["request_id"] == "req-123"
+    assert acceso["status"] == 200
+    assert acceso["ruta"] == "/api/prestamos/solicitar"
+
+
+def test_request_id_generado_si_no_viene(client):
+    primero = client.get("/health").headers["x-request-id"]
+    segundo = client.get("/health").headers["x-request-id"]
+    assert primero and segundo and primero != segundo
+
+
+def test_muestreo_solo_afecta_info():
+    filtro = FiltroMuestreo({LOGGER_ACCESO: 0.0})
+    assert not filtro.filter(_registro(LOGGER_ACCESO))
+    assert filtro.filter(_registro(LOGGER_ACCESO, nivel=logging.WARNING))
+    assert filtro.filter(_registro("app.services.jobs"))
+    assert FiltroMuestreo({LOGGER_DECISIONES: 1.0}).filter(_registro(LOGGER_DECISIONES))
+
+
+def test_cola_llena_descarta_sin_bloquear():
+    manejador = ManejadorCola(queue.Queue(maxsize=1))
+    manejador.emit(_registro())
+    manejador.emit(_registro())
+    assert manejador.descartados == 1
+
+
+def test_formato_json_con_campos_y_excepcion():
+    logger = logging.getLogger("app.test_logs")
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        registro = logger.makeRecord(logger.name, logging.ERROR, __file__, 1, "fallo %s", ("x",),
+                                     sys.exc_info(), extra={"campos": {"job": 7}})
+    salida = json.loads(FormateadorJSON().format(registro))
+    assert salida["mensaje"] == "fallo x"
+    assert salida["job"] == 7
+    assert "ValueError: boom" in salida["excepcion"]
+
+
+def test_evento_no_arma_registro_si_el_nivel_esta_apagado(salida):
+    logging.getLogger("app").setLevel(logging.WARNING)
+    evento(logging.getLogger("app.x"), "silencioso", valor=1)
+    assert metricas_logging()["activo"]
+    assert _lineas(salida) == []
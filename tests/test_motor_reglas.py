@@ -0,0 +1,46 @@
+import itertools
+from app.config import get_settings
+from app.models.prestamo import EstadoPrestamo
+from app.services.motor_reglas import MotorReglas, factor_amortizacion
+
+motor = MotorReglas.desde_settings(get_settings())
+
+
+def decision_original(score, ingresos, monto, plazo_meses):
+    """Cadena de reglas previa de PrestamoService (oráculo)"""
+    tasa_mensual = 0.15 / 12
+    cuota = monto * (tasa_mensual * (1 + tasa_mensual)**plazo_meses) / ((1 + tasa_mensual)**plazo_meses - 1)
+    if score is None or score < 500:
+        return EstadoPrestamo.RECHAZADO
+    ratio = ingresos / cuota
+    if score >= 700 and ratio >= 4:
+        return EstadoPrestamo.APROBADO
+    if score >= 600 and ratio >= 3:
+        return EstadoPrestamo.EN_REVISION
+    return EstadoPrestamo.RECHAZADO
+
+
+def test_motor_equivale_a_cadena_original():
+    scores = [None, 0, 450, 499, 500, 599, 600, 650, 699, 700, 750, 900, 950]
+    ingresos = [0.0, 500_000, 2_000_000, 4_000_000, 5_000_000]
+    montos = [1_000_000, 5_000_000, 10_000_000, 50_000_000]
+    for score, ing, monto, plazo in itertools.product(scores, ingresos, montos, range(12, 61)):
+        regla, cuota, _ = motor.evaluar(score, ing, monto, plazo)
+        assert regla.estado == decision_original(score, ing, monto, plazo)
+        assert cuota == monto * factor_amortizacion(plazo, 0.15)
+
+
+def test_motor_motivos_de_rechazo():
+    regla, _, ratio = motor.evaluar(None, 1_000_000, 5_000_000, 24)
+    assert motor.motivo(regla, ratio) == "Cliente sin historial crediticio"
+
+    regla, _, ratio = motor.evaluar(450, 1_000_000, 5_000_000, 24)
+    assert motor.motivo(regla, ratio) == "Score crediticio insuficiente (< 500)"
+
+    regla, _, ratio = motor.evaluar(650, 100_000, 10_000_000, 24)
+    assert regla.nombre == "ingresos_insuficientes"
+    assert motor.motivo(regla, ratio) == f"Ingresos insuficientes. Ratio: {ratio:.1f}x (mínimo 3x)"
+
+
+def test_motor_plazo_fuera_de_tabla_usa_calculo_directo():
+    assert motor.calcular_cuota(1_000_000, 72) == 1_000_000 * factor_amortizacion(72, 0.15)
@@ -0,0 +1,78 @@
+import dataclasses
+import threading
+import time
+
+import pytest
+from app.config import config_store
+from app.services.perfilador import PerfiladorMuestreo, _marco, a_colapsado, perfilador
+
+TOKEN = "secreto-de-prueba"
+
+
+def _ocupado(hasta):
+    while time.monotonic() < hasta:
+        sum(range(1000))
+
+
+def test_muestrea_todos_los_hilos():
+    """La pila de un hilo de trabajo aparece con su nombre como raíz"""
+    hilo = threading.Thread(target=_ocupado, args=(time.monotonic() + 0.3,), name="trabajo-test")
+    hilo.start()
+    conteos = PerfiladorMuestreo(intervalo_ms=2).perfilar(0.2)
+    hilo.join()
+
+    pilas = [pila for pila in conteos if pila.startswith("trabajo-test;")]
+    assert pilas
+    assert any("test_perfilador.py:_ocupado" in pila for pila in pilas)
+    # El propio hilo del perfilador no se cuenta
+    assert not any(pila.startswith("perfilador;") for pila in conteos)
+    linea = a_colapsado(conteos).splitlines()[0]
+    assert linea.rsplit(" ", 1)[1].isdigit()
+
+
+def test_marco_sin_co_qualname():
+    """Python 3.10: el código no trae co_qualname y se usa co_name"""
+    from types import SimpleNamespace
+    codigo = SimpleNamespace(co_filename="/app/services/x.py", co_name="calcular")
+    assert _marco(SimpleNamespace(f_code=codigo)) == "x.py:calcular"
+
+
+def test_un_perfilado_a_la_vez():
+    perfilador_local = PerfiladorMuestreo(intervalo_ms=5)
+    perfilador_local.iniciar()
+    try:
+        with pytest.raises(RuntimeError):
+            perfilador_local.iniciar()
+    finally:
+        perfilador_local.detener()
+    assert not perfilador_local.activo
+
+
+def test_endpoint_deshabilitado_sin_token(client):
+    assert client.get("/debug/profile?seconds=0.1").status_code == 404
+
+
+def test_endpoint_exige_token(client, restaurar_config):
+    config_store.reemplazar(dataclasses.replace(restaurar_config, DEBUG_PROFILE_TOKEN=TOKEN))
+    assert client.get("/debug/profile?seconds=0.1").status_code == 401
+    assert client.get("/debug/profile?seconds=0.1", headers={"X-Debug-Token": "otro"}).status_code == 401
+    assert client.get("/debug/profile?seconds=600", headers={"X-Debug-Token": TOKEN}).status_code == 400
+
+
+def test_endpoint_retorna_pilas_colapsadas(client, restaurar_config):
+    config_store.reemplazar(dataclasses.replace(restaurar_config, DEBUG_PROFILE_TOKEN=TOKEN))
+    response = client.get("/debug/profile?seconds=0.2", headers={"X-Debug-Token": TOKEN})
+    assert response.status_code == 200
+    assert "attachment" in response.headers["content-disposition"]
+    assert int(response.headers["x-profile-muestras"]) > 0
+    lineas = response.text.splitlines()
+    assert lineas and all(";" in linea for linea in lineas)
+
+
+def test_endpoint_ocupado_responde_409(client, restaurar_config):
+    config_store.reemplazar(dataclasses.replace(restaurar_config, DEBUG_PROFILE_TOKEN=TOKEN))
+    perfilador.iniciar()
+    try:
+        assert client.get("/debug/profile?seconds=0.1", headers={"X-Debug-Token": TOKEN}).status_code == 409
+    finally:
+        perfilador.detener()
@@ -0,0 +1,139 @@
+"""
+Modo PostgreSQL contra una base descartable.
+
+- Con TEST_POSTGRES_URL (ej. postgresql://postgres@127.0.0.1:5432/postgres) se usa esa base.
+- Si no, se levanta un cluster temporal con initdb/pg_ctl del PATH y se borra al final.
+- Sin psycopg o sin PostgreSQL disponible, el módulo se saltea.
+Cada test recrea el esquema: no usar una base con datos propios.
+"""
+import asyncio
+import os
+import shutil
+import socket
+import subprocess
+
+import pytest
+
+psycopg = pytest.importorskip("psycopg")
+
+from sqlalchemy import event, func, select, text  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+from app.config import get_settings  # noqa: E402
+from app.database import Base, crear_engine_escritura  # noqa: E402
+from app.models.cliente import Cliente, EstadoCliente  # noqa: E402
+from app.models.estadistica import EstadisticaCartera  # noqa: E402
+from app.models.prestamo import EstadoPrestamo  # noqa: E402
+from app.services.importacion_service import ImportadorClientes  # noqa: E402
+from app.services.prestamo_service import PrestamoService  # noqa: E402
+
+
+def _puerto_libre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture(scope="module")
+def url_postgres(tmp_path_factory):
+    url = os.environ.get("TEST_POSTGRES_URL")
+    if url:
+        yield url
+        return
+    initdb, pg_ctl = shutil.which("initdb"), shutil.which("pg_ctl")
+    if not (initdb and pg_ctl):
+        pytest.skip("Sin PostgreSQL: definir TEST_POSTGRES_URL o instalar initdb/pg_ctl")
+    datos = tmp_path_factory.mktemp("postgres")
+    puerto = _puerto_libre()
+    try:
+        subprocess.run([initdb, "-D", str(datos), "-U", "postgres", "-A", "trust"], check=True, capture_output=True)
+        subprocess.run(
+            [pg_ctl, "-D", str(datos), "-l", str(datos / "servidor.log"), "-w",
+             "-o", f"-p {puerto} -h 127.0.0.1 -k {datos}", "start"],
+            check=True, capture_output=True,
+        )
+    except subprocess.CalledProcessError as e:
+        # ej. initdb no corre como root
+        pytest.skip(f"No se pudo levantar PostgreSQL: {e.stderr.decode(errors='replace').strip()}")
+    try:
+        yield f"postgresql://postgres@127.0.0.1:{puerto}/postgres"
+    finally:
+        subprocess.run([pg_ctl, "-D", str(datos), "-m", "fast", "-w", "stop"], capture_output=True)
+
+
+@pytest.fixture
+def engine(url_postgres):
+    engine = crear_engine_escritura(url_postgres)
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def db(engine):
+    db = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    db.add_all([
+        Cliente(id=1, nombre="Juan Pérez", identificacion="1234567890", email="juan@test.com",
+                score_cifin=750, ingresos_mensuales=5_000_000, estado=EstadoCliente.ACTIVO),
+        Cliente(id=3, nombre="Pedro Gómez", identificacion="1122334455", email="pedro@test.com",
+                score_cifin=450, ingresos_mensuales=2_000_000, estado=EstadoCliente.ACTIVO),
+    ])
+    db.commit()
+    yield db
+    db.close()
+
+
+def _sentencias(engine):
+    ejecutadas = []
+    event.listen(engine, "before_cursor_execute", lambda conn, cursor, sql, *args: ejecutadas.append(sql))
+    return ejecutadas
+
+
+def test_engine_usa_psycopg_con_sentencias_preparadas(engine):
+    assert engine.dialect.driver == "psycopg"
+    with engine.connect() as conexion:
+        # Pasado el umbral, la sentencia queda preparada en el servidor
+        for _ in range(get_settings().DATABASE_PG_PREPARE_THRESHOLD + 1):
+            conexion.execute(select(Cliente.id).where(Cliente.id == 1))
+        preparadas = conexion.scalar(text("SELECT count(*) FROM pg_prepared_statements"))
+    assert preparadas >= 1
+
+
+def test_solicitud_inserta_con_returning_sin_refresh(engine, db):
+    ejecutadas = _sentencias(engine)
+    prestamo = PrestamoService().solicitar_prestamo(db, 1, 10_000_000, 24)
+
+    assert prestamo.id is not None
+    assert prestamo.estado == EstadoPrestamo.APROBADO
+    inserts = [sql for sql in ejecutadas if sql.startswith("INSERT INTO prestamos")]
+    assert len(inserts) == 1 and "RETURNING" in inserts[0]
+    # Sin SELECT del préstamo después del commit
+    assert not [sql for sql in ejecutadas if sql.startswith("SELECT") and "FROM prestamos" in sql]
+    # Agregados mantenidos con ON CONFLICT en la misma transacción
+    assert db.get(EstadisticaCartera, ("estado", "aprobado")).conteo == 1
+
+
+def test_importacion_upsert_on_conflict(db):
+    async def flujo():
+        yield b"nombre,identificacion,email,score_cifin,ingresos_mensuales,estado\n"
+        yield b"Juan Actualizado,1234567890,juan@test.com,810,6000000,activo\n"
+        yield b"Nuevo,900001,nuevo@test.com,700,3000000,activo\n"
+        yield b"Email Ajeno,900002,pedro@test.com,,1000,activo\n"
+
+    reporte = asyncio.run(ImportadorClientes(db, tamano_lote=10).importar(flujo()))
+    assert (reporte["importados"], reporte["errores"]) == (2, 1)
+    assert "email" in reporte["detalle_errores"][0]["error"]
+    db.expire_all()
+    assert db.get(Cliente, 1).score_cifin == 810
+    assert db.scalar(select(func.count()).select_from(Cliente)) == 3
+
+
+def test_exportacion_con_cursor_del_servidor(engine, db):
+    service = PrestamoService()
+    ids = [service.solicitar_prestamo(db, cliente_id, 5_000_000, 24).id for cliente_id in (1, 3, 1)]
+    cursores = []
+    event.listen(engine, "before_cursor_execute", lambda conn, cursor, *args: cursores.append(cursor))
+
+    filas = list(service.exportar(db, tamano_lote=2))
+    assert [fila["id"] for fila in filas] == ids
+    assert isinstance(cursores[-1], psycopg.ServerCursor)
@@ -1,58 +1,7 @@
-import pytest
-from fastapi.testclient import TestClient
-from app.main import app
-from app.database import Base, SessionLocal, get_db
-from app.models.cliente import Cliente, EstadoCliente
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-
-# Setup de base de datos de prueba
-SQLALCHEMY_TEST_DATABASE_URL = "sqlite:///:memory:"
-engine = create_engine(SQLALCHEMY_TEST_DATABASE_URL, connect_args={"check_same_thread": False})
-TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-
-def override_get_db():
-    """Override de la dependencia de base de datos para tests"""
-    try:
-        db = TestingSessionLocal()
-        yield db
-    finally:
-        db.close()
-
-app.dependency_overrides[get_db] = override_get_db
+# DB aislada por test: fixtures `setup_db` y `client` de tests/conftest.py
+# (copia de una plantilla con el seed, sin create_all por test)
 
-@pytest.fixture(autouse=True)
-def setup_database():
-    """Setup y teardown de base de datos para cada test"""
-    Base.metadata.create_all(bind=engine)
-    
-    # Seed data
-    db = TestingSessionLocal()
-    clientes = [
-        Cliente(id=1, nombre="Juan Pérez", identificacion="1234567890",
-                email="juan@test.com", score_cifin=750, 
-                ingresos_mensuales=5_000_000, estado=EstadoCliente.ACTIVO),
-        Cliente(id=2, nombre="María López", identificacion="0987654321",
-                email="maria@test.com", score_cifin=None,
-                ingresos_mensuales=3_000_000, estado=EstadoCliente.ACTIVO),
-        Cliente(id=3, nombre="Pedro Gómez", identificacion="1122334455",
-                email="pedro@test.com", score_cifin=450,
-                ingresos_mensuales=2_000_000, estado=EstadoCliente.ACTIVO),
-        Cliente(id=4, nombre="Ana Martínez", identificacion="5566778899",
-                email="ana@test.com", score_cifin=650,
-                ingresos_mensuales=4_000_000, estado=EstadoCliente.BLOQUEADO),
-    ]
-    db.add_all(clientes)
-    db.commit()
-    db.close()
-    
-    yield
-    
-    Base.metadata.drop_all(bind=engine)
-
-client = TestClient(app)
-
-def test_solicitar_prestamo_aprobacion_automatica():
+def test_solicitar_prestamo_aprobacion_automatica(client):
     """Test Case: Score>700, ingresos 4x cuota → APROBADO"""
     response = client.post("/api/prestamos/solicitar", json={
         "cliente_id": 1,  # Juan: score 750, ingresos $5M
@@ -65,7 +14,7 @@ def test_solicitar_prestamo_aprobacion_automatica():
     assert data["motivo_rechazo"] is None
     assert data["cuota_mensual"] is not None
 
-def test_solicitar_prestamo_rechazo_automatico():
+def test_solicitar_prestamo_rechazo_automatico(client):
     """Test Case: Score<500 → RECHAZADO"""
     response = client.post("/api/prestamos/solicitar", json={
         "cliente_id": 3,  # Pedro: score 450
@@ -77,7 +26,7 @@ def test_solicitar_prestamo_rechazo_automatico():
     assert data["estado"] == "rechazado"
     assert "score" in data["motivo_rechazo"].lower()
 
-def test_solicitar_prestamo_limite_monto():
+def test_solicitar_prestamo_limite_monto(client):
     """Test Case: Monto > $50M → Error validación"""
     response = client.post("/api/prestamos/solicitar", json={
         "cliente_id": 1,
@@ -87,7 +36,7 @@ def test_solicitar_prestamo_limite_monto():
     assert response.status_code == 400
     assert "límite" in response.json()["detail"].lower()
 
-def test_solicitar_prestamo_revision_manual():
+def test_solicitar_prestamo_revision_manual(client):
     """Test Case: Score 600-700, ratio 3x → EN_REVISION"""
     response = client.post("/api/prestamos/solicitar", json={
         "cliente_id": 4,  # Ana: score 650, ingresos $4M
@@ -99,7 +48,7 @@ def test_solicitar_prestamo_revision_manual():
     # Puede ser aprobado o en revisión dependiendo del ratio
     assert data["estado"] in ["en_revision", "aprobado"]
 
-def test_solicitar_prestamo_sin_historial():
+def test_solicitar_prestamo_sin_historial(client):
     """Test Case: Cliente sin historial crediticio → RECHAZADO"""
     response = client.post("/api/prestamos/solicitar", json={
         "cliente_id": 2,  # María: sin score
@@ -111,7 +60,7 @@ def test_solicitar_prestamo_sin_historial():
     assert data["estado"] == "rechazado"
     assert "historial" in data["motivo_rechazo"].lower()
 
-def test_obtener_estado_prestamo():
+def test_obtener_estado_prestamo(client):
     """Test Case: Consultar estado de préstamo existente"""
     # Primero crear un préstamo
     response = client.post("/api/prestamos/solicitar", json={
@@ -129,7 +78,175 @@ def test_obtener_estado_prestamo():
     assert data["id"] == prestamo_id
     assert data["estado"] == "aprobado"
 
-def test_obtener_estado_prestamo_no_existe():
+def test_obtener_estado_prestamo_no_existe(client):
     """Test Case: Consultar préstamo inexistente → Error 404"""
     response = client.get("/api/prestamos/999/estado")
     assert response.status_code == 404
+
+def test_estado_prestamo_etag_304_sin_consultar_db(client, setup_db):
+    """Test Case: Poll con If-None-Match vigente → 304 sin tocar la DB"""
+    from sqlalchemy import event
+    prestamo_id = client.post("/api/prestamos/solicitar", json={
+        "cliente_id": 3, "monto_solicitado": 10_000_000, "plazo_meses": 24  # Pedro: score 450 → rechazado
+    }).json()["id"]
+
+    response = client.get(f"/api/prestamos/{prestamo_id}/estado")
+    etag = response.headers["etag"]
+    assert response.headers["cache-control"] == "private, max-age=3600"  # rechazado: terminal
+
+    sentencias = []
+    engine = setup_db.get_bind()
+    registrar = lambda *args: sentencias.append(args[2])
+    event.listen(engine, "before_cursor_execute", registrar)
+    try:
+        response = client.get(f"/api/prestamos/{prestamo_id}/estado", headers={"If-None-Match": etag})
+    finally:
+        event.remove(engine, "before_cursor_execute", registrar)
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+    assert response.content == b""
+    assert sentencias == []
+
+def test_estado_prestamo_etag_cambia_con_la_version(client, setup_db):
+    """Test Case: Un UPDATE que sube la versión sin cambiar el estado → 200 con la versión nueva"""
+    from sqlalchemy import update
+    from app.models.prestamo import Prestamo
+    from app.services.versiones_prestamo import notificar_cambios
+    prestamo_id = client.post("/api/prestamos/solicitar", json={
+        "cliente_id": 4, "monto_solicitado": 2_000_000, "plazo_meses": 24  # Ana: score 650 → revisión
+    }).json()["id"]
+    response = client.get(f"/api/prestamos/{prestamo_id}/estado")
+    etag, version = response.headers["etag"], response.json()["version"]
+
+    # Como el re-scoring: UPDATE de core que conserva el estado y sube la versión
+    setup_db.execute(update(Prestamo).where(Prestamo.id == prestamo_id)
+                     .values(score_decision=655, version=Prestamo.version + 1))
+    setup_db.commit()
+    notificar_cambios([prestamo_id])
+
+    response = client.get(f"/api/prestamos/{prestamo_id}/estado", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert (response.json()["estado"], response.json()["version"]) == ("en_revision", version + 1)
+    assert response.headers["etag"] != etag
+    assert client.patch(f"/api/prestamos/{prestamo_id}/estado",
+                        json={"estado": "aprobado", "version": version + 1}).status_code == 200
+
+def test_estado_prestamo_version_de_otro_proceso_vence_con_ttl(client, setup_db, monkeypatch):
+    """Test Case: Escritura que el proceso no ve → a lo sumo TTL segundos de 304 viejo"""
+    from sqlalchemy import update
+    from app.models.prestamo import Prestamo
+    from app.services.versiones_prestamo import versiones_prestamo
+    ahora = [1000.0]
+    monkeypatch.setattr(versiones_prestamo, "_reloj", lambda: ahora[0])
+    monkeypatch.setattr(versiones_prestamo, "ttl", 2)
+    prestamo_id = client.post("/api/prestamos/solicitar", json={
+        "cliente_id": 4, "monto_solicitado": 2_000_000, "plazo_meses": 24  # Ana: score 650 → revisión
+    }).json()["id"]
+    url = f"/api/prestamos/{prestamo_id}/estado"
+    etag = client.get(url).headers["etag"]
+
+    # Otro worker / script: UPDATE de core sin notificar_cambios en este proceso
+    setup_db.execute(update(Prestamo).where(Prestamo.id == prestamo_id)
+                     .values(score_decision=655, version=Prestamo.version + 1))
+    setup_db.commit()
+    assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
+
+    ahora[0] += 2
+    response = client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+
+def test_estado_prestamo_etag_cambia_con_el_estado(client, setup_db):
+    """Test Case: Un cambio de estado invalida la versión → 200 con ETag nuevo"""
+    from app.models.prestamo import Prestamo, EstadoPrestamo
+    prestamo_id = client.post("/api/prestamos/solicitar", json={
+        "cliente_id": 4, "monto_solicitado": 2_000_000, "plazo_meses": 24  # Ana: score 650 → revisión
+    }).json()["id"]
+    response = client.get(f"/api/prestamos/{prestamo_id}/estado")
+    etag = response.headers["etag"]
+    assert response.headers["cache-control"] == "private, no-cache"
+
+    prestamo = setup_db.get(Prestamo, prestamo_id)
+    prestamo.estado = EstadoPrestamo.APROBADO
+    setup_db.commit()
+
+    response = client.get(f"/api/prestamos/{prestamo_id}/estado", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["estado"] == "aprobado"
+    assert response.headers["etag"] != etag
+    # Aprobado todavía se desembolsa: no se cachea
+    assert response.headers["cache-control"] == "private, no-cache"
+
+    version = response.json()["version"]
+    client.patch(f"/api/prestamos/{prestamo_id}/estado", json={"estado": "desembolsado", "version": version})
+    response = client.get(f"/api/prestamos/{prestamo_id}/estado")
+    assert response.json()["estado"] == "desembolsado"
+    assert response.headers["cache-control"] == "private, max-age=3600"
+
+def _eventos_sse(texto):
+    return [
+        dict(linea.split(": ", 1) for linea in bloque.splitlines())
+        for bloque in texto.strip().split("\n\n")
+        if bloque.startswith("event:")
+    ]
+
+def test_eventos_estado_prestamo_empuja_el_cambio(client, setup_db):
+    """Test Case: SSE envía el estado actual y el cambio, y cierra en estado terminal"""
+    import json
+    import threading
+    from sqlalchemy.orm import Session
+    from app.models.prestamo import Prestamo, EstadoPrestamo
+    prestamo_id = client.post("/api/prestamos/solicitar", json={
+        "cliente_id": 4, "monto_solicitado": 2_000_000, "plazo_meses": 24  # Ana: score 650 → revisión
+    }).json()["id"]
+
+    def pasar_a(estado):
+        with Session(bind=setup_db.get_bind()) as db:
+            db.get(Prestamo, prestamo_id).estado = estado
+            db.commit()
+
+    # Aprobado no cierra el stream: el desembolso también se empuja
+    threading.Timer(0.2, pasar_a, (EstadoPrestamo.APROBADO,)).start()
+    threading.Timer(0.4, pasar_a, (EstadoPrestamo.DESEMBOLSADO,)).start()
+    response = client.get(f"/api/prestamos/{prestamo_id}/eventos")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    eventos = _eventos_sse(response.text)
+    estados = [json.loads(e["data"])["estado"] for e in eventos]
+    assert (estados[0], estados[-1]) == ("en_revision", "desembolsado")
+    assert len({e["id"] for e in eventos}) == len(eventos)
+
+def test_eventos_estado_prestamo_terminal_y_last_event_id(client):
+    """Test Case: préstamo en estado terminal → un evento y cierre; con Last-Event-ID no se repite"""
+    prestamo_id = client.post("/api/prestamos/solicitar", json={
+        "cliente_id": 3, "monto_solicitado": 10_000_000, "plazo_meses": 24  # rechazado
+    }).json()["id"]
+    eventos = _eventos_sse(client.get(f"/api/prestamos/{prestamo_id}/eventos").text)
+    assert len(eventos) == 1
+
+    response = client.get(f"/api/prestamos/{prestamo_id}/eventos", headers={"Last-Event-ID": eventos[0]["id"]})
+    assert _eventos_sse(response.text) == []
+    assert client.get("/api/prestamos/999/eventos").status_code == 404
+    from app.services.eventos_prestamo import pubsub_prestamos
+    assert pubsub_prestamos.conexiones() == 0
+
+def test_exportar_prestamos_ndjson(client):
+    """Test Case: exportación en streaming, un préstamo por línea y filtro por estado"""
+    import json
+    ids = [
+        client.post("/api/prestamos/solicitar", json={
+            "cliente_id": cliente_id, "monto_solicitado": 5_000_000, "plazo_meses": 24
+        }).json()["id"]
+        for cliente_id in (1, 3, 1)
+    ]
+    response = client.get("/api/prestamos/exportar")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    filas = [json.loads(linea) for linea in response.text.splitlines()]
+    assert [f["id"] for f in filas] == ids
+    assert filas[1]["estado"] == "rechazado"
+
+    rechazados = client.get("/api/prestamos/exportar?estado=rechazado").text.splitlines()
+    assert [json.loads(linea)["id"] for linea in rechazados] == [ids[1]]
+    assert client.get("/api/prestamos/exportar?estado=otro").status_code == 422
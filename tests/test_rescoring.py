@@ -0,0 +1,127 @@
+import itertools
+
+import numpy as np
+import pytest
+from app.config import get_settings
+from app.models.cliente import Cliente
+from app.models.prestamo import Prestamo, EstadoPrestamo
+from app.services.estadisticas_service import EstadisticasService
+from app.services.motor_reglas import motor_para
+from app.services.motor_vectorizado import evaluar_decisiones
+from app.services.prestamo_service import PrestamoService
+from app.services.rescoring_service import RescoringCartera
+
+
+def _rescoring(db, **kwargs):
+    kwargs.setdefault("procesos", 1)
+    return RescoringCartera(db, motor_para(get_settings()), **kwargs)
+
+
+def _cartera_abierta(db):
+    """Tres préstamos EN_REVISION de Ana (score 650) y uno aprobado de Juan"""
+    service = PrestamoService()
+    ids = [service.solicitar_prestamo(db, 4, monto, 24).id for monto in (2_000_000, 4_000_000, 24_000_000)]
+    assert {db.get(Prestamo, i).estado for i in ids} == {EstadoPrestamo.EN_REVISION}
+    service.solicitar_prestamo(db, 1, 2_000_000, 24)
+    return ids
+
+
+def _cambiar_score(db, cliente_id, score):
+    db.get(Cliente, cliente_id).score_cifin = score
+    db.commit()
+
+
+def test_kernel_vectorizado_decide_igual_que_el_motor():
+    motor = motor_para(get_settings())
+    casos = list(itertools.product(
+        [None, 0, 450, 499, 500, 599, 600, 650, 699, 700, 899, 950],
+        [None, 0, 500_000, 1_000_000, 3_000_000, 8_000_000],
+        [1_000_000, 5_000_000, 20_000_000],
+        [12, 24, 36, 61],
+    ))
+    scores, ingresos, montos, plazos = zip(*casos)
+    plazos_tabla = np.unique(plazos)
+    codigos, cuotas, ratios = evaluar_decisiones(
+        np.array([np.nan if s is None else s for s in scores], dtype=float),
+        np.array([np.nan if i is None else i for i in ingresos], dtype=float),
+        np.array(montos, dtype=float), np.array(plazos),
+        plazos_tabla, np.array([motor.factor(int(p)) for p in plazos_tabla]),
+        motor.score_rechazo, tuple((r.score_minimo, r.ratio_minimo) for r in motor.reglas),
+    )
+    reglas = dict(enumerate(motor.reglas))
+    reglas.update({-1: motor.regla_sin_historial, -2: motor.regla_score_insuficiente,
+                   -3: motor.regla_ingresos_insuficientes})
+    for caso, codigo, cuota in zip(casos, codigos.tolist(), cuotas.tolist()):
+        regla, cuota_motor, _ = motor.evaluar(*caso)
+        assert reglas[codigo] is regla, caso
+        assert cuota == cuota_motor
+
+
+def test_dry_run_reporta_diferencias_sin_escribir(setup_db):
+    ids = _cartera_abierta(setup_db)
+    _cambiar_score(setup_db, 4, 750)
+    antes = EstadisticasService().resumen(setup_db)
+
+    reporte = _rescoring(setup_db).ejecutar(dry_run=True)
+
+    assert reporte["dry_run"] is True
+    assert reporte["evaluados"] == 3
+    assert reporte["actualizados"] == 0
+    # Con score 750 los dos montos menores cumplen ratio 4x; el tercero sigue en revisión
+    assert reporte["transiciones"] == {"en_revision->aprobado": 2}
+    assert [d["prestamo_id"] for d in reporte["diferencias"]] == ids[:2]
+    assert reporte["diferencias"][0]["score_anterior"] == 650
+    assert reporte["diferencias"][0]["score_nuevo"] == 750
+    assert {setup_db.get(Prestamo, i).estado for i in ids} == {EstadoPrestamo.EN_REVISION}
+    assert EstadisticasService().resumen(setup_db) == antes
+
+
+def test_escribe_solo_los_cambios_y_mantiene_agregados(setup_db):
+    ids = _cartera_abierta(setup_db)
+    _cambiar_score(setup_db, 4, 450)
+
+    reporte = _rescoring(setup_db, tamano_lote=2).ejecutar()
+
+    assert reporte["actualizados"] == 3
+    assert reporte["transiciones"] == {"en_revision->rechazado": 3}
+    setup_db.expire_all()
+    prestamo = setup_db.get(Prestamo, ids[0])
+    assert prestamo.estado == EstadoPrestamo.RECHAZADO
+    assert prestamo.score_decision == 450
+    assert prestamo.cuota_mensual is None
+    assert "Score crediticio insuficiente" in prestamo.motivo_rechazo
+    assert prestamo.fecha_decision is not None
+
+    # Los agregados incrementales cuadran con una reconstrucción completa
+    incremental = EstadisticasService().resumen(setup_db)
+    EstadisticasService().reconstruir(setup_db)
+    assert EstadisticasService().resumen(setup_db) == incremental
+
+    # Nada abierto: una segunda corrida no encuentra qué mover
+    assert _rescoring(setup_db).ejecutar()["evaluados"] == 0
+
+
+def test_no_pisa_prestamos_que_cambiaron_despues_de_leerlos(setup_db):
+    ids = _cartera_abierta(setup_db)
+    _cambiar_score(setup_db, 4, 750)
+    rescoring = _rescoring(setup_db)
+    lote = next(rescoring._lotes())
+    # Otro proceso decide el préstamo entre la lectura y la escritura
+    setup_db.get(Prestamo, ids[0]).estado = EstadoPrestamo.RECHAZADO
+    setup_db.commit()
+
+    rescoring._aplicar(lote, *rescoring._evaluar(None, lote), dry_run=False)
+
+    assert rescoring.cambios == 2
+    assert rescoring.actualizados == 1
+    setup_db.expire_all()
+    assert setup_db.get(Prestamo, ids[0]).estado == EstadoPrestamo.RECHAZADO
+    assert setup_db.get(Prestamo, ids[1]).estado == EstadoPrestamo.APROBADO
+
+
+def test_pool_de_procesos_da_el_mismo_resultado(setup_db):
+    _cartera_abierta(setup_db)
+    _cambiar_score(setup_db, 4, 750)
+    en_linea = _rescoring(setup_db, tamano_lote=1).ejecutar(dry_run=True)
+    con_pool = _rescoring(setup_db, tamano_lote=1, procesos=2).ejecutar(dry_run=True)
+    assert con_pool == en_linea
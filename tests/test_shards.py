@@ -0,0 +1,180 @@
+import dataclasses
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import func, select
+from app import shards
+from app.config import Settings
+from app.database import get_db, get_read_db
+from app.models.cliente import Cliente, EstadoCliente
+from app.models.estadistica import EstadisticaCartera
+from app.models.prestamo import Prestamo, EstadoPrestamo
+from app.services.jobs_cartera import reconstruir_estadisticas
+from app.services.prestamo_service import PrestamoService
+from app.shards import RANGO_IDS_POR_SHARD, ClusterShards, urls_shards
+
+# Con 2 shards: clientes 1 y 3 van al shard 1, el 5 al shard 0
+CLIENTES = [
+    Cliente(id=1, nombre="Juan Pérez", identificacion="1234567890", email="juan@test.com",
+            score_cifin=750, ingresos_mensuales=5_000_000, estado=EstadoCliente.ACTIVO),
+    Cliente(id=3, nombre="Pedro Gómez", identificacion="1122334455", email="pedro@test.com",
+            score_cifin=450, ingresos_mensuales=2_000_000, estado=EstadoCliente.ACTIVO),
+    Cliente(id=5, nombre="Lucía Ríos", identificacion="6677889900", email="lucia@test.com",
+            score_cifin=720, ingresos_mensuales=6_000_000, estado=EstadoCliente.ACTIVO),
+]
+
+
+@pytest.fixture
+def cluster(tmp_path):
+    cluster = ClusterShards([f"sqlite:///{tmp_path / f'shard{i}.db'}" for i in range(2)])
+    cluster.crear_esquema()
+    with cluster.SessionLocal() as db:
+        db.add_all(Cliente(**{c.name: getattr(cliente, c.name) for c in Cliente.__table__.columns})
+                   for cliente in CLIENTES)
+        db.commit()
+    yield cluster
+    cluster.cerrar()
+
+
+@pytest.fixture
+def client_shards(cluster):
+    from app.main import app
+
+    def sesion(fabrica):
+        def dependencia():
+            db = fabrica()
+            try:
+                yield db
+            finally:
+                db.close()
+        return dependencia
+
+    app.dependency_overrides[get_db] = sesion(cluster.SessionLocal)
+    app.dependency_overrides[get_read_db] = sesion(cluster.ReadSessionLocal)
+    yield TestClient(app)
+    app.dependency_overrides.pop(get_db, None)
+    app.dependency_overrides.pop(get_read_db, None)
+
+
+def _contar(cluster, shard, modelo):
+    with cluster.sesiones_shard[shard]() as db:
+        return db.scalar(select(func.count()).select_from(modelo))
+
+
+def test_clientes_y_prestamos_viven_en_el_shard_del_cliente(cluster):
+    assert [cluster.shard_de_cliente(c.id) for c in CLIENTES] == [1, 1, 0]
+    assert (_contar(cluster, 0, Cliente), _contar(cluster, 1, Cliente)) == (1, 2)
+
+    service = PrestamoService()
+    with cluster.SessionLocal() as db:
+        en_shard_1 = service.solicitar_prestamo(db, 1, 10_000_000, 36).id
+        en_shard_0 = service.solicitar_prestamo(db, 5, 5_000_000, 24).id
+
+    # Ids globales: cada shard genera en su propio rango
+    assert 0 < en_shard_0 <= RANGO_IDS_POR_SHARD < en_shard_1
+    assert cluster.shard_de_id(en_shard_1) == 1
+    assert (_contar(cluster, 0, Prestamo), _contar(cluster, 1, Prestamo)) == (1, 1)
+
+    # Los agregados se mantienen en el shard del préstamo
+    with cluster.sesiones_shard[0]() as db:
+        assert db.get(EstadisticaCartera, ("estado", "aprobado")).conteo == 1
+
+    with cluster.ReadSessionLocal() as db:
+        assert service.obtener_estado_prestamo(db, en_shard_1).cliente_id == 1
+        assert db.get(Prestamo, en_shard_0).cliente.nombre == "Lucía Ríos"
+
+
+def test_criterios_acotan_los_shards_consultados(cluster):
+    assert cluster.shards_de_criterio(select(Prestamo).where(Prestamo.cliente_id == 5)) == {0}
+    ids = [7, RANGO_IDS_POR_SHARD + 7]
+    assert cluster.shards_de_criterio(select(Prestamo).where(Prestamo.id.in_(ids))) == {0, 1}
+    assert cluster.shards_de_criterio(select(Prestamo).where(Prestamo.estado == EstadoPrestamo.APROBADO)) == set()
+
+
+def test_endpoints_con_shards(client_shards):
+    ids = []
+    for cliente_id in (1, 3, 5):
+        response = client_shards.post("/api/prestamos/solicitar", json={
+            "cliente_id": cliente_id, "monto_solicitado": 5_000_000, "plazo_meses": 24,
+        })
+        assert response.status_code == 200
+        ids.append(response.json()["id"])
+
+    assert client_shards.get(f"/api/prestamos/{ids[0]}/estado").json()["cliente_id"] == 1
+    resumen = client_shards.get("/api/clientes/1/resumen").json()
+    assert [p["id"] for p in resumen["prestamos"]] == [ids[0]]
+
+    # Lectura cruzada: agregados de los dos shards sumados
+    estadisticas = client_shards.get("/api/prestamos/estadisticas").json()
+    assert estadisticas["total_prestamos"] == 3
+    por_estado = {fila["estado"]: fila["conteo"] for fila in estadisticas["por_estado"]}
+    assert por_estado == {"aprobado": 2, "rechazado": 1}
+
+
+def test_importacion_reserva_ids_y_escribe_por_shard(client_shards, cluster):
+    filas = [{"nombre": "Juan Actualizado", "identificacion": "1234567890", "email": "juan@test.com",
+              "score_cifin": 800}]
+    filas += [{"nombre": f"Nuevo {i}", "identificacion": f"N-{i}", "email": f"n{i}@test.com"} for i in range(6)]
+    cuerpo = "\n".join(json.dumps(fila) for fila in filas).encode()
+    reporte = client_shards.post("/api/clientes/import", content=cuerpo,
+                                 headers={"Content-Type": "application/x-ndjson"}).json()
+    assert reporte["importados"] == 7
+
+    ubicados = {}
+    for shard in (0, 1):
+        with cluster.sesiones_shard[shard]() as db:
+            for cliente in db.scalars(select(Cliente)):
+                assert cluster.shard_de_cliente(cliente.id) == shard
+                ubicados[cliente.identificacion] = cliente
+    assert len(ubicados) == 9
+    assert (ubicados["1234567890"].id, ubicados["1234567890"].score_cifin) == (1, 800)
+    # Ids nuevos por encima del mayor existente y sin repetirse
+    nuevos = sorted(ubicados[f"N-{i}"].id for i in range(6))
+    assert nuevos == list(range(6, 12))
+    assert list(cluster.reservar_ids_clientes(2)) == [12, 13]
+
+
+def test_importacion_asigna_un_id_por_identificacion_nueva(cluster):
+    from app.services.importacion_service import ImportadorClientes
+    with cluster.SessionLocal() as db:
+        filas = [(1, {"identificacion": "N-1"}), (2, {"identificacion": "1234567890"}),
+                 (3, {"identificacion": "N-1"}), (4, {"identificacion": "N-2"})]
+        grupos = ImportadorClientes(db)._por_shard(filas)
+
+    ids = {fila: datos["id"] for _, grupo in grupos for fila, datos in grupo}
+    assert ids[1] == ids[3] != ids[4]
+    assert ids[2] == 1
+    assert list(cluster.reservar_ids_clientes(1)) == [max(ids.values()) + 1]
+
+
+def test_job_de_cartera_recorre_cada_shard(cluster, monkeypatch):
+    with cluster.SessionLocal() as db:
+        for cliente_id in (1, 3, 5):
+            PrestamoService().solicitar_prestamo(db, cliente_id, 5_000_000, 24)
+    monkeypatch.setattr(shards, "cluster", cluster)
+
+    class Contexto:
+        session_factory = None
+        avances = []
+
+        def reportar(self, fraccion, mensaje):
+            self.avances.append((fraccion, mensaje))
+
+        def verificar_cancelacion(self):
+            pass
+
+    contexto = Contexto()
+    assert reconstruir_estadisticas(contexto, tamano_lote=1) == {"prestamos_procesados": 3}
+    assert contexto.avances[-1][1].startswith("shard 2/2")
+
+
+def test_urls_de_shards():
+    base = dataclasses.replace(Settings(), DATABASE_URL="sqlite:///./datos/app.db", DATABASE_SHARDS=3)
+    assert urls_shards(base)[2] == "sqlite:///./datos/app.shard2.db"
+
+    explicitas = dataclasses.replace(base, DATABASE_SHARD_URLS="sqlite:///a.db, sqlite:///b.db")
+    with pytest.raises(ValueError):
+        urls_shards(explicitas)
+    with pytest.raises(ValueError):
+        urls_shards(dataclasses.replace(base, DATABASE_URL="postgresql://db/app"))
@@ -0,0 +1,113 @@
+import json
+
+import pytest
+from app import trazas
+from app.trazas import (
+    SPAN_NULO, ExportadorArchivo, ExportadorMemoria, Trazador, detener_trazas, iniciar_trazas,
+    parsear_traceparent, span,
+)
+
+
+@pytest.fixture
+def exportador():
+    exportador = ExportadorMemoria()
+    iniciar_trazas(exportador, muestreo=1.0, sincrono=True)
+    yield exportador
+    detener_trazas()
+
+
+def _por_nombre(spans):
+    return {s["name"]: s for s in spans}
+
+
+def test_solicitud_genera_arbol_de_spans(client, exportador):
+    """Router -> servicio -> pasos -> sentencias SQL, todos en la misma traza"""
+    response = client.post("/api/prestamos/solicitar", json={
+        "cliente_id": 1, "monto_solicitado": 5_000_000, "plazo_meses": 12,
+    })
+    assert response.status_code == 200
+
+    spans = exportador.spans
+    assert len({s["traceId"] for s in spans}) == 1
+    nombres = _por_nombre(spans)
+    raiz = nombres["POST /api/prestamos/solicitar"]
+    assert raiz["kind"] == "SPAN_KIND_SERVER"
+    assert "parentSpanId" not in raiz
+    assert raiz["attributes"]["http.status_code"] == 200
+
+    servicio = nombres["PrestamoService.solicitar_prestamo"]
+    assert servicio["parentSpanId"] == raiz["spanId"]
+    for paso in ("prestamo.buscar_cliente", "prestamo.evaluar_reglas", "prestamo.persistir"):
+        assert nombres[paso]["parentSpanId"] == servicio["spanId"]
+    assert nombres["prestamo.evaluar_reglas"]["attributes"]["regla"]
+
+    sql = [s for s in spans if s["kind"] == "SPAN_KIND_CLIENT"]
+    assert any(s["name"] == "SELECT" and s["parentSpanId"] == nombres["prestamo.buscar_cliente"]["spanId"]
+               for s in sql)
+    assert any(s["name"] == "INSERT" and s["parentSpanId"] == nombres["prestamo.persistir"]["spanId"]
+               for s in sql)
+    # La respuesta lleva el contexto para que el cliente enlace su traza
+    assert parsear_traceparent(response.headers["traceparent"])[0] == raiz["traceId"]
+
+
+def test_ruta_con_parametros_usa_la_plantilla(client, exportador):
+    client.get("/api/prestamos/999/estado")
+    raiz = [s for s in exportador.spans if s["kind"] == "SPAN_KIND_SERVER"][0]
+    assert raiz["name"] == "GET /api/prestamos/{prestamo_id}/estado"
+    assert raiz["attributes"]["http.status_code"] == 404
+
+
+def test_continua_traceparent_entrante(client, exportador):
+    trace_id, padre = "4bf92f3577b34da6a3ce929d0e0e4736", "00f067aa0ba902b7"
+    client.get("/api/prestamos/999/estado", headers={"traceparent": f"00-{trace_id}-{padre}-01"})
+    raiz = [s for s in exportador.spans if s["kind"] == "SPAN_KIND_SERVER"][0]
+    assert raiz["traceId"] == trace_id
+    assert raiz["parentSpanId"] == padre
+
+
+def test_traceparent_no_muestreado_no_exporta(client, exportador):
+    response = client.get("/api/prestamos/999/estado",
+                          headers={"traceparent": "00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-00"})
+    assert response.status_code == 404
+    assert exportador.spans == []
+    assert "traceparent" not in response.headers
+
+
+def test_muestreo_cero_y_trazas_apagadas_no_crean_spans():
+    assert span("x").__enter__() is SPAN_NULO  # sin trazador
+
+    exportador = ExportadorMemoria()
+    trazador = Trazador(exportador, muestreo=0.0, sincrono=True)
+    with trazador.span("raiz") as raiz:
+        assert raiz is SPAN_NULO
+        with trazador.span("hijo") as hijo:
+            assert hijo is SPAN_NULO
+    assert exportador.spans == []
+
+
+def test_error_queda_en_el_span(exportador):
+    with pytest.raises(ValueError):
+        with span("raiz"):
+            with span("falla"):
+                raise ValueError("boom")
+    falla = _por_nombre(exportador.spans)["falla"]
+    assert falla["status"] == {"code": "STATUS_CODE_ERROR", "message": "ValueError: boom"}
+
+
+def test_exportador_archivo_en_lotes(tmp_path):
+    ruta = tmp_path / "spans.ndjson"
+    trazador = Trazador(ExportadorArchivo(str(ruta)), muestreo=1.0, intervalo_ms=10)
+    trazador.iniciar()
+    with trazador.span("raiz"):
+        with trazador.span("hijo"):
+            pass
+    trazador.detener()
+    lineas = [json.loads(linea) for linea in ruta.read_text().splitlines()]
+    assert [l["name"] for l in lineas] == ["hijo", "raiz"]
+    assert lineas[0]["parentSpanId"] == lineas[1]["spanId"]
+
+
+def test_parsear_traceparent_invalido():
+    assert parsear_traceparent("basura") is None
+    assert parsear_traceparent("00-" + "0" * 32 + "-00f067aa0ba902b7-01") is None
+    assert trazas.trazador is None